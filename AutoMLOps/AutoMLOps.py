@@ -24,7 +24,7 @@ import logging
 import os
 import sys
 import subprocess
-from typing import Callable, Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Union
 
 from AutoMLOps.utils.constants import (
     BASE_DIR,
@@ -36,30 +36,32 @@ from AutoMLOps.utils.constants import (
 from AutoMLOps.utils.utils import (
     execute_process,
     make_dirs,
-    read_yaml_file,
     validate_schedule,
+    virtual_filesystem
 )
-from AutoMLOps.frameworks.kfp import builder as KfpBuilder
-from AutoMLOps.frameworks.kfp import scaffold as KfpScaffold
-from AutoMLOps.deployments.cloudbuild import builder as CloudBuildBuilder
-
-# IaC imports
-from AutoMLOps.iac.pulumi_provider import builder as PulumiBuilder
-from AutoMLOps.iac.terraform_provider import builder as TerraformBuilder
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.tracing import root_span, span
+from AutoMLOps.utils.wheelhouse import validate_wheelhouse
 from AutoMLOps.iac.enums import Provider
-from AutoMLOps.iac.configs import (
-    PulumiConfig,
-    TerraformConfig
-)
 
-logging.basicConfig(stream=sys.stdout, level=logging.INFO,
-                    format='%(message)s')
+# Builders, scaffolds and IaC providers are imported on first use so that
+# importing this module stays cheap and has no side effects
+if TYPE_CHECKING:
+    from AutoMLOps.iac.configs import (
+        PulumiConfig,
+        TerraformConfig
+    )
+
 logger = logging.getLogger()
 
-make_dirs([OUTPUT_DIR])
 
+def _configure_logging():
+    """Logs info messages to stdout, unless logging is already configured."""
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+                        format='%(message)s')
 
-def go(project_id: str,
+
+def go(project_id: str,  # pylint: disable=too-many-positional-arguments
        pipeline_params: Dict,
        af_registry_location: Optional[str] = 'us-central1',
        af_registry_name: Optional[str] = 'vertex-mlops-af',
@@ -80,7 +82,9 @@ def go(project_id: str,
        schedule_location: Optional[str] = 'us-central1',
        schedule_name: Optional[str] = 'AutoMLOps-schedule',
        schedule_pattern: Optional[str] = 'No Schedule Specified',
-       vpc_connector: Optional[str] = 'No VPC Specified'):
+       vpc_connector: Optional[str] = 'No VPC Specified',
+       per_component_images: Optional[bool] = False,
+       wheelhouse: Optional[str] = None):
     """Generates relevant pipeline and component artifacts,
        then builds, compiles, and submits the PipelineJob.
 
@@ -107,18 +111,43 @@ def go(project_id: str,
         schedule_name: The name of the scheduler resource.
         schedule_pattern: Cron formatted value used to create a Scheduled retrain job.
         vpc_connector: The name of the vpc connector to use.
+        per_component_images: Flag that determines whether each group of components
+            with the same requirements is built into its own image, layered on a
+            shared component_base image.
+        wheelhouse: Directory of wheels, or url of a package index, that component
+            requirements are resolved against offline into a pinned requirements.lock
+            with hashes, which the images install from. A directory requires
+            run_local=True, since its wheels are not pushed to CSR.
     """
-    generate(project_id, pipeline_params, af_registry_location,
-             af_registry_name, base_image, cb_trigger_location, cb_trigger_name,
-             cloud_run_location, cloud_run_name, cloud_tasks_queue_location,
-             cloud_tasks_queue_name, csr_branch_name, csr_name,
-             custom_training_job_specs, gs_bucket_location, gs_bucket_name,
-             pipeline_runner_sa, run_local, schedule_location,
-             schedule_name, schedule_pattern, vpc_connector)
-    run(run_local)
-
-
-def generate(project_id: str,
+    # A single trace covers both generate() and run()
+    with root_span('go', run_local=run_local):
+        generate(project_id, pipeline_params,
+                 af_registry_location=af_registry_location,
+                 af_registry_name=af_registry_name,
+                 base_image=base_image,
+                 cb_trigger_location=cb_trigger_location,
+                 cb_trigger_name=cb_trigger_name,
+                 cloud_run_location=cloud_run_location,
+                 cloud_run_name=cloud_run_name,
+                 cloud_tasks_queue_location=cloud_tasks_queue_location,
+                 cloud_tasks_queue_name=cloud_tasks_queue_name,
+                 csr_branch_name=csr_branch_name,
+                 csr_name=csr_name,
+                 custom_training_job_specs=custom_training_job_specs,
+                 gs_bucket_location=gs_bucket_location,
+                 gs_bucket_name=gs_bucket_name,
+                 pipeline_runner_sa=pipeline_runner_sa,
+                 run_local=run_local,
+                 schedule_location=schedule_location,
+                 schedule_name=schedule_name,
+                 schedule_pattern=schedule_pattern,
+                 vpc_connector=vpc_connector,
+                 per_component_images=per_component_images,
+                 wheelhouse=wheelhouse)
+        run(run_local)
+
+
+def generate(project_id: str,  # pylint: disable=too-many-positional-arguments
              pipeline_params: Dict,
              af_registry_location: Optional[str] = 'us-central1',
              af_registry_name: Optional[str] = 'vertex-mlops-af',
@@ -139,41 +168,62 @@ def generate(project_id: str,
              schedule_location: Optional[str] = 'us-central1',
              schedule_name: Optional[str] = 'AutoMLOps-schedule',
              schedule_pattern: Optional[str] = 'No Schedule Specified',
-             vpc_connector: Optional[str] = 'No VPC Specified'):
+             vpc_connector: Optional[str] = 'No VPC Specified',
+             per_component_images: Optional[bool] = False,
+             wheelhouse: Optional[str] = None,
+             dry_run: Optional[bool] = False) -> Optional[Dict[str, bytes]]:
     """Generates relevant pipeline and component artifacts.
 
-    Args: See go() function.
+    Args: See go() function. Additionally:
+        dry_run: Render the artifacts in memory instead of writing them under
+            AutoMLOps/; no directories are created and no processes are run.
+    Returns:
+        dict: If dry_run is set, a mapping of each generated file's path to its
+            contents; otherwise None.
     """
-    # Validate that run_local=False if schedule_pattern parameter is set
-    validate_schedule(schedule_pattern, run_local)
+    with root_span('generate'):
+        # Validate that run_local=False if schedule_pattern parameter is set
+        validate_schedule(schedule_pattern, run_local)
 
-    # Set defaults if none were given for bucket name and pipeline runner sa
-    default_bucket_name = f'{project_id}-bucket' if gs_bucket_name is None else gs_bucket_name
-    default_pipeline_runner_sa = f'vertex-pipelines@{project_id}.iam.gserviceaccount.com' if pipeline_runner_sa is None else pipeline_runner_sa
+        # Validate that run_local=True if the images install from a local wheelhouse
+        validate_wheelhouse(wheelhouse, run_local)
 
-    # Make necessary directories
-    make_dirs(GENERATED_DIRS)
+        # Build the default config variables once; defaults for bucket name and
+        # pipeline runner sa are set if none were given
+        defaults = DefaultsConfig(
+            project_id, af_registry_location, af_registry_name, base_image,
+            cb_trigger_location, cb_trigger_name, cloud_run_location, cloud_run_name,
+            cloud_tasks_queue_location, cloud_tasks_queue_name, csr_branch_name,
+            csr_name, gs_bucket_location, gs_bucket_name, pipeline_runner_sa,
+            run_local, schedule_location, schedule_name, schedule_pattern,
+            vpc_connector, per_component_images, wheelhouse)
 
-    # Switch statement to go here for different frameworks and deployments:
+        from AutoMLOps.frameworks.kfp import builder as KfpBuilder
+        from AutoMLOps.deployments.cloudbuild import builder as CloudBuildBuilder
 
-    # Build files required to run a Kubeflow Pipeline
-    KfpBuilder.build(project_id, pipeline_params, af_registry_location,
-                     af_registry_name, base_image, cb_trigger_location, cb_trigger_name,
-                     cloud_run_location, cloud_run_name, cloud_tasks_queue_location,
-                     cloud_tasks_queue_name, csr_branch_name, csr_name,
-                     custom_training_job_specs, gs_bucket_location, default_bucket_name,
-                     default_pipeline_runner_sa, run_local, schedule_location,
-                     schedule_name, schedule_pattern, vpc_connector)
+        # Render every file in memory for a dry run
+        if dry_run:
+            with virtual_filesystem() as files:
+                image_tags = KfpBuilder.build(defaults, pipeline_params, custom_training_job_specs)
+                CloudBuildBuilder.build(defaults, image_tags)
+            return dict(sorted(files.items()))
 
-    CloudBuildBuilder.build(af_registry_location, af_registry_name, cloud_run_location,
-                            cloud_run_name, default_pipeline_runner_sa, project_id,
-                            run_local, schedule_pattern, vpc_connector)
+        # Make necessary directories
+        make_dirs([OUTPUT_DIR] + GENERATED_DIRS)
+
+        # Switch statement to go here for different frameworks and deployments:
+
+        # Build files required to run a Kubeflow Pipeline
+        image_tags = KfpBuilder.build(defaults, pipeline_params, custom_training_job_specs)
+
+        CloudBuildBuilder.build(defaults, image_tags)
+    return None
 
 
 def iac_generate(
     project_id: str,
     provider: Provider = Provider.TERRAFORM,
-    provider_config: Optional[PulumiConfig or TerraformConfig] = TerraformConfig
+    provider_config: Optional[Union['PulumiConfig', 'TerraformConfig']] = None
 ):
     """Generates relevant IaC configurations.
        Follows the IaC provider and runtime specified.
@@ -184,9 +234,13 @@ def iac_generate(
         provider: The provider options: TERRAFORM or PULUMI (default: Provider.TERRAFORM).
         provider_config: The provider config (default: TerraformConfig).
     """
+    if provider_config is None:
+        from AutoMLOps.iac.configs import TerraformConfig
+        provider_config = TerraformConfig
 
     # Generate Pulumi IaC configurations
     if provider == Provider.PULUMI:
+        from AutoMLOps.iac.pulumi_provider import builder as PulumiBuilder
         PulumiBuilder(
             project_id=project_id,
             config=provider_config
@@ -194,6 +248,7 @@ def iac_generate(
 
     # Generate Terraform IaC configurations
     if provider == Provider.TERRAFORM:
+        from AutoMLOps.iac.terraform_provider import builder as TerraformBuilder
         TerraformBuilder(
             project_id=project_id,
             config=provider_config,
@@ -206,32 +261,96 @@ def run(run_local: bool):
     Args:
         run_local: Flag that determines whether to use Cloud Run CI/CD.
     """
-    # Build resources
-    execute_process('./' + GENERATED_RESOURCES_SH_FILE, to_null=False)
-
-    # Build, compile, and submit pipeline job
-    if run_local:
-        os.chdir(BASE_DIR)
-        try:
-            subprocess.run(['./scripts/run_all.sh'], shell=True,
-                           check=True, stderr=subprocess.STDOUT)
-        except subprocess.CalledProcessError as e:
-            logging.info(e)
-        os.chdir('../')
-    else:
-        _push_to_csr()
+    _configure_logging()
+
+    with root_span('run', run_local=run_local):
+        # Parse the generated defaults once for the steps below
+        defaults = DefaultsConfig.from_yaml(GENERATED_DEFAULTS_FILE)
+
+        # Build resources
+        execute_process('./' + GENERATED_RESOURCES_SH_FILE, to_null=False)
+
+        # Build, compile, and submit pipeline job
+        if run_local:
+            os.chdir(BASE_DIR)
+            try:
+                with span('execute_process', command='./scripts/run_all.sh'):
+                    subprocess.run(['./scripts/run_all.sh'], shell=True,
+                                   check=True, stderr=subprocess.STDOUT)
+            except subprocess.CalledProcessError as e:
+                logging.info(e)
+            os.chdir('../')
+        else:
+            _push_to_csr(defaults)
+
+        # Log generated resources
+        _resources_generation_manifest(defaults, run_local)
+
+
+def run_locally(pipeline_params: Optional[Dict] = None,
+                max_workers: Optional[int] = None,
+                use_step_cache: bool = True,
+                use_venvs: bool = True) -> Dict[str, dict]:
+    """Runs the generated pipeline on this machine instead of Vertex AI,
+    without building images or Docker. Each task runs its generated
+    component in a virtual environment with the requirements of its image,
+    which is created once per requirement set and shared by every project.
+    Independent tasks run concurrently.
 
-    # Log generated resources
-    _resources_generation_manifest(run_local)
+    Args:
+        pipeline_params: Pipeline parameter values, overriding the ones
+            passed to generate().
+        max_workers: Maximum number of tasks run at once (default: the number of CPUs).
+        use_step_cache: Whether tasks whose component, packages and inputs are
+            unchanged restore their outputs from the step cache instead of running.
+        use_venvs: Whether tasks run in virtual environments with the
+            requirements of their image; otherwise kfp and the requirements
+            must be installed in the current environment.
+    Returns:
+        dict: Output parameters and artifacts of each task, keyed by task name.
+    """
+    _configure_logging()
+
+    from AutoMLOps.frameworks.kfp import local_runner as KfpLocalRunner
+    with root_span('run_locally'):
+        return KfpLocalRunner.run_generated_pipeline(pipeline_params, max_workers, use_step_cache, use_venvs)
+
+
+def resume_locally(run_id: Optional[str] = None,
+                   max_workers: Optional[int] = None,
+                   use_step_cache: bool = True,
+                   use_venvs: bool = True) -> Dict[str, dict]:
+    """Resumes a failed or interrupted run of run_locally() from its
+    checkpoints. Tasks that completed are not run again and their outputs
+    are reused; the failed and incomplete tasks run with the parameters of
+    the original run.
+
+    Args:
+        run_id: Name of the run's directory under .AutoMLOps-cache/local_runs
+            (default: the latest run).
+        max_workers: Maximum number of tasks run at once (default: the number of CPUs).
+        use_step_cache: Whether tasks whose component, packages and inputs are
+            unchanged restore their outputs from the step cache instead of running.
+        use_venvs: Whether tasks run in virtual environments with the
+            requirements of their image; otherwise kfp and the requirements
+            must be installed in the current environment.
+    Returns:
+        dict: Output parameters and artifacts of each task, keyed by task name.
+    """
+    _configure_logging()
+
+    from AutoMLOps.frameworks.kfp import local_runner as KfpLocalRunner
+    with root_span('resume_locally'):
+        return KfpLocalRunner.resume_generated_pipeline(run_id, max_workers, use_step_cache, use_venvs)
 
 
-def _resources_generation_manifest(run_local: bool):
+def _resources_generation_manifest(defaults: DefaultsConfig, run_local: bool):
     """Logs urls of generated resources.
 
     Args:
+        defaults: The default config variables.
         run_local: Flag that determines whether to use Cloud Run CI/CD.
     """
-    defaults = read_yaml_file(GENERATED_DEFAULTS_FILE)
     logging.info('\n'
                  '#################################################################\n'
                  '#                                                               #\n'
@@ -242,36 +361,38 @@ def _resources_generation_manifest(run_local: bool):
                  '#################################################################\n')
     # pylint: disable=logging-fstring-interpolation
     logging.info(
-        f'''Google Cloud Storage Bucket: https://console.cloud.google.com/storage/{defaults['gcp']['gs_bucket_name']}''')
+        f'''Google Cloud Storage Bucket: https://console.cloud.google.com/storage/{defaults.gs_bucket_name}''')
     logging.info(
-        f'''Artifact Registry: https://console.cloud.google.com/artifacts/docker/{defaults['gcp']['project_id']}/{defaults['gcp']['af_registry_location']}/{defaults['gcp']['af_registry_name']}''')
+        f'''Artifact Registry: https://console.cloud.google.com/artifacts/docker/{defaults.project_id}/{defaults.af_registry_location}/{defaults.af_registry_name}''')
     logging.info(
-        f'''Service Accounts: https://console.cloud.google.com/iam-admin/serviceaccounts?project={defaults['gcp']['project_id']}''')
+        f'''Service Accounts: https://console.cloud.google.com/iam-admin/serviceaccounts?project={defaults.project_id}''')
     logging.info('APIs: https://console.cloud.google.com/apis')
     logging.info(
-        f'''Cloud Source Repository: https://source.cloud.google.com/{defaults['gcp']['project_id']}/{defaults['gcp']['cloud_source_repository']}/+/{defaults['gcp']['cloud_source_repository_branch']}:''')
+        f'''Cloud Source Repository: https://source.cloud.google.com/{defaults.project_id}/{defaults.csr_name}/+/{defaults.csr_branch_name}:''')
     logging.info(
-        f'''Cloud Build Jobs: https://console.cloud.google.com/cloud-build/builds;region={defaults['gcp']['cb_trigger_location']}''')
+        f'''Cloud Build Jobs: https://console.cloud.google.com/cloud-build/builds;region={defaults.cb_trigger_location}''')
     logging.info(
         'Vertex AI Pipeline Runs: https://console.cloud.google.com/vertex-ai/pipelines/runs')
     if not run_local:
         logging.info(
-            f'''Cloud Build Trigger: https://console.cloud.google.com/cloud-build/triggers;region={defaults['gcp']['cb_trigger_location']}''')
+            f'''Cloud Build Trigger: https://console.cloud.google.com/cloud-build/triggers;region={defaults.cb_trigger_location}''')
         logging.info(
-            f'''Cloud Run Service: https://console.cloud.google.com/run/detail/{defaults['gcp']['cloud_run_location']}/{defaults['gcp']['cloud_run_name']}''')
+            f'''Cloud Run Service: https://console.cloud.google.com/run/detail/{defaults.cloud_run_location}/{defaults.cloud_run_name}''')
         logging.info(
-            f'''Cloud Tasks Queue: https://console.cloud.google.com/cloudtasks/queue/{defaults['gcp']['cloud_tasks_queue_location']}/{defaults['gcp']['cloud_tasks_queue_name']}/tasks''')
-    if defaults['gcp']['cloud_schedule_pattern'] != 'No Schedule Specified':
+            f'''Cloud Tasks Queue: https://console.cloud.google.com/cloudtasks/queue/{defaults.cloud_tasks_queue_location}/{defaults.cloud_tasks_queue_name}/tasks''')
+    if defaults.schedule_pattern != 'No Schedule Specified':
         logging.info(
             'Cloud Scheduler Job: https://console.cloud.google.com/cloudscheduler')
 
 
-def _push_to_csr():
+def _push_to_csr(defaults: DefaultsConfig):
     """Initializes a git repo if one doesn't already exist,
        then pushes to the specified branch and triggers the cloudbuild job.
+
+    Args:
+        defaults: The default config variables.
     """
-    defaults = read_yaml_file(GENERATED_DEFAULTS_FILE)
-    csr_remote_origin_url = f'''https://source.developers.google.com/p/{defaults['gcp']['project_id']}/r/{defaults['gcp']['cloud_source_repository']}'''
+    csr_remote_origin_url = f'''https://source.developers.google.com/p/{defaults.project_id}/r/{defaults.csr_name}'''
 
     if not os.path.exists('.git'):
 
@@ -284,9 +405,9 @@ def _push_to_csr():
         execute_process(
             f'''git remote add origin {csr_remote_origin_url}''', to_null=False)
         execute_process(
-            f'''git checkout -B {defaults['gcp']['cloud_source_repository_branch']}''', to_null=False)
+            f'''git checkout -B {defaults.csr_branch_name}''', to_null=False)
         has_remote_branch = subprocess.check_output(
-            [f'''git ls-remote origin {defaults['gcp']['cloud_source_repository_branch']}'''], shell=True, stderr=subprocess.STDOUT)
+            [f'''git ls-remote origin {defaults.csr_branch_name}'''], shell=True, stderr=subprocess.STDOUT)
 
         # This will initialize the branch, a second push will be required to trigger the cloudbuild job after initializing
         if not has_remote_branch:
@@ -295,7 +416,7 @@ def _push_to_csr():
             execute_process('git add .gitkeep', to_null=False)
             execute_process('''git commit -m 'init' ''', to_null=False)
             execute_process(
-                f'''git push origin {defaults['gcp']['cloud_source_repository_branch']} --force''', to_null=False)
+                f'''git push origin {defaults.csr_branch_name} --force''', to_null=False)
 
     # Check for remote origin url mismatch
     actual_remote = subprocess.check_output(
@@ -311,17 +432,21 @@ def _push_to_csr():
     execute_process('git add .', to_null=False)
     execute_process('''git commit -m 'Run AutoMLOps' ''', to_null=False)
     execute_process(
-        f'''git push origin {defaults['gcp']['cloud_source_repository_branch']} --force''', to_null=False)
+        f'''git push origin {defaults.csr_branch_name} --force''', to_null=False)
     # pylint: disable=logging-fstring-interpolation
     logging.info(
-        f'''Pushing code to {defaults['gcp']['cloud_source_repository_branch']} branch, triggering cloudbuild...''')
+        f'''Pushing code to {defaults.csr_branch_name} branch, triggering cloudbuild...''')
     logging.info(
-        f'''Cloudbuild job running at: https://console.cloud.google.com/cloud-build/builds;region={defaults['gcp']['cb_trigger_location']}''')
+        f'''Cloudbuild job running at: https://console.cloud.google.com/cloud-build/builds;region={defaults.cb_trigger_location}''')
 
 
 def component(func: Optional[Callable] = None,
               *,
-              packages_to_install: Optional[List[str]] = None):
+              packages_to_install: Optional[List[str]] = None,
+              cpu: Optional[Union[int, float, str]] = None,
+              memory: Optional[str] = None,
+              accelerator_type: Optional[str] = None,
+              accelerator_count: Optional[int] = None):
     """Decorator for Python-function based components in AutoMLOps.
 
     Example usage:
@@ -335,16 +460,31 @@ def component(func: Optional[Callable] = None,
             it is intended to be used (e.g. as an input/output Artifact object,
             a plain parameter, or a path to a file).
         packages_to_install: A list of optional packages to install before
-            executing func. These will always be installed at component runtime.
+            executing func. These are installed into the component's image at build time.
+        cpu: Number of vCPUs the component's tasks are limited to, or
+            millicpus followed by 'm', e.g. 4 or '500m'.
+        memory: Memory the component's tasks are limited to, e.g. '16G'.
+        accelerator_type: Type of accelerator attached to the component's
+            tasks, e.g. 'NVIDIA_TESLA_T4'.
+        accelerator_count: Number of accelerators attached (default: 1).
   """
     if func is None:
         return functools.partial(
             component,
-            packages_to_install=packages_to_install)
+            packages_to_install=packages_to_install,
+            cpu=cpu,
+            memory=memory,
+            accelerator_type=accelerator_type,
+            accelerator_count=accelerator_count)
     else:
+        from AutoMLOps.frameworks.kfp import scaffold as KfpScaffold
         return KfpScaffold.create_component_scaffold(
             func=func,
-            packages_to_install=packages_to_install)
+            packages_to_install=packages_to_install,
+            cpu=cpu,
+            memory=memory,
+            accelerator_type=accelerator_type,
+            accelerator_count=accelerator_count)
 
 
 def pipeline(func: Optional[Callable] = None,
@@ -380,6 +520,7 @@ def pipeline(func: Optional[Callable] = None,
             name=name,
             description=description)
     else:
+        from AutoMLOps.frameworks.kfp import scaffold as KfpScaffold
         return KfpScaffold.create_pipeline_scaffold(
             func=func,
             name=name,
@@ -388,6 +529,6 @@ def pipeline(func: Optional[Callable] = None,
 
 def clear_cache():
     """Deletes all temporary files stored in the cache directory."""
+    _configure_logging()
     execute_process(f'rm -rf {OUTPUT_DIR}', to_null=False)
-    make_dirs([OUTPUT_DIR])
     logging.info('Cache cleared.')
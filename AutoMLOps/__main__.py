@@ -0,0 +1,62 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Command line interface of AutoMLOps.
+
+Usage:
+    python -m AutoMLOps wheelhouse [--dest wheelhouse] [--index-url URL]
+
+The wheelhouse command downloads or builds wheels for the requirements of
+the images generated by AutoMLOps.generate() into a local wheelhouse. Pass
+it to AutoMLOps.generate(wheelhouse=...) to lock the requirements against it
+and build the images offline.
+"""
+
+# pylint: disable=invalid-name
+# pylint: disable=line-too-long
+
+import argparse
+import sys
+from typing import List, Optional
+
+from AutoMLOps.utils.wheelhouse import build_wheelhouse
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs a command of the command line interface.
+
+    Args:
+        argv: Command line arguments (default: sys.argv[1:]).
+    Returns:
+        int: Exit status.
+    """
+    parser = argparse.ArgumentParser(prog='python -m AutoMLOps', description=__doc__.split('\n', maxsplit=1)[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    wheelhouse_parser = subparsers.add_parser(
+        'wheelhouse', help='Download or build wheels for the generated requirements into a local wheelhouse.')
+    wheelhouse_parser.add_argument('--dest', default='wheelhouse', help='Directory to write the wheels to.')
+    wheelhouse_parser.add_argument('--index-url', default=None,
+                                   help='Package index url, or a directory of wheels and sdists to take them from (default: PyPI).')
+    args = parser.parse_args(argv)
+
+    try:
+        requirements_files = build_wheelhouse(args.dest, args.index_url)
+    except (OSError, RuntimeError) as err:
+        print(err, file=sys.stderr)
+        return 1
+    print(f'Wrote wheels for {", ".join(requirements_files)} to {args.dest}. '
+          f'Pass wheelhouse={args.dest!r} to AutoMLOps.generate() to build the images offline.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
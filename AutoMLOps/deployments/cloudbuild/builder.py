@@ -16,41 +16,39 @@
 
 # pylint: disable=line-too-long
 
+from typing import Dict, Optional
+
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.manifest import GenerationManifest, hash_contents
+from AutoMLOps.utils.tracing import traced
 from AutoMLOps.utils.utils import write_file
 from AutoMLOps.utils.constants import (
     BASE_DIR,
-    GENERATED_CLOUDBUILD_FILE
+    GENERATED_CLOUDBUILD_FILE,
+    GENERATION_MANIFEST_FILE
 )
+from AutoMLOps.deployments.cloudbuild.constructs.registry import ImageTagChecker
 from AutoMLOps.deployments.cloudbuild.constructs.scripts import CloudBuildScripts
 
-def build(af_registry_location: str,
-          af_registry_name: str,
-          cloud_run_location: str,
-          cloud_run_name: str,
-          pipeline_runner_sa: str,
-          project_id: str,
-          run_local: bool,
-          schedule_pattern: str,
-          vpc_connector: str):
+@traced('build_cloudbuild_config')
+def build(defaults: DefaultsConfig,
+          image_tags: Dict[str, str],
+          tag_checker: Optional[ImageTagChecker] = None):
     """Constructs scripts for resource deployment and running Kubeflow pipelines.
 
     Args:
-        af_registry_location: Region of the Artifact Registry.
-        af_registry_name: Artifact Registry name where components are stored.
-        cloud_run_location: The location of the cloud runner service.
-        cloud_run_name: The name of the cloud runner service.
-        pipeline_runner_sa: Service Account to runner PipelineJobs.
-        project_id: The project ID.
-        run_local: Flag that determines whether to use Cloud Run CI/CD.
-        schedule_pattern: Cron formatted value used to create a Scheduled retrain job.
-        vpc_connector: The name of the vpc connector to use.
+        defaults: The default config variables.
+        image_tags: Tag of each image to build, keyed by image name.
+        tag_checker: Check for image tags that already exist in the registry
+            (default: ImageTagChecker).
     """
     # Get scripts builder object
-    cb_scripts = CloudBuildScripts(
-        af_registry_location, af_registry_name, cloud_run_location,
-        cloud_run_name, pipeline_runner_sa, project_id,
-        run_local, schedule_pattern, BASE_DIR,
-        vpc_connector)
+    cb_scripts = CloudBuildScripts(defaults, BASE_DIR, image_tags, tag_checker)
 
-    # Write cloud build config
-    write_file(GENERATED_CLOUDBUILD_FILE, cb_scripts.create_kfp_cloudbuild_config, 'w+')
+    # Write cloud build config, unless it is unchanged since the last generate()
+    manifest = GenerationManifest(GENERATION_MANIFEST_FILE)
+    inputs_hash = hash_contents(cb_scripts.create_kfp_cloudbuild_config)
+    if not manifest.is_fresh('cloudbuild', inputs_hash):
+        write_file(GENERATED_CLOUDBUILD_FILE, cb_scripts.create_kfp_cloudbuild_config, 'w+')
+        manifest.record('cloudbuild', inputs_hash, [GENERATED_CLOUDBUILD_FILE])
+        manifest.save()
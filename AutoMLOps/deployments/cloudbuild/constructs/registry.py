@@ -0,0 +1,37 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks for image tags that already exist in a registry."""
+
+# pylint: disable=line-too-long
+
+class ImageTagChecker():
+    """Renders the shell check that the generated build and push steps run
+    to find out whether an image tag already exists in the registry. Image
+    tags are content-addressed, so an existing tag does not need to be built
+    or pushed again. The default check asks the registry with
+    `docker manifest inspect`, using the credentials Cloud Build gives the
+    docker builder. Subclass it to check a different registry, such as a
+    local stand-in in tests."""
+    def command(self, image: str) -> str:
+        """Returns a shell command that succeeds if and only if the image
+        exists. It runs in the gcr.io/cloud-builders/docker builder, and any
+        $ must be escaped as $$ so Cloud Build does not substitute it.
+
+        Args:
+            image: Image uri, including its tag.
+        Returns:
+            str: Shell command.
+        """
+        return f'docker manifest inspect {image} > /dev/null 2>&1'
@@ -16,59 +16,81 @@
 
 # pylint: disable=line-too-long
 
-from AutoMLOps.utils.constants import GENERATED_LICENSE
+from typing import Dict, List, Optional
+
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import (
+    COMPONENT_BASE_IMAGE,
+    GENERATED_LICENSE,
+    RUN_PIPELINE_IMAGE
+)
+from AutoMLOps.deployments.cloudbuild.constructs.registry import ImageTagChecker
+from AutoMLOps.deployments.cloudbuild.constructs.steps import (
+    CloudBuildStep,
+    format_critical_path_report,
+    validate_steps
+)
 
 class CloudBuildScripts():
     """Generates CloudBuild yaml config file."""
     def __init__(self,
-                 af_registry_location: str,
-                 af_registry_name: str,
-                 cloud_run_location: str,
-                 cloud_run_name: str,
-                 pipeline_runner_sa: str,
-                 project_id: str,
-                 run_local: str,
-                 schedule_pattern: str,
+                 defaults: DefaultsConfig,
                  base_dir: str,
-                 vpc_connector: str):
+                 image_tags: Dict[str, str],
+                 tag_checker: Optional[ImageTagChecker] = None):
         """Constructs scripts for resource deployment and running Kubeflow pipelines.
 
         Args:
-            af_registry_location: Region of the Artifact Registry.
-            af_registry_name: Artifact Registry name where components are stored.
-            cloud_run_location: The location of the cloud runner service.
-            cloud_run_name: The name of the cloud runner service.
-            pipeline_runner_sa: Service Account to runner PipelineJobs.
-            project_id: The project ID.
-            run_local: Flag that determines whether to use Cloud Run CI/CD.
-            schedule_pattern: Cron formatted value used to create a Scheduled retrain job.
+            defaults: The default config variables.
             base_dir: Top directory name.
-            vpc_connector: The name of the vpc connector to use.
+            image_tags: Tag of each image to build, keyed by image name. Names
+                under components/ other than the component_base are per-component
+                images layered on the component_base image.
+            tag_checker: Check for image tags that already exist in the registry
+                (default: ImageTagChecker).
         """
 
         # Set passed variables as hidden attributes
         self.__base_dir = base_dir
-        self.__run_local = run_local
-
-        # Parse defaults file for hidden class attributes
-        self.__af_registry_name = af_registry_name
-        self.__af_registry_location = af_registry_location
-        self.__project_id = project_id
-        self.__pipeline_runner_service_account = pipeline_runner_sa
-        self.__vpc_connector = vpc_connector
-        self.__cloud_run_name = cloud_run_name
-        self.__cloud_run_location = cloud_run_location
-        self.__cloud_schedule_pattern = schedule_pattern
+        self.__run_local = defaults.run_local
+        self.__tag_checker = tag_checker or ImageTagChecker()
+
+        # Set image uris as hidden class attributes
+        self.__component_base_image = defaults.get_image_uri(COMPONENT_BASE_IMAGE, image_tags[COMPONENT_BASE_IMAGE])
+        self.__run_pipeline_image = defaults.get_image_uri(RUN_PIPELINE_IMAGE, image_tags[RUN_PIPELINE_IMAGE])
+        self.__component_images = {
+            image_name.split('/', 1)[1]: defaults.get_image_uri(image_name, tag)
+            for image_name, tag in image_tags.items()
+            if image_name.startswith('components/') and image_name != COMPONENT_BASE_IMAGE}
+
+        # Set default config variables as hidden class attributes
+        self.__pipeline_runner_service_account = defaults.pipeline_runner_sa
+        self.__vpc_connector = defaults.vpc_connector
+        self.__cloud_run_name = defaults.cloud_run_name
+        self.__cloud_run_location = defaults.cloud_run_location
+        self.__cloud_schedule_pattern = defaults.schedule_pattern
 
         # Set generated scripts as public attributes
+        self.cloudbuild_steps = self._create_kfp_cloudbuild_steps()
+        self.critical_path_report = format_critical_path_report(self.cloudbuild_steps)
         self.create_kfp_cloudbuild_config = self._create_kfp_cloudbuild_config()
 
-    def _create_kfp_cloudbuild_config(self):
-        """Builds the content of cloudbuild.yaml.
+    def _create_kfp_cloudbuild_steps(self):
+        """Builds the dependency graph of cloudbuild.yaml steps. Each step
+        waits only for the steps whose outputs it uses: both images build
+        from the start (the run_pipeline image only if the pipeline runs
+        from cloud run), each push waits on its own build, and the queueing
+        svc is set up while the images are built. Per-component images wait
+        only for the component_base image they are layered on. Images are
+        tagged with a digest of their build context, so builds and pushes
+        of tags that already exist in the registry are skipped. Builds use
+        BuildKit and the layers of the previously pushed images as a cache.
 
-        Args:
-            str: Text content of cloudbuild.yaml.
+        Returns:
+            list: Validated CloudBuildSteps, in the order they are written.
         """
+        component_base_dir = f'{self.__base_dir}components/component_base'
+
         vpc_connector_tail = ''
         if self.__vpc_connector != 'No VPC Specified':
             vpc_connector_tail = (
@@ -78,112 +100,233 @@ class CloudBuildScripts():
                 f'           "--vpc-egress", "all-traffic"')
         vpc_connector_tail += ']\n'
 
+        steps = [
+            CloudBuildStep(
+                step_id='build_component_base',
+                comment='build the component_base image',
+                body=self.__create_unless_exists_body(
+                    self.__component_base_image,
+                    self.__create_build_commands(self.__component_base_image, '', multi_stage=True),
+                    component_base_dir),
+                estimated_duration=240)]
+        # The run_pipeline files are only generated to run the pipeline from cloud run
+        if not self.__run_local:
+            steps.append(
+                CloudBuildStep(
+                    step_id='build_pipeline_runner_svc',
+                    comment='build the run_pipeline image',
+                    body=self.__create_unless_exists_body(
+                        self.__run_pipeline_image,
+                        self.__create_build_commands(self.__run_pipeline_image, ' -f cloud_run/run_pipeline/Dockerfile', multi_stage=True),
+                        self.__base_dir),
+                    estimated_duration=120))
+        steps += [
+            CloudBuildStep(
+                step_id=f'build_component_image_{image}',
+                comment=f'build the {image} component image',
+                body=self.__create_unless_exists_body(
+                    uri,
+                    self.__create_build_commands(uri, f' --build-arg BASE_IMAGE={self.__component_base_image} -f images/{image}/Dockerfile', multi_stage=False),
+                    component_base_dir),
+                wait_for=('build_component_base',),
+                estimated_duration=60)
+            for image, uri in self.__component_images.items()]
+
+        steps.append(
+            CloudBuildStep(
+                step_id='push_component_base',
+                comment='push the component_base image',
+                body=self.__create_unless_exists_body(
+                    self.__component_base_image,
+                    self.__create_push_commands(self.__component_base_image, multi_stage=True),
+                    component_base_dir),
+                wait_for=('build_component_base',),
+                estimated_duration=60))
+        if not self.__run_local:
+            steps.append(
+                CloudBuildStep(
+                    step_id='push_pipeline_runner_svc',
+                    comment='push the run_pipeline image',
+                    body=self.__create_unless_exists_body(
+                        self.__run_pipeline_image,
+                        self.__create_push_commands(self.__run_pipeline_image, multi_stage=True),
+                        self.__base_dir),
+                    wait_for=('build_pipeline_runner_svc',),
+                    estimated_duration=30))
+        steps += [
+            CloudBuildStep(
+                step_id=f'push_component_image_{image}',
+                comment=f'push the {image} component image',
+                body=self.__create_unless_exists_body(
+                    uri,
+                    self.__create_push_commands(uri, multi_stage=False),
+                    component_base_dir),
+                wait_for=(f'build_component_image_{image}',),
+                estimated_duration=20)
+            for image, uri in self.__component_images.items()]
+
+        if self.__run_local:
+            validate_steps(steps)
+            return steps
+
+        # The queued job runs the pipeline, which needs the component images
+        # pushed and the runner service deployed
+        component_pushes = ('push_component_base',) + tuple(f'push_component_image_{image}' for image in self.__component_images)
+        steps += [
+            CloudBuildStep(
+                step_id='deploy_pipeline_runner_svc',
+                comment='deploy the cloud run service',
+                body=(
+                    f'''  - name: "gcr.io/google.com/cloudsdktool/cloud-sdk"\n'''
+                    f'''    entrypoint: gcloud\n'''
+                    f'''    args: ["run",\n'''
+                    f'''           "deploy",\n'''
+                    f'''           "{self.__cloud_run_name}",\n'''
+                    f'''           "--image",\n'''
+                    f'''           "{self.__run_pipeline_image}",\n'''
+                    f'''           "--region",\n'''
+                    f'''           "{self.__cloud_run_location}",\n'''
+                    f'''           "--service-account",\n'''
+                    f'''           "{self.__pipeline_runner_service_account}",{vpc_connector_tail}'''),
+                wait_for=('push_pipeline_runner_svc',),
+                estimated_duration=60),
+            CloudBuildStep(
+                step_id='setup_queueing_svc',
+                comment='Copy runtime parameters',
+                body=(
+                    f'''  - name: 'gcr.io/cloud-builders/gcloud'\n'''
+                    f'''    entrypoint: bash\n'''
+                    f'''    args:\n'''
+                    f'''      - '-e'\n'''
+                    f'''      - '-c'\n'''
+                    f'''      - |\n'''
+                    f'''        cp -r {self.__base_dir}cloud_run/queueing_svc .\n'''),
+                estimated_duration=5),
+            CloudBuildStep(
+                step_id='install_queueing_svc_deps',
+                comment='Install dependencies',
+                body=(
+                    '''  - name: python\n'''
+                    '''    entrypoint: pip\n'''
+                    '''    args: ["install", "-r", "queueing_svc/requirements.txt", "--user"]\n'''),
+                wait_for=('setup_queueing_svc',),
+                estimated_duration=30),
+            CloudBuildStep(
+                step_id='submit_job_to_queue',
+                comment='Submit to queue',
+                body=(
+                    '''  - name: python\n'''
+                    '''    entrypoint: python\n'''
+                    '''    args: ["queueing_svc/main.py", "--setting", "queue_job"]\n'''),
+                wait_for=component_pushes + ('deploy_pipeline_runner_svc', 'install_queueing_svc_deps'),
+                estimated_duration=15)]
+
+        if self.__cloud_schedule_pattern != 'No Schedule Specified':
+            steps.append(CloudBuildStep(
+                step_id='schedule_job',
+                comment='Create Scheduler Job',
+                body=(
+                    '''  - name: python\n'''
+                    '''    entrypoint: python\n'''
+                    '''    args: ["queueing_svc/main.py", "--setting", "schedule_job"]\n'''),
+                wait_for=component_pushes + ('deploy_pipeline_runner_svc', 'install_queueing_svc_deps'),
+                estimated_duration=15))
+
+        validate_steps(steps)
+        return steps
+
+    def _create_kfp_cloudbuild_config(self):
+        """Builds the content of cloudbuild.yaml from the step dependency graph.
+
+        Returns:
+            str: Text content of cloudbuild.yaml.
+        """
+        build_steps = [step for step in self.cloudbuild_steps if step.step_id.startswith('build_')]
+        deploy_steps = [step for step in self.cloudbuild_steps if not step.step_id.startswith('build_')]
+
         cloudbuild_comp_config = (
             GENERATED_LICENSE +
-            f'steps:\n'
-            f'# ==============================================================================\n'
-            f'# BUILD CUSTOM IMAGES\n'
-            f'# ==============================================================================\n'
-            f'\n'
-            f'''  # build the component_base image\n'''
-            f'''  - name: "gcr.io/cloud-builders/docker"\n'''
-            f'''    args: [ "build", "-t", "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/components/component_base:latest", "." ]\n'''
-            f'''    dir: "{self.__base_dir}components/component_base"\n'''
-            f'''    id: "build_component_base"\n'''
-            f'''    waitFor: ["-"]\n'''
-            f'\n'
-            f'''  # build the run_pipeline image\n'''
-            f'''  - name: 'gcr.io/cloud-builders/docker'\n'''
-            f'''    args: [ "build", "-t", "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/run_pipeline:latest", "-f", "cloud_run/run_pipeline/Dockerfile", "." ]\n'''
-            f'''    dir: "{self.__base_dir}"\n'''
-            f'''    id: "build_pipeline_runner_svc"\n'''
-            f'''    waitFor: ['build_component_base']\n''')
+            self.critical_path_report +
+            'steps:\n'
+            '# ==============================================================================\n'
+            '# BUILD CUSTOM IMAGES\n'
+            '# ==============================================================================\n'
+            '\n' +
+            '\n'.join(step.render() for step in build_steps))
 
         cloudbuild_cloudrun_config = (
-            f'\n'
-            f'# ==============================================================================\n'
-            f'# PUSH & DEPLOY CUSTOM IMAGES\n'
-            f'# ==============================================================================\n'
-            f'\n'
-            f'''  # push the component_base image\n'''
-            f'''  - name: "gcr.io/cloud-builders/docker"\n'''
-            f'''    args: ["push", "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/components/component_base:latest"]\n'''
-            f'''    dir: "{self.__base_dir}components/component_base"\n'''
-            f'''    id: "push_component_base"\n'''
-            f'''    waitFor: ["build_pipeline_runner_svc"]\n'''
-            f'\n'
-            f'''  # push the run_pipeline image\n'''
+            '\n'
+            '# ==============================================================================\n'
+            '# PUSH & DEPLOY CUSTOM IMAGES\n'
+            '# ==============================================================================\n'
+            '\n' +
+            '\n'.join(step.render() for step in deploy_steps))
+
+        return cloudbuild_comp_config + cloudbuild_cloudrun_config
+
+    def __create_build_commands(self, image: str, options: str, multi_stage: bool) -> List[str]:
+        """Builds the docker commands that build an image with BuildKit,
+        using the previously pushed image as a layer cache. The image is also
+        tagged latest, which is the cache of the next build. Multi-stage
+        images build their builder stage first and tag it builder, since the
+        inline cache of an image only covers its final stage. The size of the
+        built image is logged.
+
+        Args:
+            image: Image uri, including its tag.
+            options: Extra docker build options, each preceded by a space.
+            multi_stage: Whether the Dockerfile has a builder stage.
+        Returns:
+            list: Docker commands.
+        """
+        repository = image.rsplit(':', 1)[0]
+        inline_cache = '--build-arg BUILDKIT_INLINE_CACHE=1'
+        cache_from = f'--cache-from {repository}:latest'
+        commands = []
+        if multi_stage:
+            commands.append(f'docker build --target builder -t {repository}:builder --cache-from {repository}:builder {inline_cache}{options} .')
+            cache_from = f'--cache-from {repository}:builder {cache_from}'
+        commands.append(f'docker build -t {image} -t {repository}:latest {cache_from} {inline_cache}{options} .')
+        commands.append(f'docker image inspect --format "{image}: {{{{.Size}}}} bytes" {image}')
+        return commands
+
+    def __create_push_commands(self, image: str, multi_stage: bool) -> List[str]:
+        """Builds the docker commands that push an image and its cache tags.
+
+        Args:
+            image: Image uri, including its tag.
+            multi_stage: Whether the Dockerfile has a builder stage.
+        Returns:
+            list: Docker commands.
+        """
+        repository = image.rsplit(':', 1)[0]
+        commands = [f'docker push {image}', f'docker push {repository}:latest']
+        if multi_stage:
+            commands.append(f'docker push {repository}:builder')
+        return commands
+
+    def __create_unless_exists_body(self, image: str, commands: List[str], directory: str):
+        """Builds the body of a docker step that runs commands unless the
+        image already exists in the registry.
+
+        Args:
+            image: Image uri, including its tag.
+            commands: Docker commands that build or push the image.
+            directory: Directory to run the commands in.
+        Returns:
+            str: Yaml lines of the step.
+        """
+        return (
             f'''  - name: "gcr.io/cloud-builders/docker"\n'''
-            f'''    args: ["push", "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/run_pipeline:latest"]\n'''
-            f'''    dir: "{self.__base_dir}"\n'''
-            f'''    id: "push_pipeline_runner_svc"\n'''
-            f'''    waitFor: ["push_component_base"]\n'''
-            f'\n'
-            f'''  # deploy the cloud run service\n'''
-            f'''  - name: "gcr.io/google.com/cloudsdktool/cloud-sdk"\n'''
-            f'''    entrypoint: gcloud\n'''
-            f'''    args: ["run",\n'''
-            f'''           "deploy",\n'''
-            f'''           "{self.__cloud_run_name}",\n'''
-            f'''           "--image",\n'''
-            f'''           "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/run_pipeline:latest",\n'''
-            f'''           "--region",\n'''
-            f'''           "{self.__cloud_run_location}",\n'''
-            f'''           "--service-account",\n'''
-            f'''           "{self.__pipeline_runner_service_account}",{vpc_connector_tail}'''
-            f'''    id: "deploy_pipeline_runner_svc"\n'''
-            f'''    waitFor: ["push_pipeline_runner_svc"]\n'''
-            f'\n'
-            f'''  # Copy runtime parameters\n'''
-            f'''  - name: 'gcr.io/cloud-builders/gcloud'\n'''
             f'''    entrypoint: bash\n'''
             f'''    args:\n'''
-            f'''      - '-e'\n'''
-            f'''      - '-c'\n'''
+            f'''      - -c\n'''
             f'''      - |\n'''
-            f'''        cp -r {self.__base_dir}cloud_run/queueing_svc .\n'''
-            f'''    id: "setup_queueing_svc"\n'''
-            f'''    waitFor: ["deploy_pipeline_runner_svc"]\n'''
-            f'\n'
-            f'''  # Install dependencies\n'''
-            f'''  - name: python\n'''
-            f'''    entrypoint: pip\n'''
-            f'''    args: ["install", "-r", "queueing_svc/requirements.txt", "--user"]\n'''
-            f'''    id: "install_queueing_svc_deps"\n'''
-            f'''    waitFor: ["setup_queueing_svc"]\n'''
-            f'\n'
-            f'''  # Submit to queue\n'''
-            f'''  - name: python\n'''
-            f'''    entrypoint: python\n'''
-            f'''    args: ["queueing_svc/main.py", "--setting", "queue_job"]\n'''
-            f'''    id: "submit_job_to_queue"\n'''
-            f'''    waitFor: ["install_queueing_svc_deps"]\n''')
-
-        cloudbuild_scheduler_config = (
-            '\n'
-            '''  # Create Scheduler Job\n'''
-            '''  - name: python\n'''
-            '''    entrypoint: python\n'''
-            '''    args: ["queueing_svc/main.py", "--setting", "schedule_job"]\n'''
-            '''    id: "schedule_job"\n'''
-            '''    waitFor: ["submit_job_to_queue"]\n''')
-
-        custom_comp_image = (
-            f'\n'
-            f'images:\n'
-            f'''  # custom component images\n'''
-            f'''  - "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/components/component_base:latest"\n''')
-
-        cloudrun_image = (
-            f'''  # Cloud Run image\n'''
-            f'''  - "{self.__af_registry_location}-docker.pkg.dev/{self.__project_id}/{self.__af_registry_name}/run_pipeline:latest"\n''')
-
-        if self.__run_local:
-            cb_file_contents = cloudbuild_comp_config + custom_comp_image
-        else:
-            if self.__cloud_schedule_pattern == 'No Schedule Specified':
-                cb_file_contents = cloudbuild_comp_config + cloudbuild_cloudrun_config + custom_comp_image + cloudrun_image
-            else:
-                cb_file_contents = cloudbuild_comp_config + cloudbuild_cloudrun_config + cloudbuild_scheduler_config + custom_comp_image + cloudrun_image
-
-        return cb_file_contents
+            f'''        set -e\n'''
+            f'''        if {self.__tag_checker.command(image)}; then\n'''
+            f'''          echo "{image} already exists, skipping"\n'''
+            f'''        else\n''' +
+            ''.join(f'''          {command}\n''' for command in commands) +
+            f'''        fi\n'''
+            f'''    env: ["DOCKER_BUILDKIT=1"]\n'''
+            f'''    dir: "{directory}"\n''')
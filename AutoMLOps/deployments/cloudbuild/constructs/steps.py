@@ -0,0 +1,148 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Dependency graph of Cloud Build steps and its critical path."""
+
+# pylint: disable=line-too-long
+
+from dataclasses import dataclass
+from datetime import datetime
+import re
+from typing import Dict, List, Optional, Tuple
+
+@dataclass(frozen=True)
+class CloudBuildStep():
+    """A Cloud Build step and the steps whose outputs it needs. Steps only
+    wait for their true data dependencies, so Cloud Build runs everything
+    else concurrently.
+
+    Args:
+        step_id: Unique id of the step.
+        comment: Comment written above the step.
+        body: Yaml lines of the step, other than its id and waitFor.
+        wait_for: Ids of the steps this step depends on; empty to start at the beginning of the build.
+        estimated_duration: Rough duration of the step in seconds, used for the critical path when no measured durations are given.
+    """
+    step_id: str
+    comment: str
+    body: str
+    wait_for: Tuple[str, ...] = ()
+    estimated_duration: float = 0.0
+
+    def render(self) -> str:
+        """Renders the step as an entry of the cloudbuild.yaml steps list.
+
+        Returns:
+            str: Yaml text of the step.
+        """
+        wait_for = ', '.join(f'"{step_id}"' for step_id in self.wait_for) or '"-"'
+        return (
+            f'  # {self.comment}\n'
+            f'{self.body}'
+            f'    id: "{self.step_id}"\n'
+            f'    waitFor: [{wait_for}]\n')
+
+def validate_steps(steps: List[CloudBuildStep]):
+    """Checks that step ids are unique and that every step only waits for
+    steps defined before it, as Cloud Build requires.
+
+    Args:
+        steps: Steps in the order they are written.
+    Raises:
+        Exception: If a step id is duplicated or a dependency is not defined earlier.
+    """
+    defined = set()
+    for step in steps:
+        if step.step_id in defined:
+            raise ValueError(f'Duplicate cloudbuild step id: {step.step_id}')
+        missing = [step_id for step_id in step.wait_for if step_id not in defined]
+        if missing:
+            raise ValueError(f'Cloudbuild step {step.step_id} waits for undefined or later steps: {missing}')
+        defined.add(step.step_id)
+
+def get_critical_path(steps: List[CloudBuildStep],
+                      durations: Optional[Dict[str, float]] = None) -> Tuple[List[str], float]:
+    """Finds the longest chain of dependent steps, which bounds the wall time
+    of the build however many steps run concurrently.
+
+    Args:
+        steps: Validated steps in the order they are written.
+        durations: Measured step durations in seconds, keyed by step id.
+            Steps without a measured duration use their estimated duration.
+    Returns:
+        tuple: Step ids on the critical path, in order, and its total duration in seconds.
+    """
+    durations = durations or {}
+    finish, previous = {}, {}
+    for step in steps:
+        start = 0.0
+        if step.wait_for:
+            previous[step.step_id] = max(step.wait_for, key=finish.get)
+            start = finish[previous[step.step_id]]
+        finish[step.step_id] = start + durations.get(step.step_id, step.estimated_duration)
+    if not finish:
+        return [], 0.0
+
+    step_id = max(finish, key=finish.get)
+    path = [step_id]
+    while step_id in previous:
+        step_id = previous[step_id]
+        path.append(step_id)
+    return path[::-1], finish[path[0]]
+
+def format_critical_path_report(steps: List[CloudBuildStep],
+                                durations: Optional[Dict[str, float]] = None) -> str:
+    """Describes the critical path of the steps as a yaml comment.
+
+    Args:
+        steps: Validated steps in the order they are written.
+        durations: Measured step durations in seconds, keyed by step id.
+    Returns:
+        str: Comment lines naming the critical path and its duration
+            compared to running every step serially.
+    """
+    durations = durations or {}
+    path, total = get_critical_path(steps, durations)
+    serial_total = sum(durations.get(step.step_id, step.estimated_duration) for step in steps)
+    kind = 'measured' if durations else 'estimated'
+    return (
+        f'# Critical path ({kind}): {" -> ".join(path)}\n'
+        f'# Critical path duration: ~{total:.0f}s (~{serial_total:.0f}s if run serially)\n')
+
+def get_step_durations(build: dict) -> Dict[str, float]:
+    """Reads the measured duration of each step of a finished build, as
+    returned by `gcloud builds describe BUILD_ID --format=json`.
+
+    Args:
+        build: Parsed build resource.
+    Returns:
+        dict: Step durations in seconds, keyed by step id.
+    """
+    durations = {}
+    for step in build.get('steps', []):
+        timing = step.get('timing', {})
+        if 'id' in step and 'startTime' in timing and 'endTime' in timing:
+            durations[step['id']] = (_parse_timestamp(timing['endTime']) - _parse_timestamp(timing['startTime'])).total_seconds()
+    return durations
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    """Parses an RFC 3339 timestamp, truncating fractional seconds to microseconds.
+
+    Args:
+        timestamp: Timestamp such as 2023-07-07T10:00:00.123456789Z.
+    Returns:
+        datetime: The parsed timestamp.
+    """
+    timestamp = re.sub(r'\.(\d+)', lambda match: '.' + match.group(1)[:6].ljust(6, '0'), timestamp)
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
@@ -18,36 +18,33 @@
 # pylint: disable=line-too-long
 
 from typing import Dict, List
-from AutoMLOps.utils.utils import read_yaml_file
+from AutoMLOps.utils.config import DefaultsConfig
 
 class Component():
     """Parent class that defines a general abstraction of a Component."""
-    def __init__(self, component_spec: dict, defaults_file: str):
+    def __init__(self, component_spec: dict, defaults: DefaultsConfig):
         """Instantiate Component scripts object with all necessary attributes.
 
         Args:
             component_spec (dict): Dictionary of component specs including details
                 of component image, startup command, and args.
-            defaults_file (str): Path to the default config variables yaml.
+            defaults (DefaultsConfig): The default config variables.
         """
         self._component_spec = component_spec
 
-        # Parse defaults file for hidden class attributes
-        defaults = read_yaml_file(defaults_file)
-        self._af_registry_location = defaults['gcp']['af_registry_location']
-        self._project_id = defaults['gcp']['project_id']
-        self._af_registry_name = defaults['gcp']['af_registry_name']
+        # Set default config variables as hidden class attributes
+        self._af_registry_location = defaults.af_registry_location
+        self._project_id = defaults.project_id
+        self._af_registry_name = defaults.af_registry_name
 
 class Pipeline():
     """Parent class that defines a general abstraction of a Pipeline """
-    def __init__(self, custom_training_job_specs: List[Dict], defaults_file: str):
+    def __init__(self, custom_training_job_specs: List[Dict], defaults: DefaultsConfig):
         """Instantiate Pipeline scripts object with all necessary attributes.
 
         Args:
             custom_training_job_specs (List[Dict]): Specifies the specs to run the training job with.
-            defaults_file (str): Path to the default config variables yaml.
+            defaults (DefaultsConfig): The default config variables.
         """
         self._custom_training_job_specs = custom_training_job_specs
-
-        defaults = read_yaml_file(defaults_file)
-        self._project_id = defaults['gcp']['project_id']
+        self._project_id = defaults.project_id
@@ -16,126 +16,431 @@
 
 # pylint: disable=line-too-long
 
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
+import os
+import shutil
 
 from typing import Dict, List, Optional
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.import_scanner import get_companion_requirements
+from AutoMLOps.utils.lockfile import (
+    get_lock_download_size,
+    get_requirement_name,
+    get_target_python_version,
+    get_wheelhouse_fingerprint,
+    is_index_url,
+    lock_requirements
+)
+from AutoMLOps.utils.manifest import GenerationManifest, hash_contents, hash_file
+from AutoMLOps.utils.resources import get_component_resources, get_machine_type
+from AutoMLOps.utils.tracing import span, traced
+from AutoMLOps.utils.wheelhouse import sync_wheelhouse
 from AutoMLOps.utils.utils import (
-    execute_process,
+    delete_file,
+    get_component_name,
+    get_component_spec,
     get_components_list,
+    in_virtual_filesystem,
+    list_files,
     make_dirs,
+    read_file,
     read_yaml_file,
-    is_using_kfp_spec,
     write_and_chmod,
     write_file,
     write_yaml_file
 )
 from AutoMLOps.utils.constants import (
     BASE_DIR,
+    COMPONENT_BASE_IMAGE,
+    COMPONENT_BUILD_MAX_WORKERS,
+    DEFAULT_GCP_REQUIREMENTS,
+    GENERATED_CLOUDBUILD_FILE,
     GENERATED_BUILD_COMPONENTS_SH_FILE,
     GENERATED_DEFAULTS_FILE,
     GENERATED_COMPONENT_BASE,
+    GENERATED_COMPONENT_IMAGES_DIR,
     GENERATED_PIPELINE_FILE,
     GENERATED_PIPELINE_SPEC_SH_FILE,
+    GENERATED_REQUIREMENTS_REPORT_FILE,
     GENERATED_RESOURCES_SH_FILE,
     GENERATED_RUN_PIPELINE_SH_FILE,
     GENERATED_RUN_ALL_SH_FILE,
+    GENERATED_WHEELHOUSE_DIR,
+    GENERATION_MANIFEST_FILE,
     PIPELINE_CACHE_FILE,
     GENERATED_LICENSE,
-    GENERATED_PARAMETER_VALUES_PATH
+    GENERATED_PARAMETER_VALUES_PATH,
+    IMAGE_TAG_LENGTH,
+    RUN_PIPELINE_IMAGE
 )
 from AutoMLOps.frameworks.kfp.constructs.cloudrun import KfpCloudRun
 from AutoMLOps.frameworks.kfp.constructs.component import KfpComponent
+from AutoMLOps.frameworks.kfp.constructs.images import KfpComponentImages
 from AutoMLOps.frameworks.kfp.constructs.pipeline import KfpPipeline
 from AutoMLOps.frameworks.kfp.constructs.scripts import KfpScripts
 
-def build(project_id: str,
+def build(defaults: DefaultsConfig,
           pipeline_params: Dict,
-          af_registry_location: Optional[str],
-          af_registry_name: Optional[str],
-          base_image: Optional[str],
-          cb_trigger_location: Optional[str],
-          cb_trigger_name: Optional[str],
-          cloud_run_location: Optional[str],
-          cloud_run_name: Optional[str],
-          cloud_tasks_queue_location: Optional[str],
-          cloud_tasks_queue_name: Optional[str],
-          csr_branch_name: Optional[str],
-          csr_name: Optional[str],
-          custom_training_job_specs: Optional[List[Dict]],
-          gs_bucket_location: Optional[str],
-          gs_bucket_name: Optional[str],
-          pipeline_runner_sa: Optional[str],
-          run_local: Optional[bool],
-          schedule_location: Optional[str],
-          schedule_name: Optional[str],
-          schedule_pattern: Optional[str],
-          vpc_connector: Optional[str]):
+          custom_training_job_specs: Optional[List[Dict]]) -> Dict[str, str]:
     """Constructs scripts for resource deployment and running Kubeflow pipelines.
 
     Args:
-        af_registry_location: Region of the Artifact Registry.
-        af_registry_name: Artifact Registry name where components are stored.
-        base_image: The image to use in the component base dockerfile.
-        cb_trigger_location: The location of the cloudbuild trigger.
-        cb_trigger_name: The name of the cloudbuild trigger.
-        cloud_run_location: The location of the cloud runner service.
-        cloud_run_name: The name of the cloud runner service.
-        cloud_tasks_queue_location: The location of the cloud tasks queue.
-        cloud_tasks_queue_name: The name of the cloud tasks queue.
-        csr_branch_name: The name of the csr branch to push to to trigger cb job.
-        csr_name: The name of the cloud source repo to use.
-        gs_bucket_location: Region of the GS bucket.
-        gs_bucket_name: GS bucket name where pipeline run metadata is stored.
-        pipeline_runner_sa: Service Account to runner PipelineJobs.
-        project_id: The project ID.
-        run_local: Flag that determines whether to use Cloud Run CI/CD.
-        schedule_location: The location of the scheduler resource.
-        schedule_name: The name of the scheduler resource.
-        schedule_pattern: Cron formatted value used to create a Scheduled retrain job.
-        vpc_connector: The name of the vpc connector to use.
+        defaults: The default config variables.
+        pipeline_params: Dictionary containing runtime pipeline parameters.
+        custom_training_job_specs: Specifies the specs to run the training job with.
+    Returns:
+        dict: Tag of each image to build, keyed by image name.
     """
 
     # Get scripts builder object
-    kfp_scripts = KfpScripts(
-        af_registry_location, af_registry_name, base_image, cb_trigger_location,
-        cb_trigger_name, cloud_run_location, cloud_run_name,
-        cloud_tasks_queue_location, cloud_tasks_queue_name, csr_branch_name,
-        csr_name, gs_bucket_location, gs_bucket_name,
-        pipeline_runner_sa, project_id, run_local, schedule_location,
-        schedule_name, schedule_pattern, BASE_DIR, vpc_connector)
+    kfp_scripts = KfpScripts(defaults, BASE_DIR)
+
+    # Load the manifest of previously generated outputs; targets whose inputs
+    # and outputs are unchanged since the last generate() are skipped.
+    manifest = GenerationManifest(GENERATION_MANIFEST_FILE)
+    defaults_hash = hash_contents(kfp_scripts.defaults)
+
+    # Write defaults.yaml, scripts for building pipeline, building components,
+    # running pipeline, running all files, creating resources, and the dockerfile
+    scripts_outputs = [
+        GENERATED_DEFAULTS_FILE, GENERATED_PIPELINE_SPEC_SH_FILE,
+        GENERATED_BUILD_COMPONENTS_SH_FILE, GENERATED_RUN_PIPELINE_SH_FILE,
+        GENERATED_RUN_ALL_SH_FILE, GENERATED_RESOURCES_SH_FILE,
+        f'{GENERATED_COMPONENT_BASE}/Dockerfile']
+    scripts_inputs_hash = hash_contents(
+        kfp_scripts.defaults, kfp_scripts.build_pipeline_spec, kfp_scripts.build_components,
+        kfp_scripts.run_pipeline, kfp_scripts.run_all, kfp_scripts.create_resources_script,
+        kfp_scripts.dockerfile)
+    if not manifest.is_fresh('scripts', scripts_inputs_hash):
+        with span('write_defaults_and_scripts'):
+            write_file(GENERATED_DEFAULTS_FILE, kfp_scripts.defaults, 'w+')
+            write_and_chmod(GENERATED_PIPELINE_SPEC_SH_FILE, kfp_scripts.build_pipeline_spec)
+            write_and_chmod(GENERATED_BUILD_COMPONENTS_SH_FILE, kfp_scripts.build_components)
+            write_and_chmod(GENERATED_RUN_PIPELINE_SH_FILE, kfp_scripts.run_pipeline)
+            write_and_chmod(GENERATED_RUN_ALL_SH_FILE, kfp_scripts.run_all)
+            write_and_chmod(GENERATED_RESOURCES_SH_FILE, kfp_scripts.create_resources_script)
+            write_file(f'{GENERATED_COMPONENT_BASE}/Dockerfile', kfp_scripts.dockerfile, 'w')
+        manifest.record('scripts', scripts_inputs_hash, scripts_outputs)
+
+    # Read the component and pipeline scaffolds
+    with span('read_scaffolds'):
+        components_path_list = get_components_list()
+        component_sources = [read_file(path) for path in components_path_list]
+        pipeline_scaffold = read_file(PIPELINE_CACHE_FILE)
+
+    # Check the resources declared on the components against the machine catalog
+    with span('validate_component_resources'):
+        validate_component_resources(components_path_list)
+
+    # Group components by requirement set for per-component images
+    component_images = None
+    if defaults.per_component_images:
+        with span('group_component_images'):
+            component_images = KfpComponentImages(defaults, [get_component_spec(path) for path in components_path_list])
+
+    # Create components whose inputs changed
+    images = {
+        component: defaults.get_image_uri(image_name)
+        for component, image_name in (component_images.component_images if component_images else {}).items()}
+    stale_components = {}
+    for path, component_source in zip(components_path_list, component_sources):
+        inputs_hash = hash_contents(component_source, defaults_hash, json.dumps(images, sort_keys=True))
+        if not manifest.is_fresh(f'component:{path}', inputs_hash):
+            stale_components[path] = inputs_hash
+    built_outputs = build_components(list(stale_components.keys()), defaults, images)
+    for (path, inputs_hash), outputs in zip(stale_components.items(), built_outputs):
+        manifest.record(f'component:{path}', inputs_hash, outputs)
+
+    # Copy tmp pipeline file over to AutoMLOps directory and create pipeline
+    pipeline_inputs_hash = hash_contents(
+        pipeline_scaffold, defaults_hash, *components_path_list,
+        json.dumps(custom_training_job_specs, sort_keys=True),
+        json.dumps(pipeline_params, sort_keys=True))
+    if not manifest.is_fresh('pipeline', pipeline_inputs_hash):
+        write_file(GENERATED_PIPELINE_FILE, pipeline_scaffold, 'w')
+        manifest.record('pipeline', pipeline_inputs_hash,
+                        build_pipeline(custom_training_job_specs, pipeline_params, defaults))
+
+    # Write requirements.txt to the component base directory, and lock it
+    # against the wheelhouse if one is given
+    wheelhouse_fingerprint = get_wheelhouse_fingerprint(defaults.wheelhouse) if defaults.wheelhouse else None
+    reqs_filename = f'{GENERATED_COMPONENT_BASE}/requirements.txt'
+    lock_filename = f'{GENERATED_COMPONENT_BASE}/requirements.lock'
+    reqs_inputs_hash = hash_contents(defaults.per_component_images, defaults.base_image, wheelhouse_fingerprint, *component_sources)
+    if not manifest.is_fresh('requirements', reqs_inputs_hash):
+        with span('infer_requirements'):
+            requirements = component_images.base_requirements if component_images else kfp_scripts.requirements
+            write_file(reqs_filename, requirements, 'w')
+        reqs_outputs = [reqs_filename]
+        if defaults.wheelhouse:
+            with span('lock_requirements'):
+                write_file(lock_filename, lock_requirements(
+                    requirements.splitlines(), defaults.wheelhouse, get_target_python_version(defaults.base_image)), 'w')
+            reqs_outputs.append(lock_filename)
+        else:
+            delete_file(lock_filename)
+        manifest.record('requirements', reqs_inputs_hash, reqs_outputs)
+
+    # Write the files of the per-component images
+    if component_images:
+        base_lock = read_file(lock_filename) if defaults.wheelhouse else None
+        images_inputs_hash = hash_contents(
+            json.dumps(component_images.dockerfiles, sort_keys=True),
+            json.dumps(component_images.requirements, sort_keys=True),
+            base_lock, wheelhouse_fingerprint)
+        if not manifest.is_fresh('images', images_inputs_hash):
+            manifest.record('images', images_inputs_hash, build_component_images(defaults, component_images, base_lock))
+
+    # Sync a local wheelhouse into the component_base build context, which
+    # the images install their requirements from offline
+    offline = defaults.wheelhouse is not None and not is_index_url(defaults.wheelhouse)
+    if not in_virtual_filesystem():
+        with span('sync_wheelhouse'):
+            if offline:
+                sync_wheelhouse(defaults.wheelhouse, GENERATED_WHEELHOUSE_DIR)
+            else:
+                shutil.rmtree(GENERATED_WHEELHOUSE_DIR, ignore_errors=True)
+
+    # Report the requirements of each image and the default packages they no longer install
+    with span('requirements_report'):
+        report = create_requirements_report(defaults, component_images)
+    report_inputs_hash = hash_contents(report)
+    if not manifest.is_fresh('requirements_report', report_inputs_hash):
+        write_file(GENERATED_REQUIREMENTS_REPORT_FILE, report, 'w')
+        manifest.record('requirements_report', report_inputs_hash, [GENERATED_REQUIREMENTS_REPORT_FILE])
 
-    # Write defaults.yaml
-    write_file(GENERATED_DEFAULTS_FILE, kfp_scripts.defaults, 'w+')
+    # Build the cloud run files
+    if not defaults.run_local:
+        cloudrun_inputs_hash = hash_contents(defaults_hash, json.dumps(pipeline_params, sort_keys=True))
+        if not manifest.is_fresh('cloudrun', cloudrun_inputs_hash):
+            manifest.record('cloudrun', cloudrun_inputs_hash, build_cloudrun(defaults))
+
+    # Tag each image with a digest of its build context, and pin the
+    # component specs and the run_pipeline image to those tags
+    with span('tag_images'):
+        image_tags = get_image_tags(defaults, component_images)
+        pin_component_images(components_path_list, defaults, component_images, image_tags, manifest)
+        # The wheelhouse is summarized by its file names and sizes rather than hashed
+        excluded = (os.path.normpath(GENERATED_CLOUDBUILD_FILE), os.path.normpath(GENERATED_WHEELHOUSE_DIR) + os.sep)
+        image_tags[RUN_PIPELINE_IMAGE] = get_build_context_tag(
+            BASE_DIR, [path for path in list_build_context_files(BASE_DIR) if not os.path.normpath(path).startswith(excluded)],
+            *([wheelhouse_fingerprint] if offline else []))
+
+    manifest.save()
+    return image_tags
+
+def list_build_context_files(directory: str) -> List[str]:
+    """Lists the files under a directory that can affect an image built from
+       it. Bytecode caches, dotfiles and editor swap or backup files are left
+       out, so running or editing the generated code does not retag images.
 
-    # Write scripts for building pipeline, building components, running pipeline, and running all files
-    write_and_chmod(GENERATED_PIPELINE_SPEC_SH_FILE, kfp_scripts.build_pipeline_spec)
-    write_and_chmod(GENERATED_BUILD_COMPONENTS_SH_FILE, kfp_scripts.build_components)
-    write_and_chmod(GENERATED_RUN_PIPELINE_SH_FILE, kfp_scripts.run_pipeline)
-    write_and_chmod(GENERATED_RUN_ALL_SH_FILE, kfp_scripts.run_all)
+    Args:
+        directory: Path to the directory.
+    Returns:
+        list: Paths of the files, sorted within each directory.
+    """
+    paths = []
+    for path in list_files(directory):
+        parts = os.path.relpath(path, directory).split(os.sep)
+        if any(part.startswith('.') or part == '__pycache__' for part in parts):
+            continue
+        if parts[-1].endswith(('.pyc', '.pyo', '.swp', '~')):
+            continue
+        paths.append(path)
+    return paths
+
+def get_build_context_tag(context_dir: str, paths: List[str], *extra_inputs) -> str:
+    """Computes a content-addressed image tag from the files an image is
+    built from, so an image is only rebuilt when its build context changes.
 
-    # Write scripts to create resources
-    write_and_chmod(GENERATED_RESOURCES_SH_FILE, kfp_scripts.create_resources_script)
+    Args:
+        context_dir: Directory the image is built in.
+        paths: Paths of the files in the build context that the image uses.
+        extra_inputs: Other inputs of the build, such as the tag of its base image.
+    Returns:
+        str: Image tag.
+    """
+    contents = []
+    for path in sorted(paths, key=os.path.normpath):
+        contents += [os.path.relpath(path, context_dir).replace(os.sep, '/'), hash_file(path)]
+    return hash_contents(*extra_inputs, *contents)[:IMAGE_TAG_LENGTH]
 
-    # Copy tmp pipeline file over to AutoMLOps directory
-    execute_process(f'cp {PIPELINE_CACHE_FILE} {GENERATED_PIPELINE_FILE}', to_null=False)
+def get_image_tags(defaults: DefaultsConfig, component_images: Optional[KfpComponentImages]) -> Dict[str, str]:
+    """Computes the tags of the component_base image and the per-component
+    images. A per-component image is also retagged when its base changes.
 
-    # Create components and pipelines
-    components_path_list = get_components_list()
-    for path in components_path_list:
-        build_component(path)
-    build_pipeline(custom_training_job_specs, pipeline_params)
+    Args:
+        defaults: The default config variables.
+        component_images: The per-component images, if any.
+    Returns:
+        dict: Image tags, keyed by image name.
+    """
+    reqs_filename = 'requirements.lock' if defaults.wheelhouse else 'requirements.txt'
+    base_context = [f'{GENERATED_COMPONENT_BASE}/Dockerfile', f'{GENERATED_COMPONENT_BASE}/{reqs_filename}']
+    if not component_images:
+        base_context += list_build_context_files(f'{GENERATED_COMPONENT_BASE}/src')
+    image_tags = {COMPONENT_BASE_IMAGE: get_build_context_tag(GENERATED_COMPONENT_BASE, base_context)}
+    for group, context in (component_images.build_contexts.items() if component_images else []):
+        image_tags[f'components/{group}'] = get_build_context_tag(
+            GENERATED_COMPONENT_BASE, [f'{GENERATED_COMPONENT_BASE}/{path}' for path in context],
+            image_tags[COMPONENT_BASE_IMAGE])
+    return image_tags
+
+def create_requirements_report(defaults: DefaultsConfig,
+                               component_images: Optional[KfpComponentImages]) -> str:
+    """Creates a report of the requirements each component image installs,
+    the packages added for the libraries its components import, and the
+    packages that used to be installed by default but no longer are. With a
+    local wheelhouse, it also estimates the download size of each image's
+    locked requirements; the size of each built image is logged by cloudbuild.
 
-    # Write dockerfile to the component base directory
-    write_file(f'{GENERATED_COMPONENT_BASE}/Dockerfile', kfp_scripts.dockerfile, 'w')
+    Args:
+        defaults: The default config variables.
+        component_images: The per-component images, if any.
+    Returns:
+        str: Report contents, in json.
+    """
+    # Requirements files installed by each image, including those of the image it is layered on
+    reqs_files = {COMPONENT_BASE_IMAGE: [f'{GENERATED_COMPONENT_BASE}/requirements.txt']}
+    if component_images:
+        for group in component_images.groups:
+            reqs_files[f'components/{group}'] = reqs_files[COMPONENT_BASE_IMAGE] + (
+                [f'{GENERATED_COMPONENT_IMAGES_DIR}/{group}/requirements.txt'] if group in component_images.requirements else [])
+
+    report = {}
+    for image_name, files in reqs_files.items():
+        requirements = sorted({r for path in files for r in read_file(path).splitlines() if r})
+        names = {get_requirement_name(r) for r in requirements}
+        report[image_name] = {
+            'requirements': requirements,
+            'added_for_imports': {
+                companion: library for companion, library in get_companion_requirements(requirements).items()
+                if get_requirement_name(companion) in names},
+            'dropped_defaults': [r for r in DEFAULT_GCP_REQUIREMENTS if get_requirement_name(r) not in names]}
+        if defaults.wheelhouse:
+            lock = ''.join(read_file(path[:-len('.txt')] + '.lock') for path in files)
+            report[image_name]['download_size_bytes'] = get_lock_download_size(lock, defaults.wheelhouse)
+    return json.dumps({'images': report}, indent=2, sort_keys=True) + '\n'
+
+def pin_component_images(component_paths: List[str],
+                         defaults: DefaultsConfig,
+                         component_images: Optional[KfpComponentImages],
+                         image_tags: Dict[str, str],
+                         manifest: GenerationManifest):
+    """Sets the image of each component.yaml to its tagged image. Only the
+    component.yamls whose image changed are rewritten.
 
-    # Write requirements.txt to the component base directory
-    write_file(f'{GENERATED_COMPONENT_BASE}/requirements.txt', kfp_scripts.requirements, 'w')
+    Args:
+        component_paths: Paths to the temporary component yamls.
+        defaults: The default config variables.
+        component_images: The per-component images, if any.
+        image_tags: Image tags, keyed by image name.
+        manifest: Manifest in which the rewritten components are refreshed.
+    """
+    for path in component_paths:
+        name = get_component_name(get_component_spec(path))
+        image_name = component_images.component_images[name] if component_images else COMPONENT_BASE_IMAGE
+        image = defaults.get_image_uri(image_name, image_tags[image_name])
+        filename = BASE_DIR + 'components/' + name + '/component.yaml'
+        component_spec = read_yaml_file(filename)
+        if component_spec['implementation']['container']['image'] != image:
+            component_spec['implementation']['container']['image'] = image
+            write_file(filename, GENERATED_LICENSE, 'w')
+            write_yaml_file(filename, component_spec, 'a')
+            manifest.refresh(f'component:{path}')
+
+def build_component_images(defaults: DefaultsConfig,
+                           component_images: KfpComponentImages,
+                           base_lock: Optional[str] = None) -> List[str]:
+    """Writes the Dockerfile and requirements.txt of each per-component image
+    to the component_base/images directory, and removes the files of images
+    that no longer exist. With a wheelhouse, the requirements of each image
+    are also locked, keeping the versions pinned by the component_base lock.
 
-    # Build the cloud run files
-    if not run_local:
-        build_cloudrun()
+    Args:
+        defaults: The default config variables.
+        component_images: The per-component images.
+        base_lock: Contents of the component_base requirements.lock, if any.
+    Returns:
+        list: Paths of the files written.
+    """
+    outputs = []
+    for group, dockerfile in component_images.dockerfiles.items():
+        image_dir = f'{GENERATED_COMPONENT_IMAGES_DIR}/{group}'
+        make_dirs([image_dir])
+        write_file(f'{image_dir}/Dockerfile', dockerfile, 'w')
+        outputs.append(f'{image_dir}/Dockerfile')
+        if group in component_images.requirements:
+            write_file(f'{image_dir}/requirements.txt', component_images.requirements[group], 'w')
+            outputs.append(f'{image_dir}/requirements.txt')
+            if defaults.wheelhouse:
+                with span('lock_requirements', image=group):
+                    write_file(f'{image_dir}/requirements.lock', lock_requirements(
+                        component_images.requirements[group].splitlines(), defaults.wheelhouse,
+                        get_target_python_version(defaults.base_image), base_lock), 'w')
+                outputs.append(f'{image_dir}/requirements.lock')
+    current = {os.path.normpath(output) for output in outputs}
+    for path in list_files(GENERATED_COMPONENT_IMAGES_DIR):
+        if os.path.normpath(path) not in current:
+            delete_file(path)
+    return outputs
+
+def build_components(component_paths: List[str],
+                     defaults: DefaultsConfig,
+                     component_images: Optional[Dict[str, str]] = None) -> List[list]:
+    """Constructs and writes the files for each component on a bounded
+    worker pool. Components are independent of each other, so they are
+    materialized concurrently; results are returned in input order. Each
+    worker runs in a copy of the caller's context, so an active
+    virtual_filesystem() also applies to the workers.
+
+    Args:
+        component_paths: Paths to the temporary component yamls.
+        defaults: The default config variables.
+        component_images: Image of each component, keyed by component name
+            (default: the component_base image).
+    Returns:
+        list: Paths of the files written for each component, in input order.
+    Raises:
+        Exception: If building any component fails; lists every failure.
+    """
+    with ThreadPoolExecutor(max_workers=COMPONENT_BUILD_MAX_WORKERS) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, build_component, path, defaults, component_images)
+                   for path in component_paths]
+
+    outputs, errors = [], []
+    for path, future in zip(component_paths, futures):
+        try:
+            outputs.append(future.result())
+        except Exception as err: # pylint: disable=broad-except
+            errors.append(f'{path}: {err}')
+    if errors:
+        raise RuntimeError(f'Error building {len(errors)} component(s).\n' + '\n'.join(errors))
+    return outputs
+
+def validate_component_resources(component_paths: List[str]):
+    """Checks that the cpu, memory and accelerators declared on each component
+    fit at least one machine type of the machine catalog, so the pipeline
+    does not fail to schedule its tasks on Vertex AI.
 
-def build_component(component_path: str):
+    Args:
+        component_paths: Paths to the temporary component yamls.
+    Raises:
+        Exception: If the resources declared on a component fit no machine type.
+    """
+    for path in component_paths:
+        component_spec = get_component_spec(path)
+        try:
+            get_machine_type(get_component_resources(component_spec))
+        except ValueError as err:
+            raise ValueError(f'Invalid resources declared on component {get_component_name(component_spec)}. {err}') from err
+
+@traced('build_component', 'component_path')
+def build_component(component_path: str,
+                    defaults: DefaultsConfig,
+                    component_images: Optional[Dict[str, str]] = None):
     """Constructs and writes component.yaml and {component_name}.py files.
         component.yaml: Contains the Kubeflow custom component definition.
         {component_name}.py: Contains the python code from the Jupyter cell.
@@ -144,13 +449,17 @@ def build_component(component_path: str):
         component_path: Path to the temporary component yaml. This file
             is used to create the permanent component.yaml, and deleted
             after calling AutoMLOps.generate().
+        defaults: The default config variables.
+        component_images: Image of each component, keyed by component name
+            (default: the component_base image).
+    Returns:
+        list: Paths of the files written.
     """
     # Read in component specs
-    component_spec = read_yaml_file(component_path)
+    component_spec = get_component_spec(component_path)
 
     # If using kfp, remove spaces in name and convert to lowercase
-    if is_using_kfp_spec(component_spec['implementation']['container']['image']):
-        component_spec['name'] = component_spec['name'].replace(' ', '_').lower()
+    component_spec['name'] = get_component_name(component_spec)
 
     # Set and create directory for component, and set directory for task
     component_dir = BASE_DIR + 'components/' + component_spec['name']
@@ -161,24 +470,25 @@ def build_component(component_path: str):
     make_dirs([component_dir])
 
     # Initialize component scripts builder
-    kfp_comp = KfpComponent(component_spec, GENERATED_DEFAULTS_FILE)
+    kfp_comp = KfpComponent(component_spec, defaults, (component_images or {}).get(component_spec['name']))
 
     # Write task script to component base
     write_file(task_filepath, kfp_comp.task, 'w+')
 
     # Update component_spec to include correct image and startup command
     component_spec['implementation']['container']['image'] = kfp_comp.compspec_image
-    component_spec['implementation']['container']['command'] = [
-        'python3',
-        f'''/pipelines/component/src/{component_spec['name']+'.py'}''']
+    component_spec['implementation']['container']['command'] = ['python3', '-m', component_spec['name']]
 
     # Write license and component spec to the appropriate component.yaml file
     filename = component_dir + '/component.yaml'
     write_file(filename, GENERATED_LICENSE, 'w')
     write_yaml_file(filename, component_spec, 'a')
+    return [task_filepath, filename]
 
+@traced('build_pipeline')
 def build_pipeline(custom_training_job_specs: List[Dict],
-                   pipeline_parameter_values: dict):
+                   pipeline_parameter_values: dict,
+                   defaults: DefaultsConfig):
     """Constructs and writes pipeline.py, pipeline_runner.py, and pipeline_parameter_values.json files.
         pipeline.py: Generates a Kubeflow pipeline spec from custom components.
         pipeline_runner.py: Sends a PipelineJob to Vertex AI using pipeline spec.
@@ -187,6 +497,9 @@ def build_pipeline(custom_training_job_specs: List[Dict],
     Args:
         custom_training_job_specs: Specifies the specs to run the training job with.
         pipeline_parameter_values: Dictionary of runtime parameters for the PipelineJob.
+        defaults: The default config variables.
+    Returns:
+        list: Paths of the files written.
     Raises:
         Exception: If an error is encountered reading/writing to a file.
     """
@@ -196,19 +509,14 @@ def build_pipeline(custom_training_job_specs: List[Dict],
     pipeline_params_file = BASE_DIR + GENERATED_PARAMETER_VALUES_PATH
 
     # Initializes pipeline scripts builder
-    kfp_pipeline = KfpPipeline(custom_training_job_specs, GENERATED_DEFAULTS_FILE)
-    try:
-        with open(pipeline_file, 'r+', encoding='utf-8') as file:
-            pipeline_scaffold = file.read()
-            file.seek(0, 0)
-            file.write(GENERATED_LICENSE)
-            file.write(kfp_pipeline.pipeline_imports)
-            for line in pipeline_scaffold.splitlines():
-                file.write('    ' + line + '\n')
-            file.write(kfp_pipeline.pipeline_argparse)
-        file.close()
-    except OSError as err:
-        raise OSError(f'Error interacting with file. {err}') from err
+    kfp_pipeline = KfpPipeline(custom_training_job_specs, defaults)
+    pipeline_scaffold = read_file(pipeline_file)
+    write_file(pipeline_file,
+               GENERATED_LICENSE
+               + kfp_pipeline.pipeline_imports
+               + ''.join('    ' + line + '\n' for line in pipeline_scaffold.splitlines())
+               + kfp_pipeline.pipeline_argparse,
+               'w')
 
     # Construct pipeline_runner.py
     write_file(pipeline_runner_file, kfp_pipeline.pipeline_runner, 'w+')
@@ -216,13 +524,21 @@ def build_pipeline(custom_training_job_specs: List[Dict],
     # Construct pipeline_parameter_values.json
     serialized_params = json.dumps(pipeline_parameter_values, indent=4)
     write_file(pipeline_params_file, serialized_params, 'w+')
+    return [pipeline_file, pipeline_runner_file, pipeline_params_file]
 
-def build_cloudrun():
-    """Constructs and writes a Dockerfile, requirements.txt, and
-       main.py to the cloud_run/run_pipeline directory. Also
+@traced('build_cloudrun')
+def build_cloudrun(defaults: DefaultsConfig):
+    """Constructs and writes a Dockerfile, requirements.txt,
+       pipeline_spec_requirements.txt and main.py to the
+       cloud_run/run_pipeline directory. Also
        constructs and writes a main.py, requirements.txt, and
        pipeline_parameter_values.json to the
        cloud_run/queueing_svc directory.
+
+    Args:
+        defaults: The default config variables.
+    Returns:
+        list: Paths of the files written.
     """
     # Make new directories
     make_dirs([BASE_DIR + 'cloud_run',
@@ -230,7 +546,7 @@ def build_cloudrun():
                BASE_DIR + 'cloud_run/queueing_svc'])
 
     # Initialize cloud run scripts object
-    cloudrun_scripts = KfpCloudRun(GENERATED_DEFAULTS_FILE)
+    cloudrun_scripts = KfpCloudRun(defaults)
 
     # Set new folders as variables
     cloudrun_base = BASE_DIR + 'cloud_run/run_pipeline'
@@ -241,6 +557,7 @@ def build_cloudrun():
 
     # Write requirements files for cloud run base and queueing svc
     write_file(f'{cloudrun_base}/requirements.txt', cloudrun_scripts.cloudrun_base_reqs, 'w')
+    write_file(f'{cloudrun_base}/pipeline_spec_requirements.txt', cloudrun_scripts.pipeline_spec_reqs, 'w')
     write_file(f'{queueing_svc_base}/requirements.txt', cloudrun_scripts.queueing_svc_reqs, 'w')
 
     # Write main code files for cloud run base and queueing svc
@@ -248,4 +565,8 @@ def build_cloudrun():
     write_file(f'{queueing_svc_base}/main.py', cloudrun_scripts.queueing_svc, 'w')
 
     # Copy runtime parameters over to queueing_svc dir
-    execute_process(f'''cp -r {BASE_DIR + GENERATED_PARAMETER_VALUES_PATH} {BASE_DIR + 'cloud_run/queueing_svc'}''', to_null=False)
+    queueing_svc_params_file = f'{queueing_svc_base}/{os.path.basename(GENERATED_PARAMETER_VALUES_PATH)}'
+    write_file(queueing_svc_params_file, read_file(BASE_DIR + GENERATED_PARAMETER_VALUES_PATH), 'w')
+    return [f'{cloudrun_base}/Dockerfile', f'{cloudrun_base}/requirements.txt', f'{cloudrun_base}/pipeline_spec_requirements.txt',
+            f'{queueing_svc_base}/requirements.txt', f'{cloudrun_base}/main.py',
+            f'{queueing_svc_base}/main.py', queueing_svc_params_file]
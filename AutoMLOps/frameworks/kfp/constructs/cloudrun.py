@@ -16,88 +16,158 @@
 
 # pylint: disable=line-too-long
 
-from AutoMLOps.utils.utils import read_yaml_file
+import os
+
+from AutoMLOps.utils.config import DefaultsConfig
 from AutoMLOps.utils.constants import (
+    BASE_DIR,
+    CLOUD_RUN_BASE_IMAGE,
+    DOCKER_PIPELINE_SPEC_VENV_DIR,
+    DOCKER_VENV_DIR,
+    DOCKER_WHEELHOUSE_DIR,
     GENERATED_LICENSE,
     GENERATED_PIPELINE_JOB_SPEC_PATH,
+    GENERATED_WHEELHOUSE_DIR,
     LEFT_BRACKET,
     PINNED_KFP_VERSION,
+    PIP_CACHE_MOUNT,
     RIGHT_BRACKET
 )
+from AutoMLOps.utils.lockfile import is_index_url
 
 class KfpCloudRun():
     """Generates files related to cloud runner service."""
-    def __init__(self, defaults_file: str):
+    def __init__(self, defaults: DefaultsConfig):
         """Instantiate Cloud Run scripts object with all necessary attributes.
 
         Args:
-            defaults_file (str): Path to the default config variables yaml.
+            defaults (DefaultsConfig): The default config variables.
         """
 
-        # Parse defaults file for hidden class attributes
-        defaults = read_yaml_file(defaults_file)
-        self._project_id = defaults['gcp']['project_id']
-        self._pipeline_runner_service_account = defaults['gcp']['pipeline_runner_service_account']
-        self._cloud_tasks_queue_location = defaults['gcp']['cloud_tasks_queue_location']
-        self._cloud_tasks_queue_name = defaults['gcp']['cloud_tasks_queue_name']
-        self._cloud_run_name = defaults['gcp']['cloud_run_name']
-        self._cloud_run_location = defaults['gcp']['cloud_run_location']
-        self._cloud_schedule_pattern = defaults['gcp']['cloud_schedule_pattern']
-        self._cloud_schedule_location = defaults['gcp']['cloud_schedule_location']
-        self._cloud_schedule_name = defaults['gcp']['cloud_schedule_name']
+        # Set default config variables as hidden class attributes
+        self._project_id = defaults.project_id
+        self._pipeline_runner_service_account = defaults.pipeline_runner_sa
+        self._cloud_tasks_queue_location = defaults.cloud_tasks_queue_location
+        self._cloud_tasks_queue_name = defaults.cloud_tasks_queue_name
+        self._cloud_run_name = defaults.cloud_run_name
+        self._cloud_run_location = defaults.cloud_run_location
+        self._cloud_schedule_pattern = defaults.schedule_pattern
+        self._cloud_schedule_location = defaults.schedule_location
+        self._cloud_schedule_name = defaults.schedule_name
+        self._offline = defaults.wheelhouse is not None and not is_index_url(defaults.wheelhouse)
 
         # Set generated scripts as public attributes
         self.dockerfile = self._create_dockerfile()
         self.cloudrun_base_reqs = self._create_cloudrun_base_reqs()
+        self.pipeline_spec_reqs = self._create_pipeline_spec_reqs()
         self.queueing_svc_reqs = self._create_queuing_svc_reqs()
         self.cloudrun_base = self._create_cloudrun_base()
         self.queueing_svc = self._create_queueing_svc()
 
     def _create_dockerfile(self):
         """Returns text for a Dockerfile that will be added to the cloudrun/run_pipeline directory.
+        A builder stage installs the service requirements into a virtual
+        environment, and compiles the pipeline spec with kfp from a separate
+        one, reading the sources through a bind mount of the build context.
+        The service image only gets the service environment, main.py,
+        defaults.yaml and the compiled spec, so it holds neither kfp nor the
+        rest of the AutoMLOps/ tree. With a local wheelhouse, requirements are
+        installed offline from the wheelhouse in the component_base directory,
+        which is bind mounted, so the wheels are not in any layer.
 
         Returns:
             str: Dockerfile text.
         """
         return (
             GENERATED_LICENSE +
-            'FROM python:3.9-slim\n'
+            f'FROM {CLOUD_RUN_BASE_IMAGE} AS builder\n'
+            '\n' +
+            ('# Install requirements into virtual environments from the wheelhouse, without an index\n' if self._offline else
+             '# Install requirements into virtual environments, caching downloads across builds\n') +
+            self._create_install_requirements(DOCKER_VENV_DIR, 'requirements.txt') +
+            self._create_install_requirements(DOCKER_PIPELINE_SPEC_VENV_DIR, 'pipeline_spec_requirements.txt') +
+            '\n'
+            '# Compile pipeline spec\n'
+            'WORKDIR /app\n'
+            'RUN --mount=type=bind,target=/app,rw \\\n'
+            f'    PATH="{DOCKER_PIPELINE_SPEC_VENV_DIR}/bin:$PATH" ./scripts/build_pipeline_spec.sh \\\n'
+            f'    && cp {GENERATED_PIPELINE_JOB_SPEC_PATH} /pipeline_job.json\n'
+            '\n'
+            f'FROM {CLOUD_RUN_BASE_IMAGE}\n'
             '\n'
             '# Allow statements and log messages to immediately appear in the Knative logs\n'
             'ENV PYTHONUNBUFFERED True\n'
             '\n'
-            '# Copy local code to the container image.\n'
+            f'COPY --from=builder {DOCKER_VENV_DIR} {DOCKER_VENV_DIR}\n'
+            f'ENV PATH="{DOCKER_VENV_DIR}/bin:$PATH"\n'
+            '\n'
+            '# Copy the files the service reads to the container image.\n'
             'ENV APP_HOME /app\n'
             'WORKDIR $APP_HOME\n'
-            'COPY ./ ./\n'
+            'COPY configs/defaults.yaml configs/\n'
+            'COPY cloud_run/run_pipeline/main.py cloud_run/run_pipeline/\n'
+            f'COPY --from=builder /pipeline_job.json {GENERATED_PIPELINE_JOB_SPEC_PATH}\n'
             '\n'
-            '# Upgrade pip\n'
-            'RUN python -m pip install --upgrade pip\n'
-            '# Install requirements\n'
-            'RUN pip install --no-cache-dir -r /app/cloud_run/run_pipeline/requirements.txt\n'
-            '# Compile pipeline spec\n'
-            'RUN ./scripts/build_pipeline_spec.sh\n'
             '# Change Directories\n'
             'WORKDIR "/app/cloud_run/run_pipeline"\n'
             '# Run flask api server\n'
             'CMD exec gunicorn --bind :$PORT --workers 1 --threads 8 --timeout 0 main:app\n'
         )
 
+    def _create_install_requirements(self, venv_dir: str, reqs_filename: str) -> str:
+        """Returns the Dockerfile instructions that create a virtual environment
+        and install a requirements file of the cloud_run/run_pipeline directory into it.
+
+        Args:
+            venv_dir: Directory of the virtual environment.
+            reqs_filename: Name of the requirements file.
+        Returns:
+            str: Dockerfile instructions.
+        """
+        if self._offline:
+            wheelhouse = os.path.relpath(GENERATED_WHEELHOUSE_DIR, BASE_DIR).replace(os.sep, '/')
+            return (
+                f'RUN python -m venv {venv_dir}\n'
+                f'COPY cloud_run/run_pipeline/{reqs_filename} .\n'
+                f'RUN --mount=type=bind,source={wheelhouse},target={DOCKER_WHEELHOUSE_DIR} \\\n'
+                f'    {venv_dir}/bin/python -m pip install --no-index --find-links {DOCKER_WHEELHOUSE_DIR} -r {reqs_filename}\n')
+        return (
+            f'RUN {PIP_CACHE_MOUNT} \\\n'
+            f'    python -m venv {venv_dir} \\\n'
+            f'    && {venv_dir}/bin/python -m pip install --upgrade pip\n'
+            f'COPY cloud_run/run_pipeline/{reqs_filename} .\n'
+            f'RUN {PIP_CACHE_MOUNT} \\\n'
+            f'    {venv_dir}/bin/python -m pip install -r {reqs_filename}\n')
+
     def _create_cloudrun_base_reqs(self):
         """Returns the text of a cloudrun base requirements file to be written to the cloud_run/run_pipeline directory.
+        These are the requirements of the service; the pipeline spec is compiled
+        at build time with the pipeline spec requirements.
 
         Returns:
             str: Package requirements for cloudrun base.
         """
         return (
-            f'{PINNED_KFP_VERSION}\n'
             'google-cloud-aiplatform\n'
-            'google-cloud-pipeline-components\n'
             'Flask\n'
             'gunicorn\n'
             'pyyaml\n'
         )
 
+    def _create_pipeline_spec_reqs(self):
+        """Returns the text of a requirements file to be written to the
+        cloud_run/run_pipeline directory, which the pipeline spec is compiled
+        with when the cloud run image is built.
+
+        Returns:
+            str: Package requirements for compiling the pipeline spec.
+        """
+        return (
+            f'{PINNED_KFP_VERSION}\n'
+            'google-cloud-pipeline-components\n'
+            'pyyaml\n'
+        )
+
     def _create_queuing_svc_reqs(self):
         """Returns the text of a queueing svc requirements file to be written to the cloud_run/queueing_svc directory.
 
@@ -157,7 +227,7 @@ class KfpCloudRun():
             f'''        logging.debug(request_json)\n'''
             f'\n'
             f'''        with open(CONFIG_FILE, 'r', encoding='utf-8') as config_file:\n'''
-            f'''            config = yaml.load(config_file, Loader=yaml.FullLoader)\n'''
+            f'''            config = yaml.safe_load(config_file)\n'''
             f'\n'
             f'''        logging.debug('Calling run_pipeline()')\n'''
             f'''        dashboard_uri, resource_name = run_pipeline(\n'''
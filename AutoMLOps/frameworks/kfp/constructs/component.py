@@ -16,21 +16,37 @@
 
 # pylint: disable=line-too-long
 
-from AutoMLOps.utils.constants import GENERATED_LICENSE
+import typing
+from typing import Optional
+
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import (
+    GENERATED_LICENSE,
+    IMPORT_TIME_BUDGET_ENV_VAR,
+    IMPORT_TIME_BUDGET_SECONDS,
+    KFP_DSL_NAMES,
+    STEP_CACHE_DIR_ENV_VAR,
+    STEP_CACHE_MAX_BYTES,
+    STEP_CACHE_MAX_BYTES_ENV_VAR,
+    STEP_CHECKPOINT_FILENAME
+)
+from AutoMLOps.utils.import_scanner import get_referenced_names
 from AutoMLOps.utils.utils import is_using_kfp_spec
 from AutoMLOps.frameworks.base import Component
 
 class KfpComponent(Component):
     """Child class that generates files related to kfp components."""
-    def __init__(self, component_spec: dict, defaults_file: str):
+    def __init__(self, component_spec: dict, defaults: DefaultsConfig, image: Optional[str] = None):
         """Instantiate Component scripts object with all necessary attributes.
 
         Args:
             component_spec (dict): Dictionary of component specs including details
                 of component image, startup command, and args.
-            defaults_file (str): Path to the default config variables yaml.
+            defaults (DefaultsConfig): The default config variables.
+            image (Optional[str]): Image the component runs in (default: the component_base image).
         """
-        super().__init__(component_spec, defaults_file)
+        super().__init__(component_spec, defaults)
+        self._image = image
 
         # Get generated scripts as public attributes
         self.task = self._create_task()
@@ -38,24 +54,35 @@ class KfpComponent(Component):
 
     def _create_task(self):
         """Creates the content of the cell python code to be written to a file with required imports.
+        The task imports only the kfp dsl and typing names the component
+        uses, and logs how long its imports took against a budget, which
+        can be set with an environment variable. When the step cache is
+        enabled, a step whose key is in the cache is skipped and its outputs
+        are restored instead. A completed step writes a checkpoint
+        with the locations of its outputs next to its executor output.
 
         Returns:
             str: Contents of component base source code.
         """
         default_imports = (GENERATED_LICENSE +
+            'import time\n'
+            '_IMPORT_START = time.perf_counter()\n'
+            '\n'
             'import argparse\n'
+            'import hashlib\n'
             'import json\n'
-            'from kfp.v2.components import executor\n')
+            'import logging\n'
+            'import os\n'
+            'import shutil\n'
+            'import sys\n'
+            'import tempfile\n'
+            'from kfp.v2.components import executor\n'
+            'from kfp.v2.components.types import artifact_types as _artifact_types\n')
+        custom_code = self._component_spec['implementation']['container']['command'][-1]
         if not is_using_kfp_spec(self._component_spec['implementation']['container']['image']):
-            custom_imports = ('\n'
-            'import kfp\n'
-            'from kfp.v2 import dsl\n'
-            'from kfp.v2.dsl import *\n'
-            'from typing import *\n'
-            '\n')
+            custom_imports = '\n' + self._create_custom_imports(custom_code) + '\n'
         else:
             custom_imports = '' # the above is already included as part of the kfp spec
-        custom_code = self._component_spec['implementation']['container']['command'][-1]
         main_func = (
             '\n'
             '''def main():\n'''
@@ -65,16 +92,226 @@ class KfpComponent(Component):
             '''    parser.add_argument('--function_to_execute', type=str)\n'''
             '\n'
             '''    args, _ = parser.parse_known_args()\n'''
+            '''    import_seconds = time.perf_counter() - _IMPORT_START\n'''
+            f'''    import_budget = float(os.environ.get('{IMPORT_TIME_BUDGET_ENV_VAR}', {IMPORT_TIME_BUDGET_SECONDS}))\n'''
+            '''    if import_seconds > import_budget:\n'''
+            '''        logging.warning('%s: imports took %.2fs, over the %gs budget; move heavy imports into the component function',\n'''
+            '''                        args.function_to_execute, import_seconds, import_budget)\n'''
+            '''    else:\n'''
+            '''        logging.info('%s: imports took %.2fs of a %gs budget', args.function_to_execute, import_seconds, import_budget)\n'''
+            '\n'
             '''    executor_input = json.loads(args.executor_input)\n'''
             '''    function_to_execute = globals()[args.function_to_execute]\n'''
             '\n'
-            '''    executor.Executor(\n'''
-            '''        executor_input=executor_input,\n'''
-            '''        function_to_execute=function_to_execute).execute()\n'''
+            '''    cache_key = _get_step_cache_key(executor_input, args.function_to_execute)\n'''
+            '''    if cache_key and _restore_step_outputs(cache_key, executor_input):\n'''
+            '''        print(f'{args.function_to_execute}: restored outputs from the step cache ({cache_key[:12]})')\n'''
+            '''    else:\n'''
+            '''        executor.Executor(\n'''
+            '''            executor_input=executor_input,\n'''
+            '''            function_to_execute=function_to_execute).execute()\n'''
+            '''        if cache_key:\n'''
+            '''            _save_step_outputs(cache_key, executor_input)\n'''
+            '''    _write_step_checkpoint(executor_input, args.function_to_execute)\n'''
             '\n'
             '''if __name__ == '__main__':\n'''
             '''    main()\n''')
-        return default_imports + custom_imports + custom_code + main_func
+        return default_imports + custom_imports + custom_code + self._create_step_cache() + self._create_step_checkpoint() + main_func
+
+    def _create_custom_imports(self, custom_code: str) -> str:
+        """Creates the imports of the kfp and typing names the component code
+        uses, instead of star imports that load every name. Falls back to the
+        star imports if the code cannot be parsed.
+
+        Args:
+            custom_code: Source code of the component function.
+        Returns:
+            str: Import statements.
+        """
+        names = get_referenced_names(custom_code)
+        if names is None:
+            return (
+                'import kfp\n'
+                'from kfp.v2 import dsl\n'
+                'from kfp.v2.dsl import *\n'
+                'from typing import *\n')
+        # typing names took precedence over kfp ones with the star imports
+        typing_names = sorted(names & set(typing.__all__))
+        dsl_names = sorted(names & set(KFP_DSL_NAMES) - set(typing_names))
+        imports = ''
+        if 'kfp' in names:
+            imports += 'import kfp\n'
+        if 'dsl' in names:
+            imports += 'from kfp.v2 import dsl\n'
+        if dsl_names:
+            imports += f'from kfp.v2.dsl import {", ".join(dsl_names)}\n'
+        if typing_names:
+            imports += f'from typing import {", ".join(typing_names)}\n'
+        return imports
+
+    def _create_step_cache(self) -> str:
+        """Creates the functions of a task that look up and save its outputs
+        in the step cache, a local artifact store in the directory named by
+        the AUTOMLOPS_STEP_CACHE_DIR environment variable. Entries are keyed by
+        a hash of the task source, the installed packages, the input parameter
+        values and the contents of the input artifacts, and are evicted least
+        recently used first once the store exceeds its size limit.
+
+        Returns:
+            str: Step cache functions.
+        """
+        return (
+            '\n'
+            '''def _get_step_cache_key(executor_input: dict, function_to_execute: str):\n'''
+            '''    """Hashes the task source, installed packages and inputs into a step cache key, if the cache is enabled."""\n'''
+            f'''    if not os.environ.get('{STEP_CACHE_DIR_ENV_VAR}'):\n'''
+            '''        return None\n'''
+            '''    try:\n'''
+            '''        from importlib import metadata\n'''
+            '''    except ImportError:\n'''
+            '''        return None\n'''
+            '''    digest = hashlib.sha256()\n'''
+            '''    with open(__file__, 'rb') as f:\n'''
+            '''        digest.update(f.read())\n'''
+            '''    inputs = executor_input.get('inputs', {})\n'''
+            '''    outputs = executor_input.get('outputs', {})\n'''
+            '''    digest.update(json.dumps({\n'''
+            '''        'function': function_to_execute,\n'''
+            '''        'python': sys.version,\n'''
+            '''        'packages': sorted(f'{dist.metadata["Name"]}=={dist.version}' for dist in metadata.distributions()),\n'''
+            '''        'parameters': inputs.get('parameters', {}),\n'''
+            '''        'parameterValues': inputs.get('parameterValues', {}),\n'''
+            '''        'outputs': sorted(list(outputs.get('parameters', {})) + list(outputs.get('artifacts', {})))}, sort_keys=True).encode())\n'''
+            '''    for name, artifact_list in sorted(inputs.get('artifacts', {}).items()):\n'''
+            '''        for artifact in artifact_list['artifacts']:\n'''
+            '''            digest.update(json.dumps([name, artifact.get('metadata', {})], sort_keys=True).encode())\n'''
+            '''            path = _artifact_types.Artifact(uri=artifact['uri']).path\n'''
+            '''            if path is None:\n'''
+            '''                # Not a mounted location, e.g. a BigQuery table, which its uri identifies\n'''
+            '''                digest.update(artifact['uri'].encode())\n'''
+            '''            else:\n'''
+            '''                _update_step_cache_digest(digest, path)\n'''
+            '''    return digest.hexdigest()\n'''
+            '\n'
+            '''def _update_step_cache_digest(digest, path: str):\n'''
+            '''    """Adds the contents of a file, or of the files in a directory, to a digest."""\n'''
+            '''    if os.path.isfile(path):\n'''
+            '''        with open(path, 'rb') as f:\n'''
+            '''            for chunk in iter(lambda: f.read(1024 * 1024), b''):\n'''
+            '''                digest.update(chunk)\n'''
+            '''    for root, dirs, files in os.walk(path):\n'''
+            '''        dirs.sort()\n'''
+            '''        for filename in sorted(files):\n'''
+            '''            digest.update(os.path.relpath(os.path.join(root, filename), path).encode())\n'''
+            '''            _update_step_cache_digest(digest, os.path.join(root, filename))\n'''
+            '\n'
+            '''def _restore_step_outputs(cache_key: str, executor_input: dict) -> bool:\n'''
+            '''    """Restores the outputs of a step from the step cache, and returns whether it had them."""\n'''
+            f'''    entry_dir = os.path.join(os.environ['{STEP_CACHE_DIR_ENV_VAR}'], cache_key)\n'''
+            '''    outputs = executor_input['outputs']\n'''
+            '''    try:\n'''
+            '''        with open(os.path.join(entry_dir, 'outputs.json'), 'r') as f:\n'''
+            '''            entry = json.load(f)\n'''
+            '''        for name, artifact_list in outputs.get('artifacts', {}).items():\n'''
+            '''            for i, artifact in enumerate(artifact_list['artifacts']):\n'''
+            '''                cached_path = os.path.join(entry_dir, 'artifacts', name, str(i))\n'''
+            '''                path = _artifact_types.Artifact(uri=artifact['uri']).path\n'''
+            '''                if path is None or not os.path.exists(cached_path):\n'''
+            '''                    continue\n'''
+            '''                shutil.rmtree(path, ignore_errors=True)\n'''
+            '''                os.makedirs(os.path.dirname(path), exist_ok=True)\n'''
+            '''                if os.path.isdir(cached_path):\n'''
+            '''                    shutil.copytree(cached_path, path)\n'''
+            '''                else:\n'''
+            '''                    shutil.copy2(cached_path, path)\n'''
+            '''        for name, value in entry['parameters'].items():\n'''
+            '''            os.makedirs(os.path.dirname(outputs['parameters'][name]['outputFile']), exist_ok=True)\n'''
+            '''            with open(outputs['parameters'][name]['outputFile'], 'w') as f:\n'''
+            '''                f.write(value)\n'''
+            '''        executor_output = entry['executor_output']\n'''
+            '''        if executor_output is not None:\n'''
+            '''            # The restored artifacts are at the output locations of this run\n'''
+            '''            for name, artifact_list in executor_output.get('artifacts', {}).items():\n'''
+            '''                for i, artifact in enumerate(artifact_list.get('artifacts', [])):\n'''
+            '''                    artifact['uri'] = outputs['artifacts'][name]['artifacts'][i]['uri']\n'''
+            '''            os.makedirs(os.path.dirname(outputs['outputFile']), exist_ok=True)\n'''
+            '''            with open(outputs['outputFile'], 'w') as f:\n'''
+            '''                json.dump(executor_output, f)\n'''
+            '''        # Marks the entry as recently used\n'''
+            '''        os.utime(os.path.join(entry_dir, 'outputs.json'))\n'''
+            '''    except (OSError, ValueError, KeyError, IndexError):\n'''
+            '''        return False\n'''
+            '''    return True\n'''
+            '\n'
+            '''def _save_step_outputs(cache_key: str, executor_input: dict):\n'''
+            '''    """Saves the outputs of a step to the step cache, and evicts the least recently used entries above its size limit."""\n'''
+            f'''    cache_dir = os.environ['{STEP_CACHE_DIR_ENV_VAR}']\n'''
+            '''    outputs = executor_input['outputs']\n'''
+            '''    os.makedirs(cache_dir, exist_ok=True)\n'''
+            '''    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)\n'''
+            '''    try:\n'''
+            '''        for name, artifact_list in outputs.get('artifacts', {}).items():\n'''
+            '''            for i, artifact in enumerate(artifact_list['artifacts']):\n'''
+            '''                path = _artifact_types.Artifact(uri=artifact['uri']).path\n'''
+            '''                cached_path = os.path.join(tmp_dir, 'artifacts', name, str(i))\n'''
+            '''                os.makedirs(os.path.dirname(cached_path), exist_ok=True)\n'''
+            '''                if path is not None and os.path.isdir(path):\n'''
+            '''                    shutil.copytree(path, cached_path)\n'''
+            '''                elif path is not None and os.path.isfile(path):\n'''
+            '''                    shutil.copy2(path, cached_path)\n'''
+            '''        parameters = {}\n'''
+            '''        for name, parameter in outputs.get('parameters', {}).items():\n'''
+            '''            if os.path.exists(parameter['outputFile']):\n'''
+            '''                with open(parameter['outputFile'], 'r') as f:\n'''
+            '''                    parameters[name] = f.read()\n'''
+            '''        executor_output = None\n'''
+            '''        if os.path.exists(outputs['outputFile']):\n'''
+            '''            with open(outputs['outputFile'], 'r') as f:\n'''
+            '''                executor_output = json.load(f)\n'''
+            '''        with open(os.path.join(tmp_dir, 'outputs.json'), 'w') as f:\n'''
+            '''            json.dump({'parameters': parameters, 'executor_output': executor_output}, f)\n'''
+            '''        # Fails if a concurrent run of the same step saved it first\n'''
+            '''        os.rename(tmp_dir, os.path.join(cache_dir, cache_key))\n'''
+            '''    except OSError:\n'''
+            '''        shutil.rmtree(tmp_dir, ignore_errors=True)\n'''
+            f'''    _evict_step_cache(cache_dir, int(os.environ.get('{STEP_CACHE_MAX_BYTES_ENV_VAR}', {STEP_CACHE_MAX_BYTES})))\n'''
+            '\n'
+            '''def _evict_step_cache(cache_dir: str, max_bytes: int):\n'''
+            '''    """Removes the least recently used step cache entries until the cache is at most max_bytes."""\n'''
+            '''    entries = []\n'''
+            '''    for entry in os.listdir(cache_dir):\n'''
+            '''        entry_dir = os.path.join(cache_dir, entry)\n'''
+            '''        try:\n'''
+            '''            last_used = os.path.getmtime(os.path.join(entry_dir, 'outputs.json'))\n'''
+            '''            size = sum(os.path.getsize(os.path.join(root, filename)) for root, _, files in os.walk(entry_dir) for filename in files)\n'''
+            '''        except OSError:\n'''
+            '''            continue\n'''
+            '''        entries.append((last_used, size, entry_dir))\n'''
+            '''    total = sum(size for _, size, _ in entries)\n'''
+            '''    for _, size, entry_dir in sorted(entries):\n'''
+            '''        if total <= max_bytes:\n'''
+            '''            break\n'''
+            '''        shutil.rmtree(entry_dir, ignore_errors=True)\n'''
+            '''        total -= size\n''')
+
+    def _create_step_checkpoint(self) -> str:
+        """Creates the function of a task that records its completion, and
+        where its outputs are, in a checkpoint next to its executor output.
+        Runs that are resumed reuse the outputs of checkpointed steps.
+
+        Returns:
+            str: Step checkpoint function.
+        """
+        return (
+            '\n'
+            '''def _write_step_checkpoint(executor_input: dict, function_to_execute: str):\n'''
+            '''    """Records that the step completed, and the locations of its outputs."""\n'''
+            '''    outputs = executor_input['outputs']\n'''
+            f'''    checkpoint_file = os.path.join(os.path.dirname(outputs['outputFile']), '{STEP_CHECKPOINT_FILENAME}')\n'''
+            '''    os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)\n'''
+            '''    with open(checkpoint_file + '.tmp', 'w') as f:\n'''
+            '''        json.dump({'step': function_to_execute, 'completed': time.time(), 'outputs': outputs}, f)\n'''
+            '''    os.replace(checkpoint_file + '.tmp', checkpoint_file)\n''')
 
     def _create_compspec_image(self):
         """Write the correct image for the component spec.
@@ -82,6 +319,8 @@ class KfpComponent(Component):
         Returns:
             str: Component spec image.
         """
+        if self._image:
+            return self._image
         return (
             f'''{self._af_registry_location}-docker.pkg.dev/'''
             f'''{self._project_id}/'''
@@ -0,0 +1,171 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Code strings for per-component kfp images."""
+
+# pylint: disable=line-too-long
+
+import re
+from typing import Dict, List
+
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.import_scanner import get_companion_requirements, get_imported_modules, get_requirements
+from AutoMLOps.utils.lockfile import get_requirement_name, is_index_url
+from AutoMLOps.utils.utils import get_component_name, get_packages_to_install
+from AutoMLOps.utils.constants import (
+    DOCKER_COMPONENT_SRC_DIR,
+    DOCKER_WHEELHOUSE_DIR,
+    GENERATED_LICENSE,
+    PINNED_KFP_VERSION,
+    PIP_CACHE_MOUNT
+)
+
+class KfpComponentImages():
+    """Generates the files for per-component images. Components with the same
+    requirement set share an image. Every image is layered on the component_base
+    image, which holds the requirements common to all of them, and only copies
+    the sources of its own components, so changing one component only rebuilds
+    and re-pulls its own image. The component_base image is passed in as the
+    BASE_IMAGE build arg, so the Dockerfiles do not depend on its tag."""
+    def __init__(self, defaults: DefaultsConfig, component_specs: List[dict]):
+        """Groups the components by requirement set.
+
+        Args:
+            defaults: The default config variables.
+            component_specs: Contents of the temporary component yamls.
+        """
+        # Set passed variables as hidden attributes
+        self._defaults = defaults
+        self._component_specs = component_specs
+
+        # Set generated groups and scripts as public attributes
+        self.component_requirements = self._create_component_requirements()
+        self.groups = self._create_groups()
+        self.base_requirements = self._create_base_requirements()
+        self._group_requirements = self._get_group_requirements()
+        self.component_images = {
+            component: f'components/{group}'
+            for group, components in self.groups.items() for component in components}
+        self.dockerfiles = {group: self._create_dockerfile(group) for group in self.groups}
+        self.requirements = {
+            group: ''.join(r + '\n' for r in reqs)
+            for group, reqs in self._group_requirements.items() if reqs}
+        self.build_contexts = {group: self._get_build_context(group) for group in self.groups}
+
+    def _create_component_requirements(self) -> Dict[str, List[str]]:
+        """Determines the requirements of each component: its packages_to_install
+        if given, otherwise the distributions its source imports plus the
+        packages they need but do not declare.
+
+        Returns:
+            dict: Sorted requirements, keyed by component name.
+        """
+        component_names = {get_component_name(spec) for spec in self._component_specs}
+        component_requirements = {}
+        for spec in self._component_specs:
+            reqs = set(get_packages_to_install(spec))
+            if not reqs:
+                source = spec['implementation']['container']['command'][-1]
+                reqs = set(get_requirements(get_imported_modules(source), component_names))
+                reqs.update(get_companion_requirements(sorted(reqs)))
+            reqs = {r for r in reqs if r and get_requirement_name(r) != 'kfp'}
+            reqs.add(PINNED_KFP_VERSION)
+            component_requirements[get_component_name(spec)] = sorted(reqs)
+        return component_requirements
+
+    def _create_groups(self) -> Dict[str, List[str]]:
+        """Groups components with identical requirements. A group is named
+        after its first component in sorted order.
+
+        Returns:
+            dict: Sorted component names, keyed by group name.
+        """
+        by_requirements = {}
+        for component, reqs in sorted(self.component_requirements.items()):
+            by_requirements.setdefault(tuple(reqs), []).append(component)
+        return {
+            re.sub(r'[^a-z0-9_.-]', '-', components[0].lower()): components
+            for components in by_requirements.values()}
+
+    def _create_base_requirements(self) -> str:
+        """Creates the requirements.txt of the component_base image: the
+        requirements shared by every component.
+
+        Returns:
+            str: Package requirements for the component base.
+        """
+        common = set.intersection(*(set(reqs) for reqs in self.component_requirements.values())) if self.component_requirements else set()
+        common.add(PINNED_KFP_VERSION)
+        return ''.join(r + '\n' for r in sorted(common))
+
+    def _get_group_requirements(self) -> Dict[str, List[str]]:
+        """Returns the requirements each group adds to the component_base image.
+
+        Returns:
+            dict: Sorted requirements, keyed by group name.
+        """
+        common = set(self.base_requirements.splitlines())
+        return {
+            group: sorted(set(self.component_requirements[components[0]]) - common)
+            for group, components in self.groups.items()}
+
+    def _create_dockerfile(self, group: str) -> str:
+        """Creates the Dockerfile of a group image. It is built with the
+        component_base directory as its context, and installs its extra
+        requirements into the virtual environment of the component_base image.
+        With a wheelhouse, they are installed from the group's requirements.lock,
+        and a local wheelhouse is bind mounted to install them offline. The
+        sources are precompiled.
+
+        Args:
+            group: Name of the group.
+        Returns:
+            str: Text content of dockerfile.
+        """
+        install_reqs = ''
+        if self._group_requirements[group]:
+            reqs_file, install_options, install_mount = 'requirements.txt', '', PIP_CACHE_MOUNT
+            if self._defaults.wheelhouse:
+                reqs_file, install_options = 'requirements.lock', '--require-hashes --no-deps '
+            if self._defaults.wheelhouse and not is_index_url(self._defaults.wheelhouse):
+                install_mount = f'--mount=type=bind,source=wheelhouse,target={DOCKER_WHEELHOUSE_DIR}'
+                install_options = f'--no-index --find-links {DOCKER_WHEELHOUSE_DIR} {install_options}'
+            install_reqs = (
+                f'COPY images/{group}/{reqs_file} .\n'
+                f'RUN {install_mount} \\\n'
+                f'    python -m pip install {install_options}-r {reqs_file} --quiet \\\n'
+                f'    && rm -f {reqs_file}\n')
+        sources = ' '.join(f'src/{component}.py' for component in self.groups[group])
+        return (
+            GENERATED_LICENSE +
+            'ARG BASE_IMAGE\n'
+            'FROM ${BASE_IMAGE}\n' +
+            install_reqs +
+            f'COPY {sources} {DOCKER_COMPONENT_SRC_DIR}/\n'
+            f'RUN python -m compileall -q {DOCKER_COMPONENT_SRC_DIR}\n'
+            f'ENTRYPOINT ["/bin/bash"]\n')
+
+    def _get_build_context(self, group: str) -> List[str]:
+        """Returns the files of the component_base directory that the image
+        of a group is built from.
+
+        Args:
+            group: Name of the group.
+        Returns:
+            list: Paths relative to the component_base directory.
+        """
+        files = [f'images/{group}/Dockerfile']
+        if group in self.requirements:
+            files.append(f'images/{group}/requirements.lock' if self._defaults.wheelhouse else f'images/{group}/requirements.txt')
+        return files + [f'src/{component}.py' for component in self.groups[group]]
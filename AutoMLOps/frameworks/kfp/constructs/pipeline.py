@@ -18,20 +18,21 @@
 
 from typing import Dict, List
 
+from AutoMLOps.utils.config import DefaultsConfig
 from AutoMLOps.utils.utils import get_components_list, format_spec_dict
-from AutoMLOps.utils.constants import GENERATED_LICENSE
+from AutoMLOps.utils.constants import ACCELERATOR_NODE_SELECTOR, GENERATED_LICENSE, RESOURCE_ANNOTATIONS
 from AutoMLOps.frameworks.base import Pipeline
 
 class KfpPipeline(Pipeline):
     """Child class that generates files related to kfp pipelines."""
-    def __init__(self, custom_training_job_specs: List[Dict], defaults_file: str):
+    def __init__(self, custom_training_job_specs: List[Dict], defaults: DefaultsConfig):
         """Instantiate Pipeline scripts object with all necessary attributes.
 
         Args:
             custom_training_job_specs (List[Dict]): Specifies the specs to run the training job with.
-            defaults_file (str): Path to the default config variables yaml.
+            defaults (DefaultsConfig): The default config variables.
         """
-        super().__init__(custom_training_job_specs, defaults_file)
+        super().__init__(custom_training_job_specs, defaults)
         self.pipeline_imports = self._get_pipeline_imports()
         self.pipeline_argparse = self._get_pipeline_argparse()
         self.pipeline_runner = self._get_pipeline_runner()
@@ -70,6 +71,8 @@ class KfpPipeline(Pipeline):
             'from google_cloud_pipeline_components.v1.custom_job import create_custom_training_job_op_from_component\n')
         quote = '\''
         newline_tab = '\n    '
+        cpu, memory, accelerator_type, accelerator_count = (
+            RESOURCE_ANNOTATIONS[name] for name in ('cpu', 'memory', 'accelerator_type', 'accelerator_count'))
 
 
         # If there is a custom training job specified, write those to feed to pipeline imports
@@ -78,6 +81,7 @@ class KfpPipeline(Pipeline):
         # Return standard code and customized specs
         return (
             f'''import argparse\n'''
+            f'''import functools\n'''
             f'''import os\n'''
             f'''{gcpc_imports if self._custom_training_job_specs else ''}'''
             f'''import kfp\n'''
@@ -90,7 +94,23 @@ class KfpPipeline(Pipeline):
             f'''    component_path = os.path.join('components',\n'''
             f'''                                component_name,\n'''
             f'''                              'component.yaml')\n'''
-            f'''    return kfp.components.load_component_from_file(component_path)\n'''
+            f'''    component = kfp.components.load_component_from_file(component_path)\n'''
+            f'''    metadata = component.component_spec.metadata\n'''
+            f'''    annotations = (metadata.annotations if metadata else None) or {{}}\n'''
+            f'\n'
+            f'''    # Sets the resource limits declared on the component on each of its tasks\n'''
+            f'''    @functools.wraps(component)\n'''
+            f'''    def create_task(*args, **kwargs):\n'''
+            f'''        task = component(*args, **kwargs)\n'''
+            f'''        if {quote}{cpu}{quote} in annotations:\n'''
+            f'''            task.set_cpu_limit(annotations[{quote}{cpu}{quote}])\n'''
+            f'''        if {quote}{memory}{quote} in annotations:\n'''
+            f'''            task.set_memory_limit(annotations[{quote}{memory}{quote}])\n'''
+            f'''        if {quote}{accelerator_type}{quote} in annotations:\n'''
+            f'''            task.set_gpu_limit(annotations[{quote}{accelerator_count}{quote}])\n'''
+            f'''            task.add_node_selector_constraint({quote}{ACCELERATOR_NODE_SELECTOR}{quote}, annotations[{quote}{accelerator_type}{quote}])\n'''
+            f'''        return task\n'''
+            f'''    return create_task\n'''
             f'\n'
             f'''def create_training_pipeline(pipeline_job_spec_path: str):\n'''
             f'''    {newline_tab.join(f'{component} = load_custom_component(component_name={quote}{component}{quote})' for component in components_list)}\n'''
@@ -112,7 +132,7 @@ class KfpPipeline(Pipeline):
             '''    args = parser.parse_args()\n'''
             '\n'
             '''    with open(args.config, 'r', encoding='utf-8') as config_file:\n'''
-            '''        config = yaml.load(config_file, Loader=yaml.FullLoader)\n'''
+            '''        config = yaml.safe_load(config_file)\n'''
             '\n'
             '''    pipeline = create_training_pipeline(\n'''
             '''        pipeline_job_spec_path=config['pipelines']['pipeline_job_spec_path'])\n''')
@@ -179,13 +199,16 @@ class KfpPipeline(Pipeline):
             '''    parser = argparse.ArgumentParser()\n'''
             '''    parser.add_argument('--config', type=str,\n'''
             '''                        help='The config file for setting default values.')\n'''
+            '''    parser.add_argument('--resume', action='store_true',\n'''
+            '''                        help='Reuse the outputs of steps that completed in earlier runs with the same inputs, e.g. to resume a failed run.')\n'''
             '''    args = parser.parse_args()\n'''
             '\n'
             '''    with open(args.config, 'r', encoding='utf-8') as config_file:\n'''
-            '''        config = yaml.load(config_file, Loader=yaml.FullLoader)\n'''
+            '''        config = yaml.safe_load(config_file)\n'''
             '\n'
             '''    run_pipeline(project_id=config['gcp']['project_id'],\n'''
             '''                 pipeline_root=config['pipelines']['pipeline_storage_path'],\n'''
             '''                 pipeline_runner_sa=config['gcp']['pipeline_runner_service_account'],\n'''
             '''                 parameter_values_path=config['pipelines']['parameter_values_path'],\n'''
-            '''                 pipeline_spec_path=config['pipelines']['pipeline_job_spec_path']) \n''')
+            '''                 pipeline_spec_path=config['pipelines']['pipeline_job_spec_path'],\n'''
+            '''                 enable_caching=args.resume)\n''')
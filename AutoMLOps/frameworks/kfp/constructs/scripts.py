@@ -17,97 +17,65 @@
 # pylint: disable=anomalous-backslash-in-string
 # pylint: disable=line-too-long
 
-import re
-
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.import_scanner import get_companion_requirements, infer_requirements
+from AutoMLOps.utils.lockfile import get_requirement_name, is_index_url
 from AutoMLOps.utils.utils import (
-    execute_process,
+    get_component_name,
+    get_component_spec,
     get_components_list,
-    read_file,
-    read_yaml_file
+    get_packages_to_install
 )
 from AutoMLOps.utils.constants import (
-    GENERATED_COMPONENT_BASE,
+    DOCKER_COMPILE_STDLIB,
+    DOCKER_COMPONENT_SRC_DIR,
+    DOCKER_VENV_DIR,
+    DOCKER_WHEELHOUSE_DIR,
+    GENERATED_COMPONENT_BASE_SRC,
     GENERATED_LICENSE,
-    GENERATED_PARAMETER_VALUES_PATH,
-    GENERATED_PIPELINE_JOB_SPEC_PATH,
     LEFT_BRACKET,
     NEWLINE,
     PINNED_KFP_VERSION,
+    PIP_CACHE_MOUNT,
     RIGHT_BRACKET
 )
 
 class KfpScripts():
     """Generates files related to running kubeflow pipelines."""
-    def __init__(self,
-                 af_registry_location: str,
-                 af_registry_name: str,
-                 base_image: str,
-                 cb_trigger_location: str,
-                 cb_trigger_name: str,
-                 cloud_run_location: str,
-                 cloud_run_name: str,
-                 cloud_tasks_queue_location: str,
-                 cloud_tasks_queue_name: str,
-                 csr_branch_name: str,
-                 csr_name: str,
-                 gs_bucket_location: str,
-                 gs_bucket_name: str,
-                 pipeline_runner_sa: str,
-                 project_id: str,
-                 run_local: str,
-                 schedule_location: str,
-                 schedule_name: str,
-                 schedule_pattern: str,
-                 base_dir: str,
-                 vpc_connector: str):
+    def __init__(self, defaults: DefaultsConfig, base_dir: str):
         """Constructs scripts for resource deployment and running Kubeflow pipelines.
 
         Args:
-            af_registry_location: Region of the Artifact Registry.
-            af_registry_name: Artifact Registry name where components are stored.
-            cb_trigger_location: The location of the cloudbuild trigger.
-            cb_trigger_name: The name of the cloudbuild trigger.
-            cloud_run_location: The location of the cloud runner service.
-            cloud_run_name: The name of the cloud runner service.
-            cloud_tasks_queue_location: The location of the cloud tasks queue.
-            cloud_tasks_queue_name: The name of the cloud tasks queue.
-            csr_branch_name: The name of the csr branch to push to to trigger cb job.
-            csr_name: The name of the cloud source repo to use.
-            base_image: The image to use in the dockerfile.
-            gs_bucket_location: Region of the GS bucket.
-            gs_bucket_name: GS bucket name where pipeline run metadata is stored.
-            pipeline_runner_sa: Service Account to runner PipelineJobs.
-            project_id: The project ID.
-            run_local: Flag that determines whether to use Cloud Run CI/CD.
-            schedule_location: The location of the scheduler resource.
-            schedule_name: The name of the scheduler resource.
-            schedule_pattern: Cron formatted value used to create a Scheduled retrain job.
+            defaults: The default config variables.
             base_dir: Top directory name.
-            vpc_connector: The name of the vpc connector to use.
         """
         # Set passed variables as hidden attributes
+        self._defaults = defaults
         self._base_dir = base_dir
-        self._run_local = run_local
-        self._af_registry_name = af_registry_name
-        self._af_registry_location = af_registry_location
-        self._project_id = project_id
-        self._gs_bucket_name = gs_bucket_name
-        self._gs_bucket_location = gs_bucket_location
-        self._pipeline_region = gs_bucket_location
-        self._pipeline_runner_service_account = pipeline_runner_sa
-        self._cloud_source_repository = csr_name
-        self._cloud_source_repository_branch = csr_branch_name
-        self._cb_trigger_location = cb_trigger_location
-        self._cb_trigger_name = cb_trigger_name
-        self._cloud_tasks_queue_location = cloud_tasks_queue_location
-        self._cloud_tasks_queue_name = cloud_tasks_queue_name
-        self._vpc_connector = vpc_connector
-        self._cloud_run_name = cloud_run_name
-        self._cloud_run_location = cloud_run_location
-        self._cloud_schedule_location = schedule_location
-        self._cloud_schedule_name = schedule_name
-        self._cloud_schedule_pattern = schedule_pattern
-        self._base_image = base_image
+        self._run_local = defaults.run_local
+        self._af_registry_name = defaults.af_registry_name
+        self._af_registry_location = defaults.af_registry_location
+        self._project_id = defaults.project_id
+        self._gs_bucket_name = defaults.gs_bucket_name
+        self._gs_bucket_location = defaults.gs_bucket_location
+        self._pipeline_region = defaults.gs_bucket_location
+        self._pipeline_runner_service_account = defaults.pipeline_runner_sa
+        self._cloud_source_repository = defaults.csr_name
+        self._cloud_source_repository_branch = defaults.csr_branch_name
+        self._cb_trigger_location = defaults.cb_trigger_location
+        self._cb_trigger_name = defaults.cb_trigger_name
+        self._cloud_tasks_queue_location = defaults.cloud_tasks_queue_location
+        self._cloud_tasks_queue_name = defaults.cloud_tasks_queue_name
+        self._vpc_connector = defaults.vpc_connector
+        self._cloud_run_name = defaults.cloud_run_name
+        self._cloud_run_location = defaults.cloud_run_location
+        self._cloud_schedule_location = defaults.schedule_location
+        self._cloud_schedule_name = defaults.schedule_name
+        self._cloud_schedule_pattern = defaults.schedule_pattern
+        self._base_image = defaults.base_image
+        self._per_component_images = defaults.per_component_images
+        self._lock_requirements = defaults.wheelhouse is not None
+        self._offline = defaults.wheelhouse is not None and not is_index_url(defaults.wheelhouse)
 
         # Set generated scripts as public attributes
         self.build_pipeline_spec = self._build_pipeline_spec()
@@ -116,8 +84,20 @@ class KfpScripts():
         self.run_all = self._run_all()
         self.create_resources_script = self._create_resources_script()
         self.dockerfile = self._create_dockerfile()
-        self.defaults = self._create_default_config()
-        self.requirements = self._create_requirements()
+        self.defaults = defaults.to_yaml()
+        self._requirements = None
+
+    @property
+    def requirements(self):
+        """Contents of the component base requirements.txt. Inferred on
+        first access so that callers can skip inference when unchanged.
+
+        Returns:
+            str: Package requirements for the component base.
+        """
+        if self._requirements is None:
+            self._requirements = self._create_requirements()
+        return self._requirements
 
     def _build_pipeline_spec(self):
         """Builds content of a shell script to build the pipeline specs.
@@ -160,10 +140,11 @@ class KfpScripts():
             '# Submits the PipelineJob to Vertex AI\n'
             f'# This script should run from the {self._base_dir} directory\n'
             '# Change directory in case this is not the script root.\n'
+            '# Pass --resume to reuse the steps of a failed run that completed.\n'
             '\n'
             'CONFIG_FILE=configs/defaults.yaml\n'
             '\n'
-            'python3 -m pipelines.pipeline_runner --config $CONFIG_FILE\n')
+            'python3 -m pipelines.pipeline_runner --config $CONFIG_FILE "$@"\n')
 
     def _run_all(self):
         """Builds content of a shell script to run all other shell scripts.
@@ -382,121 +363,79 @@ class KfpScripts():
 
     def _create_dockerfile(self):
         """Creates the content of a Dockerfile to be written to the component_base directory.
+        Requirements are installed into a virtual environment in a builder
+        stage, with pip's cache in a BuildKit cache mount, and only the
+        environment is copied into the runtime stage. The instructions are
+        ordered from least to most frequently changed, so a source change
+        only rebuilds the last layer. With per-component images, the
+        component sources are copied into the images layered on this one instead.
+        The standard library and the sources are precompiled, and pip compiles
+        the packages it installs, so components do not compile any module when
+        they start; the sources are on the PYTHONPATH so components run as
+        modules, which load from bytecode, unlike scripts.
+        With a wheelhouse, the pinned requirements.lock is installed instead
+        of requirements.txt. A local wheelhouse is bind mounted from the build
+        context, so requirements are installed without any index and the
+        wheels are not copied into a layer.
 
         Returns:
             str: Text content of dockerfile.
         """
+        copy_src = '' if self._per_component_images else (
+            f'COPY ./src {DOCKER_COMPONENT_SRC_DIR}\n'
+            f'RUN python -m compileall -q {DOCKER_COMPONENT_SRC_DIR}\n')
+        reqs_file, install_options = 'requirements.txt', ''
+        if self._lock_requirements:
+            reqs_file, install_options = 'requirements.lock', '--require-hashes --no-deps '
+        create_venv = (
+            f'RUN {PIP_CACHE_MOUNT} \\\n'
+            f'    python -m venv --system-site-packages {DOCKER_VENV_DIR} \\\n'
+            f'    && {DOCKER_VENV_DIR}/bin/python -m pip install --upgrade pip\n')
+        install_mount = PIP_CACHE_MOUNT
+        if self._offline:
+            create_venv = f'RUN python -m venv --system-site-packages {DOCKER_VENV_DIR}\n'
+            install_mount = f'--mount=type=bind,source=wheelhouse,target={DOCKER_WHEELHOUSE_DIR}'
+            install_options = f'--no-index --find-links {DOCKER_WHEELHOUSE_DIR} {install_options}'
         return (
             GENERATED_LICENSE +
-            f'FROM {self._base_image}\n'
-            f'RUN python -m pip install --upgrade pip\n'
-            f'COPY requirements.txt .\n'
-            f'RUN python -m pip install -r \ \n'
-            f'    requirements.txt --quiet --no-cache-dir \ \n'
-            f'    && rm -f requirements.txt\n'
-            f'COPY ./src /pipelines/component/src\n'
+            f'FROM {self._base_image} AS builder\n' +
+            create_venv +
+            f'COPY {reqs_file} .\n'
+            f'RUN {install_mount} \\\n'
+            f'    {DOCKER_VENV_DIR}/bin/python -m pip install {install_options}-r {reqs_file} --quiet\n'
+            f'\n'
+            f'FROM {self._base_image}\n' +
+            DOCKER_COMPILE_STDLIB +
+            f'COPY --from=builder {DOCKER_VENV_DIR} {DOCKER_VENV_DIR}\n'
+            f'ENV PATH="{DOCKER_VENV_DIR}/bin:$PATH"\n'
+            f'ENV PYTHONPATH="{DOCKER_COMPONENT_SRC_DIR}${{PYTHONPATH:+:$PYTHONPATH}}"\n'
+            f'{copy_src}'
             f'ENTRYPOINT ["/bin/bash"]\n')
 
-    def _create_default_config(self):
-        """Creates default defaults.yaml file contents. This defaults
-        file is used by subsequent functions and by the pipeline
-        files themselves.
-
-        Returns:
-            str: Defaults yaml file content
-        """
-        return (
-            GENERATED_LICENSE +
-            f'# These values are descriptive only - do not change.\n'
-            f'# Rerun AutoMLOps.generate() to change these values.\n'
-            f'gcp:\n'
-            f'  af_registry_location: {self._af_registry_location}\n'
-            f'  af_registry_name: {self._af_registry_name}\n'
-            f'  base_image: {self._base_image}\n'
-            f'  cb_trigger_location: {self._cb_trigger_location}\n'
-            f'  cb_trigger_name: {self._cb_trigger_name}\n'
-            f'  cloud_run_location: {self._cloud_run_location}\n'
-            f'  cloud_run_name: {self._cloud_run_name}\n'
-            f'  cloud_tasks_queue_location: {self._cloud_tasks_queue_location}\n'
-            f'  cloud_tasks_queue_name: {self._cloud_tasks_queue_name}\n'
-            f'  cloud_schedule_location: {self._cloud_schedule_location}\n'
-            f'  cloud_schedule_name: {self._cloud_schedule_name}\n'
-            f'  cloud_schedule_pattern: {self._cloud_schedule_pattern}\n'
-            f'  cloud_source_repository: {self._cloud_source_repository}\n'
-            f'  cloud_source_repository_branch: {self._cloud_source_repository_branch}\n'
-            f'  gs_bucket_name: {self._gs_bucket_name}\n'
-            f'  pipeline_runner_service_account: {self._pipeline_runner_service_account}\n'
-            f'  project_id: {self._project_id}\n'
-            f'  vpc_connector: {self._vpc_connector}\n'
-            f'\n'
-            f'pipelines:\n'
-            f'  parameter_values_path: {GENERATED_PARAMETER_VALUES_PATH}\n'
-            f'  pipeline_component_directory: components\n'
-            f'  pipeline_job_spec_path: {GENERATED_PIPELINE_JOB_SPEC_PATH}\n'
-            f'  pipeline_region: {self._gs_bucket_location}\n'
-            f'  pipeline_storage_path: gs://{self._gs_bucket_name}/pipeline_root\n')
-
     def _create_requirements(self):
-        """Writes a requirements.txt to the component_base directory.
-        Infers pip requirements from the python srcfiles using 
-        pipreqs. Takes user-inputted requirements, and addes some 
-        default gcp packages as well as packages that are often missing
-        in setup.py files (e.g db_types, pyarrow, gcsfs, fsspec).
+        """Writes a requirements.txt to the component_base directory, so
+        every package a component needs is installed in the image at build
+        time rather than when the component runs. Takes the user-inputted
+        requirements of components that declare packages_to_install, and
+        infers pip requirements from the imports of the other components'
+        srcfiles, adding the packages that the imported libraries need but do
+        not declare (e.g. db_dtypes and pyarrow for google-cloud-bigquery).
         """
-        reqs_filename = f'{GENERATED_COMPONENT_BASE}/requirements.txt'
-        default_gcp_reqs = [
-            'google-cloud-aiplatform',
-            'google-cloud-appengine-logging',
-            'google-cloud-audit-log',
-            'google-cloud-bigquery',
-            'google-cloud-bigquery-storage',
-            'google-cloud-bigtable',
-            'google-cloud-core',
-            'google-cloud-dataproc',
-            'google-cloud-datastore',
-            'google-cloud-dlp',
-            'google-cloud-firestore',
-            'google-cloud-kms',
-            'google-cloud-language',
-            'google-cloud-logging',
-            'google-cloud-monitoring',
-            'google-cloud-notebooks',
-            'google-cloud-pipeline-components',
-            'google-cloud-pubsub',
-            'google-cloud-pubsublite',
-            'google-cloud-recommendations-ai',
-            'google-cloud-resource-manager',
-            'google-cloud-scheduler',
-            'google-cloud-spanner',
-            'google-cloud-speech',
-            'google-cloud-storage',
-            'google-cloud-tasks',
-            'google-cloud-translate',
-            'google-cloud-videointelligence',
-            'google-cloud-vision',
-            'db_dtypes',
-            'pyarrow',
-            'gcsfs',
-            'fsspec']
-        # Infer reqs using pipreqs
-        execute_process(f'python3 -m pipreqs.pipreqs {GENERATED_COMPONENT_BASE} --mode no-pin --force', to_null=False)
-        pipreqs = read_file(reqs_filename).splitlines()
         # Get user-inputted requirements from the cache dir
         user_inp_reqs = []
+        declared_srcfiles = []
         components_path_list = get_components_list()
         for component_path in components_path_list:
-            component_spec = read_yaml_file(component_path)
-            reqs = component_spec['implementation']['container']['command'][2]
-            formatted_reqs = re.findall('\'([^\']*)\'', reqs)
-            user_inp_reqs.extend(formatted_reqs)
-        # Remove duplicates
-        set_of_requirements = set(user_inp_reqs) if user_inp_reqs else set(pipreqs + default_gcp_reqs)
-        # Remove empty string
-        if '' in set_of_requirements:
-            set_of_requirements.remove('')
-        # Pin kfp version
-        if 'kfp' in set_of_requirements:
-            set_of_requirements.remove('kfp')
+            component_spec = get_component_spec(component_path)
+            packages_to_install = get_packages_to_install(component_spec)
+            if packages_to_install:
+                user_inp_reqs.extend(packages_to_install)
+                declared_srcfiles.append(f'{get_component_name(component_spec)}.py')
+        # Infer reqs from the imports of the other component sources
+        inferred_reqs = infer_requirements(GENERATED_COMPONENT_BASE_SRC, declared_srcfiles)
+        inferred_reqs += list(get_companion_requirements(inferred_reqs))
+        # Remove duplicates and empty strings, and pin kfp version
+        set_of_requirements = {r for r in user_inp_reqs + inferred_reqs if r and get_requirement_name(r) != 'kfp'}
         set_of_requirements.add(PINNED_KFP_VERSION)
         # Stringify and sort
         reqs_str = ''.join(r+'\n' for r in sorted(set_of_requirements))
@@ -0,0 +1,766 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs a compiled kfp pipeline on the local machine. Tasks run as soon as
+   the tasks they depend on have finished, concurrently on a process pool,
+   either in shared virtual environments with the requirements of their
+   image or in the current environment. Tasks are limited to the cpu and
+   memory declared on their components, and only run concurrently while
+   their declared resources fit the machine. Each run records checkpoints
+   of its completed tasks, so a failed run can be resumed."""
+
+# pylint: disable=line-too-long
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import functools
+import importlib.util
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+from AutoMLOps.utils.constants import (
+    BASE_DIR,
+    GENERATED_COMPONENT_BASE,
+    GENERATED_COMPONENT_BASE_SRC,
+    GENERATED_DEFAULTS_FILE,
+    GENERATED_PARAMETER_VALUES_PATH,
+    GENERATED_PIPELINE_FILE,
+    GENERATED_PIPELINE_JOB_SPEC_PATH,
+    GENERATED_PIPELINE_SPEC_SH_FILE,
+    LOCAL_RUNS_DIR,
+    RUN_CHECKPOINTS_FILENAME,
+    STEP_CACHE_DIR,
+    STEP_CACHE_DIR_ENV_VAR,
+    STEP_CHECKPOINT_FILENAME
+)
+from AutoMLOps.utils.lockfile import get_target_python_version
+from AutoMLOps.utils.tracing import span
+from AutoMLOps.utils.utils import list_files, read_yaml_file
+from AutoMLOps.utils.venvs import ensure_venv
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where task memory is not limited
+    resource = None
+
+# Runs a task module in a subprocess, as `python -c TASK_BOOTSTRAP <gcs mount
+# dir> <module> <args>`, with its gs:// artifacts under the local mount dir
+TASK_BOOTSTRAP = (
+    'import runpy\n'
+    'import sys\n'
+    'try:\n'
+    '    from kfp.v2.components.types import artifact_types\n'
+    '    artifact_types._GCS_LOCAL_MOUNT_PREFIX = sys.argv[1]\n'
+    'except ImportError:\n'
+    '    pass\n'
+    'sys.argv = sys.argv[2:]\n'
+    "runpy.run_module(sys.argv[0], run_name='__main__', alter_sys=True)\n")
+
+def run_generated_pipeline(pipeline_params: Optional[Dict] = None,
+                           max_workers: Optional[int] = None,
+                           use_step_cache: bool = True,
+                           use_venvs: bool = True) -> Dict[str, dict]:
+    """Runs the pipeline generated under AutoMLOps/ on the local machine.
+    The pipeline spec is compiled first if it is missing or older than
+    pipeline.py or a component.yaml. The pipeline parameters default to the
+    generated runtime parameters, and each run writes its outputs to a new
+    directory under .AutoMLOps-cache/local_runs. Steps are cached in
+    .AutoMLOps-cache/step_cache.
+
+    Args:
+        pipeline_params: Pipeline parameter values, overriding the generated ones.
+        max_workers: Maximum number of tasks run at once (default: the number of CPUs).
+        use_step_cache: Whether to skip steps whose outputs are in the step cache.
+        use_venvs: Whether tasks run in shared virtual environments with the
+            requirements of their image, instead of the current environment.
+    Returns:
+        dict: Output parameters and artifacts, keyed by task name.
+    Raises:
+        Exception: If the pipeline cannot be compiled or run locally, or a task fails.
+    """
+    pipeline_spec = load_pipeline_spec(_compile_pipeline_spec())
+    task_pythons = get_task_venvs(pipeline_spec) if use_venvs else None
+    with open(BASE_DIR + GENERATED_PARAMETER_VALUES_PATH, 'r', encoding='utf-8') as file:
+        params = {**json.load(file), **(pipeline_params or {})}
+    run_dir = os.path.join(LOCAL_RUNS_DIR, time.strftime('%Y%m%d-%H%M%S'))
+    logging.info('Running the pipeline locally in %s', run_dir)
+    return run_pipeline_spec(
+        pipeline_spec, run_dir, GENERATED_COMPONENT_BASE_SRC, params,
+        pipeline_root=read_yaml_file(GENERATED_DEFAULTS_FILE)['pipelines']['pipeline_storage_path'],
+        max_workers=max_workers,
+        step_cache_dir=os.path.abspath(STEP_CACHE_DIR) if use_step_cache else None,
+        task_pythons=task_pythons)
+
+def resume_generated_pipeline(run_id: Optional[str] = None,
+                              max_workers: Optional[int] = None,
+                              use_step_cache: bool = True,
+                              use_venvs: bool = True) -> Dict[str, dict]:
+    """Resumes a local run of the pipeline generated under AutoMLOps/. Tasks
+    that completed are not run again; the failed and incomplete ones run
+    with the parameters of the original run, in its directory.
+
+    Args:
+        run_id: Name of the run's directory under .AutoMLOps-cache/local_runs
+            (default: the latest run).
+        max_workers: Maximum number of tasks run at once (default: the number of CPUs).
+        use_step_cache: Whether to skip steps whose outputs are in the step cache.
+        use_venvs: Whether tasks run in shared virtual environments with the
+            requirements of their image, instead of the current environment.
+    Returns:
+        dict: Output parameters and artifacts, keyed by task name.
+    Raises:
+        Exception: If there is no such run, or the pipeline cannot be compiled
+            or run locally, or a task fails.
+    """
+    if run_id is None:
+        runs = sorted(run for run in os.listdir(LOCAL_RUNS_DIR) if os.path.exists(os.path.join(LOCAL_RUNS_DIR, run, RUN_CHECKPOINTS_FILENAME))) if os.path.isdir(LOCAL_RUNS_DIR) else []
+        if not runs:
+            raise RuntimeError(f'No local runs to resume in {LOCAL_RUNS_DIR}.')
+        run_id = runs[-1]
+    run_dir = os.path.join(LOCAL_RUNS_DIR, run_id)
+    logging.info('Resuming the local run in %s', run_dir)
+    pipeline_spec = load_pipeline_spec(_compile_pipeline_spec())
+    return resume_pipeline_spec(
+        pipeline_spec, run_dir, GENERATED_COMPONENT_BASE_SRC,
+        max_workers=max_workers,
+        step_cache_dir=os.path.abspath(STEP_CACHE_DIR) if use_step_cache else None,
+        task_pythons=get_task_venvs(pipeline_spec) if use_venvs else None)
+
+def _compile_pipeline_spec() -> str:
+    """Compiles the generated pipeline spec if it is missing or older than
+    pipeline.py or a component.yaml.
+
+    Returns:
+        str: Path to the pipeline spec.
+    Raises:
+        Exception: If the pipeline spec cannot be compiled.
+    """
+    spec_path = BASE_DIR + GENERATED_PIPELINE_JOB_SPEC_PATH
+    sources = [GENERATED_PIPELINE_FILE] + [
+        path for path in list_files(BASE_DIR + 'components') if os.path.basename(path) == 'component.yaml']
+    if not os.path.exists(spec_path) or any(os.path.getmtime(path) > os.path.getmtime(spec_path) for path in sources):
+        with span('execute_process', command=GENERATED_PIPELINE_SPEC_SH_FILE):
+            try:
+                subprocess.run([os.path.relpath(GENERATED_PIPELINE_SPEC_SH_FILE, BASE_DIR)], cwd=BASE_DIR, check=True)
+            except (OSError, subprocess.CalledProcessError) as err:
+                raise RuntimeError(f'Error compiling the pipeline spec. {err}') from err
+    return spec_path
+
+def load_pipeline_spec(path: str) -> dict:
+    """Reads a compiled pipeline job spec.
+
+    Args:
+        path: Path to the pipeline_job.json written by the kfp compiler.
+    Returns:
+        dict: The pipeline spec, and its runtime config under 'runtimeConfig'.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        job = json.load(file)
+    pipeline_spec = dict(job.get('pipelineSpec', job))
+    pipeline_spec.setdefault('runtimeConfig', job.get('runtimeConfig', {}))
+    return pipeline_spec
+
+def get_task_dependencies(pipeline_spec: dict) -> Dict[str, Set[str]]:
+    """Resolves the DAG of the root tasks of a pipeline: the tasks each one
+    depends on, explicitly or through the outputs it consumes.
+
+    Args:
+        pipeline_spec: Compiled pipeline spec.
+    Returns:
+        dict: Names of the upstream tasks, keyed by task name.
+    Raises:
+        Exception: If a task depends on an unknown task, or the tasks form a cycle.
+    """
+    tasks = pipeline_spec['root']['dag']['tasks']
+    dependencies = {}
+    for name, task in tasks.items():
+        upstream = set(task.get('dependentTasks', []))
+        for binding in [*task.get('inputs', {}).get('parameters', {}).values(),
+                        *task.get('inputs', {}).get('artifacts', {}).values()]:
+            producer = binding.get('taskOutputParameter', binding.get('taskOutputArtifact', {})).get('producerTask')
+            if producer:
+                upstream.add(producer)
+        unknown = upstream - set(tasks)
+        if unknown:
+            raise ValueError(f'Task {name} depends on unknown tasks: {sorted(unknown)}')
+        dependencies[name] = upstream
+
+    # Kahn's algorithm; any task left over is on a cycle
+    remaining = {name: set(upstream) for name, upstream in dependencies.items()}
+    ready = [name for name, upstream in remaining.items() if not upstream]
+    while ready:
+        done = ready.pop()
+        del remaining[done]
+        for name, upstream in remaining.items():
+            if done in upstream:
+                upstream.discard(done)
+                if not upstream:
+                    ready.append(name)
+    if remaining:
+        raise ValueError(f'Pipeline tasks form a cycle: {sorted(remaining)}')
+    return dependencies
+
+def to_parameter_value(value, parameter_type: Optional[str] = None) -> dict:
+    """Converts a python value to a parameter value of an executor input.
+
+    Args:
+        value: The parameter value.
+        parameter_type: Declared type of the parameter, e.g. INT or NUMBER_INTEGER.
+    Returns:
+        dict: The value as a stringValue, intValue or doubleValue.
+    """
+    if isinstance(value, dict) and len(value) == 1 and next(iter(value)) in ('stringValue', 'intValue', 'doubleValue'):
+        return value
+    if parameter_type in ('INT', 'NUMBER_INTEGER') or (parameter_type is None and isinstance(value, int) and not isinstance(value, bool)):
+        return {'intValue': int(value)}
+    if parameter_type in ('DOUBLE', 'NUMBER_DOUBLE') or (parameter_type is None and isinstance(value, float)):
+        return {'doubleValue': float(value)}
+    return {'stringValue': value if isinstance(value, str) else json.dumps(value)}
+
+def get_pipeline_parameters(pipeline_spec: dict, pipeline_params: Optional[Dict] = None) -> Dict[str, dict]:
+    """Resolves the pipeline parameters from the defaults in the runtime
+    config of the spec and the given values.
+
+    Args:
+        pipeline_spec: Compiled pipeline spec.
+        pipeline_params: Parameter values, keyed by name.
+    Returns:
+        dict: Parameter values of the executor inputs, keyed by name.
+    """
+    definitions = pipeline_spec['root'].get('inputDefinitions', {}).get('parameters', {})
+    runtime_config = pipeline_spec.get('runtimeConfig', {})
+    values = {**runtime_config.get('parameters', {}), **runtime_config.get('parameterValues', {}), **(pipeline_params or {})}
+    return {
+        name: to_parameter_value(value, _get_parameter_type(definitions.get(name, {})))
+        for name, value in values.items()}
+
+def create_executor_input(task_name: str,
+                          pipeline_spec: dict,
+                          pipeline_parameters: Dict[str, dict],
+                          task_outputs: Dict[str, dict],
+                          *,
+                          task_dir: str,
+                          artifacts_uri: str) -> dict:
+    """Creates the executor input of a task, the way Vertex AI Pipelines
+    passes it to the task's container.
+
+    Args:
+        task_name: Name of the task.
+        pipeline_spec: Compiled pipeline spec.
+        pipeline_parameters: Parameter values of the pipeline, keyed by name.
+        task_outputs: Outputs of the finished tasks, keyed by task name.
+        task_dir: Local directory for the output parameters and executor output of the task.
+        artifacts_uri: Uri under which the output artifacts of the task are created.
+    Returns:
+        dict: The executor input.
+    Raises:
+        Exception: If an input is bound to something the local runner does not support.
+    """
+    task = pipeline_spec['root']['dag']['tasks'][task_name]
+    component = pipeline_spec['components'][task['componentRef']['name']]
+    parameters = {}
+    for name, binding in task.get('inputs', {}).get('parameters', {}).items():
+        if 'componentInputParameter' in binding:
+            if binding['componentInputParameter'] not in pipeline_parameters:
+                raise ValueError(f'Missing pipeline parameter {binding["componentInputParameter"]} of task {task_name}.')
+            parameters[name] = pipeline_parameters[binding['componentInputParameter']]
+        elif 'taskOutputParameter' in binding:
+            output = binding['taskOutputParameter']
+            parameters[name] = task_outputs[output['producerTask']]['parameters'][output['outputParameterKey']]
+        elif 'runtimeValue' in binding:
+            constant = binding['runtimeValue'].get('constantValue', binding['runtimeValue'].get('constant'))
+            parameters[name] = to_parameter_value(constant)
+        else:
+            raise ValueError(f'Input parameter {name} of task {task_name} cannot be resolved locally: {binding}')
+    artifacts = {}
+    for name, binding in task.get('inputs', {}).get('artifacts', {}).items():
+        if 'taskOutputArtifact' not in binding:
+            raise ValueError(f'Input artifact {name} of task {task_name} cannot be resolved locally: {binding}')
+        output = binding['taskOutputArtifact']
+        artifacts[name] = {'artifacts': task_outputs[output['producerTask']]['artifacts'][output['outputArtifactKey']]}
+
+    output_definitions = component.get('outputDefinitions', {})
+    return {
+        'inputs': {'parameters': parameters, 'artifacts': artifacts},
+        'outputs': {
+            'parameters': {
+                name: {'outputFile': os.path.join(task_dir, 'outputs', name)}
+                for name in output_definitions.get('parameters', {})},
+            'artifacts': {
+                name: {'artifacts': [{
+                    'name': name,
+                    'type': definition.get('artifactType', {}),
+                    'uri': f'{artifacts_uri}/{name}',
+                    'metadata': {}}]}
+                for name, definition in output_definitions.get('artifacts', {}).items()},
+            'outputFile': os.path.join(task_dir, 'executor_output.json')}}
+
+def get_task_command(task_name: str, pipeline_spec: dict, src_dir: str) -> List[str]:
+    """Finds the generated task module a task runs, and the arguments it is
+    called with, from the container of its executor.
+
+    Args:
+        task_name: Name of the task.
+        pipeline_spec: Compiled pipeline spec.
+        src_dir: Directory of the generated task modules.
+    Returns:
+        list: Path of the task module, followed by its arguments.
+    Raises:
+        Exception: If the task does not run a generated task module.
+    """
+    task = pipeline_spec['root']['dag']['tasks'][task_name]
+    if 'triggerPolicy' in task or 'iterator' in task or 'parameterIterator' in task or 'artifactIterator' in task:
+        raise ValueError(f'Task {task_name} is conditional or looped, which the local runner does not support.')
+    component = pipeline_spec['components'][task['componentRef']['name']]
+    executor = pipeline_spec['deploymentSpec']['executors'].get(component.get('executorLabel'), {})
+    command = executor.get('container', {}).get('command', [])
+    if command[:2] == ['python3', '-m'] and len(command) == 3:
+        module_file = os.path.join(src_dir, f'{command[2]}.py')
+    elif len(command) == 2 and command[0] == 'python3' and command[1].endswith('.py'):
+        module_file = os.path.join(src_dir, os.path.basename(command[1]))
+    else:
+        raise ValueError(f'Task {task_name} does not run a generated component, so it cannot run locally.')
+    return [module_file] + executor['container'].get('args', [])
+
+def run_task(task_command: List[str],
+             executor_input: dict,
+             gcs_mount_dir: str,
+             *,
+             step_cache_dir: Optional[str] = None,
+             python: Optional[str] = None,
+             memory: Optional[int] = None,
+             cpus: Optional[Set[int]] = None):
+    """Runs a generated task module with the executor input as its
+    arguments: as a subprocess of the given interpreter, e.g. of a virtual
+    environment with the component's requirements, or otherwise in this
+    process by calling its main(). Artifacts with gs:// uris are read and
+    written under a local directory instead of the gcsfuse mount. The task
+    is pinned to the given cpus. Only a subprocess is limited to the given
+    memory: this process is reused by later tasks and already holds the
+    imports and heap of earlier ones, so a limit on it would not measure the
+    task and could fail it before it starts.
+
+    Args:
+        task_command: Path of the task module, followed by its arguments.
+        executor_input: The executor input of the task.
+        gcs_mount_dir: Local directory that stands in for /gcs/.
+        step_cache_dir: Directory of the step cache the task uses, if any.
+        python: Interpreter to run the task with (default: in this process).
+        memory: Bytes of memory a task run as a subprocess is limited to.
+        cpus: CPUs the task is pinned to.
+    Raises:
+        Exception: If the task fails.
+    """
+    module_file, args = task_command[0], task_command[1:]
+    module_name = os.path.splitext(os.path.basename(module_file))[0]
+    for output in executor_input['outputs']['artifacts'].values():
+        for artifact in output['artifacts']:
+            if artifact['uri'].startswith('gs://'):
+                os.makedirs(os.path.dirname(os.path.join(gcs_mount_dir, artifact['uri'][len('gs://'):])), exist_ok=True)
+    for output in executor_input['outputs']['parameters'].values():
+        os.makedirs(os.path.dirname(output['outputFile']), exist_ok=True)
+    args = [json.dumps(executor_input) if arg == '{{$}}' else arg for arg in args]
+
+    if python:
+        env = {key: value for key, value in os.environ.items() if key not in ('PYTHONPATH', STEP_CACHE_DIR_ENV_VAR)}
+        env['PYTHONPATH'] = os.path.dirname(os.path.abspath(module_file))
+        if step_cache_dir:
+            env[STEP_CACHE_DIR_ENV_VAR] = step_cache_dir
+        result = subprocess.run(
+            [python, '-c', TASK_BOOTSTRAP, gcs_mount_dir.rstrip('/') + '/', module_name, *args], env=env, check=False,
+            preexec_fn=functools.partial(limit_task_resources, memory, cpus) if memory or cpus else None)
+        if result.returncode != 0:
+            raise RuntimeError(f'{module_name} exited with status {result.returncode}')
+        return
+
+    # Pool processes are reused, so the variable is reset for every task
+    if step_cache_dir:
+        os.environ[STEP_CACHE_DIR_ENV_VAR] = step_cache_dir
+    else:
+        os.environ.pop(STEP_CACHE_DIR_ENV_VAR, None)
+    try:
+        # pylint: disable=protected-access
+        from kfp.v2.components.types import artifact_types
+        artifact_types._GCS_LOCAL_MOUNT_PREFIX = gcs_mount_dir.rstrip('/') + '/'
+    except ImportError:
+        pass
+    sys.argv = [module_file] + args
+    if os.path.dirname(module_file) not in sys.path:
+        sys.path.insert(0, os.path.dirname(module_file))
+    # The cpus are unpinned again after the task, as pool processes are reused
+    previous_cpus = os.sched_getaffinity(0) if cpus and hasattr(os, 'sched_getaffinity') else None
+    limit_task_resources(cpus=cpus)
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, module_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.main()
+    except SystemExit as err:
+        # A SystemExit would otherwise end the process running the pipeline
+        if err.code not in (None, 0):
+            raise RuntimeError(f'{module_name} exited with status {err.code}') from None
+    finally:
+        if previous_cpus:
+            os.sched_setaffinity(0, previous_cpus)
+
+def limit_task_resources(memory: Optional[int] = None, cpus: Optional[Set[int]] = None):
+    """Limits the data segment of the current process, which includes its
+    heap and private mappings, through its rlimit, so allocations beyond the
+    memory declared on a task fail with a MemoryError instead of exhausting
+    the machine, and pins the process to the cpus reserved for the task.
+    Unlike the address space, the data segment does not count shared
+    libraries or reserved but unused mappings. Limits that the platform does
+    not support are not applied.
+
+    Args:
+        memory: Bytes of memory the process is limited to.
+        cpus: CPUs the process is pinned to.
+    """
+    if memory and resource:
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        resource.setrlimit(resource.RLIMIT_DATA, (memory if hard == resource.RLIM_INFINITY else min(memory, hard), hard))
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+def get_task_resources(task_name: str, pipeline_spec: dict) -> Dict[str, float]:
+    """Returns the cpu and memory limits that the pipeline sets on the
+    container of a task, from the resources declared on its component.
+
+    Args:
+        task_name: Name of the task.
+        pipeline_spec: Compiled pipeline spec.
+    Returns:
+        dict: Number of vCPUs as cpu and bytes as memory; limits that are
+            not set are left out.
+    """
+    component = pipeline_spec['components'][pipeline_spec['root']['dag']['tasks'][task_name]['componentRef']['name']]
+    executor = pipeline_spec['deploymentSpec']['executors'].get(component.get('executorLabel'), {})
+    limits = executor.get('container', {}).get('resources', {})
+    resources = {}
+    if limits.get('cpuLimit'):
+        resources['cpu'] = float(limits['cpuLimit'])
+    if limits.get('memoryLimit'):
+        # kfp sets memory limits in GB
+        resources['memory'] = int(float(limits['memoryLimit']) * 10 ** 9)
+    return resources
+
+def get_task_requirements(task_name: str, pipeline_spec: dict, component_base_dir: str, use_locks: bool = True) -> List[str]:
+    """Finds the requirements files of the image a task runs in: those of
+    the component_base image, followed by those of its per-component image,
+    if any. The requirements.lock of an image is preferred to its
+    requirements.txt.
+
+    Args:
+        task_name: Name of the task.
+        pipeline_spec: Compiled pipeline spec.
+        component_base_dir: The generated component_base directory.
+        use_locks: Whether to use the requirements.lock files.
+    Returns:
+        list: Paths to the requirements files, in install order.
+    Raises:
+        Exception: If the task does not run in a generated image.
+    """
+    task = pipeline_spec['root']['dag']['tasks'][task_name]
+    component = pipeline_spec['components'][task['componentRef']['name']]
+    image = pipeline_spec['deploymentSpec']['executors'][component['executorLabel']]['container']['image']
+    image_name = image.rsplit('/', 1)[-1].split('@')[0].split(':')[0]
+    image_dirs = [component_base_dir]
+    if image_name != 'component_base':
+        image_dirs.append(os.path.join(component_base_dir, 'images', image_name))
+        if not os.path.isdir(image_dirs[-1]):
+            raise ValueError(f'Task {task_name} runs in {image}, which is not an image generated by AutoMLOps.')
+    requirements_files = []
+    for image_dir in image_dirs:
+        filenames = ['requirements.lock', 'requirements.txt'] if use_locks else ['requirements.txt']
+        existing = [os.path.join(image_dir, filename) for filename in filenames if os.path.exists(os.path.join(image_dir, filename))]
+        requirements_files += existing[:1]
+    return requirements_files
+
+def get_task_venvs(pipeline_spec: dict, component_base_dir: str = GENERATED_COMPONENT_BASE) -> Dict[str, str]:
+    """Creates a virtual environment for each distinct requirement set of the
+    tasks of a pipeline, or reuses the shared environment that has it. The
+    locked requirements and the wheelhouse synced into the component_base
+    directory are only used if they were resolved for this interpreter and
+    platform.
+
+    Args:
+        pipeline_spec: Compiled pipeline spec.
+        component_base_dir: The generated component_base directory.
+    Returns:
+        dict: Path to the python executable each task runs with, keyed by task name.
+    Raises:
+        Exception: If a task does not run in a generated image, or an
+            environment cannot be created.
+    """
+    target_version = get_target_python_version(read_yaml_file(GENERATED_DEFAULTS_FILE)['gcp']['base_image'])
+    use_locks = target_version is None or (
+        target_version == f'{sys.version_info[0]}.{sys.version_info[1]}'
+        and sys.platform.startswith('linux') and platform.machine() == 'x86_64')
+    wheelhouse = os.path.join(component_base_dir, 'wheelhouse')
+    wheelhouse = os.path.abspath(wheelhouse) if use_locks and os.path.isdir(wheelhouse) else None
+    venvs = {}
+    task_venvs = {}
+    for name in pipeline_spec['root']['dag']['tasks']:
+        requirements_files = tuple(get_task_requirements(name, pipeline_spec, component_base_dir, use_locks))
+        if requirements_files not in venvs:
+            venvs[requirements_files] = ensure_venv(list(requirements_files), wheelhouse)
+        task_venvs[name] = venvs[requirements_files]
+    return task_venvs
+
+def read_task_outputs(task_name: str, pipeline_spec: dict, executor_input: dict) -> dict:
+    """Reads the outputs a task wrote: the output parameters and artifact
+    metadata in its executor output, and the output parameter files it
+    wrote through OutputPath arguments.
+
+    Args:
+        task_name: Name of the task.
+        pipeline_spec: Compiled pipeline spec.
+        executor_input: The executor input the task ran with.
+    Returns:
+        dict: Parameter values and runtime artifacts, keyed by output name.
+    Raises:
+        Exception: If the task did not write one of its output parameters.
+    """
+    task = pipeline_spec['root']['dag']['tasks'][task_name]
+    definitions = pipeline_spec['components'][task['componentRef']['name']].get('outputDefinitions', {})
+    executor_output = {}
+    if os.path.exists(executor_input['outputs']['outputFile']):
+        with open(executor_input['outputs']['outputFile'], 'r', encoding='utf-8') as file:
+            executor_output = json.load(file)
+
+    parameters = {}
+    for name, output in executor_input['outputs']['parameters'].items():
+        if name in executor_output.get('parameters', {}):
+            parameters[name] = executor_output['parameters'][name]
+        elif name in executor_output.get('parameterValues', {}):
+            parameters[name] = to_parameter_value(executor_output['parameterValues'][name])
+        elif os.path.exists(output['outputFile']):
+            with open(output['outputFile'], 'r', encoding='utf-8') as file:
+                parameters[name] = to_parameter_value(file.read(), _get_parameter_type(definitions['parameters'][name]))
+        else:
+            raise RuntimeError(f'Task {task_name} did not write its output parameter {name}.')
+    artifacts = {
+        name: executor_output.get('artifacts', {}).get(name, output)['artifacts']
+        for name, output in executor_input['outputs']['artifacts'].items()}
+    return {'parameters': parameters, 'artifacts': artifacts}
+
+def run_pipeline_spec(pipeline_spec: dict,
+                      run_dir: str,
+                      src_dir: str,
+                      pipeline_params: Optional[Dict] = None,
+                      *,
+                      pipeline_root: Optional[str] = None,
+                      max_workers: Optional[int] = None,
+                      step_cache_dir: Optional[str] = None,
+                      completed_tasks: Optional[Dict[str, dict]] = None,
+                      task_pythons: Optional[Dict[str, str]] = None) -> Dict[str, dict]:
+    """Runs the tasks of a compiled pipeline on a process pool. A task is
+    submitted as soon as every task it depends on has finished and the cpu
+    and memory limits set on it fit next to those of the running tasks, so
+    independent branches run concurrently without oversubscribing the
+    machine. Each task is pinned to its own cpus and limited to its memory.
+    A task that does not fit the machine at all runs once nothing else is
+    running. After a task fails, no new tasks are started, and the running
+    ones are waited for. The status, executor
+    input and outputs of every task are checkpointed in the run directory.
+
+    Args:
+        pipeline_spec: Compiled pipeline spec.
+        run_dir: Directory for the outputs of the run.
+        src_dir: Directory of the generated task modules.
+        pipeline_params: Pipeline parameter values, overriding the defaults in the spec.
+        pipeline_root: Uri under which output artifacts are created, as on
+            Vertex AI (default: gs://local). Artifacts with gs:// uris are
+            stored under run_dir/gcs instead of being uploaded.
+        max_workers: Maximum number of tasks run at once (default: the number of CPUs).
+        step_cache_dir: Directory of the step cache, which tasks whose inputs
+            are unchanged restore their outputs from instead of running.
+        completed_tasks: Outputs of tasks that already completed, keyed by
+            task name. They are not run again.
+        task_pythons: Interpreter each task runs in a subprocess of, keyed by
+            task name (default: tasks run in the pool processes).
+    Returns:
+        dict: Output parameters and artifacts, keyed by task name.
+    Raises:
+        Exception: If the pipeline cannot run locally, or a task fails.
+    """
+    dependencies = get_task_dependencies(pipeline_spec)
+    commands = {name: get_task_command(name, pipeline_spec, src_dir) for name in dependencies}
+    task_resources = {name: get_task_resources(name, pipeline_spec) for name in dependencies}
+    pipeline_parameters = get_pipeline_parameters(pipeline_spec, pipeline_params)
+    pipeline_root = (pipeline_root or 'gs://local').rstrip('/')
+    gcs_mount_dir = os.path.abspath(os.path.join(run_dir, 'gcs'))
+    run_name = os.path.basename(os.path.normpath(run_dir))
+
+    task_outputs = {name: outputs for name, outputs in (completed_tasks or {}).items() if name in dependencies}
+    checkpoints = {
+        'pipeline_params': pipeline_params or {},
+        'pipeline_root': pipeline_root,
+        'tasks': {name: {'status': 'succeeded', 'outputs': outputs} for name, outputs in task_outputs.items()}}
+    for name in sorted(task_outputs):
+        logging.info('Reusing the outputs of task %s', name)
+    os.makedirs(run_dir, exist_ok=True)
+    _write_run_checkpoints(run_dir, checkpoints)
+
+    executor_inputs, started, failures = {}, {}, {}
+    running = {}
+    free_cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    free_memory = _get_physical_memory()
+    reserved = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            if not failures:
+                for name, upstream in dependencies.items():
+                    if name in task_outputs or name in executor_inputs or not upstream.issubset(task_outputs):
+                        continue
+                    num_cpus = math.ceil(task_resources[name].get('cpu', 0))
+                    memory = task_resources[name].get('memory', 0)
+                    if running and (num_cpus > len(free_cpus) or (free_memory is not None and memory > free_memory)):
+                        continue
+                    reserved[name] = (set(free_cpus[:num_cpus]), memory)
+                    free_cpus = free_cpus[num_cpus:]
+                    free_memory = free_memory - memory if free_memory is not None else None
+                    task_dir = os.path.abspath(os.path.join(run_dir, name))
+                    executor_inputs[name] = create_executor_input(
+                        name, pipeline_spec, pipeline_parameters, task_outputs,
+                        task_dir=task_dir, artifacts_uri=f'{pipeline_root}/{run_name}/{name}')
+                    # A checkpoint of an earlier attempt must not mark this one as completed
+                    if os.path.exists(os.path.join(task_dir, STEP_CHECKPOINT_FILENAME)):
+                        os.remove(os.path.join(task_dir, STEP_CHECKPOINT_FILENAME))
+                    checkpoints['tasks'][name] = {'status': 'running', 'executor_input': executor_inputs[name]}
+                    _write_run_checkpoints(run_dir, checkpoints)
+                    logging.info('Starting task %s', name)
+                    started[name] = time.perf_counter()
+                    running[pool.submit(
+                        run_task, commands[name], executor_inputs[name], gcs_mount_dir,
+                        step_cache_dir=step_cache_dir, python=(task_pythons or {}).get(name),
+                        memory=memory or None, cpus=reserved[name][0] or None)] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                cpus, memory = reserved.pop(name)
+                free_cpus = sorted(free_cpus + list(cpus))
+                free_memory = free_memory + memory if free_memory is not None else None
+                try:
+                    future.result()
+                    task_outputs[name] = read_task_outputs(name, pipeline_spec, executor_inputs[name])
+                    checkpoints['tasks'][name].update(status='succeeded', outputs=task_outputs[name])
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    failures[name] = err
+                    checkpoints['tasks'][name].update(status='failed', error=repr(err))
+                _write_run_checkpoints(run_dir, checkpoints)
+                logging.info('Task %s %s in %.1fs', name, 'failed' if name in failures else 'finished', time.perf_counter() - started[name])
+
+    if failures:
+        not_run = sorted(set(dependencies) - set(task_outputs) - set(failures))
+        raise RuntimeError(
+            'Local pipeline run failed. ' +
+            ' '.join(f'Task {name}: {err!r}.' for name, err in sorted(failures.items())) +
+            (f' Not run: {", ".join(not_run)}.' if not_run else '') +
+            f' Resume the run in {run_dir} to rerun only these tasks.')
+    return task_outputs
+
+def resume_pipeline_spec(pipeline_spec: dict,
+                         run_dir: str,
+                         src_dir: str,
+                         *,
+                         max_workers: Optional[int] = None,
+                         step_cache_dir: Optional[str] = None,
+                         task_pythons: Optional[Dict[str, str]] = None) -> Dict[str, dict]:
+    """Resumes a run of a compiled pipeline from its checkpoints. Tasks the
+    run checkpointed as succeeded are not run again, nor are tasks that
+    wrote their own completion checkpoint before the run was interrupted;
+    their outputs are reused. The other tasks run with the parameters of
+    the original run.
+
+    Args:
+        pipeline_spec: Compiled pipeline spec.
+        run_dir: Directory of the run.
+        src_dir: Directory of the generated task modules.
+        max_workers: Maximum number of tasks run at once (default: the number of CPUs).
+        step_cache_dir: Directory of the step cache, which tasks whose inputs
+            are unchanged restore their outputs from instead of running.
+        task_pythons: Interpreter each task runs in a subprocess of, keyed by
+            task name (default: tasks run in the pool processes).
+    Returns:
+        dict: Output parameters and artifacts, keyed by task name.
+    Raises:
+        Exception: If the run has no checkpoints, or a task fails.
+    """
+    checkpoints_file = os.path.join(run_dir, RUN_CHECKPOINTS_FILENAME)
+    try:
+        with open(checkpoints_file, 'r', encoding='utf-8') as file:
+            checkpoints = json.load(file)
+    except (OSError, ValueError) as err:
+        raise RuntimeError(f'Error reading the checkpoints of the run in {run_dir}. {err}') from err
+
+    tasks = pipeline_spec['root']['dag']['tasks']
+    completed_tasks = {}
+    for name, checkpoint in checkpoints['tasks'].items():
+        if name not in tasks:
+            continue
+        if checkpoint['status'] == 'succeeded':
+            completed_tasks[name] = checkpoint['outputs']
+        elif checkpoint['status'] == 'running' and os.path.exists(
+                os.path.join(os.path.dirname(checkpoint['executor_input']['outputs']['outputFile']), STEP_CHECKPOINT_FILENAME)):
+            # The task completed after the process running the pipeline stopped
+            completed_tasks[name] = read_task_outputs(name, pipeline_spec, checkpoint['executor_input'])
+    return run_pipeline_spec(
+        pipeline_spec, run_dir, src_dir, checkpoints['pipeline_params'],
+        pipeline_root=checkpoints['pipeline_root'], max_workers=max_workers,
+        step_cache_dir=step_cache_dir, completed_tasks=completed_tasks, task_pythons=task_pythons)
+
+def _get_physical_memory() -> Optional[int]:
+    """Returns the physical memory of the machine.
+
+    Returns:
+        int: Number of bytes, or None if the platform does not report it.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def _write_run_checkpoints(run_dir: str, checkpoints: dict):
+    """Writes the checkpoints of a run, replacing the previous ones atomically
+    so an interrupted run never leaves a partial file.
+
+    Args:
+        run_dir: Directory of the run.
+        checkpoints: Pipeline parameters and pipeline root of the run, and
+            the status, executor input and outputs of each task, keyed by name.
+    """
+    checkpoints_file = os.path.join(run_dir, RUN_CHECKPOINTS_FILENAME)
+    with open(checkpoints_file + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(checkpoints, file, indent=2, sort_keys=True)
+    os.replace(checkpoints_file + '.tmp', checkpoints_file)
+
+def _get_parameter_type(definition: dict) -> Optional[str]:
+    """Returns the declared type of a parameter definition.
+
+    Args:
+        definition: Parameter definition of a component or the pipeline.
+    Returns:
+        str: Type such as STRING or NUMBER_INTEGER, or None if it is not declared.
+    """
+    return definition.get('parameterType', definition.get('type'))
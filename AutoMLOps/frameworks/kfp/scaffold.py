@@ -29,9 +29,11 @@ from AutoMLOps.utils.constants import (
     PIPELINE_CACHE_FILE,
     CACHE_DIR
 )
+from AutoMLOps.utils.resources import create_resource_annotations
 from AutoMLOps.utils.utils import (
     get_function_source_definition,
     make_dirs,
+    register_component,
     update_params,
     write_file,
     write_yaml_file
@@ -41,9 +43,14 @@ T = TypeVar('T')
 
 def create_component_scaffold(func: Optional[Callable] = None,
                               *,
-                              packages_to_install: Optional[List[str]] = None):
+                              packages_to_install: Optional[List[str]] = None,
+                              cpu: Optional[Union[int, float, str]] = None,
+                              memory: Optional[str] = None,
+                              accelerator_type: Optional[str] = None,
+                              accelerator_count: Optional[int] = None):
     """Creates a tmp component scaffold which will be used by the formalize function.
     Code is temporarily stored in component_spec['implementation']['container']['command'].
+    The declared resources are stored in the annotations of the component spec.
 
     Args:
         func: The python function to create a component from. The function
@@ -51,7 +58,14 @@ def create_component_scaffold(func: Optional[Callable] = None,
             it is intended to be used (e.g. as an input/output Artifact object,
             a plain parameter, or a path to a file).
         packages_to_install: A list of optional packages to install before
-            executing func. These will always be installed at component runtime.
+            executing func. These are installed into the component's image at build time.
+        cpu: Number of vCPUs the component's tasks are limited to, or
+            millicpus followed by 'm'.
+        memory: Memory the component's tasks are limited to, e.g. '16G'.
+        accelerator_type: Type of accelerator attached to the component's tasks.
+        accelerator_count: Number of accelerators attached (default: 1).
+    Raises:
+        Exception: If a declared resource is not valid.
     """
     # Extract name, docstring, and component description
     name = func.__name__
@@ -63,6 +77,9 @@ def create_component_scaffold(func: Optional[Callable] = None,
     component_spec['name'] = name
     if description:
         component_spec['description'] = description
+    annotations = create_resource_annotations(cpu, memory, accelerator_type, accelerator_count)
+    if annotations:
+        component_spec['metadata'] = {'annotations': annotations}
     component_spec['inputs'] = get_function_parameters(func)
     component_spec['implementation'] = {}
     component_spec['implementation']['container'] = {}
@@ -76,10 +93,14 @@ def create_component_scaffold(func: Optional[Callable] = None,
     filename = CACHE_DIR + f'/{name}.yaml'
     make_dirs([CACHE_DIR])
     write_yaml_file(filename, component_spec, 'w')
+    register_component(filename, component_spec)
 
 def get_packages_to_install_command(func: Optional[Callable] = None,
                                     packages_to_install: Optional[List[str]] = None):
     """Returns a list of formatted list of commands, including code for tmp storage.
+    The pip install keeps the scaffold a valid standalone kfp component; the
+    generated component.yaml does not run it, as the packages are installed
+    into the component's image when it is built.
 
     Args:
         func: The python function to create a component from. The function
@@ -87,7 +108,7 @@ def get_packages_to_install_command(func: Optional[Callable] = None,
             it is intended to be used (e.g. as an input/output Artifact object,
             a plain parameter, or a path to a file).
         packages_to_install: A list of optional packages to install before
-            executing func. These will always be installed at component runtime.
+            executing func. These are installed into the component's image.
     """
     newline = '\n'
     if not packages_to_install:
@@ -0,0 +1,178 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Typed, immutable view of the generated defaults.yaml."""
+
+# pylint: disable=line-too-long
+
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+
+from AutoMLOps.utils.utils import read_yaml_file
+from AutoMLOps.utils.constants import (
+    GENERATED_LICENSE,
+    GENERATED_PARAMETER_VALUES_PATH,
+    GENERATED_PIPELINE_JOB_SPEC_PATH
+)
+
+# Keys of the gcp section of defaults.yaml whose name differs from the field name
+_YAML_KEY_TO_FIELD = {
+    'cloud_schedule_location': 'schedule_location',
+    'cloud_schedule_name': 'schedule_name',
+    'cloud_schedule_pattern': 'schedule_pattern',
+    'cloud_source_repository': 'csr_name',
+    'cloud_source_repository_branch': 'csr_branch_name',
+    'pipeline_runner_service_account': 'pipeline_runner_sa'
+}
+
+@dataclass(frozen=True)
+class DefaultsConfig():
+    """Default config variables, built once from the arguments to generate()
+    and shared by all builders and constructs. defaults.yaml is written
+    from this object and is only a serialized view of it.
+
+    Args:
+        project_id: The project ID.
+        af_registry_location: Region of the Artifact Registry.
+        af_registry_name: Artifact Registry name where components are stored.
+        base_image: The image to use in the component base dockerfile.
+        cb_trigger_location: The location of the cloudbuild trigger.
+        cb_trigger_name: The name of the cloudbuild trigger.
+        cloud_run_location: The location of the cloud runner service.
+        cloud_run_name: The name of the cloud runner service.
+        cloud_tasks_queue_location: The location of the cloud tasks queue.
+        cloud_tasks_queue_name: The name of the cloud tasks queue.
+        csr_branch_name: The name of the csr branch to push to to trigger cb job.
+        csr_name: The name of the cloud source repo to use.
+        gs_bucket_location: Region of the GS bucket.
+        gs_bucket_name: GS bucket name where pipeline run metadata is stored (default: {project_id}-bucket).
+        pipeline_runner_sa: Service Account to runner PipelineJobs (default: vertex-pipelines@{project_id}.iam.gserviceaccount.com).
+        run_local: Flag that determines whether to use Cloud Run CI/CD.
+        schedule_location: The location of the scheduler resource.
+        schedule_name: The name of the scheduler resource.
+        schedule_pattern: Cron formatted value used to create a Scheduled retrain job.
+        vpc_connector: The name of the vpc connector to use.
+        per_component_images: Flag that determines whether each group of components with the same requirements gets its own image.
+        wheelhouse: Directory of wheels, or url of a package index, to resolve a pinned requirements lock against (default: requirements are not locked).
+    """
+    project_id: str
+    af_registry_location: str = 'us-central1'
+    af_registry_name: str = 'vertex-mlops-af'
+    base_image: str = 'python:3.9-slim'
+    cb_trigger_location: str = 'us-central1'
+    cb_trigger_name: str = 'automlops-trigger'
+    cloud_run_location: str = 'us-central1'
+    cloud_run_name: str = 'run-pipeline'
+    cloud_tasks_queue_location: str = 'us-central1'
+    cloud_tasks_queue_name: str = 'queueing-svc'
+    csr_branch_name: str = 'automlops'
+    csr_name: str = 'AutoMLOps-repo'
+    gs_bucket_location: str = 'us-central1'
+    gs_bucket_name: Optional[str] = None
+    pipeline_runner_sa: Optional[str] = None
+    run_local: bool = True
+    schedule_location: str = 'us-central1'
+    schedule_name: str = 'AutoMLOps-schedule'
+    schedule_pattern: str = 'No Schedule Specified'
+    vpc_connector: str = 'No VPC Specified'
+    per_component_images: bool = False
+    wheelhouse: Optional[str] = None
+
+    def __post_init__(self):
+        """Sets defaults if none were given for bucket name and pipeline runner sa."""
+        if self.gs_bucket_name is None:
+            object.__setattr__(self, 'gs_bucket_name', f'{self.project_id}-bucket')
+        if self.pipeline_runner_sa is None:
+            object.__setattr__(self, 'pipeline_runner_sa', f'vertex-pipelines@{self.project_id}.iam.gserviceaccount.com')
+
+    @classmethod
+    def from_dict(cls, defaults: dict) -> 'DefaultsConfig':
+        """Creates a config from the parsed contents of a defaults.yaml.
+        Keys missing from the yaml take their default values.
+
+        Args:
+            defaults: Parsed contents of a defaults.yaml.
+        Returns:
+            DefaultsConfig: The config described by the yaml.
+        """
+        field_names = {field.name for field in dataclasses.fields(cls)}
+        kwargs = {}
+        for key, value in defaults.get('gcp', {}).items():
+            key = _YAML_KEY_TO_FIELD.get(key, key)
+            if key in field_names:
+                kwargs[key] = value
+        if 'pipeline_region' in defaults.get('pipelines', {}):
+            kwargs['gs_bucket_location'] = defaults['pipelines']['pipeline_region']
+        return cls(**kwargs)
+
+    @classmethod
+    def from_yaml(cls, filepath: str) -> 'DefaultsConfig':
+        """Creates a config by parsing a defaults.yaml once.
+
+        Args:
+            filepath: Path to the defaults.yaml.
+        Returns:
+            DefaultsConfig: The config described by the yaml.
+        """
+        return cls.from_dict(read_yaml_file(filepath))
+
+    def get_image_uri(self, image_name: str, tag: str = 'latest') -> str:
+        """Returns the uri of an image in the Artifact Registry.
+
+        Args:
+            image_name: Name of the image in the registry, e.g. components/component_base.
+            tag: Tag of the image.
+        Returns:
+            str: Image uri.
+        """
+        return f'{self.af_registry_location}-docker.pkg.dev/{self.project_id}/{self.af_registry_name}/{image_name}:{tag}'
+
+    def to_yaml(self) -> str:
+        """Creates defaults.yaml file contents. This defaults file is
+        used by the generated pipeline files themselves.
+
+        Returns:
+            str: Defaults yaml file content.
+        """
+        return (
+            GENERATED_LICENSE +
+            f'# These values are descriptive only - do not change.\n'
+            f'# Rerun AutoMLOps.generate() to change these values.\n'
+            f'gcp:\n'
+            f'  af_registry_location: {self.af_registry_location}\n'
+            f'  af_registry_name: {self.af_registry_name}\n'
+            f'  base_image: {self.base_image}\n'
+            f'  cb_trigger_location: {self.cb_trigger_location}\n'
+            f'  cb_trigger_name: {self.cb_trigger_name}\n'
+            f'  cloud_run_location: {self.cloud_run_location}\n'
+            f'  cloud_run_name: {self.cloud_run_name}\n'
+            f'  cloud_tasks_queue_location: {self.cloud_tasks_queue_location}\n'
+            f'  cloud_tasks_queue_name: {self.cloud_tasks_queue_name}\n'
+            f'  cloud_schedule_location: {self.schedule_location}\n'
+            f'  cloud_schedule_name: {self.schedule_name}\n'
+            f'  cloud_schedule_pattern: {self.schedule_pattern}\n'
+            f'  cloud_source_repository: {self.csr_name}\n'
+            f'  cloud_source_repository_branch: {self.csr_branch_name}\n'
+            f'  gs_bucket_name: {self.gs_bucket_name}\n'
+            f'  pipeline_runner_service_account: {self.pipeline_runner_sa}\n'
+            f'  project_id: {self.project_id}\n'
+            f'  vpc_connector: {self.vpc_connector}\n'
+            f'\n'
+            f'pipelines:\n'
+            f'  parameter_values_path: {GENERATED_PARAMETER_VALUES_PATH}\n'
+            f'  pipeline_component_directory: components\n'
+            f'  pipeline_job_spec_path: {GENERATED_PIPELINE_JOB_SPEC_PATH}\n'
+            f'  pipeline_region: {self.gs_bucket_location}\n'
+            f'  pipeline_storage_path: gs://{self.gs_bucket_name}/pipeline_root\n')
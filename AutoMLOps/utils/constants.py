@@ -51,6 +51,11 @@ GENERATED_CLOUDBUILD_FILE = BASE_DIR + 'cloudbuild.yaml'
 GENERATED_PIPELINE_FILE = BASE_DIR + 'pipelines/pipeline.py'
 GENERATED_COMPONENT_BASE = BASE_DIR + 'components/component_base'
 GENERATED_COMPONENT_BASE_SRC = BASE_DIR + 'components/component_base/src'
+GENERATED_COMPONENT_IMAGES_DIR = BASE_DIR + 'components/component_base/images'
+GENERATED_REQUIREMENTS_REPORT_FILE = BASE_DIR + 'components/requirements_report.json'
+GENERATED_WHEELHOUSE_DIR = BASE_DIR + 'components/component_base/wheelhouse'
+GENERATED_CLOUD_RUN_REQUIREMENTS_FILE = BASE_DIR + 'cloud_run/run_pipeline/requirements.txt'
+GENERATED_CLOUD_RUN_PIPELINE_SPEC_REQUIREMENTS_FILE = BASE_DIR + 'cloud_run/run_pipeline/pipeline_spec_requirements.txt'
 GENERATED_PARAMETER_VALUES_PATH = 'pipelines/runtime_parameters/pipeline_parameter_values.json'
 GENERATED_PIPELINE_JOB_SPEC_PATH = 'scripts/pipeline_spec/pipeline_job.json'
 GENERATED_DIRS = [
@@ -69,10 +74,146 @@ GENERATED_DIRS = [
 # temporary files
 CACHE_DIR = '.AutoMLOps-cache'
 PIPELINE_CACHE_FILE = CACHE_DIR + '/pipeline_scaffold.py'
+GENERATION_MANIFEST_FILE = CACHE_DIR + '/generation_manifest.json'
+IMPORT_SCAN_CACHE_FILE = CACHE_DIR + '/import_scan_cache.json'
+REQUIREMENTS_LOCK_CACHE_FILE = CACHE_DIR + '/requirements_lock_cache.json'
+COMPONENTS_INDEX_FILENAME = 'components_index.json'
+LOCAL_RUNS_DIR = CACHE_DIR + '/local_runs'
+STEP_CACHE_DIR = CACHE_DIR + '/step_cache'
 
 # KFP Spec output_file location
 OUTPUT_DIR = CACHE_DIR
 
+# Names of the images built by cloudbuild.yaml, relative to the Artifact Registry
+COMPONENT_BASE_IMAGE = 'components/component_base'
+RUN_PIPELINE_IMAGE = 'run_pipeline'
+
+# Number of hex digits of the build context digest used as an image tag
+IMAGE_TAG_LENGTH = 16
+
+# BuildKit cache mount that keeps pip's cache across builds but out of the image layers
+PIP_CACHE_MOUNT = '--mount=type=cache,target=/root/.cache/pip'
+
+# Virtual environment the builder stage of a Dockerfile installs requirements into
+DOCKER_VENV_DIR = '/opt/venv'
+
+# Virtual environment the run_pipeline builder stage compiles the pipeline
+# spec with, so kfp is not installed in the service image
+DOCKER_PIPELINE_SPEC_VENV_DIR = '/opt/pipeline_spec_venv'
+
+# Where the wheelhouse is bind mounted while installing requirements offline,
+# so the wheels are never copied into an image layer
+DOCKER_WHEELHOUSE_DIR = '/wheelhouse'
+
+# Where component sources are copied in an image; it is on the PYTHONPATH,
+# so a component runs as a module from its precompiled bytecode
+DOCKER_COMPONENT_SRC_DIR = '/pipelines/component/src'
+
+# Precompiles the standard library and the packages of the base image, which
+# official python images ship without bytecode. Files that do not compile are
+# left for the interpreter to report when they are imported.
+DOCKER_COMPILE_STDLIB = 'RUN python -m compileall -qq -j 0 "$(python -c \'import sysconfig; print(sysconfig.get_path("stdlib"))\')" || true\n'
+
+# Import time of a component task, in seconds, above which it logs a warning;
+# tasks read the budget from the environment variable if it is set
+IMPORT_TIME_BUDGET_ENV_VAR = 'AUTOMLOPS_IMPORT_TIME_BUDGET_SECONDS'
+IMPORT_TIME_BUDGET_SECONDS = 5
+
+# Names that generated component tasks import from kfp.v2.dsl when the
+# component uses them
+KFP_DSL_NAMES = [
+    'Artifact',
+    'ClassificationMetrics',
+    'Condition',
+    'ContainerOp',
+    'Dataset',
+    'ExitHandler',
+    'HTML',
+    'Input',
+    'InputPath',
+    'Markdown',
+    'Metrics',
+    'Model',
+    'Output',
+    'OutputPath',
+    'ParallelFor',
+    'PipelineTaskFinalStatus',
+    'SlicedClassificationMetrics',
+    'component',
+    'graph_component',
+    'importer',
+    'pipeline'
+]
+
+# Base image of the run_pipeline cloud run service
+CLOUD_RUN_BASE_IMAGE = 'python:3.9-slim'
+
+# Maximum number of components materialized concurrently
+COMPONENT_BUILD_MAX_WORKERS = 8
+
+# Maximum number of resolved requirement locks kept in the lock cache
+LOCK_CACHE_MAX_ENTRIES = 32
+
+# Platform that requirements are locked for when the base image's python version is known
+LOCK_TARGET_PLATFORM = 'manylinux2014_x86_64'
+
+# Revision of how locks are resolved, part of the lock cache key so locks
+# resolved by an earlier revision are resolved again
+LOCK_RESOLVER_REVISION = 2
+
+# Maximum number of parsed yaml documents kept in memory
+YAML_CACHE_MAX_ENTRIES = 64
+
+# Environment variable that enables tracing; its value is the trace file to write
+TRACE_FILE_ENV_VAR = 'AUTOMLOPS_TRACE_FILE'
+
+# Virtual environments that local runs install the requirements of the
+# components into, shared by every project on the machine
+LOCAL_VENVS_DIR = '~/.cache/AutoMLOps/venvs'
+
+# Checkpoint files of a local run, in its directory, and of a step, next to
+# its executor output
+RUN_CHECKPOINTS_FILENAME = 'checkpoints.json'
+STEP_CHECKPOINT_FILENAME = 'step_checkpoint.json'
+
+# Environment variables read by generated component tasks. The step cache is
+# enabled when the first is set to the directory of the artifact store.
+STEP_CACHE_DIR_ENV_VAR = 'AUTOMLOPS_STEP_CACHE_DIR'
+STEP_CACHE_MAX_BYTES_ENV_VAR = 'AUTOMLOPS_STEP_CACHE_MAX_BYTES'
+
+# Size of the step cache above which the least recently used entries are evicted
+STEP_CACHE_MAX_BYTES = 10 * 1024 ** 3
+
+# Annotations of a component spec that hold the resources declared on its
+# decorator, keyed by the name of the resource
+RESOURCE_ANNOTATIONS = {
+    'cpu': 'automlops/cpu_limit',
+    'memory': 'automlops/memory_limit',
+    'accelerator_type': 'automlops/accelerator_type',
+    'accelerator_count': 'automlops/accelerator_count'}
+
+# Node selector label that kfp sets the accelerator type of a task with
+ACCELERATOR_NODE_SELECTOR = 'cloud.google.com/gke-accelerator'
+
+# Machine types that Vertex AI Pipelines runs tasks on, with their vCPUs,
+# memory in GB, and the numbers of each accelerator type they can attach.
+# Accelerator optimized machine types always have their accelerators
+# attached. Declared component resources must fit at least one of them.
+_N1_ACCELERATORS = {
+    'NVIDIA_TESLA_T4': [1, 2, 4],
+    'NVIDIA_TESLA_P4': [1, 2, 4],
+    'NVIDIA_TESLA_P100': [1, 2, 4],
+    'NVIDIA_TESLA_V100': [1, 2, 4, 8]}
+MACHINE_CATALOG = {
+    **{f'e2-standard-{n}': {'cpu': n, 'memory': 4 * n, 'accelerators': {}} for n in (2, 4, 8, 16, 32)},
+    **{f'e2-highmem-{n}': {'cpu': n, 'memory': 8 * n, 'accelerators': {}} for n in (2, 4, 8, 16)},
+    **{f'n1-standard-{n}': {'cpu': n, 'memory': 3.75 * n, 'accelerators': _N1_ACCELERATORS} for n in (4, 8, 16, 32, 64, 96)},
+    **{f'n1-highmem-{n}': {'cpu': n, 'memory': 6.5 * n, 'accelerators': _N1_ACCELERATORS} for n in (2, 4, 8, 16, 32, 64, 96)},
+    **{f'a2-highgpu-{n}g': {'cpu': 12 * n, 'memory': 85 * n, 'accelerators': {'NVIDIA_TESLA_A100': [n]}, 'accelerator_optimized': True} for n in (1, 2, 4, 8)},
+    **{f'a2-ultragpu-{n}g': {'cpu': 12 * n, 'memory': 170 * n, 'accelerators': {'NVIDIA_A100_80GB': [n]}, 'accelerator_optimized': True} for n in (1, 2, 4, 8)},
+    **{f'g2-standard-{n}': {'cpu': n, 'memory': 4 * n, 'accelerators': {'NVIDIA_L4': [count]}, 'accelerator_optimized': True}
+       for n, count in ((4, 1), (8, 1), (12, 1), (16, 1), (24, 2), (32, 1), (48, 4), (96, 8))}}
+
 # Generated kfp pipeline metadata name
 DEFAULT_PIPELINE_NAME = 'automlops-pipeline'
 
@@ -83,3 +224,54 @@ NEWLINE = '\n'
 
 # KFP v2 Migration constant
 PINNED_KFP_VERSION = 'kfp<2.0.0'
+
+# Oldest kfp version a lock may pin; generated tasks import kfp.v2
+MIN_LOCKED_KFP_VERSION = (1, 8)
+
+# Distributions that a library needs for common usage in components but
+# does not declare as dependencies, keyed by the normalized name of that
+# library. They are only added to inferred requirements when it is imported.
+COMPANION_REQUIREMENTS = {
+    # QueryJob.to_dataframe() and the bigquery storage read api
+    'google-cloud-bigquery': ['db_dtypes', 'google-cloud-bigquery-storage', 'pyarrow'],
+    # Reading and writing gs:// paths
+    'pandas': ['fsspec', 'gcsfs']
+}
+
+# Packages that used to be added to the inferred requirements of every
+# component. Requirements are now selected from the imports of the
+# components, and the requirements report lists which of these were dropped.
+DEFAULT_GCP_REQUIREMENTS = [
+    'google-cloud-aiplatform',
+    'google-cloud-appengine-logging',
+    'google-cloud-audit-log',
+    'google-cloud-bigquery',
+    'google-cloud-bigquery-storage',
+    'google-cloud-bigtable',
+    'google-cloud-core',
+    'google-cloud-dataproc',
+    'google-cloud-datastore',
+    'google-cloud-dlp',
+    'google-cloud-firestore',
+    'google-cloud-kms',
+    'google-cloud-language',
+    'google-cloud-logging',
+    'google-cloud-monitoring',
+    'google-cloud-notebooks',
+    'google-cloud-pipeline-components',
+    'google-cloud-pubsub',
+    'google-cloud-pubsublite',
+    'google-cloud-recommendations-ai',
+    'google-cloud-resource-manager',
+    'google-cloud-scheduler',
+    'google-cloud-spanner',
+    'google-cloud-speech',
+    'google-cloud-storage',
+    'google-cloud-tasks',
+    'google-cloud-translate',
+    'google-cloud-videointelligence',
+    'google-cloud-vision',
+    'db_dtypes',
+    'pyarrow',
+    'gcsfs',
+    'fsspec']
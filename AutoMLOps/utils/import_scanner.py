@@ -0,0 +1,259 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Infers pip requirements from python sources by scanning their imports
+   in-process. Scan results are cached per source file hash."""
+
+# pylint: disable=line-too-long
+
+import ast
+import importlib.util
+import json
+import logging
+import os
+import re
+import sys
+import sysconfig
+from typing import Dict, List, Optional, Set
+
+from AutoMLOps.utils.constants import COMPANION_REQUIREMENTS, IMPORT_SCAN_CACHE_FILE
+from AutoMLOps.utils.lockfile import get_requirement_name
+from AutoMLOps.utils.manifest import hash_contents
+from AutoMLOps.utils.utils import in_virtual_filesystem, list_files, read_file
+
+# Import names whose distribution name on PyPI differs from the module name
+MODULE_DISTRIBUTION_MAP = {
+    'attr': 'attrs',
+    'bs4': 'beautifulsoup4',
+    'cv2': 'opencv-python',
+    'dateutil': 'python-dateutil',
+    'dotenv': 'python-dotenv',
+    'google.ai.generativelanguage': 'google-ai-generativelanguage',
+    'google.api': 'googleapis-common-protos',
+    'google.api_core': 'google-api-core',
+    'google.auth': 'google-auth',
+    'google.cloud.client': 'google-cloud-core',
+    'google.cloud.exceptions': 'google-cloud-core',
+    'google.genai': 'google-genai',
+    'google.generativeai': 'google-generativeai',
+    'google.iam': 'grpc-google-iam-v1',
+    'google.longrunning': 'googleapis-common-protos',
+    'google.oauth2': 'google-auth',
+    'google.protobuf': 'protobuf',
+    'google.resumable_media': 'google-resumable-media',
+    'google.rpc': 'googleapis-common-protos',
+    'google.type': 'googleapis-common-protos',
+    'google_cloud_pipeline_components': 'google-cloud-pipeline-components',
+    'googleapiclient': 'google-api-python-client',
+    'jwt': 'PyJWT',
+    'PIL': 'Pillow',
+    'skimage': 'scikit-image',
+    'sklearn': 'scikit-learn',
+    'yaml': 'PyYAML'
+}
+
+def get_imported_modules(source: str) -> Set[str]:
+    """Returns the absolute module names imported by a python source.
+
+    Args:
+        source: Python source code.
+    Returns:
+        set: Imported module names, e.g. {'pandas', 'google.cloud.bigquery'}.
+    Raises:
+        Exception: If the source cannot be parsed.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as err:
+        raise ValueError(f'Error parsing source for imports. {err}') from err
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module)
+            # from google.cloud import bigquery imports the google.cloud.bigquery package
+            if node.module in ('google', 'google.cloud'):
+                modules.update(f'{node.module}.{alias.name}' for alias in node.names)
+    return modules
+
+def get_referenced_names(source: str) -> Optional[Set[str]]:
+    """Returns the names a python source loads, including those in string
+    annotations, e.g. to find which names its module must import.
+
+    Args:
+        source: Python source code.
+    Returns:
+        set: Referenced names, e.g. {'Input', 'Dataset', 'pd'}, or None if
+            the source cannot be parsed.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.arg, ast.FunctionDef, ast.AsyncFunctionDef, ast.AnnAssign)):
+            annotation = node.returns if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) else node.annotation
+            if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str):
+                names.update(get_referenced_names(annotation.value) or set())
+    return names
+
+def is_stdlib_module(module: str) -> bool:
+    """Checks whether a module belongs to the python standard library.
+
+    Args:
+        module: Absolute module name.
+    Returns:
+        bool: Whether the module is part of the standard library.
+    """
+    top_level = module.split('.')[0]
+    if top_level in sys.builtin_module_names:
+        return True
+    if hasattr(sys, 'stdlib_module_names'):
+        return top_level in sys.stdlib_module_names
+    try:
+        spec = importlib.util.find_spec(top_level)
+    except (ImportError, ValueError):
+        return False
+    if spec is None or spec.origin is None:
+        return False
+    stdlib_dir = sysconfig.get_paths()['stdlib']
+    return spec.origin.startswith(stdlib_dir) and 'site-packages' not in spec.origin
+
+def get_module_distribution(module: str) -> Optional[str]:
+    """Maps an imported module to the name of the distribution that provides it.
+    Versioned google API modules, e.g. google.cloud.aiplatform_v1beta1, map to
+    the distribution of the unversioned module. The google namespace is not
+    a distribution itself, so google modules that are not known are skipped
+    with a warning.
+
+    Args:
+        module: Absolute module name.
+    Returns:
+        str: Distribution name, e.g. 'scikit-learn' for 'sklearn.tree', or
+            None for an unknown google module.
+    """
+    parts = module.split('.')
+    if parts[0] == 'google':
+        parts = [re.sub(r'_v[0-9]+(p[0-9]+)?((alpha|beta)[0-9]*)?$', '', part) for part in parts]
+    for i in range(len(parts), 0, -1):
+        prefix = '.'.join(parts[:i])
+        if prefix in MODULE_DISTRIBUTION_MAP:
+            return MODULE_DISTRIBUTION_MAP[prefix]
+    if parts[0] == 'google' and len(parts) > 2 and parts[1] == 'cloud':
+        return 'google-cloud-' + parts[2].replace('_', '-')
+    if parts[0] == 'google':
+        logging.warning('Skipping requirement for %s: no known distribution provides it. '
+                        'Add it to packages_to_install if the component needs it.', module)
+        return None
+    return parts[0]
+
+def infer_requirements(directory: str, skip_files: Optional[List[str]] = None) -> List[str]:
+    """Scans the python files in a directory and returns the distributions
+    they import, excluding the standard library and modules local to the directory.
+    Files whose contents are unchanged since the last scan are not re-parsed.
+
+    Args:
+        directory: Path to the directory of python sources.
+        skip_files: Names of files whose imports are not scanned, e.g. because
+            their requirements are declared. They are still local modules.
+    Returns:
+        list: Sorted distribution names.
+    """
+    # The scan cache lives on disk, so it is not used while rendering in memory
+    use_cache = not in_virtual_filesystem()
+    cache = _read_scan_cache() if use_cache else {}
+    scanned = {}
+    local_modules = set()
+    imported_modules = set()
+    for filepath in list_files(directory):
+        filename = os.path.basename(filepath)
+        if not filename.endswith('.py'):
+            continue
+        local_modules.add(filename[:-len('.py')])
+        if filename in (skip_files or []):
+            continue
+        source = read_file(filepath)
+        source_hash = hash_contents(source)
+        if source_hash not in cache:
+            cache[source_hash] = sorted(get_imported_modules(source))
+        scanned[source_hash] = cache[source_hash]
+        imported_modules.update(scanned[source_hash])
+    # Only keep entries for the current sources so the cache stays bounded
+    if use_cache:
+        _write_scan_cache(scanned)
+
+    return get_requirements(imported_modules, local_modules)
+
+def get_requirements(imported_modules: Set[str], local_modules: Set[str]) -> List[str]:
+    """Returns the distributions that provide the given modules, excluding
+    the standard library and local modules.
+
+    Args:
+        imported_modules: Absolute names of the imported modules.
+        local_modules: Names of the top-level modules that are local to the sources.
+    Returns:
+        list: Sorted distribution names.
+    """
+    distributions = {
+        get_module_distribution(module) for module in imported_modules
+        if module.split('.')[0] not in local_modules and not is_stdlib_module(module)
+        and module not in ('google', 'google.cloud')}
+    return sorted(distributions - {None})
+
+def get_companion_requirements(requirements: List[str]) -> Dict[str, str]:
+    """Returns the distributions that the given requirements need for common
+    usage in components but do not declare as dependencies, e.g. db_dtypes
+    and pyarrow for google-cloud-bigquery.
+
+    Args:
+        requirements: Requirement specifiers, e.g. ['pandas', 'kfp<2.0.0'].
+    Returns:
+        dict: Name of the requirement that needs each companion distribution,
+            keyed by the companion distribution.
+    """
+    companions = {}
+    for requirement in sorted(requirements):
+        name = get_requirement_name(requirement)
+        for companion in COMPANION_REQUIREMENTS.get(name, []):
+            companions.setdefault(companion, name)
+    return companions
+
+def _read_scan_cache() -> Dict[str, List[str]]:
+    """Reads cached import scan results, keyed by source hash.
+
+    Returns:
+        dict: Imported modules of previously scanned sources.
+    """
+    try:
+        with open(IMPORT_SCAN_CACHE_FILE, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def _write_scan_cache(cache: Dict[str, List[str]]):
+    """Writes import scan results to the cache. A missing cache directory
+    is not an error; the scan is simply not cached.
+
+    Args:
+        cache: Imported modules of scanned sources, keyed by source hash.
+    """
+    try:
+        with open(IMPORT_SCAN_CACHE_FILE, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, indent=2, sort_keys=True)
+    except OSError:
+        pass
@@ -0,0 +1,363 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resolves requirements into fully pinned lock files with hashes, offline
+   against a local wheelhouse or package index. Resolved locks are cached
+   by their inputs."""
+
+# pylint: disable=line-too-long
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from AutoMLOps.utils.constants import (
+    LOCK_CACHE_MAX_ENTRIES,
+    LOCK_RESOLVER_REVISION,
+    LOCK_TARGET_PLATFORM,
+    MIN_LOCKED_KFP_VERSION,
+    REQUIREMENTS_LOCK_CACHE_FILE
+)
+from AutoMLOps.utils.manifest import hash_contents
+from AutoMLOps.utils.tracing import span
+from AutoMLOps.utils.utils import in_virtual_filesystem
+
+def normalize_name(name: str) -> str:
+    """Normalizes a distribution name as described in PEP 503.
+
+    Args:
+        name: Distribution name, e.g. Scikit_Learn.
+    Returns:
+        str: Normalized name, e.g. scikit-learn.
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+def get_requirement_name(requirement: str) -> str:
+    """Returns the normalized distribution name of a requirement specifier.
+
+    Args:
+        requirement: Requirement specifier, e.g. google-cloud-bigquery[pandas]>=3.
+    Returns:
+        str: Normalized name, e.g. google-cloud-bigquery.
+    """
+    return normalize_name(re.split(r'[\s\[<>=!~;@]', requirement.strip(), maxsplit=1)[0])
+
+def get_target_python_version(base_image: str) -> Optional[str]:
+    """Returns the python version of an official python base image, which
+    requirements are locked for.
+
+    Args:
+        base_image: The image used in the component base dockerfile.
+    Returns:
+        str: Python version such as 3.9, or None if the base image is not
+            an official python image.
+    """
+    match = re.fullmatch(r'(?:docker\.io/)?(?:library/)?python:(\d+\.\d+)(?:[.-].*)?', base_image)
+    return match.group(1) if match else None
+
+def is_index_url(wheelhouse: str) -> bool:
+    """Checks whether a wheelhouse is the url of a package index rather than
+    a local directory of wheels, which images are then installed from offline.
+
+    Args:
+        wheelhouse: Directory of wheels and sdists, or the url of a package index.
+    Returns:
+        bool: Whether the wheelhouse is an http(s) url.
+    """
+    return re.match(r'^https?://', wheelhouse) is not None
+
+def get_wheelhouse_fingerprint(wheelhouse: str) -> str:
+    """Summarizes the contents of a wheelhouse, so locks are re-resolved
+    when packages are added to or removed from it.
+
+    Args:
+        wheelhouse: Directory of wheels and sdists, or the url of a package index.
+    Returns:
+        str: Hash of the file names and sizes in the directory, or of the url.
+    """
+    if not os.path.isdir(wheelhouse):
+        return hash_contents(wheelhouse)
+    return hash_contents(*(
+        f'{filename}:{os.path.getsize(os.path.join(wheelhouse, filename))}'
+        for filename in sorted(os.listdir(wheelhouse))))
+
+def lock_requirements(requirements: List[str],
+                      wheelhouse: str,
+                      python_version: Optional[str] = None,
+                      constraints: Optional[str] = None) -> str:
+    """Creates the contents of a lock file that pins every distribution
+    needed by the requirements, including transitive ones, to an exact
+    version with its hashes. Locks are cached by their inputs, and only
+    resolved when those change.
+
+    Args:
+        requirements: Requirement specifiers, e.g. ['pandas', 'kfp<2.0.0'].
+        wheelhouse: Directory of wheels and sdists, or the url of a package index.
+        python_version: Python version to resolve for (default: the running interpreter).
+        constraints: Lock file whose pinned versions must be kept, e.g. the
+            lock of the image this one is layered on.
+    Returns:
+        str: Lock file contents, installable with pip install --require-hashes.
+    Raises:
+        Exception: If the requirements cannot be resolved, or a lock that is
+            not cached would be resolved inside a virtual_filesystem() block.
+    """
+    requirements = sorted({r for r in requirements if r})
+    constraint_pins = _get_pins(constraints) if constraints else []
+    key = hash_contents(*requirements, '--constraints', *constraint_pins,
+                        get_wheelhouse_fingerprint(wheelhouse), python_version,
+                        str(LOCK_RESOLVER_REVISION))
+    cache = _read_lock_cache()
+    if key in cache:
+        lock = cache.pop(key)
+    else:
+        if in_virtual_filesystem():
+            raise RuntimeError('Requirements changed since they were last locked; run generate() without dry_run to resolve them.')
+        lock = format_lock(resolve_requirements(requirements, wheelhouse, python_version, constraint_pins))
+    cache[key] = lock
+    if not in_virtual_filesystem():
+        _write_lock_cache(dict(list(cache.items())[-LOCK_CACHE_MAX_ENTRIES:]))
+    return lock
+
+def resolve_requirements(requirements: List[str],
+                         wheelhouse: str,
+                         python_version: Optional[str] = None,
+                         constraint_pins: Optional[List[str]] = None) -> Dict[str, Tuple[str, List[str]]]:
+    """Resolves requirements with pip against a wheelhouse or package index,
+    without installing anything or reaching any other index. When a python
+    version is given, only wheels for that version on the target platform
+    are considered, so distributions published only as sdists, such as kfp
+    1.8, are first built into pure python wheels; the lock pins them with
+    the hashes of their sdists, which the images install.
+
+    Args:
+        requirements: Requirement specifiers.
+        wheelhouse: Directory of wheels and sdists, or the url of a package index.
+        python_version: Python version to resolve for (default: the running interpreter).
+        constraint_pins: Pinned versions that must be kept, e.g. ['pandas==2.0.3'].
+    Returns:
+        dict: Version and sorted sha256 hashes of every distribution, keyed by normalized name.
+    Raises:
+        Exception: If pip cannot resolve the requirements, or resolves a kfp
+            version older than generated components need.
+    """
+    sources = ['--index-url', wheelhouse] if is_index_url(wheelhouse) else ['--no-index', '--find-links', wheelhouse]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        requirements_file = os.path.join(tmpdir, 'requirements.txt')
+        constraints_file = os.path.join(tmpdir, 'constraints.txt')
+        report_file = os.path.join(tmpdir, 'report.json')
+        with open(requirements_file, 'w', encoding='utf-8') as file:
+            file.write(''.join(r + '\n' for r in requirements))
+        with open(constraints_file, 'w', encoding='utf-8') as file:
+            file.write(''.join(pin + '\n' for pin in constraint_pins or []))
+
+        sdist_hashes = {}
+        command = [sys.executable, '-m', 'pip', 'install', '--dry-run', '--ignore-installed', '--quiet',
+                   '--disable-pip-version-check', '--report', report_file,
+                   '-r', requirements_file, '-c', constraints_file, *sources]
+        if python_version:
+            sdists_dir = os.path.join(tmpdir, 'sdists')
+            sdist_hashes = build_sdist_wheels(requirements_file, sources, sdists_dir, constraints_file)
+            # Platform specific options need a --target, which a dry run leaves untouched
+            command += ['--find-links', sdists_dir, '--python-version', python_version, '--implementation', 'cp',
+                        '--platform', LOCK_TARGET_PLATFORM, '--only-binary=:all:',
+                        '--target', os.path.join(tmpdir, 'target')]
+        with span('resolve_requirements', requirements=len(requirements)):
+            result = subprocess.run(command, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            raise RuntimeError(f'Error resolving requirements. {result.stderr.strip()}')
+        with open(report_file, 'r', encoding='utf-8') as file:
+            report = json.load(file)
+
+    wheelhouse_hashes = _get_wheelhouse_hashes(wheelhouse)
+    resolved = {}
+    for item in report['install']:
+        name = normalize_name(item['metadata']['name'])
+        version = item['metadata']['version']
+        hashes = set(wheelhouse_hashes.get((name, version), []))
+        archive_hashes = item['download_info'].get('archive_info', {}).get('hashes', {})
+        if (name, version) in sdist_hashes:
+            # The wheel was built locally; images install the sdist it was built from
+            hashes.update(sdist_hashes[(name, version)])
+        elif 'sha256' in archive_hashes:
+            hashes.add(archive_hashes['sha256'])
+        if not hashes:
+            raise RuntimeError(f'Error resolving requirements. No sha256 hash is known for {name}=={version}.')
+        resolved[name] = (version, sorted(hashes))
+    if 'kfp' in resolved and tuple(int(n) for n in re.findall(r'[0-9]+', resolved['kfp'][0])[:2]) < MIN_LOCKED_KFP_VERSION:
+        raise RuntimeError(f'Error resolving requirements. Resolved kfp=={resolved["kfp"][0]}, but generated components need kfp '
+                           f'{".".join(map(str, MIN_LOCKED_KFP_VERSION))} or later; add it to the wheelhouse with python -m AutoMLOps wheelhouse.')
+    return resolved
+
+def build_sdist_wheels(requirements_file: str,
+                       sources: List[str],
+                       wheel_dir: str,
+                       constraints_file: Optional[str] = None) -> Dict[Tuple[str, str], List[str]]:
+    """Builds wheels for the distributions that the requirements resolve to
+    sdists for, as resolving for another python version or platform only
+    considers wheels. Only pure python wheels are kept, since those install
+    on any platform. Requirements are resolved for the running interpreter
+    here, so if they cannot be, no wheels are built, and sdists that fail
+    to build are skipped.
+
+    Args:
+        requirements_file: Path to the requirements file.
+        sources: pip options of the wheelhouse or package index to use.
+        wheel_dir: Empty directory to build the wheels in.
+        constraints_file: Path to a constraints file.
+    Returns:
+        dict: sha256 hashes of the sdist of each built wheel, keyed by
+            normalized name and version.
+    """
+    report_file = os.path.join(wheel_dir, 'report.json')
+    os.makedirs(wheel_dir, exist_ok=True)
+    with span('resolve_sdists'):
+        result = subprocess.run(
+            [sys.executable, '-m', 'pip', 'install', '--dry-run', '--ignore-installed', '--quiet',
+             '--disable-pip-version-check', '--report', report_file,
+             '-r', requirements_file, *(['-c', constraints_file] if constraints_file else []), *sources],
+            capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        return {}
+    with open(report_file, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    os.remove(report_file)
+    sdists = {}
+    for item in report['install']:
+        url = item['download_info']['url']
+        if 'archive_info' in item['download_info'] and not url.endswith('.whl'):
+            sdists[url] = (normalize_name(item['metadata']['name']), item['metadata']['version'],
+                           item['download_info']['archive_info'].get('hashes', {}).get('sha256'))
+    for url in sdists:
+        with span('build_sdist_wheel', sdist=url):
+            subprocess.run(
+                [sys.executable, '-m', 'pip', 'wheel', '--no-deps', '--quiet', '--disable-pip-version-check',
+                 '--wheel-dir', wheel_dir, *sources, url],
+                capture_output=True, text=True, check=False)
+    built = {}
+    for filename in os.listdir(wheel_dir):
+        if not filename.endswith('-none-any.whl'):
+            os.remove(os.path.join(wheel_dir, filename))
+            continue
+        built[_parse_dist_filename(filename)] = filename
+    return {(name, version): [sha256] if sha256 else [] for name, version, sha256 in sdists.values() if (name, version) in built}
+
+def format_lock(resolved: Dict[str, Tuple[str, List[str]]]) -> str:
+    """Formats resolved distributions as a pip requirements file with hashes.
+
+    Args:
+        resolved: Version and hashes of every distribution, keyed by name.
+    Returns:
+        str: Lock file contents.
+    """
+    lines = ['# Generated by AutoMLOps; do not edit. Install with pip install --require-hashes -r requirements.lock\n']
+    for name, (version, hashes) in sorted(resolved.items()):
+        lines.append(f'{name}=={version}' + ''.join(f' \\\n    --hash=sha256:{h}' for h in hashes) + '\n')
+    return ''.join(lines)
+
+def get_lock_download_size(lock: str, wheelhouse: str) -> Optional[int]:
+    """Estimates how much a lock downloads from a wheelhouse directory: the
+    size of the largest file of each pinned version, as a wheelhouse may
+    hold files for several platforms.
+
+    Args:
+        lock: Lock file contents; pins repeated across concatenated locks are counted once.
+        wheelhouse: Directory of wheels and sdists, or the url of a package index.
+    Returns:
+        int: Size in bytes, or None if the wheelhouse is not a directory.
+    """
+    if not os.path.isdir(wheelhouse):
+        return None
+    sizes = {}
+    for filename in os.listdir(wheelhouse):
+        dist = _parse_dist_filename(filename)
+        if dist:
+            sizes[dist] = max(sizes.get(dist, 0), os.path.getsize(os.path.join(wheelhouse, filename)))
+    total = 0
+    for pin in set(_get_pins(lock)):
+        name, version = pin.split('==', 1)
+        total += sizes.get((normalize_name(name), version), 0)
+    return total
+
+def _get_pins(lock: str) -> List[str]:
+    """Returns the name==version pins of a lock file, without their hashes.
+
+    Args:
+        lock: Lock file contents.
+    Returns:
+        list: Pins such as pandas==2.0.3.
+    """
+    return re.findall(r'^([A-Za-z0-9][A-Za-z0-9._-]*==[^\s\\]+)', lock, flags=re.MULTILINE)
+
+def _get_wheelhouse_hashes(wheelhouse: str) -> Dict[Tuple[str, str], List[str]]:
+    """Hashes every file in a wheelhouse directory, so a lock accepts any
+    of the files built for a pinned version.
+
+    Args:
+        wheelhouse: Directory of wheels and sdists, or the url of a package index.
+    Returns:
+        dict: sha256 hashes, keyed by normalized name and version.
+    """
+    hashes = {}
+    if not os.path.isdir(wheelhouse):
+        return hashes
+    for filename in sorted(os.listdir(wheelhouse)):
+        dist = _parse_dist_filename(filename)
+        if not dist:
+            continue
+        with open(os.path.join(wheelhouse, filename), 'rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        hashes.setdefault(dist, []).append(digest)
+    return hashes
+
+def _parse_dist_filename(filename: str) -> Optional[Tuple[str, str]]:
+    """Parses the name and version of a wheel or sdist file name.
+
+    Args:
+        filename: File name, e.g. pandas-2.0.3-cp39-cp39-manylinux2014_x86_64.whl.
+    Returns:
+        tuple: Normalized name and version, or None if it is not a distribution file.
+    """
+    match = re.match(r'^(.+?)-([^-]+?)(?:(?:-\d[^-]*)?-[^-]+-[^-]+-[^-]+\.whl|\.tar\.gz|\.zip)$', filename)
+    return (normalize_name(match.group(1)), match.group(2)) if match else None
+
+def _read_lock_cache() -> Dict[str, str]:
+    """Reads cached locks, keyed by a hash of their inputs, least recently used first.
+
+    Returns:
+        dict: Cached lock file contents.
+    """
+    try:
+        with open(REQUIREMENTS_LOCK_CACHE_FILE, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def _write_lock_cache(cache: Dict[str, str]):
+    """Writes locks to the cache. A missing cache directory is not an
+    error; the lock is simply not cached.
+
+    Args:
+        cache: Lock file contents, keyed by a hash of their inputs.
+    """
+    try:
+        with open(REQUIREMENTS_LOCK_CACHE_FILE, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, indent=2)
+    except OSError:
+        pass
@@ -0,0 +1,157 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tracks content hashes of generation inputs and outputs so that
+   unchanged outputs are not rebuilt on subsequent generate() calls."""
+
+# pylint: disable=line-too-long
+
+import functools
+import hashlib
+import json
+import os
+from typing import List
+
+from AutoMLOps import __version__
+from AutoMLOps.utils.utils import in_virtual_filesystem, read_bytes
+
+def hash_contents(*contents) -> str:
+    """Returns a sha256 hex digest of the given contents.
+
+    Args:
+        contents: Strings or bytes to be hashed, in order.
+    Returns:
+        str: Hex digest of the contents.
+    """
+    digest = hashlib.sha256()
+    for content in contents:
+        if not isinstance(content, bytes):
+            content = str(content).encode('utf-8')
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+def hash_file(filepath: str) -> str:
+    """Returns a sha256 hex digest of a file's contents, or None if it
+       does not exist. Files written in a virtual_filesystem() block are
+       hashed from memory.
+
+    Args:
+        filepath: Path to the file.
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    try:
+        return hash_contents(read_bytes(filepath))
+    except FileNotFoundError:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def get_generator_fingerprint() -> str:
+    """Returns a hash of the AutoMLOps version and the sources of the
+       modules that render outputs, so that upgrading AutoMLOps or editing
+       its templates invalidates previously generated targets.
+
+    Returns:
+        str: Hex digest of the generator.
+    """
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    contents = [__version__]
+    for subpackage in ('deployments', 'frameworks', 'utils'):
+        for root, dirs, files in os.walk(os.path.join(package_dir, subpackage)):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            for filename in sorted(f for f in files if f.endswith('.py')):
+                filepath = os.path.join(root, filename)
+                with open(filepath, 'rb') as file:
+                    contents.extend([os.path.relpath(filepath, package_dir), file.read()])
+    return hash_contents(*contents)
+
+class GenerationManifest():
+    """Records, for each generated target, a hash of its inputs and a
+    hash of every output file it wrote. Inputs hashes are combined with
+    get_generator_fingerprint(), so every target is stale after an AutoMLOps
+    upgrade. Inside a virtual_filesystem() block
+    the manifest is neither read nor written and every target is stale, so
+    all outputs are rendered into memory."""
+    def __init__(self, filepath: str):
+        """Loads the manifest at filepath if one exists.
+
+        Args:
+            filepath: Path to the manifest json.
+        """
+        self._filepath = filepath
+        self._entries = {}
+        self._enabled = not in_virtual_filesystem()
+        if not self._enabled:
+            return
+        try:
+            with open(filepath, 'r', encoding='utf-8') as file:
+                self._entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def is_fresh(self, target: str, inputs_hash: str) -> bool:
+        """Checks whether a target can be skipped. A target is fresh if its
+        inputs are unchanged and all of its outputs are on disk untouched.
+
+        Args:
+            target: Name of the generated target.
+            inputs_hash: Hash of the target's current inputs.
+        Returns:
+            bool: Whether the target's outputs are up to date.
+        """
+        entry = self._entries.get(target)
+        if not entry or entry['inputs'] != hash_contents(get_generator_fingerprint(), inputs_hash):
+            return False
+        return all(hash_file(path) == output_hash for path, output_hash in entry['outputs'].items())
+
+    def record(self, target: str, inputs_hash: str, outputs: List[str]):
+        """Records the inputs hash and the current contents of a target's outputs.
+
+        Args:
+            target: Name of the generated target.
+            inputs_hash: Hash of the target's inputs.
+            outputs: Paths of the files written for this target.
+        """
+        if not self._enabled:
+            return
+        self._entries[target] = {
+            'inputs': hash_contents(get_generator_fingerprint(), inputs_hash),
+            'outputs': {path: hash_file(path) for path in outputs}}
+
+    def refresh(self, target: str):
+        """Re-hashes the outputs of a recorded target after a later step
+        rewrote them, so they are not considered modified next time.
+
+        Args:
+            target: Name of the generated target.
+        """
+        entry = self._entries.get(target)
+        if not self._enabled or not entry:
+            return
+        entry['outputs'] = {path: hash_file(path) for path in entry['outputs']}
+
+    def save(self):
+        """Writes the manifest to disk.
+
+        Raises:
+            Exception: If an error is encountered writing the file.
+        """
+        if not self._enabled:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._filepath) or '.', exist_ok=True)
+            with open(self._filepath, 'w', encoding='utf-8') as file:
+                json.dump(self._entries, file, indent=2, sort_keys=True)
+        except OSError as err:
+            raise OSError(f'Error writing to file. {err}') from err
@@ -0,0 +1,145 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Parses the cpu, memory and accelerators declared on components, and
+   validates them against the machine catalog. Quantities use the formats
+   kfp sets task resource limits with."""
+
+# pylint: disable=line-too-long
+
+import re
+from typing import Dict, Optional, Union
+
+from AutoMLOps.utils.constants import MACHINE_CATALOG, RESOURCE_ANNOTATIONS
+
+# Multipliers of the suffixes of memory quantities
+MEMORY_SUFFIXES = {
+    '': 1,
+    'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9, 'T': 10 ** 12, 'P': 10 ** 15, 'E': 10 ** 18,
+    'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40, 'Pi': 2 ** 50, 'Ei': 2 ** 60}
+
+def get_cpu_number(cpu: str) -> float:
+    """Converts a cpu quantity, a number of vCPUs or of millicpus followed
+    by 'm', to a number of vCPUs.
+
+    Args:
+        cpu: The cpu quantity, e.g. '4' or '500m'.
+    Returns:
+        float: Number of vCPUs.
+    Raises:
+        Exception: If the quantity is not valid.
+    """
+    match = re.fullmatch(r'([0-9]+)m|([0-9]*\.?[0-9]+)', cpu)
+    if not match or float(cpu.rstrip('m')) <= 0:
+        raise ValueError(f'Invalid cpu "{cpu}". Should be a positive number, or an integer followed by "m".')
+    return int(match.group(1)) / 1000 if match.group(1) else float(match.group(2))
+
+def get_memory_bytes(memory: str) -> int:
+    """Converts a memory quantity, an integer optionally followed by one of
+    E, P, T, G, M, K or Ei, Pi, Ti, Gi, Mi, Ki, to a number of bytes.
+
+    Args:
+        memory: The memory quantity, e.g. '16G' or '512Mi'.
+    Returns:
+        int: Number of bytes.
+    Raises:
+        Exception: If the quantity is not valid.
+    """
+    match = re.fullmatch(r'([0-9]+)([KMGTPE]i?)?', memory)
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f'Invalid memory "{memory}". Should be a positive integer, or an integer followed by one of "E|Ei|P|Pi|T|Ti|G|Gi|M|Mi|K|Ki".')
+    return int(match.group(1)) * MEMORY_SUFFIXES[match.group(2) or '']
+
+def create_resource_annotations(cpu: Optional[Union[int, float, str]] = None,
+                                memory: Optional[str] = None,
+                                accelerator_type: Optional[str] = None,
+                                accelerator_count: Optional[int] = None) -> Dict[str, str]:
+    """Creates the annotations of a component spec that hold the resources
+    declared on its decorator. Accelerator types are converted to the enum
+    style, e.g. nvidia-tesla-t4 to NVIDIA_TESLA_T4, and default to one
+    accelerator.
+
+    Args:
+        cpu: Number of vCPUs, or millicpus followed by 'm'.
+        memory: Memory quantity, e.g. '16G'.
+        accelerator_type: Type of accelerator to attach, e.g. NVIDIA_TESLA_T4.
+        accelerator_count: Number of accelerators to attach.
+    Returns:
+        dict: Annotation values, keyed by annotation.
+    Raises:
+        Exception: If a quantity is not valid, or accelerators are counted
+            without a type.
+    """
+    resources = {}
+    if cpu is not None:
+        get_cpu_number(str(cpu))
+        resources['cpu'] = str(cpu)
+    if memory is not None:
+        get_memory_bytes(str(memory))
+        resources['memory'] = str(memory)
+    if accelerator_count is not None and not accelerator_type:
+        raise ValueError('accelerator_count is given without an accelerator_type.')
+    if accelerator_type:
+        if accelerator_count is not None and (not isinstance(accelerator_count, int) or accelerator_count <= 0):
+            raise ValueError(f'Invalid accelerator_count "{accelerator_count}". Should be a positive integer.')
+        resources['accelerator_type'] = accelerator_type.replace('-', '_').upper()
+        resources['accelerator_count'] = str(accelerator_count or 1)
+    return {RESOURCE_ANNOTATIONS[name]: value for name, value in resources.items()}
+
+def get_component_resources(component_spec: dict) -> Dict[str, str]:
+    """Returns the resources declared on a component.
+
+    Args:
+        component_spec: Contents of the component yaml.
+    Returns:
+        dict: Quantities of cpu, memory, accelerator_type and
+            accelerator_count, keyed by the name of the resource; resources
+            that are not declared are left out.
+    """
+    annotations = (component_spec.get('metadata') or {}).get('annotations') or {}
+    return {name: annotations[key] for name, key in RESOURCE_ANNOTATIONS.items() if key in annotations}
+
+def get_machine_type(resources: Dict[str, str]) -> Optional[str]:
+    """Finds the smallest machine type in the machine catalog that fits the
+    resources declared on a component. Memory is compared in GB, as kfp
+    sets task memory limits.
+
+    Args:
+        resources: Quantities of the declared resources, as returned by
+            get_component_resources.
+    Returns:
+        str: Name of the machine type, or None if no resources are declared.
+    Raises:
+        Exception: If no machine type fits the resources.
+    """
+    if not resources:
+        return None
+    cpu = get_cpu_number(resources['cpu']) if 'cpu' in resources else 0
+    memory = get_memory_bytes(resources['memory']) / 10 ** 9 if 'memory' in resources else 0
+    accelerator_type = resources.get('accelerator_type')
+    if accelerator_type and not any(accelerator_type in machine['accelerators'] for machine in MACHINE_CATALOG.values()):
+        supported = sorted({name for machine in MACHINE_CATALOG.values() for name in machine['accelerators']})
+        raise ValueError(f'Unsupported accelerator_type "{accelerator_type}". Should be one of {", ".join(supported)}.')
+    for machine_type, machine in sorted(MACHINE_CATALOG.items(), key=lambda item: (item[1]['cpu'], item[1]['memory'], item[0])):
+        if cpu > machine['cpu'] or memory > machine['memory']:
+            continue
+        if accelerator_type and int(resources['accelerator_count']) not in machine['accelerators'].get(accelerator_type, []):
+            continue
+        if not accelerator_type and machine.get('accelerator_optimized'):
+            continue
+        return machine_type
+    declared = [f'{cpu:g} vCPUs'] if 'cpu' in resources else []
+    declared += [f'{resources["memory"]} of memory'] if 'memory' in resources else []
+    declared += [f'{resources["accelerator_count"]} {accelerator_type}'] if accelerator_type else []
+    raise ValueError(f'No machine type in the catalog has {", ".join(declared)}.')
@@ -0,0 +1,151 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Opt-in timing spans for the generate() and run() phases, written as a
+   Chrome trace (viewable in chrome://tracing or Perfetto). Tracing is
+   enabled by setting the AUTOMLOPS_TRACE_FILE environment variable."""
+
+# pylint: disable=line-too-long
+
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from AutoMLOps.utils.constants import TRACE_FILE_ENV_VAR
+
+_EVENTS = []
+_THREAD_NAMES = {}
+_EVENTS_LOCK = threading.Lock()
+
+# Number of root spans that are open; the outermost one writes the trace
+_ROOT_DEPTH = [0]
+
+def is_enabled() -> bool:
+    """Checks whether tracing is enabled.
+
+    Returns:
+        bool: Whether the trace file environment variable is set.
+    """
+    return bool(os.environ.get(TRACE_FILE_ENV_VAR))
+
+@contextlib.contextmanager
+def span(name: str, **args):
+    """Records the enclosed block as a complete event, if tracing is enabled.
+
+    Args:
+        name: Name of the span.
+        args: Additional values to attach to the span.
+    """
+    if not is_enabled():
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': 'automlops',
+            'ph': 'X',
+            'ts': start / 1000,
+            'dur': (end - start) / 1000,
+            'pid': os.getpid(),
+            'tid': thread.ident,
+            'args': args}
+        with _EVENTS_LOCK:
+            _EVENTS.append(event)
+            _THREAD_NAMES[thread.ident] = thread.name
+
+@contextlib.contextmanager
+def root_span(name: str, **args):
+    """Records the enclosed block as a span. When the outermost root span
+    exits, the spans recorded since it started are written to the trace file
+    and cleared, so each trace covers one call, e.g. of go(), including the
+    root spans nested in it.
+
+    Args:
+        name: Name of the span.
+        args: Additional values to attach to the span.
+    """
+    with _EVENTS_LOCK:
+        _ROOT_DEPTH[0] += 1
+    try:
+        with span(name, **args):
+            yield
+    finally:
+        with _EVENTS_LOCK:
+            _ROOT_DEPTH[0] -= 1
+            outermost = _ROOT_DEPTH[0] == 0
+        if outermost:
+            try:
+                write_trace()
+            finally:
+                with _EVENTS_LOCK:
+                    _EVENTS.clear()
+                    _THREAD_NAMES.clear()
+
+def traced(name: str, *arg_names: str) -> Callable:
+    """Decorator that records each call of a function as a span.
+
+    Args:
+        name: Name of the span.
+        arg_names: Names of the function arguments to attach to the span.
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            with span(name, **{arg: str(arguments.get(arg)) for arg in arg_names}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_trace(filepath: Optional[str] = None):
+    """Writes all spans recorded in this process as Chrome trace JSON.
+    Does nothing if tracing is disabled and no filepath is given.
+
+    Args:
+        filepath: Path to the trace file (default: value of AUTOMLOPS_TRACE_FILE).
+    Raises:
+        Exception: If an error is encountered writing the file.
+    """
+    filepath = filepath or os.environ.get(TRACE_FILE_ENV_VAR)
+    if not filepath:
+        return
+    with _EVENTS_LOCK:
+        events = list(_EVENTS)
+        thread_names = dict(_THREAD_NAMES)
+    pid = os.getpid()
+    metadata = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+        for tid, thread_name in thread_names.items()]
+    try:
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, file)
+    except OSError as err:
+        raise OSError(f'Error writing to file. {err}') from err
@@ -18,19 +18,97 @@
 # pylint: disable=C0103
 # pylint: disable=line-too-long
 
+from collections import OrderedDict
+import contextlib
+import contextvars
+import copy
 import inspect
+import json
 import os
+import re
 import subprocess
+import threading
 
 import itertools
 import textwrap
-from typing import Callable
+from typing import Callable, List, Optional
 import yaml
 
 from AutoMLOps.utils.constants import (
     CACHE_DIR,
-    PLACEHOLDER_IMAGE
+    COMPONENTS_INDEX_FILENAME,
+    PLACEHOLDER_IMAGE,
+    YAML_CACHE_MAX_ENTRIES
 )
+from AutoMLOps.utils.tracing import span
+
+# Use the libyaml C implementations when available
+try:
+    from yaml import CSafeDumper as YamlDumper, CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeDumper as YamlDumper, SafeLoader as YamlLoader
+
+# Bounded LRU of parsed yaml documents, keyed by path and validated against
+# the file's modification time and size
+_YAML_CACHE = OrderedDict()
+_YAML_CACHE_LOCK = threading.Lock()
+
+# Process-level registry of parsed component specs, keyed by path and
+# validated against the file's modification time and size
+_COMPONENT_REGISTRY = {}
+_COMPONENT_REGISTRY_LOCK = threading.Lock()
+
+# Components registered by the component decorator in this process, as
+# component name to yaml path in registration order, keyed by directory
+_REGISTERED_COMPONENTS = {}
+
+# In-memory file tree, keyed by normalized path, that the file helpers below
+# write to instead of disk while a virtual_filesystem() block is active
+_VIRTUAL_FILES = contextvars.ContextVar('virtual_files', default=None)
+
+@contextlib.contextmanager
+def virtual_filesystem():
+    """Redirects writes made through the file helpers in this module to an
+       in-memory mapping of path to bytes for the duration of the block.
+       Reads of files written in the block are served from the mapping; all
+       other reads fall through to disk. Directories are not created and
+       shell processes are refused. The mapping is context-local, so it is
+       seen by threads started with a copy of the current context.
+
+    Yields:
+        dict: Mapping of normalized path to file contents.
+    """
+    files = {}
+    token = _VIRTUAL_FILES.set(files)
+    try:
+        yield files
+    finally:
+        _VIRTUAL_FILES.reset(token)
+
+def in_virtual_filesystem() -> bool:
+    """Checks whether file writes are currently redirected to memory.
+
+    Returns:
+        bool: Whether a virtual_filesystem() block is active.
+    """
+    return _VIRTUAL_FILES.get() is not None
+
+def list_files(directory: str) -> List[str]:
+    """Returns the paths of the files under a directory, recursively. While
+       a virtual_filesystem() block is active, only in-memory files are listed.
+
+    Args:
+        directory: Path to the directory.
+    Returns:
+        list: Paths of the files, sorted within each directory.
+    """
+    files = _VIRTUAL_FILES.get()
+    if files is not None:
+        prefix = os.path.normpath(directory) + os.sep
+        return sorted(path for path in list(files) if path.startswith(prefix))
+    return [os.path.join(root, filename)
+            for root, _, filenames in os.walk(directory)
+            for filename in sorted(filenames)]
 
 def make_dirs(directories: list):
     """Makes directories with the specified names.
@@ -38,6 +116,8 @@ def make_dirs(directories: list):
     Args:
         directories: Path of the directories to make.
     """
+    if in_virtual_filesystem():
+        return
     for d in directories:
         try:
             os.makedirs(d)
@@ -46,7 +126,8 @@ def make_dirs(directories: list):
 
 def read_yaml_file(filepath: str) -> dict:
     """Reads a yaml and returns file contents as a dict.
-       Defaults to utf-8 encoding.
+       Defaults to utf-8 encoding. Unchanged files are served
+       from an in-memory cache instead of being re-parsed.
 
     Args:
         filepath: Path to the yaml.
@@ -55,12 +136,31 @@ def read_yaml_file(filepath: str) -> dict:
     Raises:
         Exception: If an error is encountered reading the file.
     """
+    filepath = str(filepath)
+    files = _VIRTUAL_FILES.get()
+    if files is not None and os.path.normpath(filepath) in files:
+        try:
+            return yaml.load(files[os.path.normpath(filepath)], Loader=YamlLoader)
+        except yaml.YAMLError as err:
+            raise yaml.YAMLError(f'Error reading file. {err}') from err
+    stat = os.stat(filepath)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _YAML_CACHE_LOCK:
+        entry = _YAML_CACHE.get(filepath)
+        if entry is not None and entry[0] == key:
+            _YAML_CACHE.move_to_end(filepath)
+            return copy.deepcopy(entry[1])
     try:
         with open(filepath, 'r', encoding='utf-8') as file:
-            file_dict = yaml.safe_load(file)
+            file_dict = yaml.load(file, Loader=YamlLoader)
         file.close()
     except yaml.YAMLError as err:
         raise yaml.YAMLError(f'Error reading file. {err}') from err
+    with _YAML_CACHE_LOCK:
+        _YAML_CACHE[filepath] = (key, copy.deepcopy(file_dict))
+        _YAML_CACHE.move_to_end(filepath)
+        while len(_YAML_CACHE) > YAML_CACHE_MAX_ENTRIES:
+            _YAML_CACHE.popitem(last=False)
     return file_dict
 
 def write_yaml_file(filepath: str, contents: dict, mode: str):
@@ -73,9 +173,13 @@ def write_yaml_file(filepath: str, contents: dict, mode: str):
     Raises:
         Exception: If an error is encountered writing the file.
     """
+    if in_virtual_filesystem():
+        write_file(filepath, yaml.dump(contents, Dumper=YamlDumper, sort_keys=False), mode)
+        return
+    _invalidate_yaml_cache(filepath)
     try:
         with open(filepath, mode, encoding='utf-8') as file:
-            yaml.safe_dump(contents, file, sort_keys=False)
+            yaml.dump(contents, file, Dumper=YamlDumper, sort_keys=False)
         file.close()
     except yaml.YAMLError as err:
         raise yaml.YAMLError(f'Error writing to file. {err}') from err
@@ -91,6 +195,9 @@ def read_file(filepath: str) -> str:
     Raises:
         Exception: If an error is encountered reading the file.
     """
+    files = _VIRTUAL_FILES.get()
+    if files is not None and os.path.normpath(str(filepath)) in files:
+        return files[os.path.normpath(str(filepath))].decode('utf-8')
     try:
         with open(filepath, 'r', encoding='utf-8') as file:
             contents = file.read()
@@ -99,6 +206,22 @@ def read_file(filepath: str) -> str:
         raise FileNotFoundError(f'Error reading file. {err}') from err
     return contents
 
+def read_bytes(filepath: str) -> bytes:
+    """Reads a file and returns its raw contents.
+
+    Args:
+        filepath: Path to the file.
+    Returns:
+        bytes: Contents of the file.
+    Raises:
+        Exception: If the file does not exist.
+    """
+    files = _VIRTUAL_FILES.get()
+    if files is not None and os.path.normpath(str(filepath)) in files:
+        return files[os.path.normpath(str(filepath))]
+    with open(filepath, 'rb') as file:
+        return file.read()
+
 def write_file(filepath: str, text: str, mode: str):
     """Writes a file at the specified path. Defaults to utf-8 encoding.
 
@@ -109,6 +232,13 @@ def write_file(filepath: str, text: str, mode: str):
     Raises:
         Exception: If an error is encountered writing the file.
     """
+    files = _VIRTUAL_FILES.get()
+    if files is not None:
+        path = os.path.normpath(str(filepath))
+        contents = text.encode('utf-8')
+        files[path] = files.get(path, b'') + contents if 'a' in mode else contents
+        return
+    _invalidate_yaml_cache(filepath)
     try:
         with open(filepath, mode, encoding='utf-8') as file:
             file.write(text)
@@ -116,6 +246,15 @@ def write_file(filepath: str, text: str, mode: str):
     except OSError as err:
         raise OSError(f'Error writing to file. {err}') from err
 
+def _invalidate_yaml_cache(filepath: str):
+    """Drops a file from the parsed yaml cache before it is written.
+
+    Args:
+        filepath: Path to the file.
+    """
+    with _YAML_CACHE_LOCK:
+        _YAML_CACHE.pop(str(filepath), None)
+
 def write_and_chmod(filepath: str, text: str):
     """Writes a file at the specified path and chmods the file
        to allow for execution.
@@ -127,6 +266,8 @@ def write_and_chmod(filepath: str, text: str):
         Exception: If an error is encountered chmod-ing the file.
     """
     write_file(filepath, text, 'w+')
+    if in_virtual_filesystem():
+        return
     try:
         st = os.stat(filepath)
         os.chmod(filepath, st.st_mode | 0o111)
@@ -140,30 +281,118 @@ def delete_file(filepath: str):
     Args:
         filepath: Path to the file.
     """
+    files = _VIRTUAL_FILES.get()
+    if files is not None:
+        files.pop(os.path.normpath(str(filepath)), None)
+        return
     try:
         os.remove(filepath)
     except OSError:
         pass
 
+def register_component(filepath: str, component_spec: dict):
+    """Adds a freshly written component yaml to the process-level registry,
+       and rewrites the components index file in the same directory from the
+       registry, so components registered by earlier processes are dropped.
+
+    Args:
+        filepath: Path to the component yaml.
+        component_spec: Contents of the component yaml.
+    """
+    stat = os.stat(filepath)
+    with _COMPONENT_REGISTRY_LOCK:
+        _COMPONENT_REGISTRY[filepath] = ((stat.st_mtime_ns, stat.st_size), copy.deepcopy(component_spec))
+
+        components = _REGISTERED_COMPONENTS.setdefault(os.path.normpath(os.path.dirname(filepath)), {})
+        name = os.path.basename(filepath).split('.')[0]
+        components.setdefault(name, filepath)
+        index_path = os.path.join(os.path.dirname(filepath), COMPONENTS_INDEX_FILENAME)
+        write_file(index_path, json.dumps({'components': list(components)}, indent=2), 'w')
+
+def get_component_spec(filepath: str) -> dict:
+    """Returns the contents of a component yaml. Each file is parsed at most
+       once per process unless it changes on disk.
+
+    Args:
+        filepath: Path to the component yaml.
+    Returns:
+        dict: A copy of the component spec, safe to modify.
+    """
+    stat = os.stat(filepath)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _COMPONENT_REGISTRY_LOCK:
+        entry = _COMPONENT_REGISTRY.get(filepath)
+    if entry is None or entry[0] != key:
+        entry = (key, read_yaml_file(filepath))
+        with _COMPONENT_REGISTRY_LOCK:
+            _COMPONENT_REGISTRY[filepath] = entry
+    return copy.deepcopy(entry[1])
+
 def get_components_list(full_path: bool = True) -> list:
-    """Reads yamls in the cache directory, verifies they are component
-       yamls, and returns the name of the files.
+    """Returns the components in the cache directory, from the process-level
+       registry. If no components were registered in this process, they are
+       read from the components index, or if there is no index, from the
+       yamls in the cache directory that are component yamls.
 
     Args:
         full_path: Boolean; if false, stores only the filename w/o extension.
     Returns:
         list: Contains the names or paths of all component yamls in the dir.
     """
-    components_list = []
-    elements = os.listdir(CACHE_DIR)
-    for file in list(filter(lambda y: ('.yaml' or '.yml') in y, elements)):
-        path = os.path.join(CACHE_DIR, file)
-        if is_component_config(path):
-            if full_path:
-                components_list.append(path)
-            else:
-                components_list.append(os.path.basename(file).split('.')[0])
-    return components_list
+    with _COMPONENT_REGISTRY_LOCK:
+        registered = list(_REGISTERED_COMPONENTS.get(os.path.normpath(CACHE_DIR), {}))
+    names = None if registered else _read_components_index(os.path.join(CACHE_DIR, COMPONENTS_INDEX_FILENAME))
+    if registered:
+        files = [f'{name}.yaml' for name in registered]
+    elif names is not None:
+        files = [f'{name}.yaml' for name in names if os.path.exists(os.path.join(CACHE_DIR, f'{name}.yaml'))]
+    else:
+        elements = os.listdir(CACHE_DIR)
+        files = [file for file in filter(lambda y: ('.yaml' or '.yml') in y, elements)
+                 if is_component_config(os.path.join(CACHE_DIR, file))]
+    if full_path:
+        return [os.path.join(CACHE_DIR, file) for file in files]
+    return [os.path.basename(file).split('.')[0] for file in files]
+
+def _read_components_index(index_path: str) -> Optional[List[str]]:
+    """Reads the component names from a components index file.
+
+    Args:
+        index_path: Path to the components index.
+    Returns:
+        list: Component names in registration order, or None if there is no index.
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as file:
+            return json.load(file)['components']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def get_component_name(component_spec: dict) -> str:
+    """Returns the name a component is generated under. Names of
+       components built from a kfp spec are converted to lowercase
+       with spaces replaced by underscores.
+
+    Args:
+        component_spec: Contents of the component yaml.
+    Returns:
+        str: Name of the component.
+    """
+    if is_using_kfp_spec(component_spec['implementation']['container']['image']):
+        return component_spec['name'].replace(' ', '_').lower()
+    return component_spec['name']
+
+def get_packages_to_install(component_spec: dict) -> List[str]:
+    """Returns the packages_to_install given to a component scaffold,
+       which are quoted in its pip install command. Commands generated
+       by kfp may quote each package more than once.
+
+    Args:
+        component_spec: Contents of the component yaml.
+    Returns:
+        list: Packages to install, in the order first given.
+    """
+    return list(dict.fromkeys(re.findall('\'([^\']*)\'', component_spec['implementation']['container']['command'][2])))
 
 def is_component_config(filepath: str) -> bool:
     """Checks to see if the given file is a component yaml.
@@ -184,15 +413,19 @@ def execute_process(command: str, to_null: bool):
         command: The string of the command to execute.
         to_null: Determines where to send output.
     Raises:
-        Exception: If an error occurs in executing the script.
+        Exception: If an error occurs in executing the script, or if
+            called inside a virtual_filesystem() block.
     """
+    if in_virtual_filesystem():
+        raise RuntimeError(f'Cannot execute process in a virtual filesystem: {command}')
     stdout = subprocess.DEVNULL if to_null else None
     try:
-        subprocess.run([command],
-                       shell=True,
-                       check=True,
-                       stdout=stdout,
-                       stderr=subprocess.STDOUT)
+        with span('execute_process', command=command):
+            subprocess.run([command],
+                           shell=True,
+                           check=True,
+                           stdout=stdout,
+                           stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as err:
         raise RuntimeError(f'Error executing process. {err}') from err
 
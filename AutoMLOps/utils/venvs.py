@@ -0,0 +1,102 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Creates virtual environments for requirement sets, shared by every
+   project on the machine. Environments are keyed by a hash of their
+   requirements files, so each requirement set is only installed once."""
+
+# pylint: disable=line-too-long
+
+import os
+import platform
+import shutil
+import subprocess
+import sys
+from typing import List, Optional
+
+from AutoMLOps.utils.constants import LOCAL_VENVS_DIR
+from AutoMLOps.utils.manifest import hash_contents
+from AutoMLOps.utils.tracing import span
+from AutoMLOps.utils.utils import read_file
+
+# Written last when an environment is created, so partially created
+# environments are never used
+COMPLETE_MARKER = '.complete'
+
+def get_venv_key(requirements_files: List[str]) -> str:
+    """Hashes the interpreter and the contents of requirements files, e.g.
+    lock files, into the key of the environment they are installed in.
+
+    Args:
+        requirements_files: Paths to the requirements files, in install order.
+    Returns:
+        str: Hex digest of the interpreter, platform and requirements.
+    """
+    return hash_contents(sys.version, sys.platform, platform.machine(), *(read_file(path) for path in requirements_files))
+
+def get_venv_python(venv_dir: str) -> str:
+    """Returns the path to the interpreter of a virtual environment.
+
+    Args:
+        venv_dir: Directory of the virtual environment.
+    Returns:
+        str: Path to its python executable.
+    """
+    if os.name == 'nt':
+        return os.path.join(venv_dir, 'Scripts', 'python.exe')
+    return os.path.join(venv_dir, 'bin', 'python')
+
+def ensure_venv(requirements_files: List[str],
+                wheelhouse: Optional[str] = None,
+                venvs_dir: str = LOCAL_VENVS_DIR) -> str:
+    """Returns the interpreter of a virtual environment with the given
+    requirements installed, creating it from the running interpreter if no
+    environment has them yet. Lock files are installed with
+    --require-hashes, and packages come from the wheelhouse if one is given,
+    otherwise from pip's cache or index.
+
+    Args:
+        requirements_files: Paths to requirements.txt or requirements.lock
+            files, in install order.
+        wheelhouse: Directory of wheels to install from offline.
+        venvs_dir: Directory of the shared environments.
+    Returns:
+        str: Path to the python executable of the environment.
+    Raises:
+        Exception: If the environment cannot be created, or a requirement
+            cannot be installed.
+    """
+    venv_dir = os.path.join(os.path.expanduser(venvs_dir), get_venv_key(requirements_files)[:16])
+    python = get_venv_python(venv_dir)
+    if os.path.exists(os.path.join(venv_dir, COMPLETE_MARKER)):
+        return python
+
+    # A directory without the marker is left over from a failed creation
+    shutil.rmtree(venv_dir, ignore_errors=True)
+    with span('create_venv', venv=venv_dir):
+        try:
+            subprocess.run([sys.executable, '-m', 'venv', venv_dir], capture_output=True, text=True, check=True)
+            for reqs_file in requirements_files:
+                command = [python, '-m', 'pip', 'install', '--quiet', '--disable-pip-version-check']
+                if reqs_file.endswith('.lock'):
+                    command += ['--require-hashes', '--no-deps']
+                if wheelhouse:
+                    command += ['--no-index', '--find-links', wheelhouse]
+                subprocess.run(command + ['-r', reqs_file], capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as err:
+            shutil.rmtree(venv_dir, ignore_errors=True)
+            raise RuntimeError(f'Error creating a virtual environment for {", ".join(requirements_files)}. {err.stderr.strip()}') from err
+    with open(os.path.join(venv_dir, COMPLETE_MARKER), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(requirements_files) + '\n')
+    return python
@@ -0,0 +1,173 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Builds a local wheelhouse for the generated requirements, which images
+   are then installed from offline, and syncs it into the build context."""
+
+# pylint: disable=line-too-long
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import List, Optional, Tuple
+
+from AutoMLOps.utils.constants import (
+    CLOUD_RUN_BASE_IMAGE,
+    GENERATED_CLOUD_RUN_PIPELINE_SPEC_REQUIREMENTS_FILE,
+    GENERATED_CLOUD_RUN_REQUIREMENTS_FILE,
+    GENERATED_COMPONENT_BASE,
+    GENERATED_COMPONENT_IMAGES_DIR,
+    GENERATED_DEFAULTS_FILE,
+    LOCK_TARGET_PLATFORM
+)
+from AutoMLOps.utils.lockfile import build_sdist_wheels, get_target_python_version, is_index_url
+from AutoMLOps.utils.tracing import span
+from AutoMLOps.utils.utils import list_files, read_yaml_file
+
+def get_generated_requirements() -> List[Tuple[str, Optional[str]]]:
+    """Finds the requirements files of the generated images, and the python
+    version of the image each one is installed in.
+
+    Returns:
+        list: Requirements file paths and python versions, or None for a
+            base image that is not an official python image.
+    Raises:
+        Exception: If no requirements have been generated yet.
+    """
+    reqs_file = f'{GENERATED_COMPONENT_BASE}/requirements.txt'
+    if not os.path.exists(reqs_file):
+        raise FileNotFoundError(f'{reqs_file} not found. Run AutoMLOps.generate() first.')
+    python_version = get_target_python_version(read_yaml_file(GENERATED_DEFAULTS_FILE)['gcp']['base_image'])
+    requirements = [(reqs_file, python_version)]
+    requirements += [
+        (path, python_version) for path in list_files(GENERATED_COMPONENT_IMAGES_DIR)
+        if os.path.basename(path) == 'requirements.txt']
+    requirements += [
+        (path, get_target_python_version(CLOUD_RUN_BASE_IMAGE))
+        for path in (GENERATED_CLOUD_RUN_REQUIREMENTS_FILE, GENERATED_CLOUD_RUN_PIPELINE_SPEC_REQUIREMENTS_FILE)
+        if os.path.exists(path)]
+    return requirements
+
+def build_wheelhouse(wheelhouse: str, index_url: Optional[str] = None) -> List[str]:
+    """Downloads or builds wheels for every generated requirements file into
+    a wheelhouse. Wheels already in the wheelhouse are not downloaded again.
+
+    Args:
+        wheelhouse: Directory to write the wheels to.
+        index_url: Package index url, or a directory of wheels and sdists to
+            take them from (default: PyPI).
+    Returns:
+        list: Paths of the requirements files the wheelhouse was built for.
+    Raises:
+        Exception: If no requirements have been generated yet, or pip fails.
+    """
+    requirements = get_generated_requirements()
+    os.makedirs(wheelhouse, exist_ok=True)
+    for reqs_file, python_version in requirements:
+        download_wheels(reqs_file, wheelhouse, python_version, index_url)
+    return [reqs_file for reqs_file, _ in requirements]
+
+def download_wheels(requirements_file: str,
+                    wheelhouse: str,
+                    python_version: Optional[str] = None,
+                    index_url: Optional[str] = None):
+    """Downloads the wheels of a requirements file and all its dependencies.
+    When the python version of the image is known, binary wheels for that
+    version on the target platform are downloaded, and distributions
+    published only as sdists, such as kfp 1.8, are built into pure python
+    wheels first. Otherwise, wheels are built for the running interpreter,
+    including from sdists.
+
+    Args:
+        requirements_file: Path to the requirements file.
+        wheelhouse: Directory to write the wheels to.
+        python_version: Python version of the image the requirements are installed in.
+        index_url: Package index url, or a directory of wheels and sdists to
+            take them from (default: PyPI).
+    Raises:
+        Exception: If pip cannot download or build a wheel.
+    """
+    sources = ['--find-links', wheelhouse]
+    if index_url and is_index_url(index_url):
+        sources += ['--index-url', index_url]
+    elif index_url:
+        sources += ['--no-index', '--find-links', index_url]
+    if python_version:
+        os.makedirs(wheelhouse, exist_ok=True)
+        with tempfile.TemporaryDirectory() as wheel_dir:
+            build_sdist_wheels(requirements_file, sources, wheel_dir)
+            for filename in os.listdir(wheel_dir):
+                shutil.move(os.path.join(wheel_dir, filename), os.path.join(wheelhouse, filename))
+        command = [sys.executable, '-m', 'pip', 'download', '--dest', wheelhouse,
+                   '--only-binary=:all:', '--python-version', python_version,
+                   '--implementation', 'cp', '--platform', LOCK_TARGET_PLATFORM]
+    else:
+        command = [sys.executable, '-m', 'pip', 'wheel', '--wheel-dir', wheelhouse]
+    command += ['--quiet', '--disable-pip-version-check', '-r', requirements_file, *sources]
+    with span('download_wheels', requirements=requirements_file):
+        result = subprocess.run(command, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f'Error downloading wheels for {requirements_file}. {result.stderr.strip()}')
+
+def validate_wheelhouse(wheelhouse: Optional[str], run_local: bool):
+    """Validates that a local wheelhouse is only used when the images are
+    built from this machine. run() pushes the generated files to Cloud Source
+    Repositories without the synced wheels, so a Cloud Build triggered from
+    there could not install the requirements offline.
+
+    Args:
+        wheelhouse: Directory of wheels, or url of a package index.
+        run_local: Flag that determines whether to use Cloud Run CI/CD.
+    Raises:
+        Exception: If the wheelhouse is a local directory and run_local is False.
+    """
+    if wheelhouse is not None and not is_index_url(wheelhouse) and not run_local:
+        raise ValueError('run_local must be set to True to build images from a local wheelhouse, '
+                         'or wheelhouse must be the url of a package index.')
+
+def sync_wheelhouse(source: str, destination: str) -> List[str]:
+    """Makes a directory hold the same files as a wheelhouse, hard linking
+    them where possible. Files whose name and size are unchanged are not
+    copied again, and files no longer in the wheelhouse are removed. A
+    .gitignore keeps the wheels out of the repo that run() pushes.
+
+    Args:
+        source: Wheelhouse directory.
+        destination: Directory to sync the wheelhouse to, e.g. in a build context.
+    Returns:
+        list: Names of the files copied.
+    """
+    if os.path.realpath(source) == os.path.realpath(destination):
+        return []
+    os.makedirs(destination, exist_ok=True)
+    filenames = sorted(f for f in os.listdir(source) if os.path.isfile(os.path.join(source, f)) and f != '.gitignore')
+    for filename in set(os.listdir(destination)) - set(filenames) - {'.gitignore'}:
+        os.remove(os.path.join(destination, filename))
+    with open(os.path.join(destination, '.gitignore'), 'w', encoding='utf-8') as file:
+        file.write('*\n')
+    copied = []
+    for filename in filenames:
+        src, dst = os.path.join(source, filename), os.path.join(destination, filename)
+        if os.path.exists(dst) and os.path.getsize(dst) == os.path.getsize(src):
+            continue
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+        copied.append(filename)
+    return copied
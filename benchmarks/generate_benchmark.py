@@ -0,0 +1,294 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks the generation path on synthetic pipelines.
+
+Synthesizes a pipeline of N components, each with a configurable number of
+parameters and source lines, then runs the component and pipeline scaffolds,
+KfpBuilder.build and CloudBuildBuilder.build in a temporary directory, and
+once more in memory as a dry run. Each stage runs in a fresh interpreter on
+the outputs the previous stages left in the directory, so its peak RSS is its
+own. Reports wall time, baseline and peak RSS, and the number of files opened
+for writing per stage as JSON. execute_process and subprocess are stubbed
+while a stage runs, so the benchmark stays offline; the number of processes
+a stage would have run is reported.
+
+Usage:
+    python benchmarks/generate_benchmark.py --components 10 100 500
+"""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+
+import argparse
+import builtins
+import contextlib
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from AutoMLOps.deployments.cloudbuild import builder as CloudBuildBuilder
+from AutoMLOps.frameworks.kfp import builder as KfpBuilder
+from AutoMLOps.frameworks.kfp import scaffold as KfpScaffold
+import AutoMLOps.utils.utils
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import GENERATED_DIRS, OUTPUT_DIR
+from AutoMLOps.utils.utils import make_dirs, virtual_filesystem
+
+# Stages of the generation path, in the order they run
+STAGES = [
+    'component_scaffold',
+    'pipeline_scaffold',
+    'kfp_build',
+    'cloudbuild_build',
+    # A second build with unchanged inputs measures the incremental path
+    'kfp_build_unchanged',
+    # A dry run renders every output in memory
+    'dry_run_build'
+]
+
+# Where the kfp_build stage stores the image tags for the cloudbuild_build stage
+IMAGE_TAGS_FILE = 'image_tags.json'
+
+# Third-party imports added to component sources, so requirements inference has work to do
+COMPONENT_IMPORTS = [
+    'from google.cloud import bigquery',
+    'from google.cloud import storage',
+    'import pandas as pd',
+    'import numpy as np',
+    'from sklearn import preprocessing'
+]
+
+def synthesize_module(num_components: int, num_params: int, source_lines: int) -> str:
+    """Creates the source of a module defining num_components component
+    functions and a pipeline function that chains them.
+
+    Args:
+        num_components: Number of components in the pipeline.
+        num_params: Number of parameters of each component.
+        source_lines: Number of body lines in each component.
+    Returns:
+        str: Python source code.
+    """
+    params = [f'param_{p}' for p in range(num_params)]
+    lines = []
+    for c in range(num_components):
+        lines.append(f'def component_{c}({", ".join(f"{p}: str" for p in params)}):')
+        lines.append(f'    """Synthetic component {c}.')
+        lines.append('')
+        lines.append('    Args:')
+        lines.extend(f'        {p}: Synthetic parameter {p}.' for p in params)
+        lines.append('    """')
+        lines.append(f'    {COMPONENT_IMPORTS[c % len(COMPONENT_IMPORTS)]}')
+        lines.extend(f'    value_{i} = {i} * len({params[i % num_params]})' if params else f'    value_{i} = {i}'
+                     for i in range(source_lines))
+        lines.append('')
+    lines.append(f'def pipeline({", ".join(f"{p}: str" for p in params)}):')
+    arguments = ', '.join(f'{p}={p}' for p in params)
+    for c in range(num_components):
+        after = f'.after(component_{c - 1}_task)' if c else ''
+        lines.append(f'    component_{c}_task = component_{c}({arguments}){after}')
+    if not num_components:
+        lines.append('    pass')
+    return '\n'.join(lines) + '\n'
+
+class StageRecorder():
+    """Measures wall time, peak RSS, python heap peak, file writes and stubbed
+    processes of a stage."""
+    def __init__(self, trace_malloc: bool):
+        """Creates a recorder.
+
+        Args:
+            trace_malloc: Whether to also record the python heap peak of the stage.
+        """
+        self.result = {}
+        self._trace_malloc = trace_malloc
+        self._real_open = builtins.open
+
+    @contextlib.contextmanager
+    def stage(self):
+        """Records the enclosed block as the stage. Processes it starts through
+        execute_process or subprocess are not run.
+        """
+        writes, processes = [0], [0]
+        real_open = self._real_open
+
+        def counting_open(file, *args, **kwargs):
+            mode = args[0] if args else kwargs.get('mode', 'r')
+            if any(flag in mode for flag in 'wax+'):
+                writes[0] += 1
+            return real_open(file, *args, **kwargs)
+
+        def stub_process(command, *args, **kwargs):  # pylint: disable=unused-argument
+            processes[0] += 1
+            return subprocess.CompletedProcess(command, 0, '', '')
+
+        def stub_execute_process(command: str, to_null: bool):  # pylint: disable=unused-argument
+            processes[0] += 1
+
+        # ru_maxrss is the high-water mark of this process in KiB on Linux;
+        # the stage runs in a fresh interpreter, so its peak is the stage's own
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self._trace_malloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with mock.patch('builtins.open', counting_open), \
+             mock.patch.object(AutoMLOps.utils.utils, 'execute_process', stub_execute_process), \
+             mock.patch.object(subprocess, 'run', stub_process), \
+             mock.patch.object(subprocess, 'check_output', stub_process):
+            yield
+        wall_time = time.perf_counter() - start
+        self.result = {
+            'wall_time_s': round(wall_time, 6),
+            'file_writes': writes[0],
+            'stubbed_processes': processes[0],
+            'baseline_rss_mb': round(baseline_rss / 1024, 2),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)}
+        if self._trace_malloc:
+            self.result['python_heap_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+
+def run_stage(stage: str, workdir: str, num_components: int, num_params: int,
+              *, run_local: bool, trace_malloc: bool) -> Dict:
+    """Runs one stage of the generation path in the working directory of a
+    benchmark, on the outputs of the stages before it, and measures it.
+
+    Args:
+        stage: Name of the stage.
+        workdir: Directory with the synthetic pipeline module.
+        num_components: Number of components in the pipeline.
+        num_params: Number of parameters of each component.
+        run_local: Whether to skip the cloud run files.
+        trace_malloc: Whether to also record the python heap peak of the stage.
+    Returns:
+        dict: Measurements of the stage.
+    """
+    recorder = StageRecorder(trace_malloc)
+    module_path = os.path.join(workdir, 'synthetic_pipeline.py')
+    spec = importlib.util.spec_from_file_location('synthetic_pipeline', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    defaults = DefaultsConfig(project_id='benchmark-project', run_local=run_local)
+    pipeline_params = {f'param_{p}': f'value_{p}' for p in range(num_params)}
+
+    os.chdir(workdir)
+    if stage == 'component_scaffold':
+        with recorder.stage():
+            for c in range(num_components):
+                KfpScaffold.create_component_scaffold(func=getattr(module, f'component_{c}'))
+    elif stage == 'pipeline_scaffold':
+        with recorder.stage():
+            KfpScaffold.create_pipeline_scaffold(func=module.pipeline, name='synthetic-pipeline')
+    elif stage in ('kfp_build', 'kfp_build_unchanged'):
+        make_dirs([OUTPUT_DIR] + GENERATED_DIRS)
+        with recorder.stage():
+            image_tags = KfpBuilder.build(defaults, pipeline_params, None)
+        with open(IMAGE_TAGS_FILE, 'w', encoding='utf-8') as file:
+            json.dump(image_tags, file)
+    elif stage == 'cloudbuild_build':
+        with open(IMAGE_TAGS_FILE, 'r', encoding='utf-8') as file:
+            image_tags = json.load(file)
+        with recorder.stage():
+            CloudBuildBuilder.build(defaults, image_tags)
+    elif stage == 'dry_run_build':
+        with recorder.stage():
+            with virtual_filesystem():
+                image_tags = KfpBuilder.build(defaults, pipeline_params, None)
+                CloudBuildBuilder.build(defaults, image_tags)
+    else:
+        raise ValueError(f'Unknown stage {stage}.')
+    return recorder.result
+
+def run_benchmark(num_components: int, num_params: int, source_lines: int,
+                  run_local: bool, trace_malloc: bool) -> Dict:
+    """Generates a synthetic pipeline in a temporary directory and
+    measures each stage of the generation path in its own interpreter.
+
+    Args:
+        num_components: Number of components in the pipeline.
+        num_params: Number of parameters of each component.
+        source_lines: Number of body lines in each component.
+        run_local: Whether to skip the cloud run files.
+        trace_malloc: Whether to also record the python heap peak per stage.
+    Returns:
+        dict: Benchmark configuration and per-stage measurements.
+    """
+    stages = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, 'synthetic_pipeline.py'), 'w', encoding='utf-8') as file:
+            file.write(synthesize_module(num_components, num_params, source_lines))
+        for stage in STAGES:
+            command = [sys.executable, os.path.abspath(__file__),
+                       '--stage', stage, '--workdir', workdir,
+                       '--components', str(num_components),
+                       '--params', str(num_params)]
+            command += [] if run_local else ['--cloud-run']
+            command += ['--trace-malloc'] if trace_malloc else []
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            stages[stage] = json.loads(output)
+
+    return {
+        'components': num_components,
+        'params': num_params,
+        'source_lines': source_lines,
+        'run_local': run_local,
+        'stages': stages,
+        'total_wall_time_s': round(sum(s['wall_time_s'] for s in stages.values()), 6)}
+
+def main(argv: List[str]):
+    """Runs the benchmark for each requested component count.
+
+    Args:
+        argv: Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=1)[0])
+    parser.add_argument('--components', type=int, nargs='+', default=[10, 100, 500],
+                        help='Component counts to benchmark.')
+    parser.add_argument('--params', type=int, default=5, help='Parameters per component.')
+    parser.add_argument('--source-lines', type=int, default=50, help='Source lines per component.')
+    parser.add_argument('--cloud-run', action='store_true', help='Also generate the cloud run files (run_local=False).')
+    parser.add_argument('--trace-malloc', action='store_true', help='Also record the python heap peak per stage (slower).')
+    parser.add_argument('--output', type=str, default=None, help='Path to write the JSON report to (default: stdout).')
+    parser.add_argument('--stage', choices=STAGES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Runs a single stage for run_benchmark
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.workdir, args.components[0], args.params,
+                                   run_local=not args.cloud_run, trace_malloc=args.trace_malloc)))
+        return
+
+    results = [run_benchmark(num_components, args.params, args.source_lines, not args.cloud_run, args.trace_malloc)
+               for num_components in args.components]
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(report + '\n')
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
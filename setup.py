@@ -30,11 +30,8 @@ setup(
     author_email='srastatter@google.com',
     license='Apache-2.0',
     packages=find_packages(),
-    install_requires=['docopt==0.6.2',
-                      'docstring-parser==0.15',
-                      'pipreqs==0.4.11',
-                      'PyYAML==5.4.1',
-                      'yarg==0.1.9'],
+    install_requires=['docstring-parser==0.15',
+                      'PyYAML==5.4.1'],
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
@@ -0,0 +1,127 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for AutoMLOps module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import json
+import os
+import subprocess
+import sys
+from typing import List
+
+import pytest
+import pytest_mock
+import yaml
+
+import AutoMLOps.AutoMLOps
+
+def test_import(tmpdir: pytest.FixtureRequest):
+    """Tests that importing the AutoMLOps module in a fresh interpreter does
+    not load the builders, scaffolds or IaC providers, does not configure
+    logging, and does not create any directories.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    script = (
+        'import logging, sys\n'
+        'import AutoMLOps.AutoMLOps\n'
+        'lazy = ["pydantic", "docstring_parser", "AutoMLOps.iac.configs", "AutoMLOps.frameworks.kfp.builder",\n'
+        '        "AutoMLOps.frameworks.kfp.scaffold", "AutoMLOps.deployments.cloudbuild.builder"]\n'
+        'assert not [m for m in lazy if m in sys.modules], [m for m in lazy if m in sys.modules]\n'
+        'assert not logging.getLogger().handlers\n')
+    env = dict(os.environ, PYTHONPATH=package_root)
+    subprocess.run([sys.executable, '-c', script], cwd=str(tmpdir), env=env, check=True)
+    assert os.listdir(str(tmpdir)) == []
+
+def add_numbers(a: int, b: int):
+    """Adds two numbers.
+
+    Args:
+        a: First number.
+        b: Second number.
+    """
+    import pandas as pd
+    return pd.Series([a + b])
+
+def add_pipeline(a: int, b: int):
+    add_numbers(a=a, b=b)
+
+@pytest.mark.parametrize(
+    'run_local, expected_files',
+    [
+        (
+            True,
+            ['AutoMLOps/components/add_numbers/component.yaml',
+             'AutoMLOps/components/component_base/src/add_numbers.py',
+             'AutoMLOps/components/component_base/requirements.txt',
+             'AutoMLOps/configs/defaults.yaml',
+             'AutoMLOps/pipelines/pipeline.py',
+             'AutoMLOps/scripts/run_all.sh',
+             'AutoMLOps/cloudbuild.yaml']
+        ),
+        (
+            False,
+            ['AutoMLOps/pipelines/pipeline_runner.py',
+             'AutoMLOps/pipelines/runtime_parameters/pipeline_parameter_values.json',
+             'AutoMLOps/cloud_run/run_pipeline/main.py',
+             'AutoMLOps/cloud_run/queueing_svc/pipeline_parameter_values.json']
+        )
+    ]
+)
+def test_generate_dry_run(mocker: pytest_mock.MockerFixture,
+                          monkeypatch: pytest.MonkeyPatch,
+                          tmpdir: pytest.FixtureRequest,
+                          run_local: bool,
+                          expected_files: List[str]):
+    """Tests generate with dry_run set, which renders every artifact into an
+    in-memory mapping of path to bytes without writing under AutoMLOps/ or
+    running any processes. Also checks that the component spec is pinned to
+    the content-addressed tag of the image that cloudbuild.yaml builds.
+
+    Args:
+        mocker: Mocker to patch subprocess.
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        run_local (bool): Flag that determines whether to use Cloud Run CI/CD.
+        expected_files (List[str]): Paths expected in the rendered file tree.
+    """
+    monkeypatch.chdir(tmpdir)
+    AutoMLOps.AutoMLOps.component(add_numbers)
+    AutoMLOps.AutoMLOps.pipeline(add_pipeline, name='add-pipeline')
+    cache_contents = sorted(os.listdir(f'{tmpdir}/.AutoMLOps-cache'))
+    run = mocker.patch('subprocess.run')
+
+    files = AutoMLOps.AutoMLOps.generate(project_id='my-project',
+                                         pipeline_params={'a': 1, 'b': 2},
+                                         run_local=run_local,
+                                         dry_run=True)
+
+    for path in expected_files:
+        assert isinstance(files[os.path.normpath(path)], bytes)
+    assert 'pandas' in files[os.path.normpath('AutoMLOps/components/component_base/requirements.txt')].decode('utf-8')
+    assert json.loads(files[os.path.normpath('AutoMLOps/pipelines/runtime_parameters/pipeline_parameter_values.json')]) == {'a': 1, 'b': 2}
+    component_image = yaml.safe_load(files[os.path.normpath('AutoMLOps/components/add_numbers/component.yaml')])['implementation']['container']['image']
+    assert not component_image.endswith(':latest')
+    assert f'docker build -t {component_image} ' in files[os.path.normpath('AutoMLOps/cloudbuild.yaml')].decode('utf-8')
+    assert not os.path.exists(f'{tmpdir}/AutoMLOps')
+    assert sorted(os.listdir(f'{tmpdir}/.AutoMLOps-cache')) == cache_contents
+    run.assert_not_called()
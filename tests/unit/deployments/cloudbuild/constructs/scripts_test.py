@@ -0,0 +1,199 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for cloudbuild scripts constructs module."""
+
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import os
+import subprocess
+from typing import Dict, List
+
+import pytest
+import yaml
+
+from AutoMLOps.deployments.cloudbuild.constructs.registry import ImageTagChecker
+from AutoMLOps.deployments.cloudbuild.constructs.scripts import CloudBuildScripts
+from AutoMLOps.utils.config import DefaultsConfig
+
+IMAGE_TAGS = {'components/component_base': 'base0123', 'run_pipeline': 'run0123'}
+
+@pytest.mark.parametrize(
+    'run_local, schedule_pattern, image_tags, expected_wait_for, expected_critical_path',
+    [
+        (
+            True, 'No Schedule Specified', IMAGE_TAGS,
+            {
+                'build_component_base': ['-'],
+                'push_component_base': ['build_component_base']
+            },
+            ['build_component_base', 'push_component_base']
+        ),
+        (
+            False, 'No Schedule Specified', IMAGE_TAGS,
+            {
+                'build_component_base': ['-'],
+                'build_pipeline_runner_svc': ['-'],
+                'push_component_base': ['build_component_base'],
+                'push_pipeline_runner_svc': ['build_pipeline_runner_svc'],
+                'deploy_pipeline_runner_svc': ['push_pipeline_runner_svc'],
+                'setup_queueing_svc': ['-'],
+                'install_queueing_svc_deps': ['setup_queueing_svc'],
+                'submit_job_to_queue': ['push_component_base', 'deploy_pipeline_runner_svc', 'install_queueing_svc_deps']
+            },
+            ['build_component_base', 'push_component_base', 'submit_job_to_queue']
+        ),
+        (
+            False, '0 */12 * * *', IMAGE_TAGS,
+            {
+                'build_component_base': ['-'],
+                'build_pipeline_runner_svc': ['-'],
+                'push_component_base': ['build_component_base'],
+                'push_pipeline_runner_svc': ['build_pipeline_runner_svc'],
+                'deploy_pipeline_runner_svc': ['push_pipeline_runner_svc'],
+                'setup_queueing_svc': ['-'],
+                'install_queueing_svc_deps': ['setup_queueing_svc'],
+                'submit_job_to_queue': ['push_component_base', 'deploy_pipeline_runner_svc', 'install_queueing_svc_deps'],
+                'schedule_job': ['push_component_base', 'deploy_pipeline_runner_svc', 'install_queueing_svc_deps']
+            },
+            ['build_component_base', 'push_component_base', 'submit_job_to_queue']
+        ),
+        (
+            False, 'No Schedule Specified',
+            dict(IMAGE_TAGS, **{'components/evaluate': 'eval0123', 'components/train': 'train0123'}),
+            {
+                'build_component_base': ['-'],
+                'build_pipeline_runner_svc': ['-'],
+                'build_component_image_evaluate': ['build_component_base'],
+                'build_component_image_train': ['build_component_base'],
+                'push_component_base': ['build_component_base'],
+                'push_pipeline_runner_svc': ['build_pipeline_runner_svc'],
+                'push_component_image_evaluate': ['build_component_image_evaluate'],
+                'push_component_image_train': ['build_component_image_train'],
+                'deploy_pipeline_runner_svc': ['push_pipeline_runner_svc'],
+                'setup_queueing_svc': ['-'],
+                'install_queueing_svc_deps': ['setup_queueing_svc'],
+                'submit_job_to_queue': ['push_component_base', 'push_component_image_evaluate', 'push_component_image_train',
+                                        'deploy_pipeline_runner_svc', 'install_queueing_svc_deps']
+            },
+            ['build_component_base', 'build_component_image_evaluate', 'push_component_image_evaluate', 'submit_job_to_queue']
+        )
+    ]
+)
+def test_create_kfp_cloudbuild_config(run_local: bool,
+                                      schedule_pattern: str,
+                                      image_tags: Dict[str, str],
+                                      expected_wait_for: Dict[str, List[str]],
+                                      expected_critical_path: List[str]):
+    """Tests the cloudbuild.yaml generated by CloudBuildScripts. Checks that
+    each step waits only for its true data dependencies, that every image is
+    built with BuildKit using its previously pushed layers as a cache, has
+    its size logged and is pushed with its tag, and that the critical path is reported in the file. Also checks that per-component images wait only for the
+    component_base image, which they are built on.
+
+    Args:
+        run_local (bool): Flag that determines whether to use Cloud Run CI/CD.
+        schedule_pattern (str): Cron formatted value used to create a Scheduled retrain job.
+        image_tags (Dict[str, str]): Tag of each image, keyed by image name.
+        expected_wait_for (Dict[str, List[str]]): Expected waitFor of each step, in step order.
+        expected_critical_path (List[str]): Expected step ids on the critical path.
+    """
+    defaults = DefaultsConfig(project_id='automlops-sandbox', run_local=run_local, schedule_pattern=schedule_pattern)
+    cb_scripts = CloudBuildScripts(defaults, 'AutoMLOps/', image_tags)
+    cloudbuild_config = yaml.safe_load(cb_scripts.create_kfp_cloudbuild_config)
+    steps = {step['id']: step for step in cloudbuild_config['steps']}
+
+    assert {step_id: step['waitFor'] for step_id, step in steps.items()} == expected_wait_for
+    assert list(expected_wait_for) == list(steps)
+    assert 'images' not in cloudbuild_config
+    base_repository = 'us-central1-docker.pkg.dev/automlops-sandbox/vertex-mlops-af/components/component_base'
+    assert steps['build_component_base']['env'] == ['DOCKER_BUILDKIT=1']
+    assert steps['build_component_base']['args'][1].splitlines()[-4:-1] == [
+        f'  docker build --target builder -t {base_repository}:builder --cache-from {base_repository}:builder --build-arg BUILDKIT_INLINE_CACHE=1 .',
+        f'  docker build -t {base_repository}:base0123 -t {base_repository}:latest --cache-from {base_repository}:builder '
+        f'--cache-from {base_repository}:latest --build-arg BUILDKIT_INLINE_CACHE=1 .',
+        f'  docker image inspect --format "{base_repository}:base0123: {{{{.Size}}}} bytes" {base_repository}:base0123']
+    assert steps['push_component_base']['args'][1].splitlines()[-4:-1] == [
+        f'  docker push {base_repository}:base0123', f'  docker push {base_repository}:latest', f'  docker push {base_repository}:builder']
+    for image_name, tag in image_tags.items():
+        if image_name.startswith('components/') and image_name != 'components/component_base':
+            image = image_name.split('/', 1)[1]
+            repository = defaults.get_image_uri(image_name, tag).rsplit(':', 1)[0]
+            assert steps[f'build_component_image_{image}']['args'][1].splitlines()[-3] == (
+                f'  docker build -t {repository}:{tag} -t {repository}:latest --cache-from {repository}:latest --build-arg BUILDKIT_INLINE_CACHE=1 '
+                f'--build-arg BASE_IMAGE={base_repository}:base0123 -f images/{image}/Dockerfile .')
+    assert f'# Critical path (estimated): {" -> ".join(expected_critical_path)}\n' in cb_scripts.create_kfp_cloudbuild_config
+
+class LocalRegistryTagChecker(ImageTagChecker):
+    """Stand-in for the Artifact Registry: an image exists if a file named
+    after its uri exists in a local directory."""
+    def __init__(self, registry_dir: str):
+        """Creates a checker for a local registry directory.
+
+        Args:
+            registry_dir (str): Directory holding a file per existing image.
+        """
+        self.registry_dir = registry_dir
+
+    def command(self, image: str) -> str:
+        return f'test -e {self.registry_dir}/{image.replace("/", "_")}'
+
+@pytest.mark.parametrize(
+    'existing_images, expected_docker_commands',
+    [
+        ([], ['build', 'build', 'image', 'push', 'push', 'push']),
+        (['components/component_base'], [])
+    ]
+)
+def test_create_kfp_cloudbuild_config_skips_existing_tags(tmpdir: pytest.FixtureRequest,
+                                                          existing_images: List[str],
+                                                          expected_docker_commands: List[str]):
+    """Runs the scripts of the generated component_base build and push steps
+    against a local registry stand-in, with docker replaced by a script that
+    logs its arguments. There are two cases:
+        1. The tag is not in the registry, so the image is built and pushed.
+        2. The tag is already in the registry, so both steps are skipped.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        existing_images (List[str]): Names of the images already in the registry.
+        expected_docker_commands (List[str]): Expected docker subcommands run by the steps.
+    """
+    defaults = DefaultsConfig(project_id='automlops-sandbox', run_local=True)
+    image_tags = IMAGE_TAGS
+    registry_dir = f'{tmpdir}/registry'
+    os.makedirs(registry_dir)
+    for image_name in existing_images:
+        with open(f'{registry_dir}/{defaults.get_image_uri(image_name, image_tags[image_name]).replace("/", "_")}', 'w', encoding='utf-8'):
+            pass
+    bin_dir = f'{tmpdir}/bin'
+    os.makedirs(bin_dir)
+    with open(f'{bin_dir}/docker', 'w', encoding='utf-8') as file:
+        file.write(f'#!/bin/bash\necho "$1" >> {tmpdir}/docker.log\n')
+    os.chmod(f'{bin_dir}/docker', 0o755)
+
+    cb_scripts = CloudBuildScripts(defaults, 'AutoMLOps/', image_tags, LocalRegistryTagChecker(registry_dir))
+    steps = {step['id']: step for step in yaml.safe_load(cb_scripts.create_kfp_cloudbuild_config)['steps']}
+    env = dict(os.environ, PATH=f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+    for step_id in ['build_component_base', 'push_component_base']:
+        subprocess.run(['bash', '-c', steps[step_id]['args'][1]], env=env, check=True, cwd=str(tmpdir))
+
+    docker_log = f'{tmpdir}/docker.log'
+    docker_commands = []
+    if os.path.exists(docker_log):
+        with open(docker_log, 'r', encoding='utf-8') as file:
+            docker_commands = file.read().split()
+    assert docker_commands == expected_docker_commands
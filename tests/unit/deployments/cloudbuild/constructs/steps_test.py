@@ -0,0 +1,100 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for cloudbuild steps constructs module."""
+
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+from contextlib import nullcontext as does_not_raise
+from typing import Dict, List
+
+import pytest
+
+from AutoMLOps.deployments.cloudbuild.constructs.steps import (
+    CloudBuildStep,
+    format_critical_path_report,
+    get_critical_path,
+    get_step_durations,
+    validate_steps
+)
+
+STEPS = [
+    CloudBuildStep('build_a', 'build a', '', (), 100),
+    CloudBuildStep('build_b', 'build b', '', (), 50),
+    CloudBuildStep('push_a', 'push a', '', ('build_a',), 10),
+    CloudBuildStep('push_b', 'push b', '', ('build_b',), 10),
+    CloudBuildStep('deploy_b', 'deploy b', '', ('push_b',), 30),
+    CloudBuildStep('submit', 'submit', '', ('push_a', 'deploy_b'), 5)
+]
+
+@pytest.mark.parametrize(
+    'steps, expectation',
+    [
+        (STEPS, does_not_raise()),
+        ([CloudBuildStep('a', 'a', ''), CloudBuildStep('a', 'a', '')], pytest.raises(ValueError)),
+        ([CloudBuildStep('a', 'a', '', ('b',)), CloudBuildStep('b', 'b', '')], pytest.raises(ValueError))
+    ]
+)
+def test_validate_steps(steps: List[CloudBuildStep], expectation):
+    """Tests validate_steps, which checks that step ids are unique and that
+    steps only wait for steps defined before them. There are three sets of
+    test cases for this function:
+        1. Expected outcome, a valid graph.
+        2. Duplicate step id, expecting a ValueError.
+        3. Step waiting for a later step, expecting a ValueError.
+
+    Args:
+        steps (List[CloudBuildStep]): Steps in the order they are written.
+        expectation: Any corresponding expected errors for each set of parameters.
+    """
+    with expectation:
+        validate_steps(steps)
+
+@pytest.mark.parametrize(
+    'durations, expected_path, expected_total',
+    [
+        ({}, ['build_a', 'push_a', 'submit'], 115),
+        ({'build_a': 20}, ['build_b', 'push_b', 'deploy_b', 'submit'], 95),
+        ({'build_a': 20, 'build_b': 20, 'push_a': 10, 'push_b': 10, 'deploy_b': 30, 'submit': 5}, ['build_b', 'push_b', 'deploy_b', 'submit'], 65)
+    ]
+)
+def test_get_critical_path(durations: Dict[str, float], expected_path: List[str], expected_total: float):
+    """Tests get_critical_path, which finds the longest chain of dependent
+    steps using measured durations where given and estimates otherwise.
+
+    Args:
+        durations (Dict[str, float]): Measured step durations in seconds.
+        expected_path (List[str]): Expected step ids on the critical path.
+        expected_total (float): Expected duration of the critical path.
+    """
+    assert get_critical_path(STEPS, durations) == (expected_path, expected_total)
+    assert format_critical_path_report(STEPS, durations).startswith(
+        f'# Critical path ({"measured" if durations else "estimated"}): {" -> ".join(expected_path)}\n')
+
+def test_render():
+    """Tests CloudBuildStep.render, which writes a step with its id and waitFor."""
+    assert STEPS[0].render() == '  # build a\n    id: "build_a"\n    waitFor: ["-"]\n'
+    assert STEPS[-1].render() == '  # submit\n    id: "submit"\n    waitFor: ["push_a", "deploy_b"]\n'
+
+def test_get_step_durations():
+    """Tests get_step_durations, which reads step durations from a build resource."""
+    build = {
+        'steps': [
+            {'id': 'build_a', 'timing': {'startTime': '2023-07-07T10:00:00.500000000Z', 'endTime': '2023-07-07T10:01:40.750000000Z'}},
+            {'id': 'push_a', 'timing': {'startTime': '2023-07-07T10:01:41Z', 'endTime': '2023-07-07T10:01:51.5Z'}},
+            {'id': 'submit'}
+        ]
+    }
+    assert get_step_durations(build) == {'build_a': 100.25, 'push_a': 10.5}
@@ -24,6 +24,7 @@ from typing import List
 import pytest
 
 from AutoMLOps.frameworks.base import Component, Pipeline
+from AutoMLOps.utils.config import DefaultsConfig
 from AutoMLOps.utils.utils import write_yaml_file
 
 DEFAULTS1 = {
@@ -77,7 +78,7 @@ def test_Component(defaults_dict: pytest.FixtureRequest, component_spec: dict):
     path = defaults_dict['path']
     defaults = defaults_dict['vals']
 
-    my_component = Component(component_spec=component_spec, defaults_file=path)
+    my_component = Component(component_spec=component_spec, defaults=DefaultsConfig.from_yaml(path))
     assert my_component._af_registry_location == defaults['gcp']['af_registry_location']
     assert my_component._af_registry_name == defaults['gcp']['af_registry_name']
     assert my_component._project_id == defaults['gcp']['project_id']
@@ -121,6 +122,6 @@ def test_Pipeline(defaults_dict: pytest.FixtureRequest, custom_training_job_spec
     defaults = defaults_dict['vals']
 
     my_pipeline = Pipeline(custom_training_job_specs=custom_training_job_specs,
-                           defaults_file=path)
+                           defaults=DefaultsConfig.from_yaml(path))
     assert my_pipeline._project_id == defaults['gcp']['project_id']
     assert my_pipeline._custom_training_job_specs == custom_training_job_specs
@@ -17,6 +17,8 @@
 # pylint: disable=line-too-long
 # pylint: disable=missing-function-docstring
 
+from contextlib import nullcontext as does_not_raise
+import copy
 import json
 import os
 from typing import List
@@ -26,8 +28,15 @@ import pytest_mock
 
 from AutoMLOps.frameworks.kfp.builder import (
     build_component,
-    build_pipeline
+    build_components,
+    build_pipeline,
+    create_requirements_report,
+    get_build_context_tag,
+    list_build_context_files,
+    validate_component_resources
 )
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import DEFAULT_GCP_REQUIREMENTS
 import AutoMLOps.utils.utils
 from AutoMLOps.utils.utils import (
     make_dirs,
@@ -130,7 +139,7 @@ def fixture_expected_component_dict():
     expected['implementation'] = {
         'container': {
             'image': 'us-central1-docker.pkg.dev/my_project/my_af_registry/components/component_base:latest',
-            'command': ['python3', '/pipelines/component/src/create_dataset.py'],
+            'command': ['python3', '-m', 'create_dataset'],
             'args': [
                 '--executor_input',
                 {'executorInput': None},
@@ -162,14 +171,11 @@ def test_build_component(mocker: pytest_mock.MockerFixture,
     mocker.patch.object(AutoMLOps.frameworks.kfp.builder,
                         'BASE_DIR', 
                         f'{tmpdir}' + '/')
-    mocker.patch.object(AutoMLOps.frameworks.kfp.builder,
-                        'GENERATED_DEFAULTS_FILE',
-                        defaults_dict['path'])
 
     # Extract component name, create required directories, run build_component
     component_name = TEMP_YAML['name']
     make_dirs([f'{tmpdir}/components/component_base/src'])
-    build_component(temp_yaml_dict['path'])
+    build_component(temp_yaml_dict['path'], DefaultsConfig.from_yaml(defaults_dict['path']))
 
     # Ensure correct files are created with build_component call
     assert os.path.exists(f'{tmpdir}/components/{component_name}/component.yaml')
@@ -179,6 +185,198 @@ def test_build_component(mocker: pytest_mock.MockerFixture,
     created_component_dict = read_yaml_file(f'{tmpdir}/components/{component_name}/component.yaml')
     assert created_component_dict == expected_component_dict
 
+@pytest.mark.parametrize(
+    'changed_contents, changed_name, extra_inputs, expected_same_tag',
+    [
+        (None, None, (), True),
+        ('FROM python:3.10-slim\n', None, (), False),
+        (None, 'requirements-dev.txt', (), False),
+        (None, None, ('base0123',), False)
+    ]
+)
+def test_get_build_context_tag(tmpdir: pytest.FixtureRequest,
+                               changed_contents: str,
+                               changed_name: str,
+                               extra_inputs: tuple,
+                               expected_same_tag: bool):
+    """Tests get_build_context_tag, which tags an image with a digest of its
+    build context. There are four test cases for this function:
+        1. An unchanged context, listed in a different order, keeps its tag.
+        2. Changing the contents of a file changes the tag.
+        3. Renaming a file changes the tag.
+        4. Changing an extra input, such as the base image tag, changes the tag.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        changed_contents (str): New contents of the Dockerfile, if changed.
+        changed_name (str): New name of requirements.txt, if renamed.
+        extra_inputs (tuple): Extra inputs of the second build.
+        expected_same_tag (bool): Whether the tag is expected to stay the same.
+    """
+    files = {'Dockerfile': 'FROM python:3.9-slim\n', 'requirements.txt': 'pandas\n', 'src/train.py': 'print(1)\n'}
+    make_dirs([f'{tmpdir}/src'])
+    for name, contents in files.items():
+        with open(f'{tmpdir}/{name}', 'w', encoding='utf-8') as file:
+            file.write(contents)
+    tag = get_build_context_tag(str(tmpdir), [f'{tmpdir}/{name}' for name in files])
+    assert len(tag) == 16
+
+    if changed_contents:
+        with open(f'{tmpdir}/Dockerfile', 'w', encoding='utf-8') as file:
+            file.write(changed_contents)
+    names = list(files)
+    if changed_name:
+        os.rename(f'{tmpdir}/requirements.txt', f'{tmpdir}/{changed_name}')
+        names[1] = changed_name
+    new_tag = get_build_context_tag(str(tmpdir), [f'{tmpdir}/{name}' for name in reversed(names)], *extra_inputs)
+    assert (new_tag == tag) == expected_same_tag
+
+def test_list_build_context_files(tmpdir: pytest.FixtureRequest):
+    """Tests list_build_context_files, which leaves bytecode caches, dotfiles
+    and editor swap and backup files out of a build context, so creating them
+    does not change the image tag.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    context = ['Dockerfile', 'src/train.py']
+    ignored = ['.gitignore', 'src/.config/settings.json', 'src/.train.py.swp', 'src/train.py~', 'src/train.pyc',
+               'src/__pycache__/train.cpython-39.pyc', '.ipynb_checkpoints/train-checkpoint.py']
+    make_dirs([f'{tmpdir}/src/.config', f'{tmpdir}/src/__pycache__', f'{tmpdir}/.ipynb_checkpoints'])
+    for name in context:
+        with open(f'{tmpdir}/{name}', 'w', encoding='utf-8') as file:
+            file.write(name)
+    tag = get_build_context_tag(str(tmpdir), list_build_context_files(str(tmpdir)))
+
+    for name in ignored:
+        with open(f'{tmpdir}/{name}', 'w', encoding='utf-8') as file:
+            file.write(name)
+    assert sorted(list_build_context_files(str(tmpdir))) == [f'{tmpdir}/{name}' for name in context]
+    assert get_build_context_tag(str(tmpdir), list_build_context_files(str(tmpdir))) == tag
+
+def test_create_requirements_report(mocker: pytest_mock.MockerFixture,
+                                    monkeypatch: pytest.MonkeyPatch,
+                                    tmpdir: pytest.FixtureRequest):
+    """Tests create_requirements_report, which lists the requirements of
+    each image including those of the component_base image it is layered
+    on, the packages added for imported libraries, the default packages no
+    longer installed, and the download size of the locked requirements.
+
+    Args:
+        mocker: Mocker to create the per-component images.
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    monkeypatch.chdir(tmpdir)
+    files = {
+        'wheels/kfp-1.8.22-py3-none-any.whl': 'k' * 100,
+        'wheels/pyarrow-12.0.1-cp39-cp39-manylinux2014_x86_64.whl': 'p' * 10,
+        'wheels/pyarrow-12.0.1-cp310-cp310-manylinux2014_x86_64.whl': 'p' * 20,
+        'AutoMLOps/components/component_base/requirements.txt': 'kfp<2.0.0\n',
+        'AutoMLOps/components/component_base/requirements.lock': 'kfp==1.8.22 \\\n    --hash=sha256:0\n',
+        'AutoMLOps/components/component_base/images/load/requirements.txt': 'google-cloud-bigquery\npyarrow\n',
+        'AutoMLOps/components/component_base/images/load/requirements.lock': 'kfp==1.8.22 \\\n    --hash=sha256:0\npyarrow==12.0.1 \\\n    --hash=sha256:1\n'
+    }
+    make_dirs(['wheels', 'AutoMLOps/components/component_base/images/load'])
+    for path, contents in files.items():
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(contents)
+    component_images = mocker.Mock(groups={'load': ['load'], 'train': ['train']}, requirements={'load': 'google-cloud-bigquery\npyarrow\n'})
+
+    report = json.loads(create_requirements_report(DefaultsConfig(project_id='my-project', wheelhouse='wheels'), component_images))['images']
+
+    assert report['components/component_base']['requirements'] == ['kfp<2.0.0']
+    assert report['components/component_base']['download_size_bytes'] == 100
+    assert report['components/train']['requirements'] == ['kfp<2.0.0']
+    assert report['components/load'] == {
+        'requirements': ['google-cloud-bigquery', 'kfp<2.0.0', 'pyarrow'],
+        'added_for_imports': {'pyarrow': 'google-cloud-bigquery'},
+        'dropped_defaults': [r for r in DEFAULT_GCP_REQUIREMENTS if r not in ('google-cloud-bigquery', 'pyarrow')],
+        'download_size_bytes': 120}
+
+@pytest.mark.parametrize(
+    'component_names, missing_paths',
+    [
+        (['comp_a', 'comp_b', 'comp_c'], []),
+        (['comp_a', 'comp_b'], ['missing_1', 'missing_2'])
+    ]
+)
+def test_build_components(mocker: pytest_mock.MockerFixture,
+                          tmpdir: pytest.FixtureRequest,
+                          defaults_dict: pytest.FixtureRequest,
+                          component_names: List[str],
+                          missing_paths: List[str]):
+    """Tests build_components, which builds components concurrently. There are
+    two test cases for this function:
+        1. All components build, outputs are returned in input order.
+        2. Some component yamls are missing, expecting a single RuntimeError
+            that lists every failure while the valid components are still built.
+
+    Args:
+        mocker: Mocker to patch directories.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        defaults_dict: Locally defined defaults_dict Pytest fixture.
+        component_names (List[str]): Names of the valid components to build.
+        missing_paths (List[str]): Component yaml paths that do not exist.
+    """
+    mocker.patch.object(AutoMLOps.frameworks.kfp.builder,
+                        'BASE_DIR',
+                        f'{tmpdir}' + '/')
+    make_dirs([f'{tmpdir}/components/component_base/src'])
+
+    component_paths = []
+    for name in component_names:
+        spec = copy.deepcopy(TEMP_YAML)
+        spec['name'] = name
+        component_paths.append(f'{tmpdir}/{name}.yaml')
+        write_yaml_file(component_paths[-1], spec, 'w')
+    component_paths += [f'{tmpdir}/{path}.yaml' for path in missing_paths]
+
+    if missing_paths:
+        with pytest.raises(RuntimeError) as err:
+            build_components(component_paths, DefaultsConfig.from_yaml(defaults_dict['path']))
+        for path in missing_paths:
+            assert path in str(err.value)
+    else:
+        outputs = build_components(component_paths, DefaultsConfig.from_yaml(defaults_dict['path']))
+        assert [os.path.basename(os.path.dirname(out[1])) for out in outputs] == component_names
+    for name in component_names:
+        assert os.path.exists(f'{tmpdir}/components/{name}/component.yaml')
+
+@pytest.mark.parametrize(
+    'annotations, expectation',
+    [
+        (None, does_not_raise()),
+        ({'automlops/cpu_limit': '16', 'automlops/memory_limit': '64G'}, does_not_raise()),
+        ({'automlops/memory_limit': '2T'}, pytest.raises(ValueError, match='component train'))
+    ]
+)
+def test_validate_component_resources(tmpdir: pytest.FixtureRequest, annotations: dict, expectation):
+    """Tests validate_component_resources, which checks the resources declared
+    on each component against the machine catalog. There are three test cases:
+        1. No resources are declared.
+        2. The resources fit a machine type.
+        3. No machine type has the declared memory.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        annotations (dict): Annotations holding the declared resources.
+        expectation: Any corresponding expected errors for each
+            set of parameters.
+    """
+    spec = copy.deepcopy(TEMP_YAML)
+    spec['name'] = 'train'
+    if annotations:
+        spec['metadata'] = {'annotations': annotations}
+    write_yaml_file(f'{tmpdir}/train.yaml', spec, 'w')
+    with expectation:
+        validate_component_resources([f'{tmpdir}/train.yaml'])
+
 @pytest.mark.parametrize(
     'custom_training_job_specs, pipeline_parameter_values',
     [
@@ -250,9 +448,6 @@ def test_build_pipeline(mocker: pytest_mock.MockerFixture,
     mocker.patch.object(AutoMLOps.frameworks.kfp.builder,
                         'BASE_DIR',
                         f'{tmpdir}' + '/')
-    mocker.patch.object(AutoMLOps.frameworks.kfp.builder,
-                        'GENERATED_DEFAULTS_FILE',
-                        defaults_dict['path'])
     mocker.patch.object(AutoMLOps.utils.utils,
                         'CACHE_DIR',
                         '.')
@@ -260,7 +455,7 @@ def test_build_pipeline(mocker: pytest_mock.MockerFixture,
     # Create required directory and file for build_pipeline
     make_dirs([f'{tmpdir}/pipelines/runtime_parameters'])
     os.system(f'touch {tmpdir}/pipelines/pipeline.py')
-    build_pipeline(custom_training_job_specs, pipeline_parameter_values)
+    build_pipeline(custom_training_job_specs, pipeline_parameter_values, DefaultsConfig.from_yaml(defaults_dict['path']))
 
     # Ensure correct files were created
     assert os.path.exists(f'{tmpdir}/pipelines/pipeline.py')
@@ -22,6 +22,7 @@
 import pytest
 
 from AutoMLOps.frameworks.kfp.constructs.cloudrun import KfpCloudRun
+from AutoMLOps.utils.config import DefaultsConfig
 from AutoMLOps.utils.constants import (
     GENERATED_LICENSE,
     LEFT_BRACKET,
@@ -103,7 +104,7 @@ def test_KfpCloudRun(defaults_dict: pytest.FixtureRequest):
     """
     path = defaults_dict['path']
     defaults = defaults_dict['vals']
-    my_cloudrun = KfpCloudRun(path)
+    my_cloudrun = KfpCloudRun(DefaultsConfig.from_yaml(path))
 
     #Assert that created KfpCloudRun instance has the expected attribute values
     assert my_cloudrun._project_id == defaults['gcp']['project_id']
@@ -118,22 +119,43 @@ def test_KfpCloudRun(defaults_dict: pytest.FixtureRequest):
 
     assert my_cloudrun.dockerfile == (
         GENERATED_LICENSE +
+        'FROM python:3.9-slim AS builder\n'
+        '\n'
+        '# Install requirements into virtual environments, caching downloads across builds\n'
+        'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+        '    python -m venv /opt/venv \\\n'
+        '    && /opt/venv/bin/python -m pip install --upgrade pip\n'
+        'COPY cloud_run/run_pipeline/requirements.txt .\n'
+        'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+        '    /opt/venv/bin/python -m pip install -r requirements.txt\n'
+        'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+        '    python -m venv /opt/pipeline_spec_venv \\\n'
+        '    && /opt/pipeline_spec_venv/bin/python -m pip install --upgrade pip\n'
+        'COPY cloud_run/run_pipeline/pipeline_spec_requirements.txt .\n'
+        'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+        '    /opt/pipeline_spec_venv/bin/python -m pip install -r pipeline_spec_requirements.txt\n'
+        '\n'
+        '# Compile pipeline spec\n'
+        'WORKDIR /app\n'
+        'RUN --mount=type=bind,target=/app,rw \\\n'
+        '    PATH="/opt/pipeline_spec_venv/bin:$PATH" ./scripts/build_pipeline_spec.sh \\\n'
+        '    && cp scripts/pipeline_spec/pipeline_job.json /pipeline_job.json\n'
+        '\n'
         'FROM python:3.9-slim\n'
         '\n'
         '# Allow statements and log messages to immediately appear in the Knative logs\n'
         'ENV PYTHONUNBUFFERED True\n'
         '\n'
-        '# Copy local code to the container image.\n'
+        'COPY --from=builder /opt/venv /opt/venv\n'
+        'ENV PATH="/opt/venv/bin:$PATH"\n'
+        '\n'
+        '# Copy the files the service reads to the container image.\n'
         'ENV APP_HOME /app\n'
         'WORKDIR $APP_HOME\n'
-        'COPY ./ ./\n'
+        'COPY configs/defaults.yaml configs/\n'
+        'COPY cloud_run/run_pipeline/main.py cloud_run/run_pipeline/\n'
+        'COPY --from=builder /pipeline_job.json scripts/pipeline_spec/pipeline_job.json\n'
         '\n'
-        '# Upgrade pip\n'
-        'RUN python -m pip install --upgrade pip\n'
-        '# Install requirements\n'
-        'RUN pip install --no-cache-dir -r /app/cloud_run/run_pipeline/requirements.txt\n'
-        '# Compile pipeline spec\n'
-        'RUN ./scripts/build_pipeline_spec.sh\n'
         '# Change Directories\n'
         'WORKDIR "/app/cloud_run/run_pipeline"\n'
         '# Run flask api server\n'
@@ -141,14 +163,18 @@ def test_KfpCloudRun(defaults_dict: pytest.FixtureRequest):
     )
 
     assert my_cloudrun.cloudrun_base_reqs == (
-        'kfp<2.0.0\n'
         'google-cloud-aiplatform\n'
-        'google-cloud-pipeline-components\n'
         'Flask\n'
         'gunicorn\n'
         'pyyaml\n'
     )
 
+    assert my_cloudrun.pipeline_spec_reqs == (
+        'kfp<2.0.0\n'
+        'google-cloud-pipeline-components\n'
+        'pyyaml\n'
+    )
+
     assert my_cloudrun.queueing_svc_reqs == (
         'google-cloud\n'
         'google-cloud-tasks\n'
@@ -194,7 +220,7 @@ def test_KfpCloudRun(defaults_dict: pytest.FixtureRequest):
         f'''        logging.debug(request_json)\n'''
         f'\n'
         f'''        with open(CONFIG_FILE, 'r', encoding='utf-8') as config_file:\n'''
-        f'''            config = yaml.load(config_file, Loader=yaml.FullLoader)\n'''
+        f'''            config = yaml.safe_load(config_file)\n'''
         f'\n'
         f'''        logging.debug('Calling run_pipeline()')\n'''
         f'''        dashboard_uri, resource_name = run_pipeline(\n'''
@@ -429,3 +455,16 @@ def test_KfpCloudRun(defaults_dict: pytest.FixtureRequest):
         f'''            schedule_location=SCHEDULE_LOCATION,\n'''
         f'''            schedule_name=SCHEDULE_NAME,\n'''
         f'''            schedule_pattern=SCHEDULE_PATTERN)\n''')
+
+def test_KfpCloudRun_offline():
+    """Tests that with a local wheelhouse, the run_pipeline requirements are
+    installed from the bind mounted wheelhouse without an index."""
+    my_cloudrun = KfpCloudRun(DefaultsConfig(project_id='my-project', wheelhouse='/wheels'))
+
+    for venv_dir, reqs_filename in [('/opt/venv', 'requirements.txt'), ('/opt/pipeline_spec_venv', 'pipeline_spec_requirements.txt')]:
+        assert (
+            f'RUN python -m venv {venv_dir}\n'
+            f'COPY cloud_run/run_pipeline/{reqs_filename} .\n'
+            'RUN --mount=type=bind,source=components/component_base/wheelhouse,target=/wheelhouse \\\n'
+            f'    {venv_dir}/bin/python -m pip install --no-index --find-links /wheelhouse -r {reqs_filename}\n') in my_cloudrun.dockerfile
+    assert '--mount=type=cache' not in my_cloudrun.dockerfile
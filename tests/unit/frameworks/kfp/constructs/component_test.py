@@ -19,10 +19,20 @@
 # pylint: disable=missing-function-docstring
 # pylint: disable=protected-access
 
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
 import pytest
 
 from AutoMLOps.frameworks.kfp.constructs.component import KfpComponent
-from AutoMLOps.utils.constants import GENERATED_LICENSE
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import GENERATED_LICENSE, STEP_CACHE_DIR_ENV_VAR, STEP_CACHE_MAX_BYTES_ENV_VAR, STEP_CHECKPOINT_FILENAME
 from AutoMLOps.utils.utils import is_using_kfp_spec, write_yaml_file
 
 # Create defaults file contents to test
@@ -99,7 +109,7 @@ def test_KfpComponent(component_spec: dict, defaults_dict: pytest.FixtureRequest
     # Extract path and contents from defaults dict to create KFP Component
     path = defaults_dict['path']
     defaults = defaults_dict['vals']
-    comp = KfpComponent(component_spec=component_spec, defaults_file=path)
+    comp = KfpComponent(component_spec=component_spec, defaults=DefaultsConfig.from_yaml(path))
 
     # Confirm attributes were correctly assigned
     assert comp._af_registry_location == defaults['gcp']['af_registry_location']
@@ -108,20 +118,27 @@ def test_KfpComponent(component_spec: dict, defaults_dict: pytest.FixtureRequest
     assert comp._component_spec == component_spec
 
     # Confirm generated scripts were correctly created
-    opt1 = ('\n'
-            'import kfp\n'
-            'from kfp.v2 import dsl\n'
-            'from kfp.v2.dsl import *\n'
-            'from typing import *\n'
-            '\n')
+    opt1 = '\n\n'
     opt2 = ''
     assert comp.task == (
         GENERATED_LICENSE +
+        f'''import time\n'''
+        f'''_IMPORT_START = time.perf_counter()\n'''
+        f'''\n'''
         f'''import argparse\n'''
+        f'''import hashlib\n'''
         f'''import json\n'''
+        f'''import logging\n'''
+        f'''import os\n'''
+        f'''import shutil\n'''
+        f'''import sys\n'''
+        f'''import tempfile\n'''
         f'''from kfp.v2.components import executor\n'''
+        f'''from kfp.v2.components.types import artifact_types as _artifact_types\n'''
         f'''{opt1 if not is_using_kfp_spec(component_spec["implementation"]["container"]["image"]) else opt2}'''
         f'''{component_spec["implementation"]["container"]["command"][-1]}'''
+        f'''{comp._create_step_cache()}'''
+        f'''{comp._create_step_checkpoint()}'''
         '\n'
         '''def main():\n'''
         '''    """Main executor."""\n'''
@@ -130,12 +147,27 @@ def test_KfpComponent(component_spec: dict, defaults_dict: pytest.FixtureRequest
         '''    parser.add_argument('--function_to_execute', type=str)\n'''
         '\n'
         '''    args, _ = parser.parse_known_args()\n'''
+        '''    import_seconds = time.perf_counter() - _IMPORT_START\n'''
+        '''    import_budget = float(os.environ.get('AUTOMLOPS_IMPORT_TIME_BUDGET_SECONDS', 5))\n'''
+        '''    if import_seconds > import_budget:\n'''
+        '''        logging.warning('%s: imports took %.2fs, over the %gs budget; move heavy imports into the component function',\n'''
+        '''                        args.function_to_execute, import_seconds, import_budget)\n'''
+        '''    else:\n'''
+        '''        logging.info('%s: imports took %.2fs of a %gs budget', args.function_to_execute, import_seconds, import_budget)\n'''
+        '\n'
         '''    executor_input = json.loads(args.executor_input)\n'''
         '''    function_to_execute = globals()[args.function_to_execute]\n'''
         '\n'
-        '''    executor.Executor(\n'''
-        '''        executor_input=executor_input,\n'''
-        '''        function_to_execute=function_to_execute).execute()\n'''
+        '''    cache_key = _get_step_cache_key(executor_input, args.function_to_execute)\n'''
+        '''    if cache_key and _restore_step_outputs(cache_key, executor_input):\n'''
+        '''        print(f'{args.function_to_execute}: restored outputs from the step cache ({cache_key[:12]})')\n'''
+        '''    else:\n'''
+        '''        executor.Executor(\n'''
+        '''            executor_input=executor_input,\n'''
+        '''            function_to_execute=function_to_execute).execute()\n'''
+        '''        if cache_key:\n'''
+        '''            _save_step_outputs(cache_key, executor_input)\n'''
+        '''    _write_step_checkpoint(executor_input, args.function_to_execute)\n'''
         '\n'
         '''if __name__ == '__main__':\n'''
         '''    main()\n'''
@@ -146,3 +178,140 @@ def test_KfpComponent(component_spec: dict, defaults_dict: pytest.FixtureRequest
             f'''{defaults['gcp']['project_id']}/'''
             f'''{defaults['gcp']['af_registry_name']}/'''
             f'''components/component_base:latest''')
+
+@pytest.mark.parametrize(
+    'custom_code, expected_imports',
+    [
+        (
+            'def train(data: Input[Dataset], model: Output[Model]) -> NamedTuple(\'Outputs\', [(\'score\', float)]):\n'
+            '    metrics: \'Optional[Metrics]\' = None\n',
+            'from kfp.v2.dsl import Dataset, Input, Metrics, Model, Output\n'
+            'from typing import NamedTuple, Optional\n'
+        ),
+        (
+            'def load(path: str):\n'
+            '    return kfp.__version__, dsl.PIPELINE_JOB_NAME_PLACEHOLDER\n',
+            'import kfp\n'
+            'from kfp.v2 import dsl\n'
+        ),
+        (
+            'def load(path: str:\n',
+            'import kfp\n'
+            'from kfp.v2 import dsl\n'
+            'from kfp.v2.dsl import *\n'
+            'from typing import *\n'
+        )
+    ]
+)
+def test_create_custom_imports(defaults_dict: pytest.FixtureRequest, custom_code: str, expected_imports: str):
+    """Tests that a task imports only the kfp and typing names its component
+    uses, including names in string annotations, and falls back to star
+    imports when the component code cannot be parsed.
+
+    Args:
+        defaults_dict (dict): Dictionary containing the path to the default config
+            variables yaml and the dictionary held within it.
+        custom_code (str): Source code of the component function.
+        expected_imports (str): Expected import statements.
+    """
+    comp = KfpComponent(component_spec=COMPONENT_SPEC2, defaults=DefaultsConfig.from_yaml(defaults_dict['path']))
+    assert comp._create_custom_imports(custom_code) == expected_imports
+
+def test_create_step_cache(defaults_dict: pytest.FixtureRequest, tmpdir: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch):
+    """Tests the step cache functions of a task, which are used when the step
+    cache is enabled. There are four cases:
+    1. Without a step cache directory, a task has no cache key.
+    2. A step with the same inputs has the same key, and its saved outputs are
+       restored to the output locations of the new run.
+    3. Changing the contents of an input artifact changes the key.
+    4. Saving a step evicts the least recently used steps above the size limit.
+
+    Args:
+        defaults_dict (dict): Dictionary containing the path to the default config
+            variables yaml and the dictionary held within it.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        monkeypatch: Mocker to patch the environment variables.
+    """
+    comp = KfpComponent(component_spec=COMPONENT_SPEC2, defaults=DefaultsConfig.from_yaml(defaults_dict['path']))
+    with open(f'{tmpdir}/task.py', 'w', encoding='utf-8') as f:
+        f.write(comp.task)
+    artifact_types = SimpleNamespace(Artifact=lambda uri: SimpleNamespace(path=f'{tmpdir}/gcs/' + uri[len('gs://'):] if uri.startswith('gs://') else None))
+    task = {'__file__': f'{tmpdir}/task.py', '_artifact_types': artifact_types, 'hashlib': hashlib, 'json': json, 'os': os, 'shutil': shutil, 'sys': sys, 'tempfile': tempfile}
+    exec(comp._create_step_cache(), task) # pylint: disable=exec-used
+
+    def executor_input(run: str) -> dict:
+        return {
+            'inputs': {
+                'parameters': {'rows': {'intValue': 10}},
+                'artifacts': {'data': {'artifacts': [{'name': 'data', 'uri': 'gs://bucket/extract/data', 'metadata': {}}]}}},
+            'outputs': {
+                'parameters': {'score': {'outputFile': f'{tmpdir}/{run}/outputs/score'}},
+                'artifacts': {'model': {'artifacts': [{'name': 'model', 'uri': f'gs://bucket/{run}/model', 'metadata': {}}]}},
+                'outputFile': f'{tmpdir}/{run}/executor_output.json'}}
+    os.makedirs(f'{tmpdir}/gcs/bucket/extract')
+    with open(f'{tmpdir}/gcs/bucket/extract/data', 'w', encoding='utf-8') as f:
+        f.write('a,b')
+
+    # 1. Without a step cache directory
+    assert task['_get_step_cache_key'](executor_input('run1'), 'train') is None
+
+    # 2. A step is saved by one run and restored by the next
+    monkeypatch.setenv(STEP_CACHE_DIR_ENV_VAR, f'{tmpdir}/step_cache')
+    key = task['_get_step_cache_key'](executor_input('run1'), 'train')
+    assert not task['_restore_step_outputs'](key, executor_input('run1'))
+    os.makedirs(f'{tmpdir}/gcs/bucket/run1/model')
+    with open(f'{tmpdir}/gcs/bucket/run1/model/model.pkl', 'w', encoding='utf-8') as f:
+        f.write('weights')
+    os.makedirs(f'{tmpdir}/run1/outputs')
+    with open(f'{tmpdir}/run1/outputs/score', 'w', encoding='utf-8') as f:
+        f.write('0.5')
+    with open(f'{tmpdir}/run1/executor_output.json', 'w', encoding='utf-8') as f:
+        json.dump({'artifacts': {'model': {'artifacts': [{'name': 'model', 'uri': 'gs://bucket/run1/model', 'metadata': {'framework': 'sklearn'}}]}}}, f)
+    task['_save_step_outputs'](key, executor_input('run1'))
+
+    assert task['_get_step_cache_key'](executor_input('run2'), 'train') == key
+    assert task['_restore_step_outputs'](key, executor_input('run2'))
+    with open(f'{tmpdir}/gcs/bucket/run2/model/model.pkl', 'r', encoding='utf-8') as f:
+        assert f.read() == 'weights'
+    with open(f'{tmpdir}/run2/outputs/score', 'r', encoding='utf-8') as f:
+        assert f.read() == '0.5'
+    with open(f'{tmpdir}/run2/executor_output.json', 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'artifacts': {'model': {'artifacts': [{'name': 'model', 'uri': 'gs://bucket/run2/model', 'metadata': {'framework': 'sklearn'}}]}}}
+
+    # 3. An input artifact changes
+    with open(f'{tmpdir}/gcs/bucket/extract/data', 'w', encoding='utf-8') as f:
+        f.write('a,b,c')
+    new_key = task['_get_step_cache_key'](executor_input('run3'), 'train')
+    assert new_key != key
+
+    # 4. Saving the new step evicts the old one
+    monkeypatch.setenv(STEP_CACHE_MAX_BYTES_ENV_VAR, '200')
+    os.utime(f'{tmpdir}/step_cache/{key}/outputs.json', (0, 0))
+    task['_save_step_outputs'](new_key, executor_input('run2'))
+    assert os.listdir(f'{tmpdir}/step_cache') == [new_key]
+
+def test_create_step_checkpoint(defaults_dict: pytest.FixtureRequest, tmpdir: pytest.FixtureRequest):
+    """Tests that a completed task writes a checkpoint with the locations of
+    its outputs next to its executor output.
+
+    Args:
+        defaults_dict (dict): Dictionary containing the path to the default config
+            variables yaml and the dictionary held within it.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    comp = KfpComponent(component_spec=COMPONENT_SPEC2, defaults=DefaultsConfig.from_yaml(defaults_dict['path']))
+    task = {'json': json, 'os': os, 'time': time}
+    exec(comp._create_step_checkpoint(), task) # pylint: disable=exec-used
+    outputs = {
+        'parameters': {'score': {'outputFile': f'{tmpdir}/train/outputs/score'}},
+        'artifacts': {'model': {'artifacts': [{'name': 'model', 'uri': 'gs://bucket/train/model', 'metadata': {}}]}},
+        'outputFile': f'{tmpdir}/train/executor_output.json'}
+
+    task['_write_step_checkpoint']({'inputs': {}, 'outputs': outputs}, 'train')
+
+    with open(f'{tmpdir}/train/{STEP_CHECKPOINT_FILENAME}', 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert checkpoint['step'] == 'train'
+    assert checkpoint['outputs'] == outputs
@@ -0,0 +1,138 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for images constructs kfp module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+from typing import Dict, List
+
+import pytest
+
+from AutoMLOps.frameworks.kfp.constructs.images import KfpComponentImages
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import GENERATED_LICENSE, PINNED_KFP_VERSION
+
+def create_spec(name: str, packages_to_install: List[str], source: str) -> dict:
+    """Creates the spec of a temporary component yaml.
+
+    Args:
+        name (str): Name of the component.
+        packages_to_install (List[str]): Packages to install for the component.
+        source (str): Source code of the component.
+    Returns:
+        dict: Component spec.
+    """
+    packages = ' '.join(repr(package) for package in packages_to_install)
+    return {
+        'name': name,
+        'implementation': {'container': {
+            'image': 'AutoMLOps_image_tbd',
+            'command': ['sh', '-c', f'python3 -m pip install --quiet {packages} && "$0" "$@"\n', source]}}}
+
+@pytest.mark.parametrize(
+    'component_specs, expected_groups, expected_base_requirements, expected_requirements',
+    [
+        (
+            [
+                create_spec('train', ['pandas', 'scikit-learn'], 'def train():\n    import pandas\n'),
+                create_spec('evaluate', ['pandas', 'scikit-learn'], 'def evaluate():\n    import sklearn\n'),
+                create_spec('deploy', ['pandas', 'google-cloud-aiplatform'], 'def deploy():\n    pass\n')
+            ],
+            {'deploy': ['deploy'], 'evaluate': ['evaluate', 'train']},
+            [PINNED_KFP_VERSION, 'pandas'],
+            {'deploy': 'google-cloud-aiplatform\n', 'evaluate': 'scikit-learn\n'}
+        ),
+        (
+            [
+                create_spec('Load_Data', [], 'def load_data():\n    import os\n    from google.cloud import bigquery\n    from . import train\n'),
+                create_spec('train', [], 'def train():\n    import numpy as np\n    from google.cloud import aiplatform_v1\n')
+            ],
+            {'load_data': ['Load_Data'], 'train': ['train']},
+            [PINNED_KFP_VERSION],
+            {'load_data': 'db_dtypes\ngoogle-cloud-bigquery\ngoogle-cloud-bigquery-storage\npyarrow\n', 'train': 'google-cloud-aiplatform\nnumpy\n'}
+        )
+    ]
+)
+def test_KfpComponentImages(component_specs: List[dict],
+                            expected_groups: Dict[str, List[str]],
+                            expected_base_requirements: List[str],
+                            expected_requirements: Dict[str, str]):
+    """Tests KfpComponentImages, which groups components by requirement set
+    and generates an image per group layered on the component_base image,
+    which is passed in as a build arg.
+
+    Args:
+        component_specs (List[dict]): Specs of the temporary component yamls.
+        expected_groups (Dict[str, List[str]]): Expected component names, keyed by image name.
+        expected_base_requirements (List[str]): Expected requirements of the component_base image.
+        expected_requirements (Dict[str, str]): Expected requirements.txt of each image that adds requirements.
+    """
+    component_images = KfpComponentImages(DefaultsConfig(project_id='my-project'), component_specs)
+
+    assert component_images.groups == expected_groups
+    assert component_images.base_requirements.splitlines() == expected_base_requirements
+    assert component_images.requirements == expected_requirements
+    for image, components in expected_groups.items():
+        for component in components:
+            assert component_images.component_images[component] == f'components/{image}'
+        dockerfile = component_images.dockerfiles[image]
+        assert dockerfile.startswith(GENERATED_LICENSE)
+        assert 'ARG BASE_IMAGE\nFROM ${BASE_IMAGE}\n' in dockerfile
+        assert ('RUN --mount=type=cache,target=/root/.cache/pip' in dockerfile) == (image in expected_requirements)
+        assert f'COPY {" ".join(f"src/{component}.py" for component in components)} /pipelines/component/src/\n' in dockerfile
+        assert 'RUN python -m compileall -q /pipelines/component/src\n' in dockerfile
+        assert (f'COPY images/{image}/requirements.txt .\n' in dockerfile) == (image in expected_requirements)
+        assert component_images.build_contexts[image] == (
+            [f'images/{image}/Dockerfile'] + ([f'images/{image}/requirements.txt'] if image in expected_requirements else [])
+            + [f'src/{component}.py' for component in components])
+
+@pytest.mark.parametrize(
+    'wheelhouse, expected_install',
+    [
+        (
+            'https://pypi.example.com/simple',
+            'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+            '    python -m pip install --require-hashes --no-deps -r requirements.lock --quiet \\\n'
+        ),
+        (
+            '/wheels',
+            'RUN --mount=type=bind,source=wheelhouse,target=/wheelhouse \\\n'
+            '    python -m pip install --no-index --find-links /wheelhouse --require-hashes --no-deps -r requirements.lock --quiet \\\n'
+        )
+    ]
+)
+def test_KfpComponentImages_wheelhouse(wheelhouse: str, expected_install: str):
+    """Tests that with a wheelhouse, the group images install their
+    requirements.lock with hashes instead of their requirements.txt, and
+    that a local wheelhouse is bind mounted to install it offline.
+
+    Args:
+        wheelhouse (str): Package index url or local wheelhouse directory.
+        expected_install (str): Expected instruction that installs the lock.
+    """
+    component_specs = [
+        create_spec('train', ['pandas', 'scikit-learn'], 'def train():\n    import pandas\n'),
+        create_spec('deploy', ['pandas'], 'def deploy():\n    pass\n')
+    ]
+    component_images = KfpComponentImages(DefaultsConfig(project_id='my-project', wheelhouse=wheelhouse), component_specs)
+
+    assert 'requirements.lock' not in component_images.dockerfiles['deploy']
+    assert (
+        'COPY images/train/requirements.lock .\n' +
+        expected_install +
+        '    && rm -f requirements.lock\n') in component_images.dockerfiles['train']
+    assert component_images.build_contexts['train'] == ['images/train/Dockerfile', 'images/train/requirements.lock', 'src/train.py']
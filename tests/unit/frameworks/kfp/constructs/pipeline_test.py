@@ -25,6 +25,7 @@ import pytest
 import pytest_mock
 
 from AutoMLOps.frameworks.kfp.constructs.pipeline import KfpPipeline
+from AutoMLOps.utils.config import DefaultsConfig
 from AutoMLOps.utils.constants import GENERATED_LICENSE
 import AutoMLOps.utils.utils
 from AutoMLOps.utils.utils import get_components_list, write_yaml_file
@@ -102,7 +103,7 @@ def test_KfpPipeline(mocker: pytest_mock.MockerFixture, custom_training_job_spec
     newline_tab = '\n    '
 
     pipe = KfpPipeline(custom_training_job_specs=custom_training_job_specs,
-                       defaults_file=path)
+                       defaults=DefaultsConfig.from_yaml(path))
     custom_specs = pipe.custom_specs_helper(custom_training_job_specs)
 
     #Assert that created Kfp Pipeline instance has the expected attributes
@@ -111,6 +112,7 @@ def test_KfpPipeline(mocker: pytest_mock.MockerFixture, custom_training_job_spec
 
     assert pipe.pipeline_imports == (
         f'''import argparse\n'''
+        f'''import functools\n'''
         f'''import os\n'''
         f'''{gcpc_imports if custom_training_job_specs else ''}'''
         f'''import kfp\n'''
@@ -123,7 +125,23 @@ def test_KfpPipeline(mocker: pytest_mock.MockerFixture, custom_training_job_spec
         f'''    component_path = os.path.join('components',\n'''
         f'''                                component_name,\n'''
         f'''                              'component.yaml')\n'''
-        f'''    return kfp.components.load_component_from_file(component_path)\n'''
+        f'''    component = kfp.components.load_component_from_file(component_path)\n'''
+        f'''    metadata = component.component_spec.metadata\n'''
+        f'''    annotations = (metadata.annotations if metadata else None) or {{}}\n'''
+        f'\n'
+        f'''    # Sets the resource limits declared on the component on each of its tasks\n'''
+        f'''    @functools.wraps(component)\n'''
+        f'''    def create_task(*args, **kwargs):\n'''
+        f'''        task = component(*args, **kwargs)\n'''
+        f'''        if 'automlops/cpu_limit' in annotations:\n'''
+        f'''            task.set_cpu_limit(annotations['automlops/cpu_limit'])\n'''
+        f'''        if 'automlops/memory_limit' in annotations:\n'''
+        f'''            task.set_memory_limit(annotations['automlops/memory_limit'])\n'''
+        f'''        if 'automlops/accelerator_type' in annotations:\n'''
+        f'''            task.set_gpu_limit(annotations['automlops/accelerator_count'])\n'''
+        f'''            task.add_node_selector_constraint('cloud.google.com/gke-accelerator', annotations['automlops/accelerator_type'])\n'''
+        f'''        return task\n'''
+        f'''    return create_task\n'''
         f'\n'
         f'''def create_training_pipeline(pipeline_job_spec_path: str):\n'''
         f'''    {newline_tab.join(f'{component} = load_custom_component(component_name={quote}{component}{quote})' for component in get_components_list(full_path=False))}\n'''
@@ -139,7 +157,7 @@ def test_KfpPipeline(mocker: pytest_mock.MockerFixture, custom_training_job_spec
         '''    args = parser.parse_args()\n'''
         '\n'
         '''    with open(args.config, 'r', encoding='utf-8') as config_file:\n'''
-        '''        config = yaml.load(config_file, Loader=yaml.FullLoader)\n'''
+        '''        config = yaml.safe_load(config_file)\n'''
         '\n'
         '''    pipeline = create_training_pipeline(\n'''
         '''        pipeline_job_spec_path=config['pipelines']['pipeline_job_spec_path'])\n''')
@@ -200,13 +218,16 @@ def test_KfpPipeline(mocker: pytest_mock.MockerFixture, custom_training_job_spec
         '''    parser = argparse.ArgumentParser()\n'''
         '''    parser.add_argument('--config', type=str,\n'''
         '''                        help='The config file for setting default values.')\n'''
+        '''    parser.add_argument('--resume', action='store_true',\n'''
+        '''                        help='Reuse the outputs of steps that completed in earlier runs with the same inputs, e.g. to resume a failed run.')\n'''
         '''    args = parser.parse_args()\n'''
         '\n'
         '''    with open(args.config, 'r', encoding='utf-8') as config_file:\n'''
-        '''        config = yaml.load(config_file, Loader=yaml.FullLoader)\n'''
+        '''        config = yaml.safe_load(config_file)\n'''
         '\n'
         '''    run_pipeline(project_id=config['gcp']['project_id'],\n'''
         '''                 pipeline_root=config['pipelines']['pipeline_storage_path'],\n'''
         '''                 pipeline_runner_sa=config['gcp']['pipeline_runner_service_account'],\n'''
         '''                 parameter_values_path=config['pipelines']['parameter_values_path'],\n'''
-        '''                 pipeline_spec_path=config['pipelines']['pipeline_job_spec_path']) \n''')
+        '''                 pipeline_spec_path=config['pipelines']['pipeline_job_spec_path'],\n'''
+        '''                 enable_caching=args.resume)\n''')
@@ -23,6 +23,9 @@ import pytest
 import pytest_mock
 
 from AutoMLOps.frameworks.kfp.constructs.scripts import KfpScripts
+import AutoMLOps.frameworks.kfp.constructs.scripts
+import AutoMLOps.utils.config
+from AutoMLOps.utils.config import DefaultsConfig
 import AutoMLOps.utils.constants
 from AutoMLOps.utils.constants import (
     GENERATED_LICENSE,
@@ -36,21 +39,21 @@ from AutoMLOps.utils.constants import (
     '''cb_trigger_name, cloud_run_location, cloud_run_name, cloud_tasks_queue_location,'''
     '''cloud_tasks_queue_name, csr_branch_name, csr_name, gs_bucket_location,'''
     '''gs_bucket_name, pipeline_runner_sa, project_id, run_local, schedule_location,'''
-    '''schedule_name, schedule_pattern, base_dir, vpc_connector, reqs''',
+    '''schedule_name, schedule_pattern, base_dir, vpc_connector, reqs, companion_reqs''',
     [
         (
             'us-central1', 'my-registry', 'us-central1', 'gcr.io/my-project/my-image',
             'my-trigger', 'us-central1', 'my-run', 'us-central1',
             'my-queue', 'main', 'my-repo', 'us-central1',
             'my-bucket', 'my-service-account@serviceaccount.com', 'my-project', False, 'us-central1',
-            'my-schedule', '0 12 * * *', 'base_dir', 'my-connector', ['pandas', 'kfp<2.0.0']
+            'my-schedule', '0 12 * * *', 'base_dir', 'my-connector', ['pandas', 'kfp<2.0.0'], ['fsspec', 'gcsfs']
         ),
         (
             'us-central2', 'my-123registry', 'us-central1', 'gcr.io/my-project/my-image',
             'my-trigger', 'us-central1', 'my-run', 'us-central1',
             'my-queue', 'main', 'my-repo', 'us-central3',
             'my-bucket', 'my-service-account@serviceaccount.com', 'my-project', False, 'us-central1',
-            'my-schedule', '0 10 * * *', 'base_dir', 'my-connector', ['numpy', 'kfp<2.0.0']
+            'my-schedule', '0 10 * * *', 'base_dir', 'my-connector', ['numpy', 'kfp<2.0.0'], []
         )
     ]
 )
@@ -77,7 +80,8 @@ def test_init(mocker: pytest_mock.MockerFixture,
               schedule_pattern: str,
               base_dir: str,
               vpc_connector: str,
-              reqs: list):
+              reqs: list,
+              companion_reqs: list):
     """Tests the initialization of the KFPScripts class.
 
     Args:
@@ -105,31 +109,33 @@ def test_init(mocker: pytest_mock.MockerFixture,
         schedule_pattern (str): Cron formatted value used to create a scheduled retrain job.
         base_dir (str): Top directory name.
         vpc_connector (str): The name of the vpc connector to use.
-        reqs (list): Package requirements to write into requirements.txt
+        reqs (list): Package requirements expected to be inferred from the component sources.
+        companion_reqs (list): Packages expected to be added for the inferred requirements.
     """
 
     # Patch global directory variables
     mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts,
-                        'GENERATED_COMPONENT_BASE',
+                        'GENERATED_COMPONENT_BASE_SRC',
                         tmpdir)
-    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts,
+    mocker.patch.object(AutoMLOps.utils.config,
                         'GENERATED_PARAMETER_VALUES_PATH',
                         tmpdir)
-    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts,
+    mocker.patch.object(AutoMLOps.utils.config,
                         'GENERATED_PIPELINE_JOB_SPEC_PATH',
                         tmpdir)
     mocker.patch.object(AutoMLOps.utils.utils,
                         'CACHE_DIR',
                         '.')
 
-    # Create requirements file
-    with open(file=f'{tmpdir}/requirements.txt', mode='w', encoding='utf-8') as f:
-        f.write(''.join(r+'\n' for r in reqs))
+    # Create component source file that imports the requirements
+    with open(file=f'{tmpdir}/component.py', mode='w', encoding='utf-8') as f:
+        f.write('import json\nimport kfp\n' + ''.join(f'import {r}\n' for r in reqs if not r.startswith('kfp')))
 
     # Create scripts object
-    with mock.patch('AutoMLOps.frameworks.kfp.constructs.scripts.execute_process',
-                    return_value=''):
-        scripts = KfpScripts(
+    with mock.patch('AutoMLOps.utils.import_scanner.IMPORT_SCAN_CACHE_FILE',
+                    f'{tmpdir}/import_scan_cache.json'):
+        defaults = DefaultsConfig(
+            project_id=project_id,
             af_registry_location=af_registry_location,
             af_registry_name=af_registry_name,
             base_image=base_image,
@@ -144,14 +150,12 @@ def test_init(mocker: pytest_mock.MockerFixture,
             gs_bucket_location=gs_bucket_location,
             gs_bucket_name=gs_bucket_name,
             pipeline_runner_sa=pipeline_runner_sa,
-            project_id=project_id,
             run_local=run_local,
             schedule_location=schedule_location,
             schedule_name=schedule_name,
             schedule_pattern=schedule_pattern,
-            base_dir=base_dir,
-            vpc_connector=vpc_connector,
-        )
+            vpc_connector=vpc_connector)
+        scripts = KfpScripts(defaults=defaults, base_dir=base_dir)
 
         # Assert object properties were created properly
         assert scripts._af_registry_location == af_registry_location
@@ -199,10 +203,11 @@ def test_init(mocker: pytest_mock.MockerFixture,
             '# Submits the PipelineJob to Vertex AI\n'
             f'# This script should run from the {base_dir} directory\n'
             '# Change directory in case this is not the script root.\n'
+            '# Pass --resume to reuse the steps of a failed run that completed.\n'
             '\n'
             'CONFIG_FILE=configs/defaults.yaml\n'
             '\n'
-            'python3 -m pipelines.pipeline_runner --config $CONFIG_FILE\n')
+            'python3 -m pipelines.pipeline_runner --config $CONFIG_FILE "$@"\n')
 
         assert scripts.run_all == (
             '#!/bin/bash\n' + GENERATED_LICENSE +
@@ -402,13 +407,21 @@ def test_init(mocker: pytest_mock.MockerFixture,
 
         assert scripts.dockerfile == (
             GENERATED_LICENSE +
-            f'FROM {base_image}\n'
-            f'RUN python -m pip install --upgrade pip\n'
+            f'FROM {base_image} AS builder\n'
+            f'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+            f'    python -m venv --system-site-packages /opt/venv \\\n'
+            f'    && /opt/venv/bin/python -m pip install --upgrade pip\n'
             f'COPY requirements.txt .\n'
-            f'RUN python -m pip install -r \ \n'
-            f'    requirements.txt --quiet --no-cache-dir \ \n'
-            f'    && rm -f requirements.txt\n'
+            f'RUN --mount=type=cache,target=/root/.cache/pip \\\n'
+            f'    /opt/venv/bin/python -m pip install -r requirements.txt --quiet\n'
+            f'\n'
+            f'FROM {base_image}\n'
+            f'RUN python -m compileall -qq -j 0 "$(python -c \'import sysconfig; print(sysconfig.get_path("stdlib"))\')" || true\n'
+            f'COPY --from=builder /opt/venv /opt/venv\n'
+            f'ENV PATH="/opt/venv/bin:$PATH"\n'
+            f'ENV PYTHONPATH="/pipelines/component/src${{PYTHONPATH:+:$PYTHONPATH}}"\n'
             f'COPY ./src /pipelines/component/src\n'
+            f'RUN python -m compileall -q /pipelines/component/src\n'
             f'ENTRYPOINT ["/bin/bash"]\n')
 
         assert scripts.defaults == (
@@ -442,39 +455,91 @@ def test_init(mocker: pytest_mock.MockerFixture,
             f'  pipeline_region: {gs_bucket_location}\n'
             f'  pipeline_storage_path: gs://{gs_bucket_name}/pipeline_root\n')
 
-        default_reqs = [
-            'google-cloud-aiplatform',
-            'google-cloud-appengine-logging',
-            'google-cloud-audit-log',
-            'google-cloud-bigquery',
-            'google-cloud-bigquery-storage',
-            'google-cloud-bigtable',
-            'google-cloud-core',
-            'google-cloud-dataproc',
-            'google-cloud-datastore',
-            'google-cloud-dlp',
-            'google-cloud-firestore',
-            'google-cloud-kms',
-            'google-cloud-language',
-            'google-cloud-logging',
-            'google-cloud-monitoring',
-            'google-cloud-notebooks',
-            'google-cloud-pipeline-components',
-            'google-cloud-pubsub',
-            'google-cloud-pubsublite',
-            'google-cloud-recommendations-ai',
-            'google-cloud-resource-manager',
-            'google-cloud-scheduler',
-            'google-cloud-spanner',
-            'google-cloud-speech',
-            'google-cloud-storage',
-            'google-cloud-tasks',
-            'google-cloud-translate',
-            'google-cloud-videointelligence',
-            'google-cloud-vision',
-            'db_dtypes',
-            'pyarrow',
-            'gcsfs',
-            'fsspec'
-        ]
-        assert scripts.requirements == f'{"".join(r+f"{NEWLINE}" for r in sorted(reqs + default_reqs))}'
+        assert scripts.requirements == f'{"".join(r+f"{NEWLINE}" for r in sorted(reqs + companion_reqs))}'
+
+def test_create_requirements_declared_and_inferred(mocker: pytest_mock.MockerFixture,
+                                                   tmpdir: pytest.FixtureRequest):
+    """Tests that the component_base requirements hold the packages_to_install
+    of the components that declare them, including kfp generated components
+    that quote each package twice, and the inferred requirements of the other
+    components, so no component needs to install packages when it runs. Any
+    kfp requirement is replaced by the pinned kfp version.
+
+    Args:
+        mocker: Mocker to patch the component specs and directories.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    component_specs = {
+        'train.yaml': {
+            'name': 'Train', 'implementation': {'container': {'image': 'python:3.9', 'command': [
+                'sh', '-c',
+                "(PIP_DISABLE_PIP_VERSION_CHECK=1 python3 -m pip install --quiet --no-warn-script-location 'scikit-learn==1.3.0' 'kfp==1.8.22' || "
+                "PIP_DISABLE_PIP_VERSION_CHECK=1 python3 -m pip install --quiet --no-warn-script-location 'scikit-learn==1.3.0' 'kfp==1.8.22' --user) && \"$0\" \"$@\"\n",
+                'def train():\n    import sklearn\n']}}},
+        'load.yaml': {
+            'name': 'load', 'implementation': {'container': {'image': 'AutoMLOps_image_tbd', 'command': [
+                'sh', '-c', 'python3 -m pip install --quiet --no-warn-script-location  && "$0" "$@"\n',
+                'def load():\n    from google.cloud import bigquery\n']}}}
+    }
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'GENERATED_COMPONENT_BASE_SRC', str(tmpdir))
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'get_components_list', return_value=list(component_specs))
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'get_component_spec', side_effect=component_specs.get)
+    mocker.patch.object(AutoMLOps.utils.import_scanner, 'IMPORT_SCAN_CACHE_FILE', f'{tmpdir}/import_scan_cache.json')
+    with open(f'{tmpdir}/train.py', 'w', encoding='utf-8') as f:
+        f.write('import sklearn\nimport pandas\n')
+    with open(f'{tmpdir}/load.py', 'w', encoding='utf-8') as f:
+        f.write('from google.cloud import bigquery\n')
+
+    scripts = KfpScripts(DefaultsConfig(project_id='my-project'), 'AutoMLOps/')
+
+    assert scripts.requirements.splitlines() == [
+        'db_dtypes', 'google-cloud-bigquery', 'google-cloud-bigquery-storage', 'kfp<2.0.0', 'pyarrow', 'scikit-learn==1.3.0']
+
+def test_create_requirements_versioned_google_imports(mocker: pytest_mock.MockerFixture,
+                                                      tmpdir: pytest.FixtureRequest):
+    """Tests that the component_base requirements hold the packages of
+    versioned google API imports, e.g. google-cloud-aiplatform for
+    google.cloud.aiplatform_v1, and no package for the google namespace.
+
+    Args:
+        mocker: Mocker to patch the component specs and directories.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    component_specs = {
+        'predict.yaml': {
+            'name': 'predict', 'implementation': {'container': {'image': 'AutoMLOps_image_tbd', 'command': [
+                'sh', '-c', 'python3 -m pip install --quiet --no-warn-script-location  && "$0" "$@"\n',
+                'def predict():\n    from google.cloud import aiplatform_v1\n']}}}
+    }
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'GENERATED_COMPONENT_BASE_SRC', str(tmpdir))
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'get_components_list', return_value=list(component_specs))
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'get_component_spec', side_effect=component_specs.get)
+    mocker.patch.object(AutoMLOps.utils.import_scanner, 'IMPORT_SCAN_CACHE_FILE', f'{tmpdir}/import_scan_cache.json')
+    with open(f'{tmpdir}/predict.py', 'w', encoding='utf-8') as f:
+        f.write('import google\n'
+                'from google.cloud import aiplatform_v1\n'
+                'from google.cloud.aiplatform_v1beta1 import types\n'
+                'from google.protobuf import json_format\n')
+
+    scripts = KfpScripts(DefaultsConfig(project_id='my-project'), 'AutoMLOps/')
+
+    assert scripts.requirements.splitlines() == ['google-cloud-aiplatform', 'kfp<2.0.0', 'protobuf']
+
+def test_dockerfile_offline(mocker: pytest_mock.MockerFixture):
+    """Tests that with a local wheelhouse, the component_base image installs
+    its requirements.lock from the bind mounted wheelhouse without an index.
+
+    Args:
+        mocker: Mocker to patch the component specs.
+    """
+    mocker.patch.object(AutoMLOps.frameworks.kfp.constructs.scripts, 'get_components_list', return_value=[])
+
+    scripts = KfpScripts(DefaultsConfig(project_id='my-project', wheelhouse='/wheels'), 'AutoMLOps/')
+
+    assert 'RUN python -m venv --system-site-packages /opt/venv\n' in scripts.dockerfile
+    assert (
+        'RUN --mount=type=bind,source=wheelhouse,target=/wheelhouse \\\n'
+        '    /opt/venv/bin/python -m pip install --no-index --find-links /wheelhouse --require-hashes --no-deps -r requirements.lock --quiet\n') in scripts.dockerfile
+    assert '--mount=type=cache' not in scripts.dockerfile
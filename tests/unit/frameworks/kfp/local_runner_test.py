@@ -0,0 +1,373 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for kfp local_runner module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+from contextlib import nullcontext as does_not_raise
+import json
+import os
+import resource
+import sys
+from typing import Optional
+
+import pytest
+
+from AutoMLOps.frameworks.kfp.local_runner import (
+    _get_physical_memory,
+    get_task_dependencies,
+    get_task_requirements,
+    resume_pipeline_spec,
+    run_pipeline_spec,
+    to_parameter_value
+)
+from AutoMLOps.utils.constants import RUN_CHECKPOINTS_FILENAME, STEP_CHECKPOINT_FILENAME
+
+# Reads its executor input like a generated task module, and runs the
+# component body given as {body} with the inputs and output paths in scope
+TASK_MODULE = '''import argparse
+import json
+import os
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--executor_input', type=str)
+    parser.add_argument('--function_to_execute', type=str)
+    args, _ = parser.parse_known_args()
+    executor_input = json.loads(args.executor_input)
+    inputs = executor_input['inputs']
+    outputs = executor_input['outputs']
+    executor_output = {{}}
+{body}
+    os.makedirs(os.path.dirname(outputs['outputFile']), exist_ok=True)
+    with open(outputs['outputFile'], 'w') as f:
+        json.dump(executor_output, f)
+
+if __name__ == '__main__':
+    main()
+'''
+
+def add_to_task(src_dir: str, name: str, code: str):
+    """Adds code to the end of the main() of a task module.
+
+    Args:
+        src_dir: Directory of the task modules.
+        name: Name of the task module.
+        code: Indented lines of code.
+    """
+    with open(f'{src_dir}/{name}.py', 'r', encoding='utf-8') as f:
+        source = f.read()
+    with open(f'{src_dir}/{name}.py', 'w', encoding='utf-8') as f:
+        f.write(source.replace("\nif __name__ == '__main__':", code + "\nif __name__ == '__main__':"))
+
+def make_task(name: str, inputs: Optional[dict] = None, *, output_parameters: Optional[dict] = None,
+              output_artifacts: Optional[list] = None, dependent_tasks: Optional[list] = None,
+              resources: Optional[dict] = None) -> dict:
+    """Creates the compiled spec of a task that runs a generated task module.
+
+    Args:
+        name: Name of the task, component and task module.
+        inputs: Input bindings of the task.
+        output_parameters: Types of the output parameters, keyed by name.
+        output_artifacts: Names of the output artifacts.
+        dependent_tasks: Names of the tasks it explicitly depends on.
+        resources: Resource limits set on its container.
+    Returns:
+        dict: The task, component and executor specs.
+    """
+    return {
+        'task': {'componentRef': {'name': f'comp-{name}'}, 'inputs': inputs or {}, 'dependentTasks': dependent_tasks or []},
+        'component': {
+            'executorLabel': f'exec-{name}',
+            'outputDefinitions': {
+                'parameters': {key: {'type': value} for key, value in (output_parameters or {}).items()},
+                'artifacts': {key: {'artifactType': {'schemaTitle': 'system.Dataset'}} for key in output_artifacts or []}}},
+        'executor': {'container': {
+            'image': 'us-docker.pkg.dev/my-project/my-registry/components/component_base:0123',
+            'command': ['python3', '-m', name],
+            'args': ['--executor_input', '{{$}}', '--function_to_execute', name],
+            **({'resources': resources} if resources else {})}}}
+
+def make_pipeline_spec(tasks: dict) -> dict:
+    """Creates a compiled pipeline spec from the specs of its tasks.
+
+    Args:
+        tasks: Specs created by make_task, keyed by task name.
+    Returns:
+        dict: The pipeline spec.
+    """
+    return {
+        'components': {f'comp-{name}': task['component'] for name, task in tasks.items()},
+        'deploymentSpec': {'executors': {f'exec-{name}': task['executor'] for name, task in tasks.items()}},
+        'root': {
+            'dag': {'tasks': {name: task['task'] for name, task in tasks.items()}},
+            'inputDefinitions': {'parameters': {'rows': {'type': 'INT'}, 'table': {'type': 'STRING'}}}},
+        'runtimeConfig': {'parameters': {'table': {'stringValue': 'dataset.table'}}}}
+
+@pytest.fixture(name='pipeline_spec')
+def fixture_pipeline_spec(tmpdir: pytest.FixtureRequest) -> dict:
+    """Writes the task modules of a pipeline where train consumes an output
+    parameter and artifact of load, and report runs independently.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    Returns:
+        dict: The pipeline spec.
+    """
+    bodies = {
+        'load': (
+            "    with open(outputs['parameters']['count']['outputFile'], 'w') as f:\n"
+            "        f.write(str(inputs['parameters']['rows']['intValue'] * 2))\n"),
+        'train': (
+            "    assert inputs['parameters']['count'] == {'intValue': 20}\n"
+            "    assert inputs['parameters']['table'] == {'stringValue': 'dataset.table'}\n"
+            "    executor_output['parameters'] = {'score': {'doubleValue': 0.5}}\n"
+            "    executor_output['artifacts'] = {'model': {'artifacts': [dict(outputs['artifacts']['model']['artifacts'][0], metadata={'source': inputs['artifacts']['data']['artifacts'][0]['uri']})]}}\n"),
+        'report': '    pass\n'
+    }
+    os.makedirs(f'{tmpdir}/src')
+    for name, body in bodies.items():
+        with open(f'{tmpdir}/src/{name}.py', 'w', encoding='utf-8') as f:
+            f.write(TASK_MODULE.format(body=body))
+    return make_pipeline_spec({
+        'load': make_task(
+            'load', {'parameters': {'rows': {'componentInputParameter': 'rows'}}},
+            output_parameters={'count': 'INT'}, output_artifacts=['data']),
+        'train': make_task(
+            'train', {
+                'parameters': {
+                    'count': {'taskOutputParameter': {'producerTask': 'load', 'outputParameterKey': 'count'}},
+                    'table': {'componentInputParameter': 'table'}},
+                'artifacts': {'data': {'taskOutputArtifact': {'producerTask': 'load', 'outputArtifactKey': 'data'}}}},
+            output_parameters={'score': 'DOUBLE'}, output_artifacts=['model']),
+        'report': make_task('report', {'parameters': {'title': {'runtimeValue': {'constantValue': {'stringValue': 'Report'}}}}})})
+
+@pytest.mark.parametrize('in_subprocess', [False, True])
+def test_run_pipeline_spec(tmpdir: pytest.FixtureRequest, pipeline_spec: dict, in_subprocess: bool):
+    """Tests that run_pipeline_spec runs every task with its parameters,
+    including the default and given pipeline parameters and the outputs of
+    upstream tasks, and returns the outputs of each task. Tasks run in the
+    pool processes, or in subprocesses of a given interpreter.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        pipeline_spec (dict): The pipeline spec.
+        in_subprocess (bool): Whether the tasks run in subprocesses.
+    """
+    task_pythons = {name: sys.executable for name in ('load', 'train', 'report')} if in_subprocess else None
+    outputs = run_pipeline_spec(pipeline_spec, f'{tmpdir}/run', f'{tmpdir}/src', {'rows': 10}, pipeline_root='gs://my-bucket/pipeline_root', max_workers=2, task_pythons=task_pythons)
+
+    assert sorted(outputs) == ['load', 'report', 'train']
+    assert outputs['load']['parameters'] == {'count': {'intValue': 20}}
+    assert outputs['load']['artifacts']['data'][0]['uri'] == 'gs://my-bucket/pipeline_root/run/load/data'
+    assert outputs['train']['parameters'] == {'score': {'doubleValue': 0.5}}
+    assert outputs['train']['artifacts']['model'][0]['metadata'] == {'source': 'gs://my-bucket/pipeline_root/run/load/data'}
+    assert os.path.isdir(f'{tmpdir}/run/gcs/my-bucket/pipeline_root/run/load')
+
+def test_run_pipeline_spec_failure(tmpdir: pytest.FixtureRequest, pipeline_spec: dict):
+    """Tests that a failed task fails the run, and the tasks downstream of
+    it are not run.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        pipeline_spec (dict): The pipeline spec.
+    """
+    add_to_task(f'{tmpdir}/src', 'load', "    raise ValueError('table not found')\n")
+
+    with pytest.raises(RuntimeError, match=r"Task load: ValueError\('table not found'\)\. Not run: train\."):
+        run_pipeline_spec(pipeline_spec, f'{tmpdir}/run', f'{tmpdir}/src', {'rows': 10})
+    assert not os.path.exists(f'{tmpdir}/run/train')
+
+@pytest.mark.parametrize('in_subprocess', [False, True])
+def test_run_pipeline_spec_resources(tmpdir: pytest.FixtureRequest, in_subprocess: bool):
+    """Tests that tasks are pinned to the cpus set on their containers, that
+    only tasks run as subprocesses are limited to their memory, and that
+    independent tasks whose memory does not fit the machine together do not
+    run concurrently.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        in_subprocess (bool): Whether the tasks run in subprocesses.
+    """
+    memory_limit = int(_get_physical_memory() * 0.6 / 10 ** 9)
+    expected_data_limit = memory_limit * 10 ** 9 if in_subprocess else resource.getrlimit(resource.RLIMIT_DATA)[0]
+    body = (
+        '    import resource\n'
+        '    import time\n'
+        f'    assert resource.getrlimit(resource.RLIMIT_DATA)[0] == {expected_data_limit}\n'
+        '    assert len(os.sched_getaffinity(0)) == 1\n'
+        f"    assert not os.path.exists('{tmpdir}/running')\n"
+        f"    with open('{tmpdir}/running', 'w') as f:\n"
+        '        time.sleep(0.2)\n'
+        f"    os.remove('{tmpdir}/running')\n")
+    os.makedirs(f'{tmpdir}/src')
+    for name in ('fit_a', 'fit_b'):
+        with open(f'{tmpdir}/src/{name}.py', 'w', encoding='utf-8') as f:
+            f.write(TASK_MODULE.format(body=body))
+    pipeline_spec = make_pipeline_spec({
+        name: make_task(name, resources={'cpuLimit': 1.0, 'memoryLimit': float(memory_limit)}) for name in ('fit_a', 'fit_b')})
+    task_pythons = {name: sys.executable for name in ('fit_a', 'fit_b')} if in_subprocess else None
+
+    outputs = run_pipeline_spec(pipeline_spec, f'{tmpdir}/run', f'{tmpdir}/src', max_workers=2, task_pythons=task_pythons)
+    assert sorted(outputs) == ['fit_a', 'fit_b']
+
+def test_run_pipeline_spec_memory_limit(tmpdir: pytest.FixtureRequest):
+    """Tests that a task run as a subprocess with a small memory limit still
+    imports and runs, and that allocations beyond the limit fail with a
+    MemoryError.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    body = (
+        '    import decimal\n'
+        '    import email.mime.multipart\n'
+        '    import http.client\n'
+        '    data = bytearray(100 * 10 ** 6)\n'
+        '    try:\n'
+        '        data += bytearray(10 ** 9)\n'
+        '    except MemoryError:\n'
+        "        executor_output['parameters'] = {'error': {'stringValue': 'MemoryError'}}\n")
+    os.makedirs(f'{tmpdir}/src')
+    with open(f'{tmpdir}/src/fit.py', 'w', encoding='utf-8') as f:
+        f.write(TASK_MODULE.format(body=body))
+    pipeline_spec = make_pipeline_spec({
+        'fit': make_task('fit', output_parameters={'error': 'STRING'}, resources={'memoryLimit': 0.5})})
+
+    outputs = run_pipeline_spec(pipeline_spec, f'{tmpdir}/run', f'{tmpdir}/src', task_pythons={'fit': sys.executable})
+    assert outputs['fit']['parameters'] == {'error': {'stringValue': 'MemoryError'}}
+
+@pytest.mark.parametrize('interrupted', [False, True])
+def test_resume_pipeline_spec(tmpdir: pytest.FixtureRequest, pipeline_spec: dict, interrupted: bool):
+    """Tests that resuming a failed run reruns the failed task with the
+    parameters of the run and the outputs of its completed upstream tasks,
+    which are not run again. There are two cases:
+    1. The run checkpointed the upstream task as succeeded.
+    2. The run was interrupted while the upstream task was running, after
+       the task wrote its own completion checkpoint.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        pipeline_spec (dict): The pipeline spec.
+        interrupted (bool): Whether the run was interrupted while load was running.
+    """
+    add_to_task(f'{tmpdir}/src', 'load', f"    open(r'{tmpdir}/load_runs', 'a').write('run\\n')\n")
+    add_to_task(f'{tmpdir}/src', 'train', f"    if os.path.exists(r'{tmpdir}/fail'):\n        raise ValueError('transient error')\n")
+    with open(f'{tmpdir}/fail', 'w', encoding='utf-8') as f:
+        f.write('')
+
+    with pytest.raises(RuntimeError, match='Task train'):
+        run_pipeline_spec(pipeline_spec, f'{tmpdir}/run', f'{tmpdir}/src', {'rows': 10})
+    with open(f'{tmpdir}/run/{RUN_CHECKPOINTS_FILENAME}', 'r', encoding='utf-8') as f:
+        checkpoints = json.load(f)
+    assert {name: task['status'] for name, task in checkpoints['tasks'].items()} == {'load': 'succeeded', 'report': 'succeeded', 'train': 'failed'}
+    if interrupted:
+        checkpoints['tasks']['load'] = {'status': 'running', 'executor_input': checkpoints['tasks']['load']['executor_input']}
+        with open(f'{tmpdir}/run/{RUN_CHECKPOINTS_FILENAME}', 'w', encoding='utf-8') as f:
+            json.dump(checkpoints, f)
+        with open(f'{tmpdir}/run/load/{STEP_CHECKPOINT_FILENAME}', 'w', encoding='utf-8') as f:
+            f.write('{}')
+
+    os.remove(f'{tmpdir}/fail')
+    outputs = resume_pipeline_spec(pipeline_spec, f'{tmpdir}/run', f'{tmpdir}/src')
+
+    assert sorted(outputs) == ['load', 'report', 'train']
+    assert outputs['train']['parameters'] == {'score': {'doubleValue': 0.5}}
+    with open(f'{tmpdir}/load_runs', 'r', encoding='utf-8') as f:
+        assert f.read() == 'run\n'
+    with open(f'{tmpdir}/run/{RUN_CHECKPOINTS_FILENAME}', 'r', encoding='utf-8') as f:
+        assert {name: task['status'] for name, task in json.load(f)['tasks'].items()} == {'load': 'succeeded', 'report': 'succeeded', 'train': 'succeeded'}
+
+@pytest.mark.parametrize(
+    'image, use_locks, expected_files, expectation',
+    [
+        ('us-docker.pkg.dev/my-project/my-registry/components/component_base:0123', True, ['requirements.lock'], does_not_raise()),
+        ('us-docker.pkg.dev/my-project/my-registry/components/train:4567', True, ['requirements.lock', 'images/train/requirements.txt'], does_not_raise()),
+        ('us-docker.pkg.dev/my-project/my-registry/components/train:4567', False, ['requirements.txt', 'images/train/requirements.txt'], does_not_raise()),
+        ('us-docker.pkg.dev/my-project/my-registry/trainer:latest', True, None, pytest.raises(ValueError, match='not an image generated by AutoMLOps'))
+    ]
+)
+def test_get_task_requirements(tmpdir: pytest.FixtureRequest, image: str, use_locks: bool, expected_files: Optional[list], expectation):
+    """Tests that get_task_requirements finds the requirements of the
+    component_base image followed by those of the task's own image,
+    preferring locks when they are used, and rejects images that were not
+    generated.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        image (str): Image the task runs in.
+        use_locks (bool): Whether to use the requirements.lock files.
+        expected_files (Optional[list]): Expected paths, relative to the component_base directory.
+        expectation: Any corresponding expected errors for each set of parameters.
+    """
+    os.makedirs(f'{tmpdir}/images/train')
+    for path in ('requirements.txt', 'requirements.lock', 'images/train/requirements.txt'):
+        with open(f'{tmpdir}/{path}', 'w', encoding='utf-8') as f:
+            f.write('pandas\n')
+    pipeline_spec = make_pipeline_spec({'train': make_task('train')})
+    pipeline_spec['deploymentSpec']['executors']['exec-train']['container']['image'] = image
+    with expectation:
+        assert get_task_requirements('train', pipeline_spec, str(tmpdir), use_locks) == [f'{tmpdir}/{path}' for path in expected_files]
+
+@pytest.mark.parametrize(
+    'tasks, expectation',
+    [
+        ({'a': [], 'b': ['a'], 'c': ['a', 'b']}, does_not_raise()),
+        ({'a': ['b'], 'b': ['a']}, pytest.raises(ValueError, match='cycle')),
+        ({'a': ['missing']}, pytest.raises(ValueError, match='unknown tasks'))
+    ]
+)
+def test_get_task_dependencies(tasks: dict, expectation):
+    """Tests get_task_dependencies, which resolves the tasks each task
+    depends on and rejects unknown dependencies and cycles.
+
+    Args:
+        tasks (dict): Names of the tasks each task explicitly depends on.
+        expectation: Any corresponding expected errors for each set of parameters.
+    """
+    pipeline_spec = make_pipeline_spec({name: make_task(name, dependent_tasks=upstream) for name, upstream in tasks.items()})
+    with expectation:
+        assert get_task_dependencies(pipeline_spec) == {name: set(upstream) for name, upstream in tasks.items()}
+
+@pytest.mark.parametrize(
+    'value, parameter_type, expected_output',
+    [
+        (3, None, {'intValue': 3}),
+        ('3', 'INT', {'intValue': 3}),
+        ('0.5', 'NUMBER_DOUBLE', {'doubleValue': 0.5}),
+        (True, None, {'stringValue': 'true'}),
+        ({'a': 1}, 'STRING', {'stringValue': json.dumps({'a': 1})}),
+        ({'stringValue': 'x'}, 'STRING', {'stringValue': 'x'})
+    ]
+)
+def test_to_parameter_value(value, parameter_type: Optional[str], expected_output: dict):
+    """Tests to_parameter_value, which converts python values to parameter
+    values of an executor input by their declared type.
+
+    Args:
+        value: The parameter value.
+        parameter_type (Optional[str]): Declared type of the parameter.
+        expected_output (dict): Expected parameter value.
+    """
+    assert to_parameter_value(value, parameter_type) == expected_output
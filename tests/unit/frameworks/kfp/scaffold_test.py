@@ -17,8 +17,10 @@
 # pylint: disable=anomalous-backslash-in-string
 # pylint: disable=line-too-long
 # pylint: disable=missing-function-docstring
+# pylint: disable=protected-access
 
 from contextlib import nullcontext as does_not_raise
+import json
 import os
 from typing import Callable, List
 
@@ -68,12 +70,13 @@ def div(a: float, b: float):
         (sub, None, pytest.raises(TypeError))
     ]
 )
-def test_create_component_scaffold(func: Callable, packages_to_install: list, expectation):
+def test_create_component_scaffold(mocker, func: Callable, packages_to_install: list, expectation):
     """Tests create_component_scaffold, which creates a tmp component scaffold
     which will be used by the formalize function. Code is temporarily stored in
     component_spec['implementation']['container']['command'].
 
     Args:
+        mocker: Mocker used to start from an empty component registry.
         func (Callable): The python function to create a component from. The function
             should have type annotations for all its arguments, indicating how
             it is intended to be used (e.g. as an input/output Artifact object,
@@ -83,6 +86,7 @@ def test_create_component_scaffold(func: Callable, packages_to_install: list, ex
         expectation: Any corresponding expected errors for each
             set of parameters.
     """
+    mocker.patch.object(AutoMLOps.utils.utils, '_REGISTERED_COMPONENTS', {})
     with expectation:
         create_component_scaffold(func=func,
                                   packages_to_install=packages_to_install)
@@ -97,8 +101,45 @@ def test_create_component_scaffold(func: Callable, packages_to_install: list, ex
         assert list(component_spec['implementation'].keys()) == ['container']
         assert list(component_spec['implementation']['container'].keys()) == ['image', 'command', 'args']
 
+        # Assert the component was registered in the components index
+        with open('.AutoMLOps-cache/components_index.json', 'r', encoding='utf-8') as f:
+            assert json.load(f)['components'] == [func.__name__]
+
         # Remove temporary files
         os.remove(func_path)
+        os.remove('.AutoMLOps-cache/components_index.json')
+        os.rmdir('.AutoMLOps-cache')
+
+@pytest.mark.parametrize(
+    'resources, expected_annotations, expectation',
+    [
+        ({'cpu': 8, 'memory': '32G'}, {'automlops/cpu_limit': '8', 'automlops/memory_limit': '32G'}, does_not_raise()),
+        ({'accelerator_type': 'NVIDIA_TESLA_T4', 'accelerator_count': 2},
+         {'automlops/accelerator_type': 'NVIDIA_TESLA_T4', 'automlops/accelerator_count': '2'}, does_not_raise()),
+        ({'memory': '32 GB'}, None, pytest.raises(ValueError))
+    ]
+)
+def test_create_component_scaffold_resources(mocker, resources: dict, expected_annotations: dict, expectation):
+    """Tests that the resources declared on a component are stored in the
+    annotations of its scaffold, and that invalid quantities are rejected.
+
+    Args:
+        mocker: Mocker used to start from an empty component registry.
+        resources (dict): Resources declared on the component.
+        expected_annotations (dict): Expected annotations of the scaffold.
+        expectation: Any corresponding expected errors for each
+            set of parameters.
+    """
+    mocker.patch.object(AutoMLOps.utils.utils, '_REGISTERED_COMPONENTS', {})
+    with expectation:
+        create_component_scaffold(func=add, **resources)
+
+        component_spec = read_yaml_file('.AutoMLOps-cache/add.yaml')
+        assert component_spec['metadata'] == {'annotations': expected_annotations}
+
+        # Remove temporary files
+        os.remove('.AutoMLOps-cache/add.yaml')
+        os.remove('.AutoMLOps-cache/components_index.json')
         os.rmdir('.AutoMLOps-cache')
 
 @pytest.mark.parametrize(
@@ -0,0 +1,67 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for config module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import dataclasses
+
+import pytest
+
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.utils import read_yaml_file
+
+@pytest.mark.parametrize(
+    'kwargs, expected_bucket, expected_sa',
+    [
+        (
+            {'project_id': 'my-project'},
+            'my-project-bucket',
+            'vertex-pipelines@my-project.iam.gserviceaccount.com'
+        ),
+        (
+            {'project_id': 'my-project', 'gs_bucket_name': 'my-bucket', 'pipeline_runner_sa': 'sa@my-project.iam.gserviceaccount.com',
+             'run_local': False, 'schedule_pattern': '0 12 * * *', 'gs_bucket_location': 'europe-west4'},
+            'my-bucket',
+            'sa@my-project.iam.gserviceaccount.com'
+        )
+    ]
+)
+def test_DefaultsConfig(tmpdir: pytest.FixtureRequest, kwargs: dict, expected_bucket: str, expected_sa: str):
+    """Tests DefaultsConfig, which holds the default config variables. Checks
+    that defaults are derived for the bucket and service account, that the
+    config is immutable, and that the yaml it serializes to parses back into
+    an equal config (apart from run_local, which is not written to the yaml).
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        kwargs (dict): Arguments to create the config with.
+        expected_bucket (str): Expected GS bucket name.
+        expected_sa (str): Expected pipeline runner service account.
+    """
+    defaults = DefaultsConfig(**kwargs)
+    assert defaults.gs_bucket_name == expected_bucket
+    assert defaults.pipeline_runner_sa == expected_sa
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        defaults.project_id = 'other-project'
+
+    yaml_path = f'{tmpdir}/defaults.yaml'
+    with open(yaml_path, 'w', encoding='utf-8') as file:
+        file.write(defaults.to_yaml())
+    assert read_yaml_file(yaml_path)['gcp']['cloud_source_repository'] == defaults.csr_name
+    assert DefaultsConfig.from_yaml(yaml_path) == dataclasses.replace(defaults, run_local=True)
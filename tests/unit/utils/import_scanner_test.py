@@ -0,0 +1,215 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for import_scanner module."""
+
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+from contextlib import nullcontext as does_not_raise
+import json
+from typing import Dict, List, Optional, Set
+
+import pytest
+import pytest_mock
+
+import AutoMLOps.utils.import_scanner
+from AutoMLOps.utils.import_scanner import (
+    get_companion_requirements,
+    get_imported_modules,
+    get_module_distribution,
+    get_referenced_names,
+    infer_requirements,
+    is_stdlib_module
+)
+
+@pytest.mark.parametrize(
+    'source, expected_modules, expectation',
+    [
+        ('import os\nimport pandas as pd\n', {'os', 'pandas'}, does_not_raise()),
+        ('def f():\n    from sklearn import tree\n', {'sklearn'}, does_not_raise()),
+        ('from google.cloud import bigquery, storage\n', {'google.cloud', 'google.cloud.bigquery', 'google.cloud.storage'}, does_not_raise()),
+        ('from . import sibling\n', set(), does_not_raise()),
+        ('def f(:\n', None, pytest.raises(ValueError))
+    ]
+)
+def test_get_imported_modules(source: str, expected_modules: Set[str], expectation):
+    """Tests get_imported_modules, which returns the absolute module names
+    imported anywhere in a source, including inside functions.
+
+    Args:
+        source (str): Python source code.
+        expected_modules (Set[str]): Expected imported modules.
+        expectation: Any corresponding expected errors for each set of parameters.
+    """
+    with expectation:
+        assert get_imported_modules(source) == expected_modules
+
+@pytest.mark.parametrize(
+    'source, expected_names',
+    [
+        ('def f(x: Input[Dataset]) -> int:\n    return len(x)\n', {'Input', 'Dataset', 'int', 'len', 'x'}),
+        ("def f(x: 'Optional[Model]'):\n    y = kfp.dsl\n", {'Optional', 'Model', 'kfp'}),
+        ('def f(:\n', None)
+    ]
+)
+def test_get_referenced_names(source: str, expected_names: Optional[Set[str]]):
+    """Tests get_referenced_names, which returns the names a source loads,
+    including names in string annotations, or None if it cannot be parsed.
+
+    Args:
+        source (str): Python source code.
+        expected_names (Optional[Set[str]]): Expected referenced names.
+    """
+    assert get_referenced_names(source) == expected_names
+
+@pytest.mark.parametrize(
+    'module, expected',
+    [
+        ('os', True),
+        ('os.path', True),
+        ('json', True),
+        ('pandas', False),
+        ('sklearn', False)
+    ]
+)
+def test_is_stdlib_module(module: str, expected: bool):
+    """Tests is_stdlib_module, which checks whether a module is part of the
+    standard library.
+
+    Args:
+        module (str): Absolute module name.
+        expected (bool): Whether the module is expected to be in the standard library.
+    """
+    assert is_stdlib_module(module) == expected
+
+@pytest.mark.parametrize(
+    'module, distribution',
+    [
+        ('pandas', 'pandas'),
+        ('sklearn.preprocessing', 'scikit-learn'),
+        ('google.cloud.bigquery', 'google-cloud-bigquery'),
+        ('google.cloud.bigquery_storage', 'google-cloud-bigquery-storage'),
+        ('google.cloud.aiplatform_v1', 'google-cloud-aiplatform'),
+        ('google.cloud.aiplatform_v1beta1.types', 'google-cloud-aiplatform'),
+        ('google.cloud.bigquery_storage_v1', 'google-cloud-bigquery-storage'),
+        ('google.cloud.vision_v1p3beta1', 'google-cloud-vision'),
+        ('google.cloud.exceptions', 'google-cloud-core'),
+        ('google.protobuf.json_format', 'protobuf'),
+        ('google.api_core.exceptions', 'google-api-core'),
+        ('google.generativeai', 'google-generativeai'),
+        ('google.ai.generativelanguage_v1beta', 'google-ai-generativelanguage'),
+        ('google.colab', None),
+        ('yaml', 'PyYAML')
+    ]
+)
+def test_get_module_distribution(caplog: pytest.LogCaptureFixture, module: str, distribution: Optional[str]):
+    """Tests get_module_distribution, which maps a module to the distribution
+    that provides it. Versioned google API modules map to the distribution of
+    the unversioned module, and unknown google modules are skipped with a
+    warning instead of mapping to the google namespace.
+
+    Args:
+        caplog: Pytest fixture to capture the logged warnings.
+        module (str): Absolute module name.
+        distribution (str): Expected distribution name, or None if the module is skipped.
+    """
+    assert get_module_distribution(module) == distribution
+    assert (f'Skipping requirement for {module}' in caplog.text) == (distribution is None)
+
+@pytest.mark.parametrize(
+    'requirements, expected_companions',
+    [
+        (['numpy', 'kfp<2.0.0'], {}),
+        (['Pandas==2.0.3'], {'fsspec': 'pandas', 'gcsfs': 'pandas'}),
+        (['google-cloud-bigquery[pandas]>=3'], {'db_dtypes': 'google-cloud-bigquery', 'google-cloud-bigquery-storage': 'google-cloud-bigquery', 'pyarrow': 'google-cloud-bigquery'})
+    ]
+)
+def test_get_companion_requirements(requirements: List[str], expected_companions: Dict[str, str]):
+    """Tests get_companion_requirements, which only adds the packages a
+    library needs but does not declare when that library is required.
+
+    Args:
+        requirements (List[str]): Requirement specifiers.
+        expected_companions (Dict[str, str]): Expected requirement that needs each companion.
+    """
+    assert get_companion_requirements(requirements) == expected_companions
+
+@pytest.mark.parametrize(
+    'sources, expected_reqs',
+    [
+        (
+            {'a.py': 'import os\nimport pandas\nfrom sklearn import tree\n'},
+            ['pandas', 'scikit-learn']
+        ),
+        (
+            {'a.py': 'import b\nfrom google.cloud import bigquery\n', 'b.py': 'import numpy\n', 'notes.txt': 'import scipy'},
+            ['google-cloud-bigquery', 'numpy']
+        ),
+        (
+            {'a.py': 'from google.cloud import aiplatform_v1\nfrom google import colab, genai\nimport google.protobuf\n'},
+            ['google-cloud-aiplatform', 'google-genai', 'protobuf']
+        ),
+        (
+            {},
+            []
+        )
+    ]
+)
+def test_infer_requirements(mocker: pytest_mock.MockerFixture,
+                            tmpdir: pytest.FixtureRequest,
+                            sources: dict,
+                            expected_reqs: List[str]):
+    """Tests infer_requirements, which scans a directory of python sources for
+    third-party requirements, excluding stdlib and local modules. Also checks
+    that unchanged sources are served from the scan cache.
+
+    Args:
+        mocker: Mocker to patch the scan cache file and parser.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        sources (dict): Mapping of filename to file contents.
+        expected_reqs (List[str]): Expected inferred requirements.
+    """
+    cache_file = f'{tmpdir}/import_scan_cache.json'
+    mocker.patch.object(AutoMLOps.utils.import_scanner, 'IMPORT_SCAN_CACHE_FILE', cache_file)
+    src_dir = tmpdir.mkdir('src')
+    for filename, contents in sources.items():
+        src_dir.join(filename).write(contents)
+
+    assert infer_requirements(str(src_dir)) == expected_reqs
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == len([f for f in sources if f.endswith('.py')])
+
+    # A second scan of unchanged sources must not re-parse them
+    parser = mocker.patch.object(AutoMLOps.utils.import_scanner, 'get_imported_modules')
+    assert infer_requirements(str(src_dir)) == expected_reqs
+    parser.assert_not_called()
+
+def test_infer_requirements_skip_files(mocker: pytest_mock.MockerFixture,
+                                       tmpdir: pytest.FixtureRequest):
+    """Tests that infer_requirements does not scan the imports of skipped
+    files, but still treats them as local modules.
+
+    Args:
+        mocker: Mocker to patch the scan cache file.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    mocker.patch.object(AutoMLOps.utils.import_scanner, 'IMPORT_SCAN_CACHE_FILE', f'{tmpdir}/import_scan_cache.json')
+    src_dir = tmpdir.mkdir('src')
+    src_dir.join('a.py').write('import b\nimport pandas\n')
+    src_dir.join('b.py').write('import numpy\n')
+
+    assert infer_requirements(str(src_dir), ['b.py']) == ['pandas']
@@ -0,0 +1,292 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for lockfile module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import hashlib
+import io
+import os
+import subprocess
+import tarfile
+import zipfile
+from typing import List, Optional
+
+import pytest
+import pytest_mock
+
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import PINNED_KFP_VERSION
+from AutoMLOps.utils.lockfile import (
+    format_lock,
+    get_target_python_version,
+    lock_requirements,
+    normalize_name
+)
+from AutoMLOps.utils.utils import virtual_filesystem
+
+def make_wheel(wheelhouse: str, name: str, version: str, requires: Optional[List[str]] = None) -> str:
+    """Writes a minimal pure python wheel to a wheelhouse.
+
+    Args:
+        wheelhouse: Directory to write the wheel to.
+        name: Distribution name.
+        version: Distribution version.
+        requires: Requirement specifiers of the distribution.
+    Returns:
+        str: sha256 hash of the wheel.
+    """
+    filename = f'{wheelhouse}/{name}-{version}-py3-none-any.whl'
+    dist_info = f'{name}-{version}.dist-info'
+    metadata = f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n' + ''.join(f'Requires-Dist: {r}\n' for r in requires or [])
+    with zipfile.ZipFile(filename, 'w') as wheel:
+        wheel.writestr(f'{name}/__init__.py', '')
+        wheel.writestr(f'{dist_info}/METADATA', metadata)
+        wheel.writestr(f'{dist_info}/WHEEL', 'Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n')
+        wheel.writestr(f'{dist_info}/RECORD', '')
+    with open(filename, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+# In-tree build backend of the test sdists, which builds a pure python wheel
+# without installing a build system
+SDIST_BACKEND = '''import base64, hashlib, os, zipfile
+
+def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
+    with open('PKG-INFO', encoding='utf-8') as file:
+        metadata = file.read()
+    fields = dict(line.split(': ', 1) for line in metadata.splitlines() if ': ' in line)
+    name, version = fields['Name'], fields['Version']
+    filename = f'{name.replace("-", "_")}-{version}-py3-none-any.whl'
+    dist_info = f'{name.replace("-", "_")}-{version}.dist-info'
+    with zipfile.ZipFile(os.path.join(wheel_directory, filename), 'w') as wheel:
+        wheel.writestr(f'{name.replace("-", "_")}/__init__.py', '')
+        wheel.writestr(f'{dist_info}/METADATA', metadata)
+        wheel.writestr(f'{dist_info}/WHEEL', 'Wheel-Version: 1.0\\nGenerator: test\\nRoot-Is-Purelib: true\\nTag: py3-none-any\\n')
+        wheel.writestr(f'{dist_info}/RECORD', '')
+    return filename
+'''
+
+def make_sdist(wheelhouse: str, name: str, version: str, requires: Optional[List[str]] = None) -> str:
+    """Writes a minimal sdist of a pure python distribution, which builds
+    with an in-tree backend, to a wheelhouse.
+
+    Args:
+        wheelhouse: Directory to write the sdist to.
+        name: Distribution name.
+        version: Distribution version.
+        requires: Requirement specifiers of the distribution.
+    Returns:
+        str: sha256 hash of the sdist.
+    """
+    filename = f'{wheelhouse}/{name}-{version}.tar.gz'
+    files = {
+        'PKG-INFO': f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n' + ''.join(f'Requires-Dist: {r}\n' for r in requires or []),
+        'pyproject.toml': '[build-system]\nrequires = []\nbuild-backend = "backend"\nbackend-path = ["."]\n',
+        'backend.py': SDIST_BACKEND}
+    with tarfile.open(filename, 'w:gz') as sdist:
+        for path, contents in files.items():
+            info = tarfile.TarInfo(f'{name}-{version}/{path}')
+            info.size = len(contents.encode('utf-8'))
+            sdist.addfile(info, io.BytesIO(contents.encode('utf-8')))
+    with open(filename, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+@pytest.fixture(name='wheelhouse')
+def fixture_wheelhouse(tmpdir: pytest.FixtureRequest) -> dict:
+    """Creates a wheelhouse where alpha 1.0 requires beta>=1, and beta has
+    versions 1.0 and 2.0.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    Returns:
+        dict: The wheelhouse directory and the hash of each wheel.
+    """
+    os.makedirs(f'{tmpdir}/wheelhouse')
+    return {
+        'dir': f'{tmpdir}/wheelhouse',
+        'alpha-1.0': make_wheel(f'{tmpdir}/wheelhouse', 'alpha', '1.0', ['beta>=1']),
+        'beta-1.0': make_wheel(f'{tmpdir}/wheelhouse', 'beta', '1.0'),
+        'beta-2.0': make_wheel(f'{tmpdir}/wheelhouse', 'beta', '2.0')
+    }
+
+@pytest.mark.parametrize(
+    'name, expected_output',
+    [
+        ('Scikit_Learn', 'scikit-learn'),
+        ('google.cloud-storage', 'google-cloud-storage'),
+        ('pandas', 'pandas')
+    ]
+)
+def test_normalize_name(name: str, expected_output: str):
+    """Tests normalize_name, which normalizes distribution names.
+
+    Args:
+        name (str): Distribution name.
+        expected_output (str): Normalized name.
+    """
+    assert normalize_name(name) == expected_output
+
+@pytest.mark.parametrize(
+    'base_image, expected_output',
+    [
+        ('python:3.9-slim', '3.9'),
+        ('python:3.10', '3.10'),
+        ('docker.io/library/python:3.11.4-bookworm', '3.11'),
+        ('gcr.io/my-project/custom:latest', None)
+    ]
+)
+def test_get_target_python_version(base_image: str, expected_output: Optional[str]):
+    """Tests get_target_python_version, which reads the python version of
+    official python images, and None for any other image.
+
+    Args:
+        base_image (str): Base image of the component base dockerfile.
+        expected_output (Optional[str]): Expected python version.
+    """
+    assert get_target_python_version(base_image) == expected_output
+
+def test_format_lock():
+    """Tests format_lock, which writes one pin per distribution, sorted by
+    name, followed by its hashes."""
+    lock = format_lock({'beta': ('2.0', ['b1']), 'alpha': ('1.0', ['a1', 'a2'])})
+    assert lock.splitlines()[1:] == [
+        'alpha==1.0 \\',
+        '    --hash=sha256:a1 \\',
+        '    --hash=sha256:a2',
+        'beta==2.0 \\',
+        '    --hash=sha256:b1']
+
+@pytest.mark.parametrize(
+    'requirements, constraints, python_version, expected_pins',
+    [
+        (['alpha'], None, None, ['alpha==1.0', 'beta==2.0']),
+        (['alpha'], 'beta==1.0 \\\n    --hash=sha256:0\n', None, ['alpha==1.0', 'beta==1.0']),
+        (['beta<2'], None, '3.9', ['beta==1.0'])
+    ]
+)
+def test_lock_requirements(monkeypatch: pytest.MonkeyPatch,
+                           tmpdir: pytest.FixtureRequest,
+                           wheelhouse: dict,
+                           *,
+                           requirements: List[str],
+                           constraints: Optional[str],
+                           python_version: Optional[str],
+                           expected_pins: List[str]):
+    """Tests lock_requirements, which resolves the requirements against the
+    wheelhouse, including transitive dependencies and the versions pinned by
+    the constraints, and records the hash of each wheel.
+
+    Args:
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        wheelhouse (dict): The wheelhouse directory and the hash of each wheel.
+        requirements (List[str]): Requirement specifiers.
+        constraints (Optional[str]): Lock whose pins must be kept.
+        python_version (Optional[str]): Python version to resolve for.
+        expected_pins (List[str]): Expected name==version pins.
+    """
+    monkeypatch.chdir(tmpdir)
+    lock = lock_requirements(requirements, wheelhouse['dir'], python_version, constraints)
+    pins = [line.split(' ')[0] for line in lock.splitlines() if '==' in line]
+    assert pins == expected_pins
+    for pin in expected_pins:
+        assert f'--hash=sha256:{wheelhouse[pin.replace("==", "-")]}' in lock
+
+def test_lock_requirements_cache(mocker: pytest_mock.MockerFixture,
+                                 monkeypatch: pytest.MonkeyPatch,
+                                 tmpdir: pytest.FixtureRequest,
+                                 wheelhouse: dict):
+    """Tests that lock_requirements reuses a cached lock while its inputs
+    are unchanged, re-resolves when the wheelhouse changes, and fails inside
+    a virtual filesystem when the lock is not cached.
+
+    Args:
+        mocker: Mocker to spy on subprocess.
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        wheelhouse (dict): The wheelhouse directory and the hash of each wheel.
+    """
+    monkeypatch.chdir(tmpdir)
+    os.makedirs(f'{tmpdir}/.AutoMLOps-cache')
+    run = mocker.spy(subprocess, 'run')
+    lock = lock_requirements(['alpha'], wheelhouse['dir'])
+    assert run.call_count == 1
+
+    assert lock_requirements(['alpha'], wheelhouse['dir']) == lock
+    with virtual_filesystem():
+        assert lock_requirements(['alpha'], wheelhouse['dir']) == lock
+    assert run.call_count == 1
+
+    make_wheel(wheelhouse['dir'], 'beta', '3.0')
+    with virtual_filesystem():
+        with pytest.raises(RuntimeError):
+            lock_requirements(['alpha'], wheelhouse['dir'])
+    assert 'beta==3.0' in lock_requirements(['alpha'], wheelhouse['dir'])
+    assert run.call_count == 2
+
+@pytest.mark.parametrize('with_sdists', [True, False])
+def test_lock_requirements_kfp_sdists(monkeypatch: pytest.MonkeyPatch, tmpdir: pytest.FixtureRequest, with_sdists: bool):
+    """Tests locking the pinned kfp version for the python version of the
+    default base image, where kfp 1.8 and kfp-server-api are only published
+    as sdists and kfp 0.1.11 as a wheel. There are two test cases:
+    1. The sdists are built into wheels, so kfp 1.8 is locked with the
+       hashes of the sdists.
+    2. Without the sdists, only kfp 0.1.11 resolves, which generated
+       components cannot import kfp.v2 from.
+
+    Args:
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        with_sdists (bool): Whether the kfp 1.8 sdists are in the wheelhouse.
+    """
+    monkeypatch.chdir(tmpdir)
+    os.makedirs(f'{tmpdir}/wheelhouse')
+    make_wheel(f'{tmpdir}/wheelhouse', 'kfp', '0.1.11')
+    python_version = get_target_python_version(DefaultsConfig(project_id='my-project').base_image)
+    if not with_sdists:
+        with pytest.raises(RuntimeError, match=r'Resolved kfp==0\.1\.11, but generated components need kfp 1\.8 or later'):
+            lock_requirements([PINNED_KFP_VERSION], f'{tmpdir}/wheelhouse', python_version)
+        return
+    kfp_hash = make_sdist(f'{tmpdir}/wheelhouse', 'kfp', '1.8.22', ['kfp-server-api<2.0.0,>=1.1.2'])
+    server_api_hash = make_sdist(f'{tmpdir}/wheelhouse', 'kfp-server-api', '1.8.5')
+
+    lock = lock_requirements([PINNED_KFP_VERSION], f'{tmpdir}/wheelhouse', python_version)
+    assert lock.splitlines()[1:] == [
+        'kfp==1.8.22 \\',
+        f'    --hash=sha256:{kfp_hash}',
+        'kfp-server-api==1.8.5 \\',
+        f'    --hash=sha256:{server_api_hash}']
+
+def test_lock_requirements_unresolvable(monkeypatch: pytest.MonkeyPatch,
+                                        tmpdir: pytest.FixtureRequest,
+                                        wheelhouse: dict):
+    """Tests that lock_requirements raises an error when a requirement is
+    not in the wheelhouse.
+
+    Args:
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        wheelhouse (dict): The wheelhouse directory and the hash of each wheel.
+    """
+    monkeypatch.chdir(tmpdir)
+    with pytest.raises(RuntimeError, match='Error resolving requirements'):
+        lock_requirements(['gamma'], wheelhouse['dir'])
@@ -0,0 +1,121 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for manifest module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+import AutoMLOps.utils.manifest
+from AutoMLOps.utils.manifest import (
+    GenerationManifest,
+    get_generator_fingerprint,
+    hash_contents,
+    hash_file
+)
+
+@pytest.mark.parametrize(
+    'contents1, contents2, expected_equal',
+    [
+        (['a', 'b'], ['a', 'b'], True),
+        (['a', 'b'], ['b', 'a'], False),
+        (['ab'], ['a', 'b'], False),
+        ([b'a'], ['a'], True)
+    ]
+)
+def test_hash_contents(contents1: list, contents2: list, expected_equal: bool):
+    """Tests hash_contents, which hashes an ordered sequence of contents.
+
+    Args:
+        contents1 (list): First sequence of contents to hash.
+        contents2 (list): Second sequence of contents to hash.
+        expected_equal (bool): Whether the two hashes are expected to match.
+    """
+    assert (hash_contents(*contents1) == hash_contents(*contents2)) == expected_equal
+
+def test_hash_file(tmpdir: pytest.FixtureRequest):
+    """Tests hash_file, which hashes a file's contents or returns None if it
+    does not exist.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    filepath = f'{tmpdir}/test.txt'
+    assert hash_file(filepath) is None
+    with open(filepath, 'w', encoding='utf-8') as file:
+        file.write('contents')
+    assert hash_file(filepath) == hash_contents('contents')
+
+def test_GenerationManifest(tmpdir: pytest.FixtureRequest):
+    """Tests GenerationManifest, which determines whether a target's inputs
+    or outputs have changed since it was last recorded. There are five cases:
+        1. A target that was never recorded is stale.
+        2. A recorded target with unchanged inputs and outputs is fresh,
+            including after reloading the saved manifest.
+        3. A target whose inputs changed is stale.
+        4. A target whose output was modified or deleted is stale.
+        5. A target whose output was rewritten by a later step is fresh
+            again once refreshed.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    manifest_path = f'{tmpdir}/cache/manifest.json'
+    output_path = f'{tmpdir}/output.txt'
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write('generated')
+
+    manifest = GenerationManifest(manifest_path)
+    assert not manifest.is_fresh('target', 'inputs')
+
+    manifest.record('target', 'inputs', [output_path])
+    assert manifest.is_fresh('target', 'inputs')
+    manifest.save()
+    assert GenerationManifest(manifest_path).is_fresh('target', 'inputs')
+
+    assert not manifest.is_fresh('target', 'changed_inputs')
+
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write('edited by hand')
+    assert not manifest.is_fresh('target', 'inputs')
+    manifest.refresh('target')
+    assert manifest.is_fresh('target', 'inputs')
+
+def test_GenerationManifest_generator_changed(tmpdir: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch):
+    """Tests that a recorded target is stale once the generator changes,
+    e.g. after AutoMLOps is upgraded, even if its inputs and outputs are
+    unchanged.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        monkeypatch: Pytest fixture used to swap the generator fingerprint.
+    """
+    manifest_path = f'{tmpdir}/cache/manifest.json'
+    output_path = f'{tmpdir}/output.txt'
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write('generated')
+
+    manifest = GenerationManifest(manifest_path)
+    manifest.record('target', 'inputs', [output_path])
+    manifest.save()
+    assert get_generator_fingerprint() == get_generator_fingerprint()
+
+    monkeypatch.setattr(AutoMLOps.utils.manifest, 'get_generator_fingerprint', lambda: 'upgraded')
+    assert not GenerationManifest(manifest_path).is_fresh('target', 'inputs')
@@ -0,0 +1,135 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for resources module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+from contextlib import nullcontext as does_not_raise
+from typing import Optional
+
+import pytest
+
+from AutoMLOps.utils.resources import (
+    create_resource_annotations,
+    get_component_resources,
+    get_cpu_number,
+    get_machine_type,
+    get_memory_bytes
+)
+
+@pytest.mark.parametrize(
+    'cpu, expected_output, expectation',
+    [
+        ('4', 4.0, does_not_raise()),
+        ('0.5', 0.5, does_not_raise()),
+        ('500m', 0.5, does_not_raise()),
+        ('0', None, pytest.raises(ValueError)),
+        ('1.5m', None, pytest.raises(ValueError)),
+        ('four', None, pytest.raises(ValueError))
+    ]
+)
+def test_get_cpu_number(cpu: str, expected_output: Optional[float], expectation):
+    with expectation:
+        assert get_cpu_number(cpu) == expected_output
+
+@pytest.mark.parametrize(
+    'memory, expected_output, expectation',
+    [
+        ('1024', 1024, does_not_raise()),
+        ('16G', 16 * 10 ** 9, does_not_raise()),
+        ('512Mi', 512 * 2 ** 20, does_not_raise()),
+        ('1.5G', None, pytest.raises(ValueError)),
+        ('16GB', None, pytest.raises(ValueError))
+    ]
+)
+def test_get_memory_bytes(memory: str, expected_output: Optional[int], expectation):
+    with expectation:
+        assert get_memory_bytes(memory) == expected_output
+
+@pytest.mark.parametrize(
+    'kwargs, expected_output, expectation',
+    [
+        ({}, {}, does_not_raise()),
+        ({'cpu': 4, 'memory': '16G'}, {'automlops/cpu_limit': '4', 'automlops/memory_limit': '16G'}, does_not_raise()),
+        ({'accelerator_type': 'nvidia-tesla-t4'}, {'automlops/accelerator_type': 'NVIDIA_TESLA_T4', 'automlops/accelerator_count': '1'}, does_not_raise()),
+        ({'memory': '16GB'}, None, pytest.raises(ValueError)),
+        ({'accelerator_count': 2}, None, pytest.raises(ValueError)),
+        ({'accelerator_type': 'NVIDIA_L4', 'accelerator_count': 0}, None, pytest.raises(ValueError))
+    ]
+)
+def test_create_resource_annotations(kwargs: dict, expected_output: Optional[dict], expectation):
+    """Tests create_resource_annotations, which validates the resources
+    declared on a decorator and creates the annotations that hold them.
+    There are six test cases:
+    1. No resources are declared.
+    2. cpu and memory are declared.
+    3. An accelerator type is declared, which is converted to the enum style
+       and defaults to one accelerator.
+    4. The memory quantity is not valid.
+    5. Accelerators are counted without a type.
+    6. The number of accelerators is not positive.
+
+    Args:
+        kwargs (dict): Resources declared on the decorator.
+        expected_output (dict): Expected annotations.
+        expectation: Any corresponding expected errors for each
+            set of parameters.
+    """
+    with expectation:
+        annotations = create_resource_annotations(**kwargs)
+        assert annotations == expected_output
+        assert get_component_resources({'name': 'train', 'metadata': {'annotations': annotations}}) == {
+            key: value for key, value in {
+                'cpu': annotations.get('automlops/cpu_limit'),
+                'memory': annotations.get('automlops/memory_limit'),
+                'accelerator_type': annotations.get('automlops/accelerator_type'),
+                'accelerator_count': annotations.get('automlops/accelerator_count')}.items() if value}
+
+@pytest.mark.parametrize(
+    'resources, expected_output, expectation',
+    [
+        ({}, None, does_not_raise()),
+        ({'cpu': '500m', 'memory': '1G'}, 'e2-standard-2', does_not_raise()),
+        ({'memory': '100G'}, 'n1-highmem-16', does_not_raise()),
+        ({'cpu': '8', 'accelerator_type': 'NVIDIA_TESLA_T4', 'accelerator_count': '2'}, 'n1-standard-8', does_not_raise()),
+        ({'accelerator_type': 'NVIDIA_TESLA_A100', 'accelerator_count': '4'}, 'a2-highgpu-4g', does_not_raise()),
+        ({'cpu': '128'}, None, pytest.raises(ValueError, match='128 vCPUs')),
+        ({'cpu': '4', 'accelerator_type': 'NVIDIA_TESLA_A100', 'accelerator_count': '3'}, None, pytest.raises(ValueError, match='3 NVIDIA_TESLA_A100')),
+        ({'accelerator_type': 'TPU_V9', 'accelerator_count': '1'}, None, pytest.raises(ValueError, match='Unsupported accelerator_type'))
+    ]
+)
+def test_get_machine_type(resources: dict, expected_output: Optional[str], expectation):
+    """Tests get_machine_type, which finds the smallest machine type in the
+    machine catalog that fits the declared resources. There are eight test
+    cases:
+    1. No resources are declared.
+    2. A fraction of a vCPU and little memory fit the smallest machine.
+    3. Memory alone picks a high memory machine.
+    4. Accelerators are only attached to machines that support them.
+    5. Machines with fixed accelerator counts fit exactly that count.
+    6. More vCPUs than any machine has.
+    7. An accelerator count that no machine supports.
+    8. An accelerator type that is not in the catalog.
+
+    Args:
+        resources (dict): Quantities of the declared resources.
+        expected_output (str): Expected machine type.
+        expectation: Any corresponding expected errors for each
+            set of parameters.
+    """
+    with expectation:
+        assert get_machine_type(resources) == expected_output
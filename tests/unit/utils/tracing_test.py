@@ -0,0 +1,113 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for tracing module."""
+
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import json
+
+import pytest
+import pytest_mock
+
+import AutoMLOps.utils.tracing
+from AutoMLOps.utils.constants import TRACE_FILE_ENV_VAR
+from AutoMLOps.utils.tracing import (
+    root_span,
+    span,
+    traced
+)
+
+@traced('add', 'a')
+def add(a: int, b: int):
+    return a + b
+
+@pytest.mark.parametrize(
+    'enabled',
+    [True, False]
+)
+def test_root_span(mocker: pytest_mock.MockerFixture,
+                   monkeypatch: pytest.MonkeyPatch,
+                   tmpdir: pytest.FixtureRequest,
+                   enabled: bool):
+    """Tests root_span, span and traced, which record timed spans and write
+    them to the trace file as Chrome trace JSON. There are two test cases:
+        1. Tracing enabled: nested spans and traced calls are written, with
+            their arguments, when the root span exits.
+        2. Tracing disabled: nothing is recorded or written.
+
+    Args:
+        mocker: Mocker to patch the recorded events.
+        monkeypatch: Pytest fixture to set the trace file environment variable.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        enabled (bool): Whether tracing is enabled.
+    """
+    mocker.patch.object(AutoMLOps.utils.tracing, '_EVENTS', [])
+    trace_file = f'{tmpdir}/traces/trace.json'
+    if enabled:
+        monkeypatch.setenv(TRACE_FILE_ENV_VAR, trace_file)
+    else:
+        monkeypatch.delenv(TRACE_FILE_ENV_VAR, raising=False)
+
+    with root_span('generate'):
+        with span('step', detail='value'):
+            assert add(1, b=2) == 3
+
+    if not enabled:
+        assert not AutoMLOps.utils.tracing._EVENTS # pylint: disable=protected-access
+        assert not tmpdir.join('traces').check()
+        return
+
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        events = [e for e in json.load(f)['traceEvents'] if e['ph'] == 'X']
+    assert [e['name'] for e in events] == ['add', 'step', 'generate']
+    assert events[0]['args'] == {'a': '1'}
+    assert events[1]['args'] == {'detail': 'value'}
+    generate, step = events[2], events[1]
+    assert generate['ts'] <= step['ts'] and step['ts'] + step['dur'] <= generate['ts'] + generate['dur']
+
+def test_root_span_clears_events(mocker: pytest_mock.MockerFixture,
+                                 monkeypatch: pytest.MonkeyPatch,
+                                 tmpdir: pytest.FixtureRequest):
+    """Tests that the outermost root span writes the trace once with the spans
+    of its nested root spans, and clears them, so the next call writes only
+    its own spans.
+
+    Args:
+        mocker: Mocker to patch the recorded events and spy on the writes.
+        monkeypatch: Pytest fixture to set the trace file environment variable.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    mocker.patch.object(AutoMLOps.utils.tracing, '_EVENTS', [])
+    trace_file = f'{tmpdir}/trace.json'
+    monkeypatch.setenv(TRACE_FILE_ENV_VAR, trace_file)
+    write_trace = mocker.spy(AutoMLOps.utils.tracing, 'write_trace')
+
+    with root_span('go'):
+        with root_span('generate'):
+            pass
+        with root_span('run'):
+            pass
+    assert write_trace.call_count == 1
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        assert [e['name'] for e in json.load(f)['traceEvents'] if e['ph'] == 'X'] == ['generate', 'run', 'go']
+    assert not AutoMLOps.utils.tracing._EVENTS # pylint: disable=protected-access
+
+    with root_span('generate'):
+        pass
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        assert [e['name'] for e in json.load(f)['traceEvents'] if e['ph'] == 'X'] == ['generate']
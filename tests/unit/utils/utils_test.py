@@ -16,7 +16,9 @@
 
 # pylint: disable=line-too-long
 # pylint: disable=missing-function-docstring
+# pylint: disable=protected-access
 
+import json
 from contextlib import nullcontext as does_not_raise
 import os
 from typing import Callable, List
@@ -31,14 +33,19 @@ from AutoMLOps.utils.utils import (
     delete_file,
     execute_process,
     format_spec_dict,
+    get_component_spec,
     get_components_list,
     get_function_source_definition,
+    in_virtual_filesystem,
     is_component_config,
+    list_files,
     make_dirs,
     read_file,
     read_yaml_file,
+    register_component,
     update_params,
     validate_schedule,
+    virtual_filesystem,
     write_and_chmod,
     write_file,
     write_yaml_file
@@ -126,6 +133,72 @@ def test_read_yaml_file(filepath: str, content1: dict, content2: str, expectatio
         assert read_yaml_file(filepath=filepath) == content1
     os.remove(path=filepath)
 
+def test_read_yaml_file_cache(mocker: pytest_mock.MockerFixture,
+                              tmpdir: pytest.FixtureRequest):
+    """Tests the parsed yaml cache used by read_yaml_file. Unchanged files are
+    not re-parsed, callers cannot modify cached contents, rewritten files are
+    re-parsed, and the number of cached documents is bounded.
+
+    Args:
+        mocker: Mocker to patch the yaml loader and cache size.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    mocker.patch.object(AutoMLOps.utils.utils, 'YAML_CACHE_MAX_ENTRIES', 2)
+    filepath = f'{tmpdir}/test.yaml'
+    write_yaml_file(filepath, {'key1': 'value1'}, 'w')
+    read_yaml_file(filepath)['key1'] = 'modified'
+
+    loader = mocker.spy(AutoMLOps.utils.utils.yaml, 'load')
+    assert read_yaml_file(filepath) == {'key1': 'value1'}
+    loader.assert_not_called()
+
+    write_yaml_file(filepath, {'key1': 'value2'}, 'w')
+    assert read_yaml_file(filepath) == {'key1': 'value2'}
+    assert loader.call_count == 1
+
+    for i in range(3):
+        write_yaml_file(f'{tmpdir}/other{i}.yaml', {'key': i}, 'w')
+        read_yaml_file(f'{tmpdir}/other{i}.yaml')
+    assert len(AutoMLOps.utils.utils._YAML_CACHE) == 2
+    assert filepath not in AutoMLOps.utils.utils._YAML_CACHE
+
+def test_virtual_filesystem(tmpdir: pytest.FixtureRequest):
+    """Tests virtual_filesystem, which redirects the file helpers to an
+    in-memory mapping of path to bytes. Checks that writes, appends, yaml
+    and chmod-ed files land in the mapping, that they can be read and listed
+    back, that nothing is written to disk and that processes are refused.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    with open(f'{tmpdir}/on_disk.txt', 'w', encoding='utf-8') as file:
+        file.write('on disk')
+
+    with virtual_filesystem() as files:
+        assert in_virtual_filesystem()
+        make_dirs([f'{tmpdir}/dir'])
+        write_file(f'{tmpdir}/dir/a.yaml', '# header\n', 'w')
+        write_yaml_file(f'{tmpdir}/dir/a.yaml', {'key1': 'value1'}, 'a')
+        write_and_chmod(f'{tmpdir}/dir/sub/run.sh', 'echo hi\n')
+        write_file(f'{tmpdir}/dir/deleted.txt', 'deleted', 'w')
+        delete_file(f'{tmpdir}/dir/deleted.txt')
+
+        assert read_yaml_file(f'{tmpdir}/dir/a.yaml') == {'key1': 'value1'}
+        assert read_file(f'{tmpdir}/dir/sub/run.sh') == 'echo hi\n'
+        assert read_file(f'{tmpdir}/on_disk.txt') == 'on disk'
+        assert list_files(f'{tmpdir}/dir') == [os.path.normpath(f'{tmpdir}/dir/a.yaml'), os.path.normpath(f'{tmpdir}/dir/sub/run.sh')]
+        with pytest.raises(RuntimeError):
+            execute_process('touch should_not_exist', to_null=True)
+
+    assert not in_virtual_filesystem()
+    assert files == {
+        os.path.normpath(f'{tmpdir}/dir/a.yaml'): b'# header\nkey1: value1\n',
+        os.path.normpath(f'{tmpdir}/dir/sub/run.sh'): b'echo hi\n'}
+    assert os.listdir(tmpdir) == ['on_disk.txt']
+    assert not os.path.exists('should_not_exist')
+
 @pytest.mark.parametrize(
     'filepath, mode, expectation',
     [
@@ -295,6 +368,7 @@ def test_get_components_list(mocker: pytest_mock.MockerFixture,
         expectation: Any corresponding expected errors for each set of
             parameters.
     """
+    mocker.patch.object(AutoMLOps.utils.utils, '_REGISTERED_COMPONENTS', {})
     if patch_cwd:
         mocker.patch.object(AutoMLOps.utils.utils, 'CACHE_DIR', '.')
     if comp_path:
@@ -314,6 +388,57 @@ def test_get_components_list(mocker: pytest_mock.MockerFixture,
         if os.path.exists(file):
             os.remove(file)
 
+def test_register_component(mocker: pytest_mock.MockerFixture,
+                            tmpdir: pytest.FixtureRequest):
+    """Tests register_component and get_component_spec, which record component
+    yamls in the registry and the components index and serve their parsed specs
+    without re-reading the yamls. Also checks that the registry is listed
+    without reading the disk, that the index drops components registered by
+    an earlier process, that a later process falls back to the index, and
+    that a spec edited on disk is re-parsed.
+
+    Args:
+        mocker: Mocker to patch the cache directory, registry and yaml reader.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    mocker.patch.object(AutoMLOps.utils.utils, 'CACHE_DIR', str(tmpdir))
+    mocker.patch.object(AutoMLOps.utils.utils, '_REGISTERED_COMPONENTS', {})
+    # Registered by an earlier process
+    write_yaml_file(f'{tmpdir}/removed.yaml', {'name': 'removed', 'inputs': [], 'implementation': {}}, 'w')
+    with open(f'{tmpdir}/components_index.json', 'w', encoding='utf-8') as f:
+        json.dump({'components': ['removed']}, f)
+    specs = {
+        'train': {'name': 'train', 'inputs': [], 'implementation': {}},
+        'deploy': {'name': 'deploy', 'inputs': [], 'implementation': {}}}
+    for name, spec in specs.items():
+        write_yaml_file(f'{tmpdir}/{name}.yaml', spec, 'w')
+        register_component(f'{tmpdir}/{name}.yaml', spec)
+    # Registering a component twice does not duplicate it in the index
+    register_component(f'{tmpdir}/train.yaml', specs['train'])
+    # A component yaml missing from the index is not listed
+    write_yaml_file(f'{tmpdir}/unregistered.yaml', {'name': 'unregistered', 'inputs': [], 'implementation': {}}, 'w')
+
+    exists = mocker.spy(os.path, 'exists')
+    assert get_components_list(full_path=False) == ['train', 'deploy']
+    assert get_components_list(full_path=True) == [f'{tmpdir}/train.yaml', f'{tmpdir}/deploy.yaml']
+    exists.assert_not_called()
+
+    # A new process lists the components in the index
+    mocker.patch.object(AutoMLOps.utils.utils, '_REGISTERED_COMPONENTS', {})
+    assert get_components_list(full_path=False) == ['train', 'deploy']
+
+    reader = mocker.patch.object(AutoMLOps.utils.utils, 'read_yaml_file', wraps=read_yaml_file)
+    spec = get_component_spec(f'{tmpdir}/train.yaml')
+    assert spec == specs['train']
+    spec['name'] = 'modified'
+    assert get_component_spec(f'{tmpdir}/train.yaml') == specs['train']
+    reader.assert_not_called()
+
+    write_yaml_file(f'{tmpdir}/train.yaml', {'name': 'edited', 'inputs': [], 'implementation': {}, 'description': 'edited'}, 'w')
+    assert get_component_spec(f'{tmpdir}/train.yaml')['name'] == 'edited'
+    reader.assert_called_once()
+
 @pytest.mark.parametrize(
     'yaml_contents, expectation',
     [
@@ -0,0 +1,72 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for venvs module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+import os
+import subprocess
+
+import pytest
+
+from AutoMLOps.utils.venvs import ensure_venv, get_venv_key
+from tests.unit.utils.lockfile_test import make_wheel
+
+def test_ensure_venv(tmpdir: pytest.FixtureRequest, mocker: pytest.FixtureRequest):
+    """Tests that ensure_venv installs a requirement set from the wheelhouse
+    into a new environment once, and reuses it for the same requirements.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        mocker: Mocker to spy on the processes that are run.
+    """
+    os.makedirs(f'{tmpdir}/wheelhouse')
+    make_wheel(f'{tmpdir}/wheelhouse', 'alpha', '1.0')
+    with open(f'{tmpdir}/requirements.txt', 'w', encoding='utf-8') as f:
+        f.write('alpha\n')
+
+    python = ensure_venv([f'{tmpdir}/requirements.txt'], f'{tmpdir}/wheelhouse', f'{tmpdir}/venvs')
+    result = subprocess.run([python, '-c', 'import alpha'], check=False)
+    assert result.returncode == 0
+
+    run = mocker.spy(subprocess, 'run')
+    assert ensure_venv([f'{tmpdir}/requirements.txt'], f'{tmpdir}/wheelhouse', f'{tmpdir}/venvs') == python
+    run.assert_not_called()
+
+def test_ensure_venv_failure(tmpdir: pytest.FixtureRequest, mocker: pytest.FixtureRequest):
+    """Tests that an environment whose requirements fail to install is
+    removed, so it is created again on the next call.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        mocker: Mocker to patch the processes that are run.
+    """
+    with open(f'{tmpdir}/requirements.lock', 'w', encoding='utf-8') as f:
+        f.write('delta==1.0 --hash=sha256:0123\n')
+    def fake_run(command, **_):
+        if command[1:3] == ['-m', 'venv']:
+            os.makedirs(command[3])
+        else:
+            raise subprocess.CalledProcessError(1, command, stderr='No matching distribution found for delta')
+    run = mocker.patch('subprocess.run', side_effect=fake_run)
+
+    with pytest.raises(RuntimeError, match='No matching distribution found for delta'):
+        ensure_venv([f'{tmpdir}/requirements.lock'], None, f'{tmpdir}/venvs')
+    assert '--require-hashes' in run.call_args.args[0]
+    assert not os.path.exists(f'{tmpdir}/venvs/{get_venv_key([f"{tmpdir}/requirements.lock"])[:16]}')
@@ -0,0 +1,144 @@
+# Copyright 2023 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for wheelhouse module."""
+
+# pylint: disable=C0103
+# pylint: disable=line-too-long
+# pylint: disable=missing-function-docstring
+
+from contextlib import nullcontext as does_not_raise
+import os
+from typing import Optional
+
+import pytest
+
+from AutoMLOps.utils.wheelhouse import (
+    download_wheels,
+    get_generated_requirements,
+    sync_wheelhouse,
+    validate_wheelhouse
+)
+from AutoMLOps.utils.config import DefaultsConfig
+from AutoMLOps.utils.constants import PINNED_KFP_VERSION
+from AutoMLOps.utils.lockfile import get_target_python_version
+from tests.unit.utils.lockfile_test import make_sdist, make_wheel
+
+@pytest.mark.parametrize('python_version', ['3.9', None])
+def test_download_wheels(tmpdir: pytest.FixtureRequest, python_version: Optional[str]):
+    """Tests download_wheels, which copies the wheels of the requirements and
+    their dependencies from an index into the wheelhouse, for the python
+    version of the image if it is known, otherwise for the running interpreter.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+        python_version (Optional[str]): Python version of the image.
+    """
+    os.makedirs(f'{tmpdir}/index')
+    make_wheel(f'{tmpdir}/index', 'alpha', '1.0', ['beta'])
+    make_wheel(f'{tmpdir}/index', 'beta', '1.0')
+    make_wheel(f'{tmpdir}/index', 'gamma', '1.0')
+    with open(f'{tmpdir}/requirements.txt', 'w', encoding='utf-8') as f:
+        f.write('alpha\n')
+
+    download_wheels(f'{tmpdir}/requirements.txt', f'{tmpdir}/wheelhouse', python_version, f'{tmpdir}/index')
+
+    assert sorted(os.listdir(f'{tmpdir}/wheelhouse')) == ['alpha-1.0-py3-none-any.whl', 'beta-1.0-py3-none-any.whl']
+    with pytest.raises(RuntimeError, match='Error downloading wheels'):
+        with open(f'{tmpdir}/requirements.txt', 'w', encoding='utf-8') as f:
+            f.write('delta\n')
+        download_wheels(f'{tmpdir}/requirements.txt', f'{tmpdir}/wheelhouse', python_version, f'{tmpdir}/index')
+
+def test_download_wheels_kfp_sdists(tmpdir: pytest.FixtureRequest):
+    """Tests that download_wheels builds the pinned kfp 1.8 version, which
+    like kfp-server-api is only published as an sdist, into a pure python
+    wheel for the python version of the default base image, instead of
+    downloading the older kfp 0.1.11 wheel.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    os.makedirs(f'{tmpdir}/index')
+    make_wheel(f'{tmpdir}/index', 'kfp', '0.1.11')
+    make_sdist(f'{tmpdir}/index', 'kfp', '1.8.22', ['kfp-server-api<2.0.0,>=1.1.2'])
+    make_sdist(f'{tmpdir}/index', 'kfp-server-api', '1.8.5')
+    with open(f'{tmpdir}/requirements.txt', 'w', encoding='utf-8') as f:
+        f.write(f'{PINNED_KFP_VERSION}\n')
+    python_version = get_target_python_version(DefaultsConfig(project_id='my-project').base_image)
+
+    download_wheels(f'{tmpdir}/requirements.txt', f'{tmpdir}/wheelhouse', python_version, f'{tmpdir}/index')
+
+    assert sorted(os.listdir(f'{tmpdir}/wheelhouse')) == ['kfp-1.8.22-py3-none-any.whl', 'kfp_server_api-1.8.5-py3-none-any.whl']
+
+def test_sync_wheelhouse(tmpdir: pytest.FixtureRequest):
+    """Tests sync_wheelhouse, which copies new and changed wheels, leaves
+    unchanged ones, removes wheels no longer in the wheelhouse, and ignores
+    the wheels in git.
+
+    Args:
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    os.makedirs(f'{tmpdir}/wheelhouse')
+    make_wheel(f'{tmpdir}/wheelhouse', 'alpha', '1.0')
+    make_wheel(f'{tmpdir}/wheelhouse', 'beta', '1.0')
+    assert sync_wheelhouse(f'{tmpdir}/wheelhouse', f'{tmpdir}/context') == ['alpha-1.0-py3-none-any.whl', 'beta-1.0-py3-none-any.whl']
+
+    os.remove(f'{tmpdir}/wheelhouse/alpha-1.0-py3-none-any.whl')
+    make_wheel(f'{tmpdir}/wheelhouse', 'gamma', '1.0')
+    assert sync_wheelhouse(f'{tmpdir}/wheelhouse', f'{tmpdir}/context') == ['gamma-1.0-py3-none-any.whl']
+    assert sorted(os.listdir(f'{tmpdir}/context')) == ['.gitignore', 'beta-1.0-py3-none-any.whl', 'gamma-1.0-py3-none-any.whl']
+    with open(f'{tmpdir}/context/.gitignore', 'r', encoding='utf-8') as file:
+        assert file.read() == '*\n'
+    assert not sync_wheelhouse(f'{tmpdir}/context', f'{tmpdir}/context')
+
+@pytest.mark.parametrize(
+    'wheelhouse, run_local, expectation',
+    [
+        (None, False, does_not_raise()),
+        ('wheels', True, does_not_raise()),
+        ('https://pypi.org/simple', False, does_not_raise()),
+        ('wheels', False, pytest.raises(ValueError))
+    ]
+)
+def test_validate_wheelhouse(wheelhouse: Optional[str], run_local: bool, expectation):
+    """Tests validate_wheelhouse, which only allows a local wheelhouse when
+    the images are built from this machine. There are four test cases:
+    1. No wheelhouse is given.
+    2. A local wheelhouse with run_local set.
+    3. A package index with run_local not set.
+    4. A local wheelhouse with run_local not set.
+
+    Args:
+        wheelhouse (str): Directory of wheels, or url of a package index.
+        run_local (bool): Flag that determines whether to use Cloud Run CI/CD.
+        expectation: Any corresponding expected errors for each set of parameters.
+    """
+    with expectation:
+        validate_wheelhouse(wheelhouse, run_local)
+
+def test_get_generated_requirements_not_generated(monkeypatch: pytest.MonkeyPatch, tmpdir: pytest.FixtureRequest):
+    """Tests that get_generated_requirements raises an error before
+    AutoMLOps.generate() has written any requirements.
+
+    Args:
+        monkeypatch: Pytest fixture to change the working directory.
+        tmpdir: Pytest fixture that provides a temporary directory unique
+            to the test invocation.
+    """
+    monkeypatch.chdir(tmpdir)
+    with pytest.raises(FileNotFoundError, match='Run AutoMLOps.generate'):
+        get_generated_requirements()